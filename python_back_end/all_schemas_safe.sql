@@ -46,14 +46,26 @@ CREATE INDEX IF NOT EXISTS idx_chat_messages_role ON chat_messages(role);
 CREATE OR REPLACE FUNCTION update_session_on_message_insert()
 RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE chat_sessions
+    -- Statement-level: one counter update per session, however many rows were inserted
+    UPDATE chat_sessions s
     SET
-        updated_at = NEW.created_at,
-        last_message_at = NEW.created_at,
-        message_count = message_count + 1,
-        model_used = COALESCE(NEW.model_used, model_used)
-    WHERE id = NEW.session_id;
-    RETURN NEW;
+        updated_at = n.last_created_at,
+        last_message_at = n.last_created_at,
+        message_count = s.message_count + n.inserted,
+        model_used = COALESCE(n.last_model_used, s.model_used)
+    FROM (
+        SELECT
+            session_id,
+            COUNT(*) AS inserted,
+            MAX(created_at) AS last_created_at,
+            (ARRAY_AGG(model_used ORDER BY created_at DESC, id DESC)
+                FILTER (WHERE model_used IS NOT NULL))[1] AS last_model_used
+        FROM new_messages
+        GROUP BY session_id
+    ) n
+    WHERE s.id = n.session_id;
+
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -61,9 +73,13 @@ $$ LANGUAGE plpgsql;
 DROP TRIGGER IF EXISTS trigger_update_session_on_message_insert ON chat_messages;
 CREATE TRIGGER trigger_update_session_on_message_insert
     AFTER INSERT ON chat_messages
-    FOR EACH ROW
+    REFERENCING NEW TABLE AS new_messages
+    FOR EACH STATEMENT
     EXECUTE FUNCTION update_session_on_message_insert();
 
+-- Per-user chat statistics (table, trigger and a rebuild from chat_messages)
+\ir chat_user_stats.sql
+
 -- =====================================================
 -- 2. ARTIFACTS TABLE (for generated documents/websites)
 -- =====================================================
@@ -148,6 +164,17 @@ CREATE TABLE IF NOT EXISTS artifact_build_jobs (
     expires_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP + INTERVAL '24 hours'
 );
 
+-- Build progress reported by the executor (phase timings in seconds:
+-- write, install, build, copy, total)
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS progress INTEGER DEFAULT 0;
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS current_phase VARCHAR(50);
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS phase_timings JSONB;
+
+-- Queue claims: replica that claimed the job and time spent spawning its
+-- executor; queue wait is started_at - queued_at
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(255);
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS spawn_ms INTEGER;
+
 -- Indexes for build jobs
 CREATE INDEX IF NOT EXISTS idx_build_jobs_artifact_id ON artifact_build_jobs(artifact_id);
 CREATE INDEX IF NOT EXISTS idx_build_jobs_status ON artifact_build_jobs(status);
@@ -156,6 +183,7 @@ CREATE INDEX IF NOT EXISTS idx_build_jobs_expires_at ON artifact_build_jobs(expi
 CREATE INDEX IF NOT EXISTS idx_build_jobs_pod_name ON artifact_build_jobs(pod_name);
 CREATE INDEX IF NOT EXISTS idx_build_jobs_queued ON artifact_build_jobs(queued_at) WHERE status = 'queued';
 CREATE INDEX IF NOT EXISTS idx_build_jobs_running ON artifact_build_jobs(last_health_check) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_build_jobs_active_port ON artifact_build_jobs(port) WHERE status IN ('building', 'running');
 
 -- Function to update artifact status when build job changes
 CREATE OR REPLACE FUNCTION update_artifact_build_status()
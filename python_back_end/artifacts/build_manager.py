@@ -4,11 +4,15 @@ for isolated code execution
 """
 
 import os
+import json
+import time
+import socket
 import asyncio
 import logging
+from collections import deque
 from typing import Optional, Dict, Any, List
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timedelta
 import aiohttp
 
 from .executor_models import (
@@ -33,6 +37,18 @@ BACKEND_URL = os.environ.get("BACKEND_URL", "http://harvis-ai-backend:8000")
 PORT_RANGE_START = int(os.environ.get("ARTIFACT_PORT_START", "30000"))
 PORT_RANGE_END = int(os.environ.get("ARTIFACT_PORT_END", "31000"))
 
+# Queue processing: builds allowed in the 'building' state across all
+# replicas, spawns in flight per replica, and the fallback poll interval
+# when no NOTIFY arrives
+MAX_CONCURRENT_BUILDS = int(os.environ.get("ARTIFACT_MAX_CONCURRENT_BUILDS", "4"))
+SPAWN_CONCURRENCY = int(os.environ.get("ARTIFACT_SPAWN_CONCURRENCY", "4"))
+QUEUE_POLL_INTERVAL = float(os.environ.get("ARTIFACT_QUEUE_POLL_INTERVAL", "30"))
+BUILD_TIMEOUT_MINUTES = int(os.environ.get("ARTIFACT_BUILD_TIMEOUT_MINUTES", "30"))
+
+QUEUE_CHANNEL = "artifact_build_queue"
+# pg_advisory_xact_lock key serializing claims (slots and ports) across replicas
+CLAIM_LOCK_KEY = 0x41525442  # "ARTB"
+
 # Resource defaults
 DEFAULT_MEMORY_LIMIT = os.environ.get("ARTIFACT_MEMORY_LIMIT", "1Gi")
 DEFAULT_CPU_LIMIT = os.environ.get("ARTIFACT_CPU_LIMIT", "1000m")
@@ -49,11 +65,33 @@ class ArtifactBuildManager:
     4. Handles cleanup of expired jobs
     """
 
-    def __init__(self, db_pool):
+    def __init__(
+        self,
+        db_pool,
+        max_concurrent_builds: int = MAX_CONCURRENT_BUILDS,
+        spawn_concurrency: int = SPAWN_CONCURRENCY,
+        poll_interval: float = QUEUE_POLL_INTERVAL,
+    ):
         self.db_pool = db_pool
-        self._running_builds: Dict[str, asyncio.Task] = {}
-        self._port_pool = set(range(PORT_RANGE_START, PORT_RANGE_END + 1))
-        self._used_ports: Dict[str, int] = {}  # job_id -> port
+        self.max_concurrent_builds = max_concurrent_builds
+        self.spawn_concurrency = spawn_concurrency
+        self.poll_interval = poll_interval
+        self.replica_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._spawn_tasks: set = set()
+        self._wakeup = asyncio.Event()
+        self._listen_conn = None
+
+        # Recent samples for queue metrics (this replica's claims)
+        self._queue_waits: deque = deque(maxlen=200)
+        self._spawn_times: deque = deque(maxlen=200)
+        self._counters = {
+            "claimed": 0,
+            "spawned": 0,
+            "spawn_failed": 0,
+            "wakeups_notify": 0,
+            "wakeups_poll": 0,
+        }
 
     async def create_build_job(
         self,
@@ -103,8 +141,9 @@ class ArtifactBuildManager:
                 node_version,
                 memory_limit,
                 cpu_limit,
-                datetime.utcnow() + asyncio.timedelta(hours=24),
+                datetime.utcnow() + timedelta(hours=24),
             )
+            await self._notify_queue(conn)
 
             job_id = row["id"]
             logger.info(f"Created build job {job_id} for artifact {artifact_id}")
@@ -189,6 +228,11 @@ class ArtifactBuildManager:
                 params.append(update.error_message)
                 param_idx += 1
 
+            if update.phase_timings:
+                updates.append(f"phase_timings = ${param_idx}::jsonb")
+                params.append(json.dumps(update.phase_timings))
+                param_idx += 1
+
             # Set timestamps based on status
             if update.status == BuildJobStatus.BUILDING and update.started_at:
                 updates.append(f"started_at = ${param_idx}")
@@ -218,110 +262,251 @@ class ArtifactBuildManager:
             """
 
             await conn.execute(query, *params)
+            if update.status != BuildJobStatus.BUILDING:
+                # Build slot (and possibly port) freed
+                await self._notify_queue(conn)
             logger.info(
                 f"Updated build job {update.job_id} status to {update.status.value}"
             )
             return True
 
+    async def _notify_queue(self, conn):
+        """Wake queue processors on every replica"""
+        await conn.execute("SELECT pg_notify($1, '')", QUEUE_CHANNEL)
+
+    def _on_queue_notify(self, connection, pid, channel, payload):
+        self._counters["wakeups_notify"] += 1
+        self._wakeup.set()
+
+    async def _ensure_listener(self):
+        """LISTEN on a dedicated connection; re-established if it drops"""
+        if self._listen_conn is not None and not self._listen_conn.is_closed():
+            return
+        try:
+            conn = await self.db_pool.acquire()
+            await conn.add_listener(QUEUE_CHANNEL, self._on_queue_notify)
+            self._listen_conn = conn
+        except Exception as e:
+            # Polling still picks jobs up, just later
+            logger.warning(f"Build queue LISTEN unavailable, polling instead: {e}")
+            self._listen_conn = None
+
+    async def _close_listener(self):
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is None:
+            return
+        try:
+            if not conn.is_closed():
+                await conn.remove_listener(QUEUE_CHANNEL, self._on_queue_notify)
+            await self.db_pool.release(conn)
+        except Exception as e:
+            logger.debug(f"Error closing build queue listener: {e}")
+
+    async def _claim_jobs(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Claim up to `limit` queued jobs and assign each a port.
+
+        Runs under a transaction-scoped advisory lock so replicas never hand
+        out the same build slot or port; SKIP LOCKED keeps rows another
+        transaction is touching (e.g. a stop) out of the claim.
+        """
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", CLAIM_LOCK_KEY)
+
+                building = await conn.fetchval(
+                    "SELECT COUNT(*) FROM artifact_build_jobs WHERE status = 'building'"
+                )
+                limit = min(limit, self.max_concurrent_builds - building)
+                if limit <= 0:
+                    return []
+
+                jobs = await conn.fetch(
+                    """
+                    SELECT id, artifact_id, framework, node_version, queued_at
+                    FROM artifact_build_jobs
+                    WHERE status = 'queued'
+                    ORDER BY queued_at
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    limit,
+                )
+                if not jobs:
+                    return []
+
+                ports = await conn.fetch(
+                    """
+                    SELECT p AS port
+                    FROM generate_series($1::int, $2::int) AS p
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM artifact_build_jobs j
+                        WHERE j.port = p AND j.status IN ('building', 'running')
+                    )
+                    ORDER BY p
+                    LIMIT $3
+                    """,
+                    PORT_RANGE_START,
+                    PORT_RANGE_END,
+                    len(jobs),
+                )
+                if len(ports) < len(jobs):
+                    logger.warning(
+                        f"Only {len(ports)} ports free for {len(jobs)} queued builds"
+                    )
+                jobs = jobs[: len(ports)]
+                if not jobs:
+                    return []
+
+                claimed = await conn.fetch(
+                    """
+                    UPDATE artifact_build_jobs AS j
+                    SET status = 'building', port = c.port,
+                        started_at = NOW(), claimed_by = $3
+                    FROM unnest($1::uuid[], $2::int[]) AS c(id, port)
+                    WHERE j.id = c.id
+                    RETURNING j.id, j.artifact_id, j.framework, j.node_version,
+                              j.port, j.queued_at, j.started_at
+                    """,
+                    [job["id"] for job in jobs],
+                    [row["port"] for row in ports],
+                    self.replica_id,
+                )
+
+        now = time.time()
+        for job in claimed:
+            wait = (job["started_at"] - job["queued_at"]).total_seconds()
+            self._queue_waits.append((now, wait))
+        self._counters["claimed"] += len(claimed)
+        return [dict(job) for job in claimed]
+
+    async def _spawn_claimed_job(self, job: Dict[str, Any]):
+        """Spawn an executor for a claimed job without holding a connection"""
+        job_id = job["id"]
+        artifact_id = job["artifact_id"]
+        logger.info(
+            f"Processing build job {job_id} for artifact {artifact_id} on port {job['port']}"
+        )
+
+        try:
+            async with self.db_pool.acquire() as conn:
+                artifact_row = await conn.fetchrow(
+                    """
+                    SELECT content, dependencies, title
+                    FROM artifacts WHERE id = $1
+                    """,
+                    artifact_id,
+                )
+            if not artifact_row:
+                raise RuntimeError("Artifact not found")
+
+            started = time.monotonic()
+            await self._spawn_executor_pod(
+                job_id=job_id,
+                artifact_id=artifact_id,
+                content=artifact_row["content"],
+                dependencies=artifact_row["dependencies"] or {},
+                framework=job["framework"],
+                node_version=job["node_version"],
+                port=job["port"],
+            )
+            spawn_ms = int((time.monotonic() - started) * 1000)
+            self._spawn_times.append((time.time(), spawn_ms / 1000))
+            self._counters["spawned"] += 1
+
+            async with self.db_pool.acquire() as conn:
+                await conn.execute(
+                    "UPDATE artifact_build_jobs SET spawn_ms = $2 WHERE id = $1",
+                    job_id,
+                    spawn_ms,
+                )
+
+        except Exception as e:
+            logger.error(f"Failed to spawn executor pod for job {job_id}: {e}")
+            self._counters["spawn_failed"] += 1
+            async with self.db_pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    UPDATE artifact_build_jobs
+                    SET status = 'failed', error_message = $2, completed_at = NOW()
+                    WHERE id = $1
+                    """,
+                    job_id,
+                    str(e),
+                )
+                await self._notify_queue(conn)
+
+    def _spawn_done(self, task: asyncio.Task):
+        self._spawn_tasks.discard(task)
+        # A spawn slot opened up
+        self._wakeup.set()
+
     async def process_build_queue(self):
         """
         Background task to process queued build jobs.
 
-        This spawns executor pods for queued jobs.
+        Woken by NOTIFY on QUEUE_CHANNEL (new job, freed slot) with a slow
+        poll as a fallback. Each pass claims as many jobs as there are free
+        spawn and build slots, and spawns them concurrently.
         """
         while True:
             try:
-                async with self.db_pool.acquire() as conn:
-                    # Get next queued job
-                    row = await conn.fetchrow(
-                        """
-                        SELECT id, artifact_id, framework, node_version
-                        FROM artifact_build_jobs
-                        WHERE status = 'queued'
-                        ORDER BY queued_at
-                        LIMIT 1
-                        """
-                    )
+                await self._ensure_listener()
+                self._wakeup.clear()
+
+                capacity = self.spawn_concurrency - len(self._spawn_tasks)
+                claimed = await self._claim_jobs(capacity) if capacity > 0 else []
+
+                for job in claimed:
+                    task = asyncio.create_task(self._spawn_claimed_job(job))
+                    self._spawn_tasks.add(task)
+                    task.add_done_callback(self._spawn_done)
 
-                    if row:
-                        job_id = row["id"]
-                        artifact_id = row["artifact_id"]
-
-                        logger.info(
-                            f"Processing build job {job_id} for artifact {artifact_id}"
-                        )
-
-                        # Get artifact details
-                        artifact_row = await conn.fetchrow(
-                            """
-                            SELECT content, dependencies, title
-                            FROM artifacts WHERE id = $1
-                            """,
-                            artifact_id,
-                        )
-
-                        if not artifact_row:
-                            logger.error(f"Artifact {artifact_id} not found")
-                            await conn.execute(
-                                """
-                                UPDATE artifact_build_jobs
-                                SET status = 'failed', error_message = 'Artifact not found'
-                                WHERE id = $1
-                                """,
-                                job_id,
-                            )
-                            continue
-
-                        # Assign port
-                        port = self._allocate_port(job_id)
-                        if not port:
-                            logger.warning("No ports available, waiting...")
-                            await asyncio.sleep(5)
-                            continue
-
-                        # Spawn executor pod
-                        try:
-                            await self._spawn_executor_pod(
-                                job_id=job_id,
-                                artifact_id=artifact_id,
-                                content=artifact_row["content"],
-                                dependencies=artifact_row["dependencies"] or {},
-                                framework=row["framework"],
-                                node_version=row["node_version"],
-                                port=port,
-                            )
-
-                            # Update status to building
-                            await conn.execute(
-                                """
-                                UPDATE artifact_build_jobs
-                                SET status = 'building', port = $2, started_at = NOW()
-                                WHERE id = $1
-                                """,
-                                job_id,
-                                port,
-                            )
-
-                        except Exception as e:
-                            logger.error(f"Failed to spawn executor pod: {e}")
-                            self._release_port(job_id)
-                            await conn.execute(
-                                """
-                                UPDATE artifact_build_jobs
-                                SET status = 'failed', error_message = $2
-                                WHERE id = $1
-                                """,
-                                job_id,
-                                str(e),
-                            )
-                    else:
-                        # No queued jobs, sleep before checking again
-                        await asyncio.sleep(5)
+                if claimed and len(claimed) == capacity:
+                    # There may be more; go again once a spawn finishes
+                    await self._wakeup.wait()
+                    continue
 
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    self._counters["wakeups_poll"] += 1
+
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error in build queue processor: {e}")
+                await self._close_listener()
                 await asyncio.sleep(10)
 
+    def get_queue_metrics(self) -> Dict[str, Any]:
+        """Queue-wait and spawn-time metrics for this replica (last 15 minutes)"""
+
+        def summarize(samples: deque) -> Dict[str, Any]:
+            cutoff = time.time() - 900
+            values = sorted(v for t, v in samples if t >= cutoff)
+            if not values:
+                return {"count": 0}
+            return {
+                "count": len(values),
+                "avg_s": round(sum(values) / len(values), 3),
+                "p50_s": round(values[len(values) // 2], 3),
+                "p95_s": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "max_s": round(values[-1], 3),
+            }
+
+        return {
+            "replica_id": self.replica_id,
+            "listening": self._listen_conn is not None
+            and not self._listen_conn.is_closed(),
+            "max_concurrent_builds": self.max_concurrent_builds,
+            "spawn_concurrency": self.spawn_concurrency,
+            "spawns_in_flight": len(self._spawn_tasks),
+            "queue_wait": summarize(self._queue_waits),
+            "spawn_time": summarize(self._spawn_times),
+            **self._counters,
+        }
+
     async def _spawn_executor_pod(
         self,
         job_id: UUID,
@@ -365,20 +550,6 @@ class ArtifactBuildManager:
         # - Volume mount for artifact_data PVC
         # - Environment variables for build_request
 
-    def _allocate_port(self, job_id: str) -> Optional[int]:
-        """Allocate an available port for a build job"""
-        available = self._port_pool - set(self._used_ports.values())
-        if not available:
-            return None
-        port = min(available)
-        self._used_ports[job_id] = port
-        return port
-
-    def _release_port(self, job_id: str):
-        """Release a port allocation"""
-        if job_id in self._used_ports:
-            del self._used_ports[job_id]
-
     async def stop_build_job(self, job_id: UUID) -> bool:
         """Stop a running build job"""
         async with self.db_pool.acquire() as conn:
@@ -410,8 +581,8 @@ class ArtifactBuildManager:
                 """,
                 job_id,
             )
+            await self._notify_queue(conn)
 
-            self._release_port(str(job_id))
             logger.info(f"Stopped build job {job_id}")
             return True
 
@@ -435,13 +606,31 @@ class ArtifactBuildManager:
             for row in old_running:
                 await self.stop_build_job(row["id"])
 
+            # Fail builds that never reported back (executor or claiming
+            # replica died) so their build slot and port are freed
+            timed_out = await conn.execute(
+                """
+                UPDATE artifact_build_jobs
+                SET status = 'failed', completed_at = NOW(),
+                    error_message = 'Build timed out'
+                WHERE status = 'building'
+                AND started_at < NOW() - make_interval(mins => $1)
+                """,
+                BUILD_TIMEOUT_MINUTES,
+            )
+            if timed_out != "UPDATE 0":
+                await self._notify_queue(conn)
+
             # Delete old stopped/failed jobs
             deleted = await conn.fetchval(
                 """
-                DELETE FROM artifact_build_jobs
-                WHERE status IN ('stopped', 'failed')
-                AND completed_at < NOW() - INTERVAL '7 days'
-                RETURNING COUNT(*)
+                WITH deleted AS (
+                    DELETE FROM artifact_build_jobs
+                    WHERE status IN ('stopped', 'failed')
+                    AND completed_at < NOW() - INTERVAL '7 days'
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM deleted
                 """
             )
 
@@ -457,6 +646,9 @@ class ArtifactBuildManager:
                     j.id, j.artifact_id, j.status, j.framework,
                     j.port, j.preview_url, j.pod_name, j.node_name,
                     j.queued_at, j.started_at, j.built_at, j.running_at,
+                    j.current_phase, j.phase_timings, j.spawn_ms, j.claimed_by,
+                    EXTRACT(EPOCH FROM COALESCE(j.started_at, NOW()) - j.queued_at)::float8
+                        AS queue_wait_s,
                     a.title as artifact_title
                 FROM artifact_build_jobs j
                 JOIN artifacts a ON j.artifact_id = a.id
@@ -464,7 +656,13 @@ class ArtifactBuildManager:
                 ORDER BY j.queued_at
                 """
             )
-            return [dict(row) for row in rows]
+            builds = []
+            for row in rows:
+                build = dict(row)
+                if isinstance(build.get("phase_timings"), str):
+                    build["phase_timings"] = json.loads(build["phase_timings"])
+                builds.append(build)
+            return builds
 
     async def start_queue_processor(self):
         """Start the background queue processor task"""
@@ -498,3 +696,7 @@ class ArtifactBuildManager:
                 await self._cleanup_task
             except asyncio.CancelledError:
                 pass
+
+        for task in list(self._spawn_tasks):
+            task.cancel()
+        await self._close_listener()
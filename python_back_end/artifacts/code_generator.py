@@ -38,6 +38,15 @@ MAX_EXECUTION_TIME = int(os.environ.get("CODE_MAX_EXECUTION_TIME", "60"))  # sec
 MAX_MEMORY = os.environ.get("CODE_MAX_MEMORY", "512m")
 MAX_CPUS = os.environ.get("CODE_MAX_CPUS", "1.0")
 
+from .sandbox_pool import (
+    WARM_POOL_ENABLED,
+    DockerBackend,
+    K8sBackend,
+    SandboxUnavailable,
+    WorkerBackend,
+    get_sandbox_pool,
+)
+
 
 def extract_document_code(llm_response: str, artifact_type: str) -> Optional[str]:
     """
@@ -373,12 +382,18 @@ def execute_document_code(
         use_k8s = False
 
     try:
-        if use_k8s:
-            result = _execute_in_k8s(script_path, output_path, timeout)
-        elif use_docker_local:
-            result = _execute_in_docker(script_path, output_path, timeout, memory_limit)
-        else:
-            result = _execute_locally(script_path, timeout)
+        result = None
+        if WARM_POOL_ENABLED:
+            mode = "k8s" if use_k8s else ("docker" if use_docker_local else "local")
+            result = _execute_warm(mode, script_path, output_path, timeout, memory_limit)
+
+        if result is None:
+            if use_k8s:
+                result = _execute_in_k8s(script_path, output_path, timeout)
+            elif use_docker_local:
+                result = _execute_in_docker(script_path, output_path, timeout, memory_limit)
+            else:
+                result = _execute_locally(script_path, timeout)
 
         # Check if output was created
         if result["success"] and os.path.exists(output_path):
@@ -403,6 +418,32 @@ def execute_document_code(
         }
 
 
+def _execute_warm(
+    mode: str, script_path: str, output_path: str, timeout: int, memory_limit: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Execute on a pre-warmed sandbox worker (see sandbox_pool.py).
+
+    Returns None when no warm worker can be started so the caller falls back
+    to a cold container/pod/interpreter.
+    """
+    if mode == "docker":
+        key = ("docker", memory_limit)
+        factory = lambda: DockerBackend(ARTIFACT_DIR, CODE_EXECUTOR_IMAGE, memory_limit, MAX_CPUS)
+    elif mode == "k8s":
+        key = ("k8s", CODE_EXECUTOR_NAMESPACE)
+        factory = lambda: K8sBackend(CODE_EXECUTOR_NAMESPACE, CODE_EXECUTOR_POD)
+    else:
+        key = ("local",)
+        factory = WorkerBackend
+
+    try:
+        return get_sandbox_pool(key, factory).run(script_path, output_path, timeout)
+    except SandboxUnavailable as e:
+        logger.warning(f"Warm sandbox unavailable ({mode}), using cold execution: {e}")
+        return None
+
+
 def _execute_in_docker(
     script_path: str, output_path: str, timeout: int, memory_limit: str
 ) -> Dict[str, Any]:
@@ -62,6 +62,9 @@ class BuildStatusUpdate(BaseModel):
     progress_percentage: int = Field(0, ge=0, le=100)
     current_phase: Optional[str] = None  # "installing", "building", "starting"
 
+    # Seconds spent per build phase: write, install, build, copy, total
+    phase_timings: Optional[Dict[str, float]] = None
+
     # URLs (populated when running)
     preview_url: Optional[str] = None
 
@@ -113,6 +116,7 @@ class BuildJobResponse(BaseModel):
 
     build_logs: Optional[str] = None
     error_message: Optional[str] = None
+    phase_timings: Optional[Dict[str, float]] = None
 
     class Config:
         from_attributes = True
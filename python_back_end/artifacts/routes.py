@@ -495,4 +495,16 @@ async def get_active_builds(request: Request):
 
     builds = await build_manager.get_active_builds()
 
-    return {"builds": builds, "count": len(builds)}
+    return {
+        "builds": builds,
+        "count": len(builds),
+        "metrics": build_manager.get_queue_metrics(),
+    }
+
+
+@artifact_router.get("/sandbox/stats", response_model=dict)
+async def get_sandbox_stats_route():
+    """Warm document sandbox stats: queue depth, cold/warm latency, recycling"""
+    from .sandbox_pool import get_sandbox_stats
+
+    return get_sandbox_stats()
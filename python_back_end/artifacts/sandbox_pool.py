@@ -0,0 +1,510 @@
+"""
+Warm sandbox pool for document-code execution
+
+Keeps a few long-lived sandbox_worker.py processes around with python-docx,
+openpyxl, python-pptx and reportlab already imported, so generating a
+document no longer pays interpreter startup and library imports on every
+request. Workers run wherever cold execution ran before:
+
+- local:  a host subprocess (CODE_EXECUTOR_LOCAL)
+- docker: one long-running `docker run -i` container per worker, with the
+          same --network none / --memory / --cpus / --user limits
+- k8s:    a `kubectl exec -i` session into the executor pod
+
+Jobs are sent over the worker's stdin/stdout as JSON lines. Workers are
+recycled after CODE_EXECUTOR_MAX_JOBS jobs, or once either the worker's own
+resident size or the peak of the job it just forked passes
+CODE_EXECUTOR_MAX_RSS_MB, and retired when a job left processes running
+that the worker could not kill.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+# Pool configuration
+WARM_POOL_ENABLED = os.environ.get("CODE_EXECUTOR_WARM_POOL", "true").lower() == "true"
+POOL_SIZE = int(os.environ.get("CODE_EXECUTOR_POOL_SIZE", "2"))
+MAX_JOBS_PER_WORKER = int(os.environ.get("CODE_EXECUTOR_MAX_JOBS", "50"))
+MAX_WORKER_RSS_MB = int(os.environ.get("CODE_EXECUTOR_MAX_RSS_MB", "400"))
+WORKER_START_TIMEOUT = int(os.environ.get("CODE_EXECUTOR_START_TIMEOUT", "60"))  # seconds
+
+
+class SandboxUnavailable(Exception):
+    """A warm worker could not be started; callers fall back to cold execution"""
+
+
+class WorkerBackend:
+    """How a worker process is launched and how job paths map into it"""
+
+    name = "local"
+
+    def prepare(self):
+        """One-time setup before the first worker starts"""
+
+    def command(self) -> List[str]:
+        return [sys.executable, "-u", WORKER_SCRIPT]
+
+    def job_script(self, script_path: str, job_id: str) -> str:
+        return script_path
+
+    def job_cwd(self) -> Optional[str]:
+        return None
+
+    def job_cleanup(self, job_script: str) -> List[str]:
+        """Paths (as the worker sees them) to delete once the job has run"""
+        return []
+
+    def after_job(self, reply: Dict[str, Any], output_path: str):
+        """Hook run after a successful job (e.g. copy the output back)"""
+
+
+class DockerBackend(WorkerBackend):
+    """
+    Long-running executor container per worker. The artifacts tree is mounted
+    exactly as for cold runs: the code directory read-only, outputs read-write.
+    """
+
+    name = "docker"
+
+    def __init__(self, artifact_dir: str, image: str, memory_limit: str, cpus: str):
+        self.artifact_dir = artifact_dir
+        self.code_dir = os.path.join(artifact_dir, "code")
+        self.image = image
+        self.memory_limit = memory_limit
+        self.cpus = cpus
+
+    def prepare(self):
+        if shutil.which("docker") is None:
+            raise SandboxUnavailable("Docker command not found")
+        # The worker script has to be visible inside the container
+        sandbox_dir = os.path.join(self.code_dir, "_sandbox")
+        os.makedirs(sandbox_dir, exist_ok=True)
+        shutil.copyfile(WORKER_SCRIPT, os.path.join(sandbox_dir, "sandbox_worker.py"))
+
+    def command(self) -> List[str]:
+        return [
+            "docker", "run", "-i", "--rm",
+            "--network", "none",
+            "--memory", self.memory_limit,
+            "--cpus", self.cpus,
+            "--user", "1001:1001",
+            "-v", f"{self.artifact_dir}:/data/artifacts:rw",
+            "-v", f"{self.code_dir}:/workspace/code:ro",
+            "-w", "/workspace",
+            self.image,
+            "python3", "-u", "/workspace/code/_sandbox/sandbox_worker.py",
+        ]
+
+    def job_script(self, script_path: str, job_id: str) -> str:
+        rel = os.path.relpath(script_path, self.code_dir)
+        return f"/workspace/code/{rel}"
+
+    def job_cwd(self) -> Optional[str]:
+        return "/workspace"
+
+
+class K8sBackend(WorkerBackend):
+    """Persistent `kubectl exec -i` session into the code-executor pod"""
+
+    name = "k8s"
+
+    def __init__(self, namespace: str, pod: str):
+        self.namespace = namespace
+        self.pod = pod
+
+    def _kubectl(self, *args: str, timeout: int = 30) -> subprocess.CompletedProcess:
+        return subprocess.run(["kubectl", *args], capture_output=True, text=True, timeout=timeout)
+
+    def prepare(self):
+        if shutil.which("kubectl") is None:
+            raise SandboxUnavailable("kubectl not available")
+        result = self._kubectl(
+            "get", "pods", "-n", self.namespace,
+            "-l", "app.kubernetes.io/component=code-executor",
+            "-o", "jsonpath={.items[0].metadata.name}",
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            self.pod = result.stdout.strip()
+        copied = self._kubectl("cp", "-n", self.namespace, WORKER_SCRIPT, f"{self.pod}:/tmp/sandbox_worker.py")
+        if copied.returncode != 0:
+            raise SandboxUnavailable(f"Failed to copy sandbox worker to pod: {copied.stderr}")
+
+    def command(self) -> List[str]:
+        return [
+            "kubectl", "exec", "-i", "-n", self.namespace, self.pod,
+            "--", "python3", "-u", "/tmp/sandbox_worker.py",
+        ]
+
+    def job_script(self, script_path: str, job_id: str) -> str:
+        # Unique name so concurrent jobs in the same pod do not overwrite each other
+        pod_path = f"/tmp/{job_id}-{os.path.basename(script_path)}"
+        copied = self._kubectl("cp", "-n", self.namespace, script_path, f"{self.pod}:{pod_path}")
+        if copied.returncode != 0:
+            raise RuntimeError(f"Failed to copy script to pod: {copied.stderr}")
+        return pod_path
+
+    def job_cleanup(self, job_script: str) -> List[str]:
+        # Per-job copies would otherwise pile up in the pod's /tmp
+        return [job_script]
+
+    def after_job(self, reply: Dict[str, Any], output_path: str):
+        self._kubectl("cp", "-n", self.namespace, f"{self.pod}:{output_path}", output_path)
+
+
+class WarmWorker:
+    """One running sandbox_worker.py process and its reply channel"""
+
+    def __init__(self, backend: WorkerBackend):
+        self.backend = backend
+        self.jobs = 0
+        self.rss_kb = 0  # the worker process itself, as of its last reply
+        self.child_rss_kb = 0  # peak of the last job's forked child
+        self.clean = True  # nothing the last job started is still running
+        self.started_at = time.monotonic()
+        self.startup_ms = 0.0
+        self._replies: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+
+        try:
+            self.proc = subprocess.Popen(
+                backend.command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1,
+            )
+        except OSError as e:
+            raise SandboxUnavailable(f"Could not start sandbox worker: {e}") from e
+
+        self._reader = threading.Thread(target=self._read_replies, name="sandbox-reader", daemon=True)
+        self._reader.start()
+
+        ready = self._next_reply(WORKER_START_TIMEOUT)
+        if not ready or ready.get("event") != "ready":
+            self.kill()
+            raise SandboxUnavailable("Sandbox worker did not become ready")
+        self.startup_ms = (time.monotonic() - self.started_at) * 1000
+        logger.info(
+            f"Sandbox worker ready ({backend.name}) in {self.startup_ms:.0f}ms, "
+            f"preloaded: {', '.join(ready.get('preloaded', []))}"
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, job: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send one job and wait for its reply (job timeout plus a grace period)"""
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+
+        reply = self._next_reply(timeout + 10)
+        if reply is None:
+            # The worker itself is wedged or gone; do not reuse it
+            self.kill()
+            return {
+                "returncode": -1, "stdout": "", "stderr": "", "timed_out": True,
+                "error": f"Execution timed out after {timeout} seconds",
+            }
+
+        self.jobs += 1
+        self.rss_kb = reply.get("rss_kb", self.rss_kb)
+        self.child_rss_kb = reply.get("child_rss_kb", 0)
+        self.clean = reply.get("clean", True)
+        return reply
+
+    def shutdown(self):
+        if self.alive:
+            try:
+                self.proc.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=5)
+            except Exception:
+                self.kill()
+
+    def kill(self):
+        if self.alive:
+            self.proc.kill()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+
+    def _read_replies(self):
+        for line in self.proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self._replies.put(json.loads(line))
+            except ValueError:
+                logger.debug(f"Ignoring non-protocol output from sandbox worker: {line[:200]}")
+        self._replies.put(None)
+
+    def _next_reply(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self._replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SandboxPool:
+    """
+    Bounded pool of warm workers for one backend.
+
+    `run` blocks until a worker is free; callers already execute on worker
+    threads (document worker, executor), so the pool is thread based.
+    """
+
+    def __init__(
+        self,
+        backend: WorkerBackend,
+        size: int = POOL_SIZE,
+        max_jobs: int = MAX_JOBS_PER_WORKER,
+        max_rss_mb: int = MAX_WORKER_RSS_MB,
+    ):
+        self.backend = backend
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.max_rss_kb = max_rss_mb * 1024
+
+        self._idle: "queue.LifoQueue[WarmWorker]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._prepared = False
+        self._prepare_lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self._job_ids = itertools.count(1)
+        self._waiting = 0
+        self._running = 0
+        self._closed = False
+
+        self.stats = {
+            "jobs": 0,
+            "warm_starts": 0,
+            "cold_starts": 0,
+            "recycled": 0,
+            "failed_workers": 0,
+            "timeouts": 0,
+        }
+        self._worker_start_ms: Deque[float] = deque(maxlen=100)
+        self._latency_ms: Dict[str, Deque[float]] = {
+            "warm": deque(maxlen=200),
+            "cold": deque(maxlen=200),
+        }
+
+    def prewarm(self, count: Optional[int] = None):
+        """Start idle workers ahead of demand (runs in a background thread)"""
+        def _fill():
+            for _ in range(min(count or self.size, self.size)):
+                if self._closed or self._idle.qsize() + self._running >= self.size:
+                    return
+                try:
+                    self._idle.put(self._spawn())
+                except SandboxUnavailable as e:
+                    logger.warning(f"Sandbox prewarm failed: {e}")
+                    return
+
+        threading.Thread(target=_fill, name="sandbox-prewarm", daemon=True).start()
+
+    def run(self, script_path: str, output_path: str, timeout: int) -> Dict[str, Any]:
+        """
+        Execute a prepared generate.py on a warm worker.
+
+        Returns the same dict shape as the cold executors (success, stdout,
+        stderr, returncode, optional error). Raises SandboxUnavailable if no
+        worker could be started.
+        """
+        if self._closed:
+            raise SandboxUnavailable("Sandbox pool is closed")
+
+        queued_at = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=timeout)
+        with self._lock:
+            self._waiting -= 1
+        if not acquired:
+            return {
+                "success": False,
+                "error": f"Timed out after {timeout} seconds waiting for a sandbox worker",
+                "stdout": "",
+                "stderr": "",
+                "returncode": -1,
+            }
+
+        worker = None
+        try:
+            with self._lock:
+                self._running += 1
+            worker, start_kind = self._checkout()
+            self.stats[f"{start_kind}_starts"] += 1
+
+            job_id = f"job-{next(self._job_ids)}"
+            try:
+                job_script = self.backend.job_script(script_path, job_id)
+            except Exception as e:
+                return {"success": False, "error": str(e), "stdout": "", "stderr": "", "returncode": -1}
+            job = {"id": job_id, "script": job_script, "timeout": timeout, "cwd": self.backend.job_cwd(),
+                   "cleanup": self.backend.job_cleanup(job_script)}
+            reply = worker.run(job, timeout)
+            self.stats["jobs"] += 1
+            if reply.get("timed_out"):
+                self.stats["timeouts"] += 1
+
+            result = {
+                "success": reply.get("returncode") == 0,
+                "stdout": reply.get("stdout", ""),
+                "stderr": reply.get("stderr", ""),
+                "returncode": reply.get("returncode", -1),
+                "sandbox": {"start": start_kind, "worker_jobs": worker.jobs},
+            }
+            if reply.get("timed_out"):
+                result["error"] = f"Execution timed out after {timeout} seconds"
+            elif reply.get("error"):
+                result["error"] = reply["error"]
+
+            if result["success"]:
+                self.backend.after_job(reply, output_path)
+
+            self._latency_ms[start_kind].append((time.monotonic() - queued_at) * 1000)
+            return result
+        finally:
+            if worker is not None:
+                self._checkin(worker)
+            with self._lock:
+                self._running -= 1
+            self._slots.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        def summary(values) -> Dict[str, float]:
+            values = sorted(values)
+            if not values:
+                return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0}
+            return {
+                "count": len(values),
+                "p50_ms": round(statistics.median(values), 1),
+                "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+            }
+
+        return {
+            "backend": self.backend.name,
+            "size": self.size,
+            "idle_workers": self._idle.qsize(),
+            "running": self._running,
+            "queue_depth": self._waiting,
+            **self.stats,
+            "worker_start": summary(self._worker_start_ms),
+            "job_latency": {kind: summary(values) for kind, values in self._latency_ms.items()},
+        }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().shutdown()
+            except queue.Empty:
+                break
+
+    def _spawn(self) -> WarmWorker:
+        if time.monotonic() < self._unavailable_until:
+            raise SandboxUnavailable(f"{self.backend.name} sandbox recently failed to start")
+        with self._prepare_lock:
+            if not self._prepared:
+                try:
+                    self.backend.prepare()
+                except SandboxUnavailable:
+                    # Do not retry setup on every request while the backend is down
+                    self._unavailable_until = time.monotonic() + 60
+                    raise
+                self._prepared = True
+        try:
+            worker = WarmWorker(self.backend)
+        except SandboxUnavailable:
+            self.stats["failed_workers"] += 1
+            raise
+        self._worker_start_ms.append(worker.startup_ms)
+        return worker
+
+    def _checkout(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn(), "cold"
+            if worker.alive:
+                return worker, "warm"
+            self.stats["failed_workers"] += 1
+
+    def _checkin(self, worker: WarmWorker):
+        if not worker.alive:
+            return
+        if self._closed:
+            worker.shutdown()
+        elif not worker.clean:
+            # A later job could see what the stray process reads or writes
+            self.stats["recycled"] += 1
+            logger.warning("Retiring sandbox worker: a job left processes running")
+            # The worker exiting ends its container, and the strays with it
+            worker.shutdown()
+            self.prewarm(1)
+        elif (worker.jobs >= self.max_jobs or worker.rss_kb >= self.max_rss_kb
+              or worker.child_rss_kb >= self.max_rss_kb):
+            self.stats["recycled"] += 1
+            logger.info(
+                f"Recycling sandbox worker after {worker.jobs} jobs (rss {worker.rss_kb // 1024}MB, "
+                f"last job peak {worker.child_rss_kb // 1024}MB)"
+            )
+            worker.shutdown()
+            # Replace it in the background so the next job stays warm
+            self.prewarm(1)
+        else:
+            self._idle.put(worker)
+
+
+# Pools per (backend, memory limit); docker limits are fixed per container
+_pools: Dict[tuple, SandboxPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_sandbox_pool(key: tuple, factory) -> SandboxPool:
+    """Shared pool for `key`, created (and prewarmed) by `factory` on first use"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SandboxPool(factory())
+            pool.prewarm()
+        return pool
+
+
+def get_sandbox_stats() -> Dict[str, Any]:
+    """Stats for every pool that has been used"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {
+        "enabled": WARM_POOL_ENABLED,
+        "pools": {":".join(str(part) for part in key): pool.get_stats() for key, pool in pools},
+    }
+
+
+def shutdown_sandbox_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Warm sandbox worker for document-code execution
+
+Standalone script (no backend imports) so it can run on the host, inside the
+code-executor image, or in the executor pod. It imports the document
+libraries once, then reads one JSON job per line on stdin and answers with
+one JSON line on stdout. Each job runs in a forked child, so scripts start
+with every library already loaded but cannot leave state behind in the
+worker.
+
+Job:    {"id": "...", "script": "/path/generate.py", "timeout": 60, "cwd": "/workspace",
+         "cleanup": ["/tmp/job-3-generate.py"]}
+Reply:  {"id": "...", "returncode": 0, "stdout": "...", "stderr": "...",
+         "timed_out": false, "duration_ms": 412.0, "rss_kb": 123456,
+         "child_rss_kb": 234567, "jobs": 3}
+
+rss_kb is the worker's current resident size; child_rss_kb is the peak of
+the child that ran this job. Files listed in "cleanup" are removed once the
+job has finished.
+
+Whatever a job started in its process group is killed when the job ends.
+The worker is a child subreaper (Linux), so processes that outlive their
+parent are reparented to it and reaped; if any are still running shortly
+after the kill (e.g. one that called setsid itself), the reply carries
+"clean": false and the pool retires the worker.
+"""
+
+import json
+import os
+import resource
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+PRELOAD_MODULES = [
+    "docx",
+    "openpyxl",
+    "pptx",
+    "reportlab.lib.pagesizes",
+    "reportlab.platypus",
+    "reportlab.lib.styles",
+    "matplotlib",
+    "PIL.Image",
+]
+
+MAX_CAPTURE_BYTES = 256 * 1024
+# How long a killed job's leftover processes get to exit before the worker is unclean
+LEFTOVER_GRACE_S = 1.0
+PR_SET_CHILD_SUBREAPER = 36
+
+
+def _preload():
+    loaded = []
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+            loaded.append(name)
+        except Exception:
+            pass
+    if "matplotlib" in loaded:
+        # Scripts save figures to files; never try to open a display
+        import matplotlib
+        matplotlib.use("Agg")
+    return loaded
+
+
+def _become_subreaper():
+    """Have orphans of job processes reparented to (and reaped by) this worker"""
+    try:
+        import ctypes
+        ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+    except Exception:
+        pass
+
+
+def _reap_children():
+    """Reap exited children; True while any are still running"""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return False
+        if pid == 0:
+            return True
+
+
+def _group_exists(pgid):
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _kill_leftovers(pgid):
+    """
+    SIGKILL the job's process group and reap what it left behind. False if
+    something the job started is still running after LEFTOVER_GRACE_S.
+    """
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    deadline = time.monotonic() + LEFTOVER_GRACE_S
+    while _reap_children() or _group_exists(pgid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _send(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def _read_capture(handle):
+    handle.seek(0)
+    data = handle.read(MAX_CAPTURE_BYTES + 1)
+    text = data[:MAX_CAPTURE_BYTES].decode("utf-8", errors="replace")
+    if len(data) > MAX_CAPTURE_BYTES:
+        text += "\n[output truncated]"
+    return text
+
+
+def _current_rss_kb():
+    """Resident size of this process now (ru_maxrss is only a high-water mark)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_child(script, cwd, out_fd, err_fd):
+    """Runs in the forked child; never returns"""
+    code = 1
+    try:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        if cwd:
+            os.chdir(cwd)
+
+        import runpy
+        sys.argv = [script]
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(code)
+
+
+def _run_job(job):
+    timeout = float(job.get("timeout") or 60)
+    started = time.monotonic()
+
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        pid = os.fork()
+        if pid == 0:
+            _run_child(job["script"], job.get("cwd"), out.fileno(), err.fileno())
+
+        timed_out = False
+        status = usage = None
+        deadline = started + timeout
+        while True:
+            # wait4 rather than waitpid: its rusage is this child's alone
+            done, status, usage = os.wait4(pid, os.WNOHANG)
+            if done:
+                break
+            if time.monotonic() >= deadline:
+                timed_out = True
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                _, status, usage = os.wait4(pid, 0)
+                break
+            time.sleep(0.01)
+
+        # Background processes the script started must not see later jobs
+        clean = _kill_leftovers(pid)
+
+        if os.WIFEXITED(status):
+            returncode = os.WEXITSTATUS(status)
+        else:
+            returncode = -os.WTERMSIG(status)
+
+        return {
+            "returncode": -1 if timed_out else returncode,
+            "stdout": _read_capture(out),
+            "stderr": _read_capture(err),
+            "timed_out": timed_out,
+            "clean": clean,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "child_rss_kb": usage.ru_maxrss,
+        }
+
+
+def main():
+    started = time.monotonic()
+    _become_subreaper()
+    preloaded = _preload()
+    _send({
+        "event": "ready",
+        "pid": os.getpid(),
+        "preloaded": preloaded,
+        "startup_ms": round((time.monotonic() - started) * 1000, 1),
+    })
+
+    jobs = 0
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            _send({"event": "error", "error": "invalid job payload"})
+            continue
+        if job.get("op") == "shutdown":
+            break
+
+        try:
+            reply = _run_job(job)
+        except Exception as e:
+            reply = {"returncode": -1, "stdout": "", "stderr": traceback.format_exc(),
+                     "timed_out": False, "error": str(e)}
+        finally:
+            for path in job.get("cleanup") or []:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        jobs += 1
+        reply["id"] = job.get("id")
+        reply["jobs"] = jobs
+        reply["rss_kb"] = _current_rss_kb()
+        _send(reply)
+
+
+if __name__ == "__main__":
+    main()
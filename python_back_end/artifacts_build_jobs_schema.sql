@@ -53,6 +53,17 @@ CREATE TABLE IF NOT EXISTS artifact_build_jobs (
     DEFERRABLE INITIALLY DEFERRED
 );
 
+-- Build progress reported by the executor (phase timings in seconds:
+-- write, install, build, copy, total)
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS progress INTEGER DEFAULT 0;
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS current_phase VARCHAR(50);
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS phase_timings JSONB;
+
+-- Queue claims: replica that claimed the job and time spent spawning its
+-- executor; queue wait is started_at - queued_at
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(255);
+ALTER TABLE artifact_build_jobs ADD COLUMN IF NOT EXISTS spawn_ms INTEGER;
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_build_jobs_artifact_id ON artifact_build_jobs(artifact_id);
 CREATE INDEX IF NOT EXISTS idx_build_jobs_status ON artifact_build_jobs(status);
@@ -65,6 +76,11 @@ CREATE INDEX IF NOT EXISTS idx_build_jobs_queued
 ON artifact_build_jobs(queued_at) 
 WHERE status = 'queued';
 
+-- Ports held by active jobs (port allocation when claiming)
+CREATE INDEX IF NOT EXISTS idx_build_jobs_active_port
+ON artifact_build_jobs(port)
+WHERE status IN ('building', 'running');
+
 -- Partial index for running jobs (for health checks)
 CREATE INDEX IF NOT EXISTS idx_build_jobs_running 
 ON artifact_build_jobs(last_health_check) 
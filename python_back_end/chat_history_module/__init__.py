@@ -6,6 +6,7 @@ for persistent storage and retrieval of chat messages.
 """
 
 from .manager import ChatHistoryManager
+from .write_buffer import ChatHistoryWriteBuffer
 from .models import (
     ChatSession, 
     ChatMessage, 
@@ -18,6 +19,7 @@ from .exceptions import ChatHistoryError, SessionNotFoundError, MessageNotFoundE
 
 __all__ = [
     "ChatHistoryManager",
+    "ChatHistoryWriteBuffer",
     "ChatSession", 
     "ChatMessage",
     "CreateSessionRequest",
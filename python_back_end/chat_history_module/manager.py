@@ -9,6 +9,7 @@ from asyncpg import Pool
 import json
 
 from .storage import ChatHistoryStorage
+from .write_buffer import ChatHistoryWriteBuffer
 from .models import (
     ChatSession, ChatMessage, CreateSessionRequest, CreateMessageRequest,
     MessageHistoryResponse, SessionListResponse
@@ -24,8 +25,25 @@ class ChatHistoryManager:
     Follows LangChain patterns for persistent chat message storage.
     """
     
-    def __init__(self, db_pool: Pool):
+    def __init__(self, db_pool: Pool, write_behind: bool = False,
+                 flush_interval: float = 0.05, max_batch: int = 100):
         self.storage = ChatHistoryStorage(db_pool)
+        self.write_buffer: Optional[ChatHistoryWriteBuffer] = None
+        if write_behind:
+            self.write_buffer = ChatHistoryWriteBuffer(
+                self.storage, flush_interval=flush_interval, max_batch=max_batch
+            )
+    
+    async def close(self):
+        """Flush buffered writes. Call on shutdown before closing the pool."""
+        if self.write_buffer:
+            await self.write_buffer.close()
+            logger.info(f"Chat history write buffer flushed: {self.write_buffer.get_stats()}")
+    
+    async def _sync_pending(self, session_id: UUID):
+        """Flush buffered writes for a session so reads see them"""
+        if self.write_buffer and self.write_buffer.has_pending(session_id):
+            await self.write_buffer.flush()
     
     async def create_session(self, user_id: int, title: str = "New Chat", model_used: Optional[str] = None) -> ChatSession:
         """
@@ -187,6 +205,91 @@ class ChatHistoryManager:
             logger.error(f"Failed to add message to session {session_id}: {e}")
             raise ChatHistoryError(f"Failed to add message: {e}")
     
+    async def add_messages(self, user_id: int, session_id: UUID, requests: List[CreateMessageRequest],
+                           wait: bool = True) -> List[ChatMessage]:
+        """
+        Add several messages to a session in a single round trip.
+        
+        Args:
+            user_id: The user ID
+            session_id: The session UUID
+            requests: Messages to add, in order
+            wait: If False and write-behind is enabled, queue the write and
+                return immediately with the ids the messages will be stored under
+            
+        Returns:
+            List[ChatMessage]: The created messages
+            
+        Raises:
+            SessionNotFoundError: If session doesn't exist or belongs to another user
+            ChatHistoryError: If message creation fails
+        """
+        if not wait and self.write_buffer:
+            # Check ownership now: a failure at flush time would come after the
+            # caller had already handed out the message ids
+            await self.storage.get_session(session_id, user_id)
+            try:
+                return await self.write_buffer.enqueue(user_id, session_id, requests)
+            except Exception as e:
+                logger.warning(f"Write-behind enqueue failed, writing directly: {e}")
+        
+        try:
+            messages = await self.storage.add_messages(user_id, session_id, requests)
+            logger.debug(f"Added {len(messages)} messages to session {session_id}")
+            return messages
+            
+        except SessionNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to add messages to session {session_id}: {e}")
+            raise ChatHistoryError(f"Failed to add messages: {e}")
+    
+    async def add_exchange(self, user_id: int, session_id: UUID, user_content: str, assistant_content: str,
+                           reasoning: Optional[str] = None, model_used: Optional[str] = None,
+                           user_input_type: str = "text", assistant_input_type: str = "text",
+                           user_metadata: Optional[Dict[str, Any]] = None,
+                           assistant_metadata: Optional[Dict[str, Any]] = None,
+                           wait: bool = True) -> List[ChatMessage]:
+        """
+        Persist a user/assistant turn as one multi-row insert.
+        
+        Args:
+            user_id: The user ID
+            session_id: The session UUID
+            user_content: The user's message
+            assistant_content: The assistant's reply
+            reasoning: Optional reasoning content for the reply
+            model_used: AI model used for the turn
+            user_input_type: Input type of the user message (text, voice, screen)
+            assistant_input_type: Input type recorded on the reply
+            user_metadata: Metadata for the user message
+            assistant_metadata: Metadata for the assistant message
+            wait: See ``add_messages``
+            
+        Returns:
+            List[ChatMessage]: ``[user_message, assistant_message]``
+        """
+        requests = [
+            CreateMessageRequest(
+                session_id=session_id,
+                role="user",
+                content=user_content,
+                model_used=model_used,
+                input_type=user_input_type,
+                metadata=user_metadata or {}
+            ),
+            CreateMessageRequest(
+                session_id=session_id,
+                role="assistant",
+                content=assistant_content,
+                reasoning=reasoning,
+                model_used=model_used,
+                input_type=assistant_input_type,
+                metadata=assistant_metadata or {}
+            ),
+        ]
+        return await self.add_messages(user_id, session_id, requests, wait=wait)
+    
     async def get_session_messages(self, session_id: UUID, user_id: int, 
                                   limit: int = 100, offset: int = 0) -> MessageHistoryResponse:
         """
@@ -205,6 +308,8 @@ class ChatHistoryManager:
             SessionNotFoundError: If session doesn't exist
         """
         try:
+            await self._sync_pending(session_id)
+            
             # Get session info
             session = await self.storage.get_session(session_id, user_id)
             
@@ -247,6 +352,7 @@ class ChatHistoryManager:
             SessionNotFoundError: If session doesn't exist
         """
         try:
+            await self._sync_pending(session_id)
             result = await self.storage.clear_session_messages(session_id, user_id)
             
             if result:
@@ -450,7 +556,7 @@ class ChatHistoryManager:
     
     async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """
-        Get user statistics.
+        Get user statistics from the materialized ``chat_user_stats`` row.
         
         Args:
             user_id: The user ID
@@ -459,22 +565,7 @@ class ChatHistoryManager:
             Dict[str, Any]: User statistics
         """
         try:
-            async with self.storage.db_pool.acquire() as conn:
-                stats = await conn.fetchrow("""
-                    SELECT 
-                        COUNT(DISTINCT s.id) as total_sessions,
-                        COUNT(m.id) as total_messages,
-                        MAX(s.last_message_at) as last_activity
-                    FROM chat_sessions s
-                    LEFT JOIN chat_messages m ON s.id = m.session_id
-                    WHERE s.user_id = $1 AND s.is_active = TRUE
-                """, user_id)
-                
-                return {
-                    "total_sessions": stats['total_sessions'] or 0,
-                    "total_messages": stats['total_messages'] or 0,
-                    "last_activity": stats['last_activity'].isoformat() if stats['last_activity'] else None
-                }
+            return await self.storage.get_user_stats(user_id)
                 
         except Exception as e:
             logger.error(f"Error getting user stats: {e}")
@@ -491,10 +582,10 @@ class ChatHistoryManager:
             List[ChatMessage]: List of created messages
         """
         try:
-            results = []
+            # Group by session so each session is written with one multi-row insert
+            groups: Dict[tuple, List[CreateMessageRequest]] = {}
             for message in messages:
-                # Convert to CreateMessageRequest and add
-                request = CreateMessageRequest(
+                groups.setdefault((message.user_id, message.session_id), []).append(CreateMessageRequest(
                     session_id=message.session_id,
                     role=message.role,
                     content=message.content,
@@ -502,9 +593,11 @@ class ChatHistoryManager:
                     model_used=message.model_used,
                     input_type=message.input_type,
                     metadata=message.metadata
-                )
-                created_message = await self.storage.add_message(message.user_id, request)
-                results.append(created_message)
+                ))
+            
+            results = []
+            for (user_id, session_id), requests in groups.items():
+                results.extend(await self.storage.add_messages(user_id, session_id, requests))
             
             logger.info(f"Added batch of {len(messages)} messages")
             return results
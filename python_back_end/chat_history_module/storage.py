@@ -4,7 +4,7 @@ Database storage operations for chat history
 
 import json
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from uuid import UUID, uuid4
 import asyncpg
@@ -126,50 +126,62 @@ class ChatHistoryStorage:
     
     async def add_message(self, user_id: int, request: CreateMessageRequest) -> ChatMessage:
         """Add a message to a session"""
+        messages = await self.add_messages(user_id, request.session_id, [request])
+        return messages[0]
+    
+    async def add_messages(self, user_id: int, session_id: UUID, requests: List[CreateMessageRequest],
+                           message_ids: Optional[List[int]] = None,
+                           created_at: Optional[List[datetime]] = None) -> List[ChatMessage]:
+        """
+        Insert several messages into one session in a single round trip.
+        
+        The session check, the multi-row insert and the RETURNING of the created
+        rows happen in one statement. Session counters are maintained by the
+        ``update_session_on_message_insert`` trigger, once per statement.
+        
+        ``message_ids`` and ``created_at`` let the write-behind buffer persist
+        messages whose ids were reserved ahead of time.
+        """
+        if not requests:
+            return []
+        
+        if created_at is None:
+            # Keep created_at strictly increasing so history ordering is stable
+            now = datetime.utcnow()
+            created_at = [now + timedelta(microseconds=i) for i in range(len(requests))]
+            
         try:
             async with self.db_pool.acquire() as conn:
-                # Start transaction
-                async with conn.transaction():
-                    # Verify session exists and belongs to user
-                    session_exists = await conn.fetchval("""
-                        SELECT EXISTS(
-                            SELECT 1 FROM chat_sessions 
-                            WHERE id = $1 AND user_id = $2 AND is_active = TRUE
-                        )
-                    """, request.session_id, user_id)
-                    
-                    if not session_exists:
-                        raise SessionNotFoundError(str(request.session_id))
-                    
-                    # Insert message
-                    message_id = await conn.fetchval("""
-                        INSERT INTO chat_messages (session_id, user_id, role, content, reasoning, model_used, input_type, metadata, created_at)
-                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                        RETURNING id
-                    """, request.session_id, user_id, request.role, request.content, 
-                        request.reasoning, request.model_used, request.input_type, 
-                        json.dumps(request.metadata), datetime.utcnow())
-                    
-                    # Update session counters
-                    await conn.execute("""
-                        UPDATE chat_sessions 
-                        SET message_count = message_count + 1, 
-                            last_message_at = $1,
-                            updated_at = $1
-                        WHERE id = $2
-                    """, datetime.utcnow(), request.session_id)
-                    
-                    # Fetch the created message
-                    row = await conn.fetchrow("""
-                        SELECT id, session_id, user_id, role, content, reasoning, model_used, 
-                               input_type, metadata, created_at
-                        FROM chat_messages 
-                        WHERE id = $1
-                    """, message_id)
-                    
-                    if not row:
-                        raise DatabaseError(f"Failed to create message {message_id}")
-                    
+                rows = await conn.fetch("""
+                    WITH target AS (
+                        SELECT id FROM chat_sessions 
+                        WHERE id = $1 AND user_id = $2 AND is_active = TRUE
+                    )
+                    INSERT INTO chat_messages (id, session_id, user_id, role, content, reasoning, model_used, input_type, metadata, created_at)
+                    SELECT COALESCE(m.id, nextval(pg_get_serial_sequence('chat_messages', 'id'))),
+                           target.id, $2, m.role, m.content, m.reasoning, 
+                           m.model_used, m.input_type, m.metadata::jsonb, m.created_at
+                    FROM target, unnest(
+                        $3::int[], $4::text[], $5::text[], $6::text[], $7::text[], $8::text[], $9::text[], $10::timestamptz[]
+                    ) WITH ORDINALITY AS m(id, role, content, reasoning, model_used, input_type, metadata, created_at, ord)
+                    ORDER BY m.ord
+                    RETURNING id, session_id, user_id, role, content, reasoning, model_used, 
+                              input_type, metadata, created_at
+                """, session_id, user_id,
+                    message_ids or [None] * len(requests),
+                    [r.role for r in requests],
+                    [r.content for r in requests],
+                    [r.reasoning for r in requests],
+                    [r.model_used for r in requests],
+                    [r.input_type for r in requests],
+                    [json.dumps(r.metadata) for r in requests],
+                    created_at)
+                
+                if not rows:
+                    raise SessionNotFoundError(str(session_id))
+                
+                messages = []
+                for row in sorted(rows, key=lambda r: (r['created_at'], r['id'])):
                     message_data = dict(row)
                     # Parse metadata if it's a string
                     if isinstance(message_data['metadata'], str):
@@ -177,14 +189,30 @@ class ChatHistoryStorage:
                             message_data['metadata'] = json.loads(message_data['metadata'])
                         except json.JSONDecodeError:
                             message_data['metadata'] = {}
-                    
-                    return ChatMessage(**message_data)
+                    messages.append(ChatMessage(**message_data))
+                
+                return messages
                     
         except SessionNotFoundError:
             raise
         except Exception as e:
-            logger.error(f"Error adding message: {e}")
-            raise DatabaseError(f"Failed to add message: {e}")
+            logger.error(f"Error adding messages: {e}")
+            raise DatabaseError(f"Failed to add messages: {e}")
+    
+    async def reserve_message_ids(self, count: int) -> List[int]:
+        """Reserve a block of message ids from the chat_messages sequence"""
+        try:
+            async with self.db_pool.acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT nextval(pg_get_serial_sequence('chat_messages', 'id')) AS id
+                    FROM generate_series(1, $1)
+                """, count)
+                
+                return [row['id'] for row in rows]
+                
+        except Exception as e:
+            logger.error(f"Error reserving message ids: {e}")
+            raise DatabaseError(f"Failed to reserve message ids: {e}")
     
     async def get_session_messages(self, session_id: UUID, user_id: int, limit: int = 100, offset: int = 0) -> List[ChatMessage]:
         """Get messages for a session"""
@@ -267,3 +295,142 @@ class ChatHistoryStorage:
         except Exception as e:
             logger.error(f"Error clearing session messages: {e}")
             raise DatabaseError(f"Failed to clear session messages: {e}")
+    
+    async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
+        """Get materialized chat statistics for a user"""
+        try:
+            async with self.db_pool.acquire() as conn:
+                try:
+                    row = await conn.fetchrow("""
+                        SELECT total_sessions, total_messages, last_activity
+                        FROM chat_user_stats 
+                        WHERE user_id = $1
+                    """, user_id)
+                    
+                    if row is None:
+                        # First lookup for a user with no activity since the table was created
+                        await conn.execute("SELECT refresh_user_chat_stats($1)", user_id)
+                        row = await conn.fetchrow("""
+                            SELECT total_sessions, total_messages, last_activity
+                            FROM chat_user_stats 
+                            WHERE user_id = $1
+                        """, user_id)
+                        
+                except (asyncpg.UndefinedTableError, asyncpg.UndefinedFunctionError):
+                    logger.warning("chat_user_stats is not installed, aggregating live")
+                    rows = await self._aggregate_user_stats(conn, user_id)
+                    row = rows[0] if rows else None
+                
+                if not row:
+                    return {"total_sessions": 0, "total_messages": 0, "last_activity": None}
+                
+                return {
+                    "total_sessions": row['total_sessions'] or 0,
+                    "total_messages": row['total_messages'] or 0,
+                    "last_activity": row['last_activity'].isoformat() if row['last_activity'] else None
+                }
+                
+        except Exception as e:
+            logger.error(f"Error getting user stats: {e}")
+            raise DatabaseError(f"Failed to get user stats: {e}")
+    
+    async def check_user_stats(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Compare materialized stats against a live aggregate and return the mismatches"""
+        try:
+            async with self.db_pool.acquire() as conn:
+                live = {row['user_id']: row for row in await self._aggregate_user_stats(conn, user_id)}
+                stored = {
+                    row['user_id']: row for row in await conn.fetch("""
+                        SELECT user_id, total_sessions, total_messages, last_activity
+                        FROM chat_user_stats
+                        WHERE ($1::int IS NULL OR user_id = $1)
+                    """, user_id)
+                }
+                
+                mismatches = []
+                for uid in sorted(set(live) | set(stored)):
+                    expected = live.get(uid)
+                    actual = stored.get(uid)
+                    expected_values = (
+                        (expected['total_sessions'], expected['total_messages'], expected['last_activity'])
+                        if expected else (0, 0, None)
+                    )
+                    actual_values = (
+                        (actual['total_sessions'], actual['total_messages'], actual['last_activity'])
+                        if actual else (0, 0, None)
+                    )
+                    if expected_values != actual_values:
+                        mismatches.append({
+                            "user_id": uid,
+                            "expected": dict(zip(("total_sessions", "total_messages", "last_activity"), expected_values)),
+                            "actual": dict(zip(("total_sessions", "total_messages", "last_activity"), actual_values)),
+                        })
+                
+                return mismatches
+                
+        except Exception as e:
+            logger.error(f"Error checking user stats: {e}")
+            raise DatabaseError(f"Failed to check user stats: {e}")
+    
+    async def backfill_user_stats(self, user_id: Optional[int] = None) -> Dict[str, int]:
+        """
+        Rebuild materialized stats from the source tables.
+        
+        Session ``message_count`` values are repaired from actual message rows
+        first, since the per-user totals are derived from them.
+        """
+        try:
+            async with self.db_pool.acquire() as conn:
+                async with conn.transaction():
+                    # Block concurrent session updates so the rebuild is not raced by the trigger
+                    await conn.execute("LOCK TABLE chat_sessions IN SHARE ROW EXCLUSIVE MODE")
+                    
+                    repaired = await conn.execute("""
+                        UPDATE chat_sessions s
+                        SET message_count = c.actual
+                        FROM (
+                            SELECT s2.id, COUNT(m.id) AS actual
+                            FROM chat_sessions s2
+                            LEFT JOIN chat_messages m ON m.session_id = s2.id
+                            WHERE ($1::int IS NULL OR s2.user_id = $1)
+                            GROUP BY s2.id
+                        ) c
+                        WHERE s.id = c.id AND s.message_count IS DISTINCT FROM c.actual
+                    """, user_id)
+                    
+                    await conn.execute("""
+                        DELETE FROM chat_user_stats WHERE ($1::int IS NULL OR user_id = $1)
+                    """, user_id)
+                    
+                    rebuilt = await conn.fetch("""
+                        SELECT refresh_user_chat_stats(user_id)
+                        FROM (
+                            SELECT DISTINCT user_id FROM chat_sessions
+                            WHERE is_active = TRUE AND user_id IS NOT NULL
+                            AND ($1::int IS NULL OR user_id = $1)
+                        ) users
+                    """, user_id)
+                    
+                    return {
+                        "sessions_repaired": int(repaired.split()[-1]),
+                        "users_rebuilt": len(rebuilt),
+                    }
+                    
+        except Exception as e:
+            logger.error(f"Error backfilling user stats: {e}")
+            raise DatabaseError(f"Failed to backfill user stats: {e}")
+    
+    async def _aggregate_user_stats(self, conn: Connection, user_id: Optional[int] = None) -> List[asyncpg.Record]:
+        """Compute per-user stats directly from sessions and messages"""
+        return await conn.fetch("""
+            SELECT 
+                s.user_id,
+                COUNT(DISTINCT s.id) as total_sessions,
+                COUNT(m.id) as total_messages,
+                MAX(s.last_message_at) as last_activity
+            FROM chat_sessions s
+            LEFT JOIN chat_messages m ON s.id = m.session_id
+            WHERE s.is_active = TRUE AND s.user_id IS NOT NULL
+            AND ($1::int IS NULL OR s.user_id = $1)
+            GROUP BY s.user_id
+        """, user_id)
@@ -0,0 +1,228 @@
+"""
+Write-behind buffer for chat message persistence
+"""
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from .models import ChatMessage, CreateMessageRequest
+from .exceptions import SessionNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingWrite:
+    """Messages for one session waiting to be flushed"""
+    user_id: int
+    session_id: UUID
+    requests: List[CreateMessageRequest]
+    message_ids: List[int]
+    created_at: List[datetime]
+    attempts: int = 0
+
+
+class ChatHistoryWriteBuffer:
+    """
+    Coalesces chat message inserts and writes them behind the request path.
+
+    Message ids are reserved from the ``chat_messages`` sequence in blocks, so
+    ``enqueue`` can hand back fully formed ``ChatMessage`` objects (including
+    ``id``) without waiting on the insert. Pending writes are flushed after a
+    short coalescing window (``flush_interval``), or immediately once
+    ``max_batch`` messages are queued, with one multi-row insert per session.
+    """
+
+    def __init__(self, storage, flush_interval: float = 0.05, max_batch: int = 100,
+                 id_block_size: int = 64, max_attempts: int = 3):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.id_block_size = id_block_size
+        self.max_attempts = max_attempts
+
+        self._pending: List[_PendingWrite] = []
+        self._pending_count = 0
+        self._inflight: Set[UUID] = set()
+        self._ids: Deque[int] = deque()
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "flushes": 0,
+            "failed": 0,
+            "dropped": 0,
+        }
+
+    async def enqueue(self, user_id: int, session_id: UUID,
+                      requests: List[CreateMessageRequest]) -> List[ChatMessage]:
+        """Queue messages for writing and return them as they will be stored"""
+        if self._closed:
+            raise RuntimeError("Chat history write buffer is closed")
+        if not requests:
+            return []
+
+        session_id = UUID(str(session_id))
+        message_ids = await self._take_ids(len(requests))
+        now = datetime.utcnow()
+        created_at = [now + timedelta(microseconds=i) for i in range(len(requests))]
+
+        self._pending.append(_PendingWrite(
+            user_id=user_id,
+            session_id=session_id,
+            requests=list(requests),
+            message_ids=message_ids,
+            created_at=created_at,
+        ))
+        self._pending_count += len(requests)
+        self.stats["enqueued"] += len(requests)
+
+        self._ensure_task()
+        self._wakeup.set()
+
+        return [
+            ChatMessage(
+                id=message_id,
+                session_id=session_id,
+                user_id=user_id,
+                role=request.role,
+                content=request.content,
+                reasoning=request.reasoning,
+                model_used=request.model_used,
+                input_type=request.input_type,
+                metadata=request.metadata,
+                created_at=timestamp,
+            )
+            for request, message_id, timestamp in zip(requests, message_ids, created_at)
+        ]
+
+    def has_pending(self, session_id: UUID) -> bool:
+        """Whether writes for a session are queued or being flushed"""
+        session_id = UUID(str(session_id))
+        return session_id in self._inflight or any(
+            write.session_id == session_id for write in self._pending
+        )
+
+    async def flush(self) -> int:
+        """Write every pending message now. Returns the number of messages written."""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            self._pending_count = 0
+            if not batch:
+                return 0
+
+            groups: Dict[Tuple[int, UUID], List[_PendingWrite]] = {}
+            for write in batch:
+                groups.setdefault((write.user_id, write.session_id), []).append(write)
+
+            self._inflight = {session_id for _, session_id in groups}
+            try:
+                results = await asyncio.gather(
+                    *(self._write_group(user_id, session_id, writes)
+                      for (user_id, session_id), writes in groups.items())
+                )
+            finally:
+                self._inflight = set()
+
+            self.stats["flushes"] += 1
+            return sum(results)
+
+    async def close(self):
+        """Stop the background flusher and write whatever is still pending"""
+        self._closed = True
+        if self._task:
+            # Let the flusher finish its current batch instead of cancelling mid-write
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        # Retries are re-queued by flush, so drain until nothing is left
+        for _ in range(self.max_attempts):
+            if not self._pending:
+                break
+            await self.flush()
+
+        if self._pending:
+            lost = sum(len(write.requests) for write in self._pending)
+            self.stats["dropped"] += lost
+            logger.error(f"Dropped {lost} chat messages that could not be written on shutdown")
+            self._pending = []
+            self._pending_count = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Buffer counters for monitoring"""
+        return {
+            **self.stats,
+            "pending": self._pending_count,
+            "reserved_ids": len(self._ids),
+        }
+
+    async def _write_group(self, user_id: int, session_id: UUID, writes: List[_PendingWrite]) -> int:
+        requests: List[CreateMessageRequest] = []
+        message_ids: List[int] = []
+        created_at: List[datetime] = []
+        for write in writes:
+            requests.extend(write.requests)
+            message_ids.extend(write.message_ids)
+            created_at.extend(write.created_at)
+
+        try:
+            await self.storage.add_messages(
+                user_id, session_id, requests, message_ids=message_ids, created_at=created_at
+            )
+            self.stats["written"] += len(requests)
+            return len(requests)
+
+        except SessionNotFoundError:
+            self.stats["dropped"] += len(requests)
+            logger.warning(f"Dropped {len(requests)} buffered messages for missing session {session_id}")
+
+        except Exception as e:
+            self.stats["failed"] += len(requests)
+            for write in writes:
+                write.attempts += 1
+                if write.attempts < self.max_attempts:
+                    self._pending.append(write)
+                    self._pending_count += len(write.requests)
+                else:
+                    self.stats["dropped"] += len(write.requests)
+            if self._pending:
+                self._wakeup.set()
+            logger.error(f"Failed to flush buffered messages for session {session_id}: {e}")
+
+        return 0
+
+    async def _take_ids(self, count: int) -> List[int]:
+        async with self._id_lock:
+            if len(self._ids) < count:
+                self._ids.extend(
+                    await self.storage.reserve_message_ids(max(count, self.id_block_size))
+                )
+            return [self._ids.popleft() for _ in range(count)]
+
+    def _ensure_task(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._pending_count < self.max_batch and not self._closed:
+                # Give concurrent requests a short window to join this batch
+                await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Chat history flush loop error: {e}")
@@ -2,6 +2,7 @@
 -- Run this SQL to create the necessary tables for chat history functionality
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS chat_user_stats CASCADE;
 DROP TABLE IF EXISTS chat_messages CASCADE;
 DROP TABLE IF EXISTS chat_sessions CASCADE;
 
@@ -46,22 +47,34 @@ CREATE INDEX idx_chat_messages_role ON chat_messages(role);
 CREATE OR REPLACE FUNCTION update_session_on_message_insert()
 RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE chat_sessions 
-    SET 
-        updated_at = NEW.created_at,
-        last_message_at = NEW.created_at,
-        message_count = message_count + 1,
-        model_used = COALESCE(NEW.model_used, model_used)
-    WHERE id = NEW.session_id;
-    
-    RETURN NEW;
+    -- Statement-level: one counter update per session, however many rows were inserted
+    UPDATE chat_sessions s
+    SET
+        updated_at = n.last_created_at,
+        last_message_at = n.last_created_at,
+        message_count = s.message_count + n.inserted,
+        model_used = COALESCE(n.last_model_used, s.model_used)
+    FROM (
+        SELECT
+            session_id,
+            COUNT(*) AS inserted,
+            MAX(created_at) AS last_created_at,
+            (ARRAY_AGG(model_used ORDER BY created_at DESC, id DESC)
+                FILTER (WHERE model_used IS NOT NULL))[1] AS last_model_used
+        FROM new_messages
+        GROUP BY session_id
+    ) n
+    WHERE s.id = n.session_id;
+
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 -- Trigger to automatically update session when messages are added
 CREATE TRIGGER trigger_update_session_on_message_insert
     AFTER INSERT ON chat_messages
-    FOR EACH ROW
+    REFERENCING NEW TABLE AS new_messages
+    FOR EACH STATEMENT
     EXECUTE FUNCTION update_session_on_message_insert();
 
 -- Function to auto-generate session title based on first user message
@@ -92,6 +105,9 @@ CREATE TRIGGER trigger_auto_generate_session_title
     FOR EACH ROW
     EXECUTE FUNCTION auto_generate_session_title();
 
+-- Per-user chat statistics (table, trigger and a rebuild from chat_messages)
+\ir chat_user_stats.sql
+
 -- Sample data for testing (optional - remove in production)
 -- INSERT INTO chat_sessions (user_id, title) VALUES (1, 'Sample Chat Session');
 
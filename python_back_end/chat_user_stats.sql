@@ -0,0 +1,88 @@
+-- Per-user chat statistics, kept current by a trigger on chat_sessions
+-- Idempotent; included by chat_history_schema.sql and all_schemas_safe.sql,
+-- and loaded by chat_history_module.user_stats
+-- (check or rebuild with: python -m chat_history_module.user_stats check|backfill)
+
+CREATE TABLE IF NOT EXISTS chat_user_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_sessions INTEGER NOT NULL DEFAULT 0,
+    total_messages BIGINT NOT NULL DEFAULT 0,
+    last_activity TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Recount one user from chat_messages: chat_sessions.message_count may have
+-- drifted (it used to be incremented twice per message)
+CREATE OR REPLACE FUNCTION refresh_user_chat_stats(p_user_id INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO chat_user_stats (user_id, total_sessions, total_messages, last_activity, updated_at)
+    SELECT p_user_id, COUNT(DISTINCT s.id), COUNT(m.id), MAX(s.last_message_at), CURRENT_TIMESTAMP
+    FROM chat_sessions s
+    LEFT JOIN chat_messages m ON m.session_id = s.id
+    WHERE s.user_id = p_user_id AND s.is_active = TRUE
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_sessions = EXCLUDED.total_sessions,
+        total_messages = EXCLUDED.total_messages,
+        last_activity = EXCLUDED.last_activity,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_user_chat_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Common case: messages added to or cleared from an active session
+    IF TG_OP = 'UPDATE' AND OLD.is_active AND NEW.is_active
+       AND OLD.user_id IS NOT DISTINCT FROM NEW.user_id THEN
+        UPDATE chat_user_stats
+        SET
+            total_messages = total_messages + COALESCE(NEW.message_count, 0) - COALESCE(OLD.message_count, 0),
+            last_activity = GREATEST(last_activity, NEW.last_message_at),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = NEW.user_id;
+
+        IF NOT FOUND AND NEW.user_id IS NOT NULL THEN
+            PERFORM refresh_user_chat_stats(NEW.user_id);
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    -- Session created, soft deleted, restored or removed: recount the user
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+        PERFORM refresh_user_chat_stats(OLD.user_id);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL
+       AND (TG_OP = 'INSERT' OR NEW.user_id IS DISTINCT FROM OLD.user_id) THEN
+        PERFORM refresh_user_chat_stats(NEW.user_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_user_chat_stats ON chat_sessions;
+CREATE TRIGGER trigger_update_user_chat_stats
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, is_active, message_count, last_message_at
+    ON chat_sessions
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_chat_stats();
+
+-- One-off repair, a no-op once counts agree: message_count used to be
+-- incremented twice per message. Fix the sessions (the trigger applies their
+-- deltas) and then rebuild every user's row from chat_messages.
+UPDATE chat_sessions s
+SET message_count = c.actual
+FROM (
+    SELECT s2.id, COUNT(m.id) AS actual
+    FROM chat_sessions s2
+    LEFT JOIN chat_messages m ON m.session_id = s2.id
+    GROUP BY s2.id
+) c
+WHERE s.id = c.id AND s.message_count IS DISTINCT FROM c.actual;
+
+DO $$
+BEGIN
+    PERFORM refresh_user_chat_stats(user_id)
+    FROM (SELECT DISTINCT user_id FROM chat_sessions WHERE user_id IS NOT NULL) users;
+END;
+$$;
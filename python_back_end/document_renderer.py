@@ -0,0 +1,521 @@
+"""
+Document rendering service for file_processing
+
+Renders PDF pages (and DOCX via PDF) to PNG across a pool of worker
+processes and hands them back one page at a time, in page order, as soon as
+each is ready. Rendered pages, converted PDFs and extracted text are cached
+on disk by document hash; the cache is bounded by total size and evicts the
+least recently used documents.
+
+DOCX conversion goes through a long-lived headless LibreOffice listener
+when the `uno` bridge is importable, so only the first conversion pays
+office startup. Without it, each conversion still runs `soffice
+--convert-to`, but against a pre-initialized profile kept for the life of
+the process. Each backend process has its own listener port and profile.
+
+This module only imports the standard library at the top level: worker
+processes are spawned and import it on their own.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get(
+    "DOCUMENT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "harvis-document-cache")
+)
+CACHE_MAX_MB = int(os.environ.get("DOCUMENT_CACHE_MAX_MB", "512"))
+RENDER_WORKERS = int(os.environ.get("DOCUMENT_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+RENDER_ZOOM = float(os.environ.get("DOCUMENT_RENDER_ZOOM", "2.0"))
+# Each backend process runs its own listener: the port is this base offset
+# by the pid, the profile lives under a pid-named directory
+OFFICE_PORT = int(os.environ.get("LIBREOFFICE_LISTENER_PORT", "2002"))
+OFFICE_PORT_SPAN = 1000
+OFFICE_TIMEOUT = int(os.environ.get("LIBREOFFICE_TIMEOUT", "60"))  # seconds
+
+
+def document_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def office_port(pid: Optional[int] = None) -> int:
+    """Listener port for a process, so uvicorn workers on one host don't collide"""
+    pid = os.getpid() if pid is None else pid
+    return OFFICE_PORT + pid % OFFICE_PORT_SPAN
+
+
+def _port_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _render_pdf_page(pdf_path: str, page_index: int, zoom: float, out_path: str) -> int:
+    """Worker-process entry point: render one page to a PNG file, return its size"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as pdf:
+        pix = pdf[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        data = pix.tobytes("png")
+    _atomic_write(out_path, data)
+    return len(data)
+
+
+def pdf_page_count(pdf_path: str) -> int:
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as pdf:
+        return len(pdf)
+
+
+class OfficeListener:
+    """
+    A warm headless LibreOffice for DOCX -> PDF.
+
+    Conversions are serialized; LibreOffice does not load documents
+    concurrently in one instance. The listener is restarted if it dies.
+    One instance per process: the profile directory must not be shared, and
+    the port defaults to office_port() for this pid.
+    """
+
+    def __init__(self, binary: str, profile_dir: str, port: Optional[int] = None, timeout: int = OFFICE_TIMEOUT):
+        self.binary = binary
+        self.profile_dir = profile_dir
+        self.port = office_port() if port is None else port
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._desktop = None
+        try:
+            import uno  # noqa: F401  (python3-uno from the LibreOffice packages)
+            self.has_uno = True
+        except ImportError:
+            self.has_uno = False
+        self.stats = {"conversions": 0, "starts": 0, "failures": 0, "mode": "listener" if self.has_uno else "cli"}
+
+    @property
+    def _profile_url(self) -> str:
+        return "file://" + os.path.abspath(self.profile_dir)
+
+    def _start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if not _port_free(self.port):
+            # Something else (not our office, which is stopped) holds it
+            port, self.port = self.port, _free_port()
+            logger.warning(f"LibreOffice port {port} is in use, listening on {self.port} instead")
+        self._process = subprocess.Popen(
+            [
+                self.binary, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+                f"-env:UserInstallation={self._profile_url}",
+                f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.stats["starts"] += 1
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"LibreOffice exited with {self._process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            self.close()
+            raise TimeoutError("LibreOffice listener did not come up")
+
+        import uno
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext")
+        self._desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        logger.info(f"📄 LibreOffice listener ready on port {self.port}")
+
+    def _convert_via_listener(self, src: str, dst: str):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            return p
+
+        if self._process is None or self._process.poll() is not None or self._desktop is None:
+            self._start()
+        doc = self._desktop.loadComponentFromURL(uno.systemPathToFileUrl(src), "_blank", 0, (prop("Hidden", True),))
+        if doc is None:
+            raise RuntimeError("LibreOffice could not load the document")
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(dst), (prop("FilterName", "writer_pdf_Export"),))
+        finally:
+            doc.close(True)
+
+    def _convert_via_cli(self, src: str, dst: str):
+        outdir = os.path.dirname(dst)
+        subprocess.run(
+            [
+                self.binary, "--headless", "--norestore",
+                f"-env:UserInstallation={self._profile_url}",
+                "--convert-to", "pdf", "--outdir", outdir, src,
+            ],
+            capture_output=True,
+            timeout=self.timeout,
+            check=True,
+        )
+        produced = os.path.join(outdir, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+        if produced != dst:
+            os.replace(produced, dst)
+
+    def convert_to_pdf(self, data: bytes, suffix: str = ".docx") -> bytes:
+        with self._lock, tempfile.TemporaryDirectory() as work:
+            src = os.path.join(work, f"document{suffix}")
+            dst = os.path.join(work, "document.pdf")
+            with open(src, "wb") as f:
+                f.write(data)
+            try:
+                if self.has_uno:
+                    try:
+                        self._convert_via_listener(src, dst)
+                    except Exception as e:
+                        # Bridge gone stale or office crashed: restart once
+                        logger.warning(f"LibreOffice listener failed ({e}), restarting")
+                        self.close()
+                        self._convert_via_listener(src, dst)
+                else:
+                    self._convert_via_cli(src, dst)
+            except Exception:
+                self.stats["failures"] += 1
+                raise
+            if not os.path.exists(dst):
+                self.stats["failures"] += 1
+                raise RuntimeError("LibreOffice did not generate PDF")
+            self.stats["conversions"] += 1
+            with open(dst, "rb") as f:
+                return f.read()
+
+    def close(self):
+        self._desktop = None
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+    def remove_profile(self):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class DocumentRenderer:
+    """Parallel page rendering with a size-bounded, hash-keyed disk cache"""
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        max_cache_bytes: int = CACHE_MAX_MB * 1024 * 1024,
+        workers: int = RENDER_WORKERS,
+        zoom: float = RENDER_ZOOM,
+    ):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.workers = max(1, workers)
+        self.zoom = zoom
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._office: Optional[OfficeListener] = None
+        self._office_checked = False
+
+        self._lock = threading.Lock()
+        self._doc_locks: Dict[str, threading.Lock] = {}
+        self._sizes: Optional[Dict[str, int]] = None
+
+        self.stats = {
+            "page_hits": 0,
+            "pages_rendered": 0,
+            "text_hits": 0,
+            "text_extracted": 0,
+            "evicted": 0,
+        }
+
+    # -- cache bookkeeping -------------------------------------------------
+
+    def _entry(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest)
+
+    def _doc_lock(self, digest: str) -> threading.Lock:
+        with self._lock:
+            return self._doc_locks.setdefault(digest, threading.Lock())
+
+    def _load_sizes(self):
+        if self._sizes is not None:
+            return
+        sizes = {}
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                # Dot directories hold LibreOffice profiles, not documents
+                if os.path.isdir(path) and not name.startswith("."):
+                    sizes[name] = sum(
+                        os.path.getsize(os.path.join(root, f))
+                        for root, _, files in os.walk(path) for f in files
+                    )
+        self._sizes = sizes
+
+    def _touch(self, digest: str):
+        try:
+            os.utime(self._entry(digest))
+        except OSError:
+            pass
+
+    def _account(self, digest: str, added: int):
+        """Record bytes written for a document and evict LRU entries over the limit"""
+        with self._lock:
+            self._load_sizes()
+            self._sizes[digest] = self._sizes.get(digest, 0) + added
+            total = sum(self._sizes.values())
+            if total <= self.max_cache_bytes:
+                return
+
+            def last_used(name):
+                try:
+                    return os.path.getmtime(self._entry(name))
+                except OSError:
+                    return 0
+
+            for name in sorted(self._sizes, key=last_used):
+                if total <= self.max_cache_bytes:
+                    break
+                if name == digest or self._doc_locks.get(name, threading.Lock()).locked():
+                    continue
+                shutil.rmtree(self._entry(name), ignore_errors=True)
+                total -= self._sizes.pop(name)
+                self._doc_locks.pop(name, None)
+                self.stats["evicted"] += 1
+
+    def _write(self, digest: str, name: str, data: bytes):
+        entry = self._entry(digest)
+        os.makedirs(entry, exist_ok=True)
+        _atomic_write(os.path.join(entry, name), data)
+        self._account(digest, len(data))
+
+    def _read(self, digest: str, name: str) -> Optional[bytes]:
+        path = os.path.join(self._entry(digest), name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._touch(digest)
+        return data
+
+    # -- text --------------------------------------------------------------
+
+    def cached_text(self, data: bytes, kind: str, extract: Callable[[], str]) -> str:
+        """Extracted text for a document, computed once per content hash"""
+        digest = document_hash(data)
+        name = f"text-{kind}.txt"
+        cached = self._read(digest, name)
+        if cached is not None:
+            self.stats["text_hits"] += 1
+            return cached.decode("utf-8")
+        with self._doc_lock(digest):
+            cached = self._read(digest, name)
+            if cached is not None:
+                self.stats["text_hits"] += 1
+                return cached.decode("utf-8")
+            text = extract()
+            self.stats["text_extracted"] += 1
+            if text is not None and not text.startswith("[Error"):
+                self._write(digest, name, text.encode("utf-8"))
+            return text
+
+    # -- pages -------------------------------------------------------------
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 1:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: the app process holds threads (and possibly CUDA) that must not be forked
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def iter_pdf_pages(self, pdf_data: bytes, max_pages: int, digest: Optional[str] = None) -> Iterator[bytes]:
+        """
+        PNG bytes for the first max_pages pages, in order.
+
+        Pages are rendered in parallel; each is yielded as soon as it and
+        every page before it are done. Cached pages are read back directly.
+        `digest` lets a DOCX cache its pages under the DOCX's own hash.
+        """
+        digest = digest or document_hash(pdf_data)
+        entry = self._entry(digest)
+        prefix = f"page-z{self.zoom:g}-"
+        meta_name = f"pages-z{self.zoom:g}.json"
+
+        meta = self._read(digest, meta_name)
+        if meta is not None:
+            info = json.loads(meta)
+            wanted = min(max_pages, info["total"])
+            cached = [os.path.join(entry, f"{prefix}{i + 1:04d}.png") for i in range(wanted)]
+            if info["rendered"] >= wanted and all(os.path.exists(p) for p in cached):
+                for path in cached:
+                    with open(path, "rb") as f:
+                        page = f.read()
+                    self.stats["page_hits"] += 1
+                    yield page
+                return
+
+        with self._doc_lock(digest):
+            os.makedirs(entry, exist_ok=True)
+            pdf_path = os.path.join(entry, "source.pdf")
+            if not os.path.exists(pdf_path):
+                self._write(digest, "source.pdf", pdf_data)
+            total = pdf_page_count(pdf_path)
+            wanted = min(max_pages, total)
+            logger.info(f"Rendering {wanted}/{total} PDF pages on {self.workers} worker(s)")
+
+            outputs = [os.path.join(entry, f"{prefix}{i + 1:04d}.png") for i in range(wanted)]
+            executor = self._get_executor()
+            futures = []
+            if executor is not None:
+                try:
+                    futures = [
+                        executor.submit(_render_pdf_page, pdf_path, i, self.zoom, out)
+                        for i, out in enumerate(outputs)
+                    ]
+                except (BrokenProcessPool, RuntimeError) as e:
+                    logger.warning(f"Render pool unavailable ({e}), rendering in-process")
+                    self._reset_executor()
+                    futures = []
+
+            try:
+                for i, out in enumerate(outputs):
+                    if futures:
+                        size = futures[i].result()
+                    else:
+                        size = _render_pdf_page(pdf_path, i, self.zoom, out)
+                    self._account(digest, size)
+                    self.stats["pages_rendered"] += 1
+                    with open(out, "rb") as f:
+                        yield f.read()
+            finally:
+                # Consumer stopped early: don't keep rendering pages nobody reads
+                for future in futures:
+                    future.cancel()
+
+            self._write(digest, meta_name, json.dumps({"rendered": wanted, "total": total}).encode())
+
+    def _office_listener(self) -> Optional[OfficeListener]:
+        if not self._office_checked:
+            self._office_checked = True
+            binary = shutil.which("libreoffice") or shutil.which("soffice")
+            if binary:
+                profile = os.path.join(self.cache_dir, ".libreoffice-profiles", str(os.getpid()))
+                self._office = OfficeListener(binary, profile)
+        return self._office
+
+    def docx_to_pdf(self, docx_data: bytes) -> Optional[bytes]:
+        """Cached DOCX -> PDF; None when LibreOffice is not installed"""
+        office = self._office_listener()
+        if office is None:
+            return None
+        digest = document_hash(docx_data)
+        cached = self._read(digest, "source.pdf")
+        if cached is not None:
+            return cached
+        with self._doc_lock(digest):
+            cached = self._read(digest, "source.pdf")
+            if cached is not None:
+                return cached
+            pdf = office.convert_to_pdf(docx_data)
+            self._write(digest, "source.pdf", pdf)
+            return pdf
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._load_sizes()
+            cache = {"documents": len(self._sizes), "bytes": sum(self._sizes.values()),
+                     "max_bytes": self.max_cache_bytes}
+        return {
+            "workers": self.workers,
+            **self.stats,
+            "cache": cache,
+            "libreoffice": self._office.stats if self._office else None,
+        }
+
+    def close(self):
+        self._reset_executor()
+        if self._office:
+            self._office.close()
+            self._office.remove_profile()
+
+
+_renderer: Optional[DocumentRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_document_renderer() -> DocumentRenderer:
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = DocumentRenderer()
+        return _renderer
+
+
+def get_renderer_stats() -> Dict:
+    with _renderer_lock:
+        renderer = _renderer
+    return renderer.get_stats() if renderer else {"workers": 0}
+
+
+def shutdown_document_renderer():
+    global _renderer
+    with _renderer_lock:
+        renderer, _renderer = _renderer, None
+    if renderer:
+        renderer.close()
@@ -0,0 +1,370 @@
+"""
+Build cache for the artifact executor
+
+Keeps state on the executor volume between builds:
+
+- a shared npm cache (npm_config_cache), so package tarballs are fetched once
+- node_modules snapshots keyed by a hash of the dependency set; a workspace
+  with the same dependencies gets a hardlinked copy instead of npm install
+- the last workspace of each artifact, so a rebuild where only sources
+  changed rewrites those files and runs just the build step
+
+Layout under EXECUTOR_CACHE_DIR:
+
+    npm/                      shared npm download cache
+    deps/<hash>/node_modules  dependency snapshots (plus package-lock.json)
+    workspaces/<artifact_id>  parked workspace of the artifact's last build
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import subprocess
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple, List
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(
+    os.environ.get(
+        "EXECUTOR_CACHE_DIR",
+        os.path.join(os.environ.get("EXECUTOR_WORKSPACE", "/workspace"), ".cache"),
+    )
+)
+MAX_DEP_SNAPSHOTS = int(os.environ.get("EXECUTOR_MAX_DEP_SNAPSHOTS", "8"))
+WORKSPACE_TTL_HOURS = float(os.environ.get("EXECUTOR_WORKSPACE_TTL_HOURS", "72"))
+
+STATE_FILE = ".harvis-build.json"
+LOCKFILE = "package-lock.json"
+
+# Tool caches that builds write into; never shared through a snapshot
+SNAPSHOT_IGNORE = shutil.ignore_patterns(".cache", ".vite")
+
+
+def content_hash(content: str) -> str:
+    """Hash of a source file's content"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def dependency_hash(
+    package: Dict[str, Any], node_version: str, lockfile: Optional[str] = None
+) -> str:
+    """
+    Key for a node_modules snapshot.
+
+    Only what decides the installed tree goes in: the dependency maps, the
+    lockfile if the artifact ships one, and the node runtime (native addons
+    are built against its ABI).
+    """
+    payload = {
+        "dependencies": package.get("dependencies") or {},
+        "devDependencies": package.get("devDependencies") or {},
+        "node": node_version,
+        "lockfile": content_hash(lockfile) if lockfile else None,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+def lockfile_matches(package: Dict[str, Any], lockfile: Optional[str]) -> bool:
+    """
+    Whether `npm ci` can use the lockfile with this package.json: its root
+    entry must declare exactly the generated dependency maps. A mismatch
+    makes `npm ci` fail where `npm install` would re-resolve.
+    """
+    if not lockfile:
+        return False
+    try:
+        root = json.loads(lockfile).get("packages", {}).get("")
+    except (ValueError, AttributeError):
+        return False
+    if not isinstance(root, dict):
+        return False  # lockfileVersion 1 has no root entry to compare
+    return all(
+        (root.get(field) or {}) == (package.get(field) or {})
+        for field in ("dependencies", "devDependencies")
+    )
+
+
+def scripts_hash(package: Dict[str, Any]) -> str:
+    """Hash of the generated package.json scripts, which decide what a build runs"""
+    encoded = json.dumps(package.get("scripts") or {}, sort_keys=True, separators=(",", ":"))
+    return content_hash(encoded)
+
+
+def read_state(workspace: Path) -> Dict[str, Any]:
+    """Build state left in a workspace by its previous build"""
+    try:
+        return json.loads((workspace / STATE_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_state(workspace: Path, state: Dict[str, Any]):
+    path = workspace / STATE_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def sync_files(
+    files: Dict[str, str], workspace: Path, previous: Optional[Dict[str, str]] = None
+) -> Tuple[Dict[str, str], List[str], List[str]]:
+    """
+    Write source files into a workspace, touching only what changed.
+
+    Files from the previous build that are no longer part of the artifact are
+    removed. Unchanged files keep their mtime, which is what lets the
+    framework's own build cache skip them.
+
+    Returns (manifest, changed, removed) where manifest maps path -> hash.
+    """
+    previous = previous or {}
+    manifest: Dict[str, str] = {}
+    changed: List[str] = []
+
+    for filepath, content in files.items():
+        filepath = filepath.lstrip("/")
+        full_path = workspace / filepath
+        digest = content_hash(content)
+        manifest[filepath] = digest
+
+        if previous.get(filepath) == digest and full_path.exists():
+            continue
+
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(content, encoding="utf-8")
+        changed.append(filepath)
+
+    removed = [path for path in previous if path not in manifest]
+    for filepath in removed:
+        try:
+            (workspace / filepath).unlink()
+        except FileNotFoundError:
+            pass
+
+    return manifest, changed, removed
+
+
+def sync_tree(src: Path, dst: Path) -> int:
+    """Copy src into dst, skipping files whose size and mtime already match"""
+    copied = 0
+
+    def copy_if_changed(s, d):
+        nonlocal copied
+        try:
+            ss, ds = os.stat(s), os.stat(d)
+            if ss.st_size == ds.st_size and int(ss.st_mtime) == int(ds.st_mtime):
+                return d
+        except FileNotFoundError:
+            pass
+        copied += 1
+        return shutil.copy2(s, d)
+
+    shutil.copytree(
+        src, dst, symlinks=True, dirs_exist_ok=True, copy_function=copy_if_changed
+    )
+    return copied
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem or no hardlink support
+        shutil.copy2(src, dst)
+    return dst
+
+
+def hardlink_tree(src: Path, dst: Path, ignore=None):
+    """Materialize src at dst with hardlinks (files share inodes, dirs are new)"""
+    if ignore is None:
+        try:
+            subprocess.run(
+                ["cp", "-al", str(src), str(dst)],
+                check=True,
+                capture_output=True,
+                timeout=300,
+            )
+            return
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug(f"cp -al failed, falling back to os.link: {e}")
+            shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(
+        src, dst, symlinks=True, ignore=ignore, copy_function=_link_or_copy
+    )
+
+
+class BuildCache:
+    """Dependency snapshots, shared npm cache and parked workspaces"""
+
+    def __init__(
+        self,
+        root: Path = CACHE_DIR,
+        max_snapshots: int = MAX_DEP_SNAPSHOTS,
+        workspace_ttl_hours: float = WORKSPACE_TTL_HOURS,
+    ):
+        self.root = Path(root)
+        self.npm_cache = self.root / "npm"
+        self.deps_dir = self.root / "deps"
+        self.workspaces_dir = self.root / "workspaces"
+        self.max_snapshots = max_snapshots
+        self.workspace_ttl_s = workspace_ttl_hours * 3600
+        self._node_version: Optional[str] = None
+
+    def ensure_dirs(self):
+        for path in (self.npm_cache, self.deps_dir, self.workspaces_dir):
+            path.mkdir(parents=True, exist_ok=True)
+
+    def npm_env(self) -> Dict[str, str]:
+        """Environment for npm so every build shares one download cache"""
+        return {
+            "npm_config_cache": str(self.npm_cache),
+            "npm_config_prefer_offline": "true",
+            "npm_config_audit": "false",
+            "npm_config_fund": "false",
+            "npm_config_update_notifier": "false",
+        }
+
+    def node_version(self) -> str:
+        """Runtime node version (resolved once per process)"""
+        if self._node_version is None:
+            try:
+                result = subprocess.run(
+                    ["node", "--version"], capture_output=True, text=True, timeout=10
+                )
+                self._node_version = result.stdout.strip() or "unknown"
+            except (OSError, subprocess.SubprocessError):
+                self._node_version = "unknown"
+        return self._node_version
+
+    # Workspaces
+
+    def checkout_workspace(self, artifact_id: str, workspace: Path) -> bool:
+        """
+        Move the artifact's parked workspace to workspace.
+
+        Returns False (leaving an empty workspace) when there is nothing to
+        reuse, e.g. first build or the previous job is still serving from it.
+        """
+        parked = self.workspaces_dir / artifact_id
+        if not parked.is_dir():
+            workspace.mkdir(parents=True, exist_ok=True)
+            return False
+
+        if workspace.exists():
+            shutil.rmtree(workspace)
+        workspace.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(parked, workspace)
+        except OSError as e:
+            logger.warning(f"Could not reuse workspace for {artifact_id}: {e}")
+            workspace.mkdir(parents=True, exist_ok=True)
+            return False
+        return True
+
+    def park_workspace(self, artifact_id: str, workspace: Path):
+        """Keep a finished job's workspace for the artifact's next build"""
+        if not workspace.is_dir():
+            return
+        parked = self.workspaces_dir / artifact_id
+        try:
+            if parked.exists():
+                shutil.rmtree(parked)
+            self.workspaces_dir.mkdir(parents=True, exist_ok=True)
+            os.rename(workspace, parked)
+            os.utime(parked)
+        except OSError as e:
+            logger.warning(f"Could not park workspace {workspace}: {e}")
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    def prune_workspaces(self) -> int:
+        """Remove parked workspaces not used within the TTL"""
+        if not self.workspaces_dir.is_dir():
+            return 0
+        cutoff = time.time() - self.workspace_ttl_s
+        removed = 0
+        for path in self.workspaces_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    shutil.rmtree(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    # Dependency snapshots
+
+    def restore_dependencies(self, workspace: Path, dep_hash: str) -> bool:
+        """Hardlink a node_modules snapshot into workspace if one exists"""
+        snapshot = self.deps_dir / dep_hash
+        if not (snapshot / "node_modules").is_dir():
+            return False
+
+        target = workspace / "node_modules"
+        if target.exists():
+            shutil.rmtree(target)
+        hardlink_tree(snapshot / "node_modules", target)
+        lockfile = snapshot / LOCKFILE
+        if lockfile.exists():
+            shutil.copy2(lockfile, workspace / LOCKFILE)
+        os.utime(snapshot)
+        return True
+
+    def save_dependencies(self, workspace: Path, dep_hash: str) -> bool:
+        """Snapshot a freshly installed node_modules under dep_hash"""
+        source = workspace / "node_modules"
+        final = self.deps_dir / dep_hash
+        if final.exists() or not source.is_dir():
+            return False
+
+        tmp = self.deps_dir / f".{dep_hash}.{os.getpid()}.{time.monotonic_ns()}"
+        try:
+            tmp.mkdir(parents=True)
+            hardlink_tree(source, tmp / "node_modules", ignore=SNAPSHOT_IGNORE)
+            if (workspace / LOCKFILE).exists():
+                shutil.copy2(workspace / LOCKFILE, tmp / LOCKFILE)
+            os.rename(tmp, final)
+        except OSError as e:
+            # Lost a race with another job saving the same set, or disk trouble
+            logger.debug(f"Dependency snapshot {dep_hash} not saved: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+
+        self.prune_snapshots(keep=dep_hash)
+        return True
+
+    def prune_snapshots(self, keep: Optional[str] = None) -> int:
+        """Drop least recently used snapshots beyond max_snapshots"""
+        snapshots = []
+        for path in self.deps_dir.iterdir():
+            if path.name.startswith(".") or path.name == keep:
+                continue
+            try:
+                snapshots.append((path.stat().st_mtime, path))
+            except OSError:
+                pass
+
+        excess = len(snapshots) + (1 if keep else 0) - self.max_snapshots
+        removed = 0
+        for _, path in sorted(snapshots)[: max(excess, 0)]:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        def count(path: Path) -> int:
+            try:
+                return sum(1 for p in path.iterdir() if not p.name.startswith("."))
+            except OSError:
+                return 0
+
+        return {
+            "cache_dir": str(self.root),
+            "dependency_snapshots": count(self.deps_dir),
+            "parked_workspaces": count(self.workspaces_dir),
+            "node_version": self._node_version,
+        }
@@ -4,8 +4,8 @@ Artifact Executor Service - FastAPI app that runs inside executor pods
 This service:
 1. Receives build requests from the backend
 2. Writes files to workspace
-3. Runs npm install
-4. Builds the Next.js app
+3. Installs dependencies (reusing cached node_modules when possible)
+4. Builds the Next.js app (incrementally when the workspace is reused)
 5. Starts the app server
 6. Reports status back to backend via callbacks
 """
@@ -13,12 +13,13 @@ This service:
 import os
 import sys
 import json
+import time
 import asyncio
 import logging
 import subprocess
 import shutil
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Awaitable
 from datetime import datetime
 from contextlib import asynccontextmanager
 
@@ -34,6 +35,18 @@ from artifacts.executor_models import (
     BuildJobStatus,
     ExecutorHealth,
 )
+from executor_service.build_cache import (
+    BuildCache,
+    LOCKFILE,
+    STATE_FILE,
+    dependency_hash,
+    lockfile_matches,
+    read_state,
+    scripts_hash,
+    write_state,
+    sync_files,
+    sync_tree,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -54,6 +67,9 @@ NODE_NAME = os.environ.get("NODE_NAME", "unknown-node")
 _running_builds: Dict[str, Dict[str, Any]] = {}
 _build_tasks: Dict[str, asyncio.Task] = {}
 
+# npm cache, dependency snapshots and parked workspaces
+_build_cache = BuildCache()
+
 
 async def send_status_update(update: BuildStatusUpdate):
     """Send status update to backend"""
@@ -78,19 +94,27 @@ async def send_status_update(update: BuildStatusUpdate):
         logger.error(f"Error sending status update: {e}")
 
 
-async def write_files(files: Dict[str, str], workspace: Path):
-    """Write source files to workspace"""
-    for filepath, content in files.items():
-        # Normalize path (remove leading slash)
-        filepath = filepath.lstrip("/")
-        full_path = workspace / filepath
+async def write_files(
+    files: Dict[str, str], workspace: Path, previous: Optional[Dict[str, str]] = None
+):
+    """Write source files to workspace, skipping files unchanged since the last build"""
+    manifest, changed, removed = sync_files(files, workspace, previous)
+    for filepath in changed:
+        logger.info(f"Written file: {workspace / filepath}")
+    for filepath in removed:
+        logger.info(f"Removed file: {workspace / filepath}")
+    return manifest, changed, removed
 
-        # Create parent directories
-        full_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Write file
-        full_path.write_text(content, encoding="utf-8")
-        logger.info(f"Written file: {full_path}")
+def _write_if_changed(path: Path, text: str) -> bool:
+    """Write generated config only when it differs, so its mtime stays stable"""
+    try:
+        if path.read_text() == text:
+            return False
+    except OSError:
+        pass
+    path.write_text(text)
+    return True
 
 
 async def create_package_json(
@@ -151,8 +175,9 @@ async def create_package_json(
         }
 
     package_path = workspace / "package.json"
-    package_path.write_text(json.dumps(package, indent=2))
-    logger.info(f"Created package.json at {package_path}")
+    if _write_if_changed(package_path, json.dumps(package, indent=2)):
+        logger.info(f"Created package.json at {package_path}")
+    return package
 
 
 async def create_nextjs_config(workspace: Path, port: int):
@@ -169,8 +194,8 @@ const nextConfig = {{
 module.exports = nextConfig
 """
     config_path = workspace / "next.config.js"
-    config_path.write_text(config)
-    logger.info(f"Created next.config.js")
+    if _write_if_changed(config_path, config):
+        logger.info(f"Created next.config.js")
 
 
 def run_command(
@@ -200,58 +225,205 @@ def run_command(
     return result
 
 
-async def build_artifact(request: BuildRequest, workspace: Path, build_logs: list):
-    """Build the artifact"""
+PhaseCallback = Callable[[str, int, Dict[str, float]], Awaitable[None]]
+
+
+def _log_output(build_logs: list, result: subprocess.CompletedProcess):
+    build_logs.append(result.stdout)
+    if result.stderr:
+        build_logs.append(f"[STDERR] {result.stderr}")
+
+
+async def install_dependencies(
+    workspace: Path,
+    dep_hash: str,
+    state: Dict[str, Any],
+    build_logs: list,
+    locked: bool = False,
+) -> str:
+    """
+    Make node_modules match dep_hash.
+
+    Returns how it was done: "reused" (workspace already had this set),
+    "snapshot" (hardlinked from the dependency cache) or "npm".
+    """
+    if state.get("dep_hash") == dep_hash and (workspace / "node_modules").is_dir():
+        build_logs.append(f"[CACHE] Dependencies unchanged ({dep_hash[:12]})")
+        return "reused"
+
+    if await asyncio.to_thread(
+        _build_cache.restore_dependencies, workspace, dep_hash
+    ):
+        build_logs.append(f"[CACHE] Restored node_modules snapshot {dep_hash[:12]}")
+        return "snapshot"
+
+    # node_modules may be hardlinked to another snapshot; never let npm
+    # modify those files in place
+    if state.get("dep_hash") and (workspace / "node_modules").exists():
+        await asyncio.to_thread(shutil.rmtree, workspace / "node_modules")
+
+    # A lockfile left by an earlier install may not match the new set; only
+    # one shipped with the artifact, and matching package.json, is used
+    cmd = ["npm", "ci"] if locked else ["npm", "install"]
+    build_logs.append(f"[CACHE] No snapshot for {dep_hash[:12]}, running {' '.join(cmd)}")
+    try:
+        result = await asyncio.to_thread(
+            run_command, cmd, workspace, _build_cache.npm_env()
+        )
+    except subprocess.CalledProcessError as e:
+        if not locked:
+            raise
+        # npm ci is strict about the lockfile; npm install tolerates drift
+        build_logs.append(f"[WARN] npm ci failed, retrying with npm install: {e.stderr}")
+        result = await asyncio.to_thread(
+            run_command, ["npm", "install"], workspace, _build_cache.npm_env()
+        )
+    _log_output(build_logs, result)
+
+    if await asyncio.to_thread(_build_cache.save_dependencies, workspace, dep_hash):
+        build_logs.append(f"[CACHE] Saved node_modules snapshot {dep_hash[:12]}")
+    return "npm"
+
+
+async def copy_output(request: BuildRequest, workspace: Path) -> int:
+    """Copy build output to the artifacts directory; returns files copied"""
+    output_dir = Path(request.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if request.framework == "nextjs":
+        dist_dir = workspace / "dist"
+        if dist_dir.exists():
+            return await asyncio.to_thread(sync_tree, dist_dir, output_dir)
+        return 0
+
+    # For other frameworks, copy all files
+    copied = 0
+    for item in workspace.iterdir():
+        if item.name == STATE_FILE:
+            continue
+        if item.is_dir():
+            copied += await asyncio.to_thread(sync_tree, item, output_dir / item.name)
+        else:
+            shutil.copy2(item, output_dir / item.name)
+            copied += 1
+    return copied
+
+
+async def build_artifact(
+    request: BuildRequest,
+    workspace: Path,
+    build_logs: list,
+    on_phase: Optional[PhaseCallback] = None,
+) -> Dict[str, float]:
+    """
+    Build the artifact.
+
+    The workspace may hold the artifact's previous build: unchanged sources
+    are left alone, node_modules is reused when the dependency set matches,
+    and the build step is skipped when nothing changed at all.
+
+    Returns phase timings in seconds (write, install, build, copy, total).
+    """
+    timings: Dict[str, float] = {}
+    started = time.monotonic()
+
+    async def phase(name: str, progress: int):
+        if on_phase:
+            await on_phase(name, progress, dict(timings))
+
+    def mark(name: str, since: float):
+        timings[name] = round(time.monotonic() - since, 3)
+
     try:
+        state = read_state(workspace)
+
         # Write source files
         build_logs.append("[PHASE] Writing source files...")
-        await write_files(request.files, workspace)
+        t0 = time.monotonic()
+        manifest, changed, removed = await write_files(
+            request.files, workspace, state.get("files")
+        )
+        if state:
+            build_logs.append(
+                f"[CACHE] Reusing workspace: {len(changed)} changed, "
+                f"{len(removed)} removed, {len(manifest) - len(changed)} unchanged"
+            )
 
         # Create package.json
         build_logs.append("[PHASE] Creating package.json...")
-        await create_package_json(
+        package = await create_package_json(
             workspace, request.dependencies, request.framework, request.entry_file
         )
 
         # Create Next.js config if needed
         if request.framework == "nextjs":
             await create_nextjs_config(workspace, request.port)
+        mark("write", t0)
+
+        dep_hash = dependency_hash(
+            package,
+            await asyncio.to_thread(_build_cache.node_version),
+            request.files.get(LOCKFILE),
+        )
 
         # Install dependencies
         build_logs.append("[PHASE] Installing dependencies...")
-        result = await asyncio.to_thread(run_command, ["npm", "install"], workspace)
-        build_logs.append(result.stdout)
-        if result.stderr:
-            build_logs.append(f"[STDERR] {result.stderr}")
+        await phase("installing", 20)
+        t0 = time.monotonic()
+        lockfile = request.files.get(LOCKFILE)
+        locked = lockfile_matches(package, lockfile)
+        if lockfile and not locked:
+            build_logs.append(
+                "[CACHE] package-lock.json does not match the generated package.json, using npm install"
+            )
+        install_mode = await install_dependencies(
+            workspace, dep_hash, state, build_logs, locked=locked
+        )
+        mark("install", t0)
+
+        # Dependencies are in place; record them before the build can fail
+        build_scripts = scripts_hash(package)
+        unchanged = (
+            install_mode == "reused"
+            and not changed
+            and not removed
+            and state.get("built")
+            and state.get("scripts_hash") == build_scripts
+        )
+        state = {**state, "dep_hash": dep_hash, "files": manifest, "scripts_hash": build_scripts}
+        state["built"] = False
+        write_state(workspace, state)
 
         # Build the app
-        build_logs.append("[PHASE] Building application...")
-        result = await asyncio.to_thread(
-            run_command, ["npm", "run", "build"], workspace
-        )
-        build_logs.append(result.stdout)
-        if result.stderr:
-            build_logs.append(f"[STDERR] {result.stderr}")
+        await phase("building", 50)
+        t0 = time.monotonic()
+        if unchanged:
+            build_logs.append("[PHASE] Sources and dependencies unchanged, skipping build")
+        else:
+            build_logs.append("[PHASE] Building application...")
+            result = await asyncio.to_thread(
+                run_command, ["npm", "run", "build"], workspace
+            )
+            _log_output(build_logs, result)
+        mark("build", t0)
+        state["built"] = True
+        write_state(workspace, state)
 
         # Copy build output to artifacts directory
         build_logs.append("[PHASE] Copying build output...")
-        output_dir = Path(request.output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        if request.framework == "nextjs":
-            dist_dir = workspace / "dist"
-            if dist_dir.exists():
-                shutil.copytree(dist_dir, output_dir, dirs_exist_ok=True)
-        else:
-            # For other frameworks, copy all files
-            for item in workspace.iterdir():
-                if item.is_dir():
-                    shutil.copytree(item, output_dir / item.name, dirs_exist_ok=True)
-                else:
-                    shutil.copy2(item, output_dir / item.name)
+        await phase("copying", 70)
+        t0 = time.monotonic()
+        copied = await copy_output(request, workspace)
+        mark("copy", t0)
 
+        timings["total"] = round(time.monotonic() - started, 3)
+        build_logs.append(
+            f"[TIMING] write={timings['write']}s install={timings['install']}s "
+            f"({install_mode}) build={timings['build']}s copy={timings['copy']}s "
+            f"({copied} files) total={timings['total']}s"
+        )
         build_logs.append("[SUCCESS] Build completed successfully")
-        return True
+        return timings
 
     except subprocess.CalledProcessError as e:
         build_logs.append(f"[ERROR] Build failed: {e}")
@@ -304,12 +476,32 @@ async def process_build(request: BuildRequest):
     build_logs = []
     process = None
 
+    artifact_id = str(request.artifact_id)
+    workspace = WORKSPACE_DIR / job_id
+    timings: Dict[str, float] = {}
+
+    async def report_phase(phase: str, progress: int, phase_timings: Dict[str, float]):
+        await send_status_update(
+            BuildStatusUpdate(
+                job_id=request.job_id,
+                artifact_id=request.artifact_id,
+                status=BuildJobStatus.BUILDING,
+                progress_percentage=progress,
+                current_phase=phase,
+                phase_timings=phase_timings or None,
+            )
+        )
+
     try:
-        # Create workspace
-        workspace = WORKSPACE_DIR / job_id
-        workspace.mkdir(parents=True, exist_ok=True)
+        # Create workspace, starting from the artifact's previous build if any
+        reused = await asyncio.to_thread(
+            _build_cache.checkout_workspace, artifact_id, workspace
+        )
 
-        logger.info(f"Starting build for job {job_id}")
+        logger.info(
+            f"Starting build for job {job_id}"
+            + (" (reusing previous workspace)" if reused else "")
+        )
 
         # Update status to building
         await send_status_update(
@@ -327,7 +519,7 @@ async def process_build(request: BuildRequest):
         )
 
         # Build the artifact
-        await build_artifact(request, workspace, build_logs)
+        timings = await build_artifact(request, workspace, build_logs, report_phase)
 
         # Update status to built
         await send_status_update(
@@ -342,6 +534,7 @@ async def process_build(request: BuildRequest):
                 node_name=NODE_NAME,
                 built_at=datetime.utcnow(),
                 build_logs="\n".join(build_logs),
+                phase_timings=timings,
             )
         )
 
@@ -433,6 +626,8 @@ async def process_build(request: BuildRequest):
             del _running_builds[job_id]
         if job_id in _build_tasks:
             del _build_tasks[job_id]
+        # Keep the workspace for the artifact's next build
+        await asyncio.to_thread(_build_cache.park_workspace, artifact_id, workspace)
 
 
 # FastAPI app
@@ -444,6 +639,10 @@ async def lifespan(app: FastAPI):
     # Create directories
     WORKSPACE_DIR.mkdir(parents=True, exist_ok=True)
     ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+    _build_cache.ensure_dirs()
+    pruned = await asyncio.to_thread(_build_cache.prune_workspaces)
+    if pruned:
+        logger.info(f"Pruned {pruned} stale workspaces")
 
     yield
 
@@ -540,6 +739,7 @@ async def health_check():
             "namespace": NAMESPACE,
             "node": NODE_NAME,
             "running_builds": len(_running_builds),
+            "build_cache": _build_cache.get_stats(),
             "timestamp": datetime.utcnow().isoformat(),
         }
     )
@@ -1,9 +1,12 @@
+import asyncio
 import base64
 import io
 import logging
 import tempfile
 import os
-from typing import Optional, List, Tuple
+from typing import AsyncIterator, Iterator, Optional, List, Tuple
+
+from document_renderer import document_hash, get_document_renderer
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -32,11 +35,15 @@ def extract_text_from_file(file_data: str, file_type: str) -> Optional[str]:
         decoded_data = base64.b64decode(encoded)
         file_bytes = io.BytesIO(decoded_data)
         
-        # Determine extraction method based on type
+        # Determine extraction method based on type; documents are cached by hash
         if 'pdf' in file_type.lower():
-            return _extract_from_pdf(file_bytes)
+            return get_document_renderer().cached_text(
+                decoded_data, "pdf", lambda: _extract_from_pdf(file_bytes)
+            )
         elif 'word' in file_type.lower() or 'docx' in file_type.lower():
-            return _extract_from_docx(file_bytes)
+            return get_document_renderer().cached_text(
+                decoded_data, "docx", lambda: _extract_from_docx(file_bytes)
+            )
         elif 'text' in file_type.lower() or 'txt' in file_type.lower() or 'md' in file_type.lower() or 'csv' in file_type.lower():
             return decoded_data.decode('utf-8', errors='replace')
         else:
@@ -94,6 +101,14 @@ def convert_file_to_images(file_data: str, file_type: str, max_pages: int = None
         List of tuples: [(base64_image, mime_type), ...]
         Returns empty list if conversion fails or type not supported
     """
+    return list(iter_file_images(file_data, file_type, max_pages))
+
+
+def iter_file_images(file_data: str, file_type: str, max_pages: int = None) -> Iterator[Tuple[str, str]]:
+    """
+    Like convert_file_to_images, but yields (base64_image, mime_type) page by
+    page as soon as each is rendered instead of building the whole list.
+    """
     if max_pages is None:
         max_pages = MAX_PAGES_FOR_VISION
 
@@ -111,65 +126,56 @@ def convert_file_to_images(file_data: str, file_type: str, max_pages: int = None
         file_type_lower = file_type.lower()
 
         if 'pdf' in file_type_lower:
-            return _pdf_to_images(file_bytes, max_pages)
+            yield from _pdf_to_images(file_bytes, max_pages)
         elif 'word' in file_type_lower or 'docx' in file_type_lower or file_type_lower.endswith('.docx'):
-            return _docx_to_images(file_bytes, max_pages)
+            yield from _docx_to_images(file_bytes, max_pages)
         elif any(img_type in file_type_lower for img_type in ['image', 'png', 'jpg', 'jpeg', 'gif', 'webp']):
             # Already an image, just return it
             mime = 'image/png' if 'png' in file_type_lower else 'image/jpeg'
-            return [(encoded, mime)]
+            yield (encoded, mime)
         else:
             logger.warning(f"Unsupported file type for image conversion: {file_type}")
-            return []
 
     except Exception as e:
         logger.error(f"Error converting file to images: {e}")
-        return []
-
-
-def _pdf_to_images(file_bytes: io.BytesIO, max_pages: int) -> List[Tuple[str, str]]:
-    """
-    Convert PDF pages to images using PyMuPDF (fitz).
 
-    Returns list of (base64_image, mime_type) tuples.
-    """
-    images = []
 
+async def aiter_file_images(file_data: str, file_type: str, max_pages: int = None) -> AsyncIterator[Tuple[str, str]]:
+    """Async wrapper over iter_file_images; each page is awaited off the event loop"""
+    pages = iter_file_images(file_data, file_type, max_pages)
+    done = object()
     try:
-        import fitz  # PyMuPDF
-
-        # Open PDF from bytes
-        pdf_document = fitz.open(stream=file_bytes.read(), filetype="pdf")
-        total_pages = len(pdf_document)
-        pages_to_convert = min(total_pages, max_pages)
-
-        logger.info(f"Converting {pages_to_convert}/{total_pages} PDF pages to images")
-
-        for page_num in range(pages_to_convert):
-            page = pdf_document[page_num]
-
-            # Render page to image (2x zoom for better quality)
-            mat = fitz.Matrix(2.0, 2.0)
-            pix = page.get_pixmap(matrix=mat)
+        while True:
+            page = await asyncio.to_thread(next, pages, done)
+            if page is done:
+                break
+            yield page
+    finally:
+        await asyncio.to_thread(pages.close)
 
-            # Convert to PNG bytes
-            img_bytes = pix.tobytes("png")
-            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
 
-            images.append((img_base64, "image/png"))
-            logger.debug(f"Converted PDF page {page_num + 1}/{pages_to_convert}")
+def _pdf_to_images(file_bytes: io.BytesIO, max_pages: int, digest: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Render PDF pages to PNG with PyMuPDF (fitz) via the document renderer:
+    pages render in parallel worker processes and are cached by document
+    hash. `digest` keys the cache when the PDF was converted from a DOCX.
 
-        pdf_document.close()
-        logger.info(f"Successfully converted {len(images)} PDF pages to images")
-        return images
+    Yields (base64_image, mime_type) tuples in page order.
+    """
+    count = 0
+    try:
+        file_bytes.seek(0)
+        for png in get_document_renderer().iter_pdf_pages(file_bytes.read(), max_pages, digest=digest):
+            count += 1
+            yield (base64.b64encode(png).decode('utf-8'), "image/png")
+        logger.info(f"Successfully converted {count} PDF pages to images")
 
     except ImportError:
         logger.error("PyMuPDF (fitz) is not installed. Install with: pip install PyMuPDF")
         # Fallback: try pdf2image
-        return _pdf_to_images_fallback(file_bytes, max_pages)
+        yield from _pdf_to_images_fallback(file_bytes, max_pages)
     except Exception as e:
-        logger.error(f"PDF to image conversion error: {e}")
-        return []
+        logger.error(f"PDF to image conversion error after {count} page(s): {e}")
 
 
 def _pdf_to_images_fallback(file_bytes: io.BytesIO, max_pages: int) -> List[Tuple[str, str]]:
@@ -214,74 +220,51 @@ def _pdf_to_images_fallback(file_bytes: io.BytesIO, max_pages: int) -> List[Tupl
         return []
 
 
-def _docx_to_images(file_bytes: io.BytesIO, max_pages: int) -> List[Tuple[str, str]]:
+def _docx_to_images(file_bytes: io.BytesIO, max_pages: int) -> Iterator[Tuple[str, str]]:
     """
     Convert DOCX to images.
 
     Strategy:
-    1. Try to convert DOCX to PDF using LibreOffice (if available)
+    1. Convert DOCX to PDF with the warm LibreOffice listener (if available)
     2. Then convert PDF pages to images
     3. Fallback: Extract text and create a simple image representation
     """
-    images = []
-
     try:
-        import subprocess
-        import shutil
-
-        # Check if LibreOffice is available
-        libreoffice_path = shutil.which('libreoffice') or shutil.which('soffice')
-
-        if libreoffice_path:
-            return _docx_to_images_via_libreoffice(file_bytes, max_pages, libreoffice_path)
-        else:
-            logger.warning("LibreOffice not found, using text-based fallback for DOCX")
-            return _docx_to_images_fallback(file_bytes, max_pages)
-
+        file_bytes.seek(0)
+        docx_data = file_bytes.read()
+        pdf_data = _docx_to_pdf_via_libreoffice(docx_data)
     except Exception as e:
         logger.error(f"DOCX to image conversion error: {e}")
-        return _docx_to_images_fallback(file_bytes, max_pages)
+        pdf_data = None
 
+    if pdf_data is None:
+        yield from _docx_to_images_fallback(file_bytes, max_pages)
+        return
 
-def _docx_to_images_via_libreoffice(file_bytes: io.BytesIO, max_pages: int, libreoffice_path: str) -> List[Tuple[str, str]]:
+    # Pages are cached under the DOCX's own hash, so a repeat skips conversion too
+    yield from _pdf_to_images(io.BytesIO(pdf_data), max_pages, digest=document_hash(docx_data))
+
+
+def _docx_to_pdf_via_libreoffice(docx_data: bytes) -> Optional[bytes]:
     """
-    Convert DOCX to images using LibreOffice.
+    Convert DOCX to PDF using LibreOffice, cached by document hash.
+
+    Returns None when LibreOffice is not installed.
     """
     import subprocess
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Save DOCX to temp file
-        docx_path = os.path.join(temp_dir, "document.docx")
-        with open(docx_path, 'wb') as f:
-            file_bytes.seek(0)
-            f.write(file_bytes.read())
-
-        # Convert DOCX to PDF using LibreOffice
-        try:
-            subprocess.run(
-                [libreoffice_path, '--headless', '--convert-to', 'pdf', '--outdir', temp_dir, docx_path],
-                capture_output=True,
-                timeout=60,
-                check=True
-            )
-        except subprocess.TimeoutExpired:
-            logger.error("LibreOffice conversion timed out")
-            return _docx_to_images_fallback(file_bytes, max_pages)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"LibreOffice conversion failed: {e}")
-            return _docx_to_images_fallback(file_bytes, max_pages)
-
-        # Find the generated PDF
-        pdf_path = os.path.join(temp_dir, "document.pdf")
-        if not os.path.exists(pdf_path):
-            logger.error("LibreOffice did not generate PDF")
-            return _docx_to_images_fallback(file_bytes, max_pages)
-
-        # Convert PDF to images
-        with open(pdf_path, 'rb') as f:
-            pdf_bytes = io.BytesIO(f.read())
+    try:
+        pdf_data = get_document_renderer().docx_to_pdf(docx_data)
+    except subprocess.TimeoutExpired:
+        logger.error("LibreOffice conversion timed out")
+        return None
+    except Exception as e:
+        logger.error(f"LibreOffice conversion failed: {e}")
+        return None
 
-        return _pdf_to_images(pdf_bytes, max_pages)
+    if pdf_data is None:
+        logger.warning("LibreOffice not found, using text-based fallback for DOCX")
+    return pdf_data
 
 
 def _docx_to_images_fallback(file_bytes: io.BytesIO, max_pages: int) -> List[Tuple[str, str]]:
@@ -0,0 +1,402 @@
+"""
+Image ingest stage for vision chat
+
+Uploaded images are decoded, downscaled to what the vision model can use,
+re-encoded to whichever of PNG/JPEG is smaller, and stored content-addressed
+in IMAGES_DIR together with a small WebP thumbnail for chat history. The work
+runs on a dedicated thread pool (Pillow releases the GIL while decoding,
+resizing and encoding), never on the event loop.
+
+Results are cached per (session, content hash), so an image re-sent later in
+the same session is returned as-is instead of being processed again.
+
+The model payload stays PNG/JPEG: llama.cpp-based Ollama models decode images
+with stb_image, which has no WebP support.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("VISION_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_MAX_SIDE = int(os.getenv("VISION_IMAGE_MAX_SIDE", "1536"))
+JPEG_QUALITY = int(os.getenv("VISION_IMAGE_JPEG_QUALITY", "88"))
+THUMBNAIL_SIDE = int(os.getenv("VISION_THUMBNAIL_SIDE", "256"))
+CACHE_MB = int(os.getenv("VISION_INGEST_CACHE_MB", "64"))
+
+# Largest side worth sending, by model family (prefix match on the Ollama name).
+# Anything bigger is downscaled by the model's own preprocessor anyway.
+MODEL_MAX_SIDE = {
+    "llava": 672,
+    "bakllava": 672,
+    "moondream": 756,
+    "llama3.2-vision": 1120,
+    "minicpm-v": 1344,
+}
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8", "jpg", "image/jpeg"),
+    (b"GIF8", "gif", "image/gif"),
+    (b"RIFF", "webp", "image/webp"),
+)
+
+
+@dataclass
+class IngestedImage:
+    digest: str
+    data_b64: str
+    mime: str
+    url: str
+    thumbnail_url: Optional[str]
+    width: int
+    height: int
+    original_bytes: int
+    processed_bytes: int
+    elapsed_ms: float
+    resized: bool = False
+    deduped: bool = False
+
+
+def max_side_for_model(model: Optional[str]) -> int:
+    name = (model or "").lower()
+    for prefix, side in MODEL_MAX_SIDE.items():
+        if name.startswith(prefix):
+            return min(side, DEFAULT_MAX_SIDE)
+    return DEFAULT_MAX_SIDE
+
+
+def decode_image_payload(payload: str) -> bytes:
+    """Base64 (raw or data-URI) to bytes"""
+    if "," in payload:
+        payload = payload.split(",", 1)[1]
+    payload = payload.strip().replace("\n", "").replace("\r", "").replace(" ", "")
+    return base64.b64decode(payload)
+
+
+def sniff_format(data: bytes) -> Tuple[str, str]:
+    """(extension, mime) from magic bytes"""
+    for magic, ext, mime in _MAGIC:
+        if data.startswith(magic):
+            return ext, mime
+    return "img", "application/octet-stream"
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """RGB with any transparency composited onto white"""
+    if img.mode == "P":
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    if img.mode in ("RGBA", "LA"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+
+def preprocess_image(
+    raw: bytes,
+    max_side: int = DEFAULT_MAX_SIDE,
+    jpeg_quality: int = JPEG_QUALITY,
+    thumbnail_side: int = THUMBNAIL_SIDE,
+) -> Dict[str, Any]:
+    """
+    Downscale and re-encode one image.
+
+    Returns the smallest of the original (when it is already PNG/JPEG, upright
+    and within max_side), a PNG and a JPEG encoding, plus a WebP thumbnail.
+    PNG is only tried for lossless sources; it never beats JPEG on photos.
+    """
+    with Image.open(io.BytesIO(raw)) as img:
+        source_format = img.format
+        width, height = img.size
+        oriented = img.getexif().get(0x0112, 1) not in (0, 1)
+        resized = max(width, height) > max_side
+        if source_format == "JPEG" and resized:
+            # Let libjpeg decode at a reduced scale instead of full resolution
+            scale = max_side / max(width, height)
+            img.draft("RGB", (int(width * scale) + 1, int(height * scale) + 1))
+        img = ImageOps.exif_transpose(img)
+        img = _flatten(img)
+
+    if resized:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    candidates: List[Tuple[bytes, str, str]] = []
+    if not resized and not oriented and source_format in ("PNG", "JPEG"):
+        ext, mime = sniff_format(raw)
+        candidates.append((raw, ext, mime))
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=jpeg_quality, optimize=True)
+    candidates.append((out.getvalue(), "jpg", "image/jpeg"))
+
+    if source_format != "JPEG":
+        out = io.BytesIO()
+        img.save(out, format="PNG", compress_level=6)
+        candidates.append((out.getvalue(), "png", "image/png"))
+
+    data, ext, mime = min(candidates, key=lambda c: len(c[0]))
+
+    thumbnail = None
+    if thumbnail_side:
+        thumb = img.copy()
+        thumb.thumbnail((thumbnail_side, thumbnail_side), Image.LANCZOS)
+        out = io.BytesIO()
+        thumb.save(out, format="WEBP", quality=70)
+        thumbnail = out.getvalue()
+
+    return {
+        "data": data,
+        "ext": ext,
+        "mime": mime,
+        "width": img.width,
+        "height": img.height,
+        "resized": resized,
+        "thumbnail": thumbnail,
+    }
+
+
+class ImageIngestor:
+    """Thread-pool image preprocessing with a per-session content-hash cache"""
+
+    def __init__(
+        self,
+        images_dir: str,
+        workers: int = INGEST_WORKERS,
+        jpeg_quality: int = JPEG_QUALITY,
+        thumbnail_side: int = THUMBNAIL_SIDE,
+        cache_bytes: int = CACHE_MB * 1024 * 1024,
+    ):
+        self.images_dir = images_dir
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_side = thumbnail_side
+        self.cache_bytes = cache_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="image-ingest")
+        self.workers = max(1, workers)
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[tuple, IngestedImage]" = OrderedDict()
+        self._cached_bytes = 0
+        self._inflight: Dict[tuple, Future] = {}
+
+        self.stats = {
+            "images": 0,
+            "processed": 0,
+            "deduped": 0,
+            "failed": 0,
+            "resized": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+        self._process_ms: Deque[float] = deque(maxlen=500)
+
+    async def ingest(
+        self, images: List[str], session_id: Optional[str] = None, model: Optional[str] = None
+    ) -> List[IngestedImage]:
+        """
+        Preprocess base64 images concurrently, in input order.
+
+        Images that cannot be decoded are logged and left out. Without a
+        session id, duplicates are only collapsed within this call.
+        """
+        scope = session_id or f"request-{uuid.uuid4()}"
+        max_side = max_side_for_model(model)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, self._ingest_one, img, scope, max_side) for img in images),
+            return_exceptions=True,
+        )
+
+        ingested = []
+        for idx, result in enumerate(results):
+            if isinstance(result, BaseException):
+                with self._lock:
+                    self.stats["failed"] += 1
+                logger.error(f"🖼️ Image {idx + 1}: ingest failed: {result}")
+            else:
+                ingested.append(result)
+        return ingested
+
+    def _ingest_one(self, payload: str, scope: str, max_side: int) -> IngestedImage:
+        started = time.perf_counter()
+        try:
+            raw = decode_image_payload(payload)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"invalid base64 image data: {e}")
+        if not raw:
+            raise ValueError("empty image")
+
+        digest = hashlib.sha256(raw).hexdigest()
+        key = (scope, digest, max_side)
+        owner = False
+        with self._lock:
+            self.stats["images"] += 1
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["deduped"] += 1
+                return replace(cached, deduped=True, elapsed_ms=(time.perf_counter() - started) * 1000)
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+
+        if not owner:
+            # Same image twice in flight: wait for the first one
+            result = pending.result()
+            with self._lock:
+                self.stats["deduped"] += 1
+            return replace(result, deduped=True, elapsed_ms=(time.perf_counter() - started) * 1000)
+
+        try:
+            result = self._process(raw, digest, max_side, started)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        pending.set_result(result)
+        self._remember(key, result)
+        return result
+
+    def _process(self, raw: bytes, digest: str, max_side: int, started: float) -> IngestedImage:
+        name = f"{digest[:32]}_{max_side}"
+        thumbnail_url = None
+        try:
+            out = preprocess_image(raw, max_side, self.jpeg_quality, self.thumbnail_side)
+        except Exception as e:
+            # Not something Pillow can read; pass the original through untouched
+            logger.warning(f"🖼️ Image {digest[:12]}: preprocessing failed ({e}), sending original")
+            ext, mime = sniff_format(raw)
+            out = {"data": raw, "ext": ext, "mime": mime, "width": 0, "height": 0,
+                   "resized": False, "thumbnail": None}
+
+        filename = f"{name}.{out['ext']}"
+        self._store(filename, out["data"])
+        if out["thumbnail"]:
+            thumb_name = f"{name}_thumb.webp"
+            self._store(thumb_name, out["thumbnail"])
+            thumbnail_url = f"/api/images/{thumb_name}"
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats["processed"] += 1
+            self.stats["resized"] += int(out["resized"])
+            self.stats["bytes_in"] += len(raw)
+            self.stats["bytes_out"] += len(out["data"])
+            self._process_ms.append(elapsed_ms)
+
+        return IngestedImage(
+            digest=digest,
+            data_b64=base64.b64encode(out["data"]).decode("ascii"),
+            mime=out["mime"],
+            url=f"/api/images/{filename}",
+            thumbnail_url=thumbnail_url,
+            width=out["width"],
+            height=out["height"],
+            original_bytes=len(raw),
+            processed_bytes=len(out["data"]),
+            elapsed_ms=elapsed_ms,
+            resized=out["resized"],
+        )
+
+    def _store(self, filename: str, data: bytes):
+        """Content-addressed write; an existing file is already the same bytes"""
+        path = os.path.join(self.images_dir, filename)
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _remember(self, key: tuple, result: IngestedImage):
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = result
+            self._cached_bytes += len(result.data_b64)
+            while self._cached_bytes > self.cache_bytes and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted.data_b64)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = sorted(self._process_ms)
+            stats = dict(self.stats)
+            cache = {"entries": len(self._cache), "bytes": self._cached_bytes, "max_bytes": self.cache_bytes}
+        return {
+            "workers": self.workers,
+            **stats,
+            "bytes_saved": stats["bytes_in"] - stats["bytes_out"],
+            "cache": cache,
+            "process_ms": {
+                "count": len(timings),
+                "p50": round(statistics.median(timings), 1) if timings else 0.0,
+                "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1) if timings else 0.0,
+            },
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def summarize(images: List[IngestedImage], elapsed_ms: float) -> Dict[str, Any]:
+    """Per-request numbers for the vision response and logs"""
+    fresh = [img for img in images if not img.deduped]
+    bytes_in = sum(img.original_bytes for img in fresh)
+    bytes_out = sum(img.processed_bytes for img in fresh)
+    return {
+        "images": len(images),
+        "deduped": len(images) - len(fresh),
+        "resized": sum(1 for img in fresh if img.resized),
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "bytes_saved": bytes_in - bytes_out,
+        "preprocess_ms": round(elapsed_ms, 1),
+    }
+
+
+_ingestor: Optional[ImageIngestor] = None
+_ingestor_lock = threading.Lock()
+
+
+def get_image_ingestor(images_dir: str) -> ImageIngestor:
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = ImageIngestor(images_dir)
+        return _ingestor
+
+
+def get_ingest_stats() -> Dict[str, Any]:
+    with _ingestor_lock:
+        ingestor = _ingestor
+    return ingestor.get_stats() if ingestor else {"workers": 0, "images": 0}
+
+
+def shutdown_image_ingestor():
+    global _ingestor
+    with _ingestor_lock:
+        ingestor, _ingestor = _ingestor, None
+    if ingestor:
+        ingestor.close()
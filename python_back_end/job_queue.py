@@ -41,6 +41,14 @@ class Job:
         """Mark job as failed"""
         pass
 
+    async def release(self):
+        """Put the job back in the queue without using up an attempt"""
+        pass
+
+    async def touch(self):
+        """Heartbeat for long-running handlers (see JobQueue.requeue_stale)"""
+        pass
+
 
 class JobQueue:
     """
@@ -73,6 +81,9 @@ class JobQueue:
         # Cancel all worker tasks
         for task in self._worker_tasks:
             task.cancel()
+        # Let in-flight handlers record their outcome before the pool goes away
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
 
         if self.pool:
             await self.pool.close()
@@ -225,6 +236,8 @@ class JobQueue:
                     # Bind done/fail methods
                     job.done = lambda result=None: self._complete_job(job.id, result)
                     job.fail = lambda error=None: self._fail_job(job.id, error)
+                    job.release = lambda: self._release_job(job.id)
+                    job.touch = lambda: self._touch_job(job.id)
 
                     return job
 
@@ -315,6 +328,57 @@ class JobQueue:
 
                 logger.error(f"❌ Job failed permanently: {job_id} - {error}")
 
+    async def _release_job(self, job_id: str):
+        """Requeue an interrupted job; fetch counted an attempt, so give it back"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"""
+                UPDATE {self.schema}.job
+                SET state = 'retry',
+                    updated_at = NOW(),
+                    start_after = NOW(),
+                    retry_count = GREATEST(retry_count - 1, 0)
+                WHERE id = $1 AND state = 'active'
+            """,
+                job_id,
+            )
+
+        logger.info(f"↩️ Job released back to the queue: {job_id}")
+
+    async def _touch_job(self, job_id: str):
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"UPDATE {self.schema}.job SET updated_at = NOW() WHERE id = $1 AND state = 'active'",
+                job_id,
+            )
+
+    async def requeue_stale(self, name: str, stale_after_s: float) -> List[Dict[str, Any]]:
+        """
+        Hand out again active jobs of a queue whose handler stopped calling
+        touch() (its process died). Only for queues whose handlers heartbeat.
+
+        Returns the requeued jobs' ids and data
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"""
+                UPDATE {self.schema}.job
+                SET state = 'retry',
+                    updated_at = NOW(),
+                    start_after = NOW()
+                WHERE name = $1
+                  AND state = 'active'
+                  AND updated_at < NOW() - make_interval(secs => $2)
+                RETURNING id, data
+            """,
+                name,
+                float(stale_after_s),
+            )
+
+        for row in rows:
+            logger.warning(f"🔄 Stale job requeued: {row['id']} ({name})")
+        return [{"id": str(row["id"]), "data": json.loads(row["data"]) if row["data"] else {}} for row in rows]
+
     def work(self, name: str, handler: Callable[[Job], Any]):
         """
         Register a worker handler for a queue
@@ -16,6 +16,7 @@ from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 import uvicorn, os, sys, tempfile, uuid, base64, io, logging, re, requests, random, json, httpx
+import mimetypes
 from PIL import Image
 
 # Import optimized auth module
@@ -58,9 +59,19 @@ from vibecoding import (
     containers_router,
 )
 from vibecoding.core import initialize_vibe_agent
+from image_ingest import (
+    get_image_ingestor,
+    get_ingest_stats,
+    shutdown_image_ingestor,
+    summarize as summarize_ingest,
+)
+from document_renderer import get_renderer_stats, shutdown_document_renderer
+from ollama_runner import get_ollama_runner, get_ollama_runner_stats, shutdown_ollama_runner
+from tts_cache import get_tts_cache_stats
 from file_processing import (
     extract_text_from_file,
     convert_file_to_images,
+    aiter_file_images,
     is_vision_compatible_file,
 )
 
@@ -88,8 +99,12 @@ artifact_storage = ArtifactStorage()
 artifact_build_manager = None
 
 from pydantic import BaseModel
-import torch, soundfile as sf
-import whisper  # Import Whisper
+from ml_runtime import lazy_import, get_ml_status
+
+# The ML stack loads on first use (see ml_runtime); whisper/TTS models are
+# built by model_manager on the first request that needs them
+torch = lazy_import("torch")
+sf = lazy_import("soundfile")
 
 # ─── Authentication Setup ──────────────────────────────────────────────────────
 SECRET_KEY = os.getenv("JWT_SECRET", "key")
@@ -193,6 +208,7 @@ async def get_user_api_key(
 # Images storage directory (mounted via PVC in K8s)
 IMAGES_DIR = os.getenv("IMAGES_DIR", "/app/images")
 os.makedirs(IMAGES_DIR, exist_ok=True)
+mimetypes.add_type("image/webp", ".webp")
 print(f"Images directory: {IMAGES_DIR}")
 security = HTTPBearer(auto_error=False)
 
@@ -479,7 +495,8 @@ HARVIS_VOICE_PATH = os.path.abspath(
 )  # Point to the file in project root
 
 # ─── Database Connection Pool -------------------------------------------------
-
+db_pool = None
+chat_history_manager = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -501,9 +518,20 @@ async def lifespan(app: FastAPI):
 
         # Initialize ChatHistoryManager
         db_pool = app.state.pg_pool
-        chat_history_manager = ChatHistoryManager(db_pool)
+        chat_history_manager = ChatHistoryManager(
+            db_pool,
+            write_behind=os.getenv("CHAT_HISTORY_WRITE_BEHIND", "false").lower()
+            == "true",
+            flush_interval=float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL_MS", "50"))
+            / 1000,
+            max_batch=int(os.getenv("CHAT_HISTORY_MAX_BATCH", "100")),
+        )
         logger.info("✅ ChatHistoryManager initialized")
 
+        # Vibe file tree queries share the app pool
+        from vibecoding.files import init_files_db
+        await init_files_db(db_pool)
+
         # Initialize ArtifactBuildManager for website/app builds
         global artifact_build_manager
         try:
@@ -606,12 +634,47 @@ async def lifespan(app: FastAPI):
         logger.warning(f"⚠️ Job queue initialization failed: {e}")
         # Don't fail startup if job queue doesn't work
 
+    # OpenClaw bridge: with the pool, task/event history is persisted and
+    # jobs queued before a restart are scheduled again
+    try:
+        from plugins.openclaw.bridge import bridge as openclaw_bridge
+
+        await openclaw_bridge.start(db_pool=getattr(app.state, "pg_pool", None))
+    except Exception as e:
+        logger.warning(f"⚠️ OpenClaw bridge startup failed: {e}")
+
     yield
 
-    # Shutdown: close connection pool
-    if hasattr(app.state, "pg_pool"):
-        await app.state.pg_pool.close()
-        logger.info("✅ Database connection pool closed")
+    # Shutdown: flush buffered chat history before the pool goes away
+    if chat_history_manager is not None:
+        try:
+            await chat_history_manager.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Chat history flush error: {e}")
+
+    # Stop the build queue before the pool closes; it holds a LISTEN connection
+    if artifact_build_manager is not None:
+        try:
+            await artifact_build_manager.stop()
+        except Exception as e:
+            logger.warning(f"⚠️ Build manager shutdown error: {e}")
+
+    # Stop the OpenClaw bridge; it flushes buffered jobs and events to the pool
+    try:
+        from plugins.openclaw.bridge import bridge as openclaw_bridge
+
+        await openclaw_bridge.stop()
+    except Exception as e:
+        logger.warning(f"⚠️ OpenClaw bridge shutdown error: {e}")
+
+    # Stop the RAG stale-job sweep, then the job queue; cancelled RAG jobs are
+    # requeued through the app pool, so both go before it closes
+    try:
+        from rag_corpus.routes import shutdown_rag_worker
+
+        await shutdown_rag_worker()
+    except Exception as e:
+        logger.warning(f"⚠️ RAG worker shutdown error: {e}")
 
     # Shutdown job queue
     try:
@@ -622,6 +685,44 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ Job queue shutdown error: {e}")
 
+    # Shutdown: close connection pool
+    if hasattr(app.state, "pg_pool"):
+        await app.state.pg_pool.close()
+        logger.info("✅ Database connection pool closed")
+
+    # Shutdown warm document sandboxes
+    try:
+        from artifacts.sandbox_pool import shutdown_sandbox_pools
+
+        await asyncio.to_thread(shutdown_sandbox_pools)
+    except Exception as e:
+        logger.warning(f"⚠️ Sandbox pool shutdown error: {e}")
+
+    # Remove warm vibecoding runner containers
+    try:
+        from vibecoding.runner_pool import shutdown_runner_pool
+
+        await asyncio.to_thread(shutdown_runner_pool)
+    except Exception as e:
+        logger.warning(f"⚠️ Runner pool shutdown error: {e}")
+
+    # Close the research fetch client, its event loop thread and the extraction pool
+    try:
+        from research.extract.fetcher import shutdown_fetch_service
+
+        await asyncio.to_thread(shutdown_fetch_service)
+    except Exception as e:
+        logger.warning(f"⚠️ Fetch service shutdown error: {e}")
+
+    # Stop the vision image ingest workers
+    shutdown_image_ingestor()
+
+    # Stop document render workers and the LibreOffice listener
+    await asyncio.to_thread(shutdown_document_renderer)
+
+    # Close the shared Ollama client used for heartbeat-wrapped chat calls
+    await shutdown_ollama_runner()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -826,11 +927,6 @@ if RAG_CORPUS_AVAILABLE:
 # Include artifacts router
 app.include_router(artifact_router)
 
-# ─── Device & models -----------------------------------------------------------
-device = 0 if torch.cuda.is_available() else -1
-logger.info("Using device: %s", "cuda" if device == 0 else "cpu")
-
-
 # ─── Config --------------------------------------------------------------------
 
 LOCAL_OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
@@ -930,19 +1026,10 @@ MAX_RESPONSE_SIZE = int(
 )  # Default 100k chars (~20k words)
 
 
-async def stream_ollama_chunks(endpoint, payload, timeout=3600):
-    """
-    Stream chunks from Ollama using async httpx.
-    Replaces the threading/queue implementation for better stability.
-    """
-    import httpx
-
-    # Routing logic
+def _ollama_target(endpoint, payload):
+    """Resolve the URL and headers for an async Ollama call (external models vs local)"""
     model_name = payload.get("model", "")
-    is_external_model = model_name in EXTERNAL_MODELS_CACHE
-
-    # Determine URL and headers
-    if is_external_model and EXTERNAL_OLLAMA_URL and EXTERNAL_OLLAMA_API_KEY:
+    if model_name in EXTERNAL_MODELS_CACHE and EXTERNAL_OLLAMA_URL and EXTERNAL_OLLAMA_API_KEY:
         url = f"{EXTERNAL_OLLAMA_URL}{endpoint}"
         headers = {
             "Authorization": f"Bearer {EXTERNAL_OLLAMA_API_KEY}",
@@ -955,6 +1042,17 @@ async def stream_ollama_chunks(endpoint, payload, timeout=3600):
         url = f"{LOCAL_OLLAMA_URL}{endpoint}"
         headers = {}
         logger.info(f"🏠 Using local Ollama: {url}")
+    return url, headers
+
+
+async def stream_ollama_chunks(endpoint, payload, timeout=3600):
+    """
+    Stream chunks from Ollama using async httpx.
+    Replaces the threading/queue implementation for better stability.
+    """
+    import httpx
+
+    url, headers = _ollama_target(endpoint, payload)
 
     try:
         # Increase timeout for connection and reading
@@ -986,60 +1084,20 @@ async def stream_ollama_chunks(endpoint, payload, timeout=3600):
 
 async def run_ollama_with_heartbeats(endpoint: str, payload: dict, timeout: int = 3600):
     """
-    Run an Ollama request in a background thread while yielding heartbeats.
+    Run an Ollama request on the shared runner while yielding heartbeats.
     This prevents Zen browser (and others) from killing the connection due to idle timeout.
 
+    The reply is streamed from Ollama and reassembled, so the result answers
+    status_code/text/json() like a non-streaming response. Stopping iteration
+    early (client disconnected) cancels the generation.
+
     Yields:
         dict: Either a heartbeat event or the final result
     """
-    import asyncio
-    import concurrent.futures
-
-    # Create a thread pool executor for the blocking Ollama request
-    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-
-    # Submit the Ollama request to run in a thread
-    loop = asyncio.get_event_loop()
-    future = loop.run_in_executor(
-        executor, make_ollama_request, endpoint, payload, timeout
-    )
-
-    heartbeat_count = 0
-    start_time = asyncio.get_event_loop().time()
-
-    while True:
-        try:
-            # Wait for the result with a timeout of HEARTBEAT_INTERVAL seconds
-            result = await asyncio.wait_for(
-                asyncio.shield(future), timeout=HEARTBEAT_INTERVAL
-            )
-
-            # Got the result - return it
-            elapsed = asyncio.get_event_loop().time() - start_time
-            logger.info(
-                f"💓 Ollama completed after {elapsed:.1f}s ({heartbeat_count} heartbeats sent)"
-            )
-
-            yield {"type": "result", "data": result}
-            executor.shutdown(wait=False)
-            return
-
-        except asyncio.TimeoutError:
-            # Heartbeat time - send a keepalive
-            heartbeat_count += 1
-            elapsed = asyncio.get_event_loop().time() - start_time
-            logger.info(f"💓 Heartbeat #{heartbeat_count} ({elapsed:.1f}s elapsed)")
-
-            yield {
-                "type": "heartbeat",
-                "count": heartbeat_count,
-                "elapsed": round(elapsed, 1),
-            }
-
-        except Exception as e:
-            logger.error(f"❌ Ollama request failed: {e}")
-            executor.shutdown(wait=False)
-            raise
+    url, headers = _ollama_target(endpoint, payload)
+    runner = get_ollama_runner()
+    async for event in runner.run(url, payload, headers=headers, timeout=timeout):
+        yield event
 
 
 async def run_stt_with_heartbeats(audio_path: str):
@@ -1403,6 +1461,18 @@ async def health_check():
     return {"status": "healthy", "timestamp": time.time()}
 
 
+@app.get("/ready", tags=["health"])
+async def readiness_check():
+    """Readiness probe: serving now; reports which ML modules/models are loaded"""
+    return {"status": "ready", "timestamp": time.time(), **get_ml_status()}
+
+
+@app.get("/api/ollama/runner/stats", tags=["health"])
+async def ollama_runner_stats():
+    """Shared Ollama runner: in-flight/queued generations, cancellations, latency"""
+    return get_ollama_runner_stats()
+
+
 # ─── Chat History Endpoints ───────────────────────────────────────────────────────
 @app.post(
     "/api/chat-history/sessions", response_model=ChatSession, tags=["chat-history"]
@@ -2051,6 +2121,42 @@ async def get_local_rag_context(query: str, max_length: int = None) -> str:
         return ""
 
 
+async def save_chat_exchange(user_id: int, session_id, model: str, user_content: str,
+                             assistant_content: str, **kwargs):
+    """
+    Persist a user/assistant turn, starting a new session when session_id is
+    missing, malformed or not the user's. Returns (session_id, assistant_message).
+    """
+    if session_id:
+        try:
+            _, asst_msg = await chat_history_manager.add_exchange(
+                user_id=user_id,
+                session_id=UUID(str(session_id)),
+                user_content=user_content,
+                assistant_content=assistant_content,
+                model_used=model,
+                wait=False,
+                **kwargs,
+            )
+            return session_id, asst_msg
+        except (SessionNotFoundError, ValueError):
+            logger.info(f"Session {session_id} not found for user {user_id}, starting a new one")
+
+    session = await chat_history_manager.create_session(
+        user_id=user_id, title="New Chat", model_used=model
+    )
+    _, asst_msg = await chat_history_manager.add_exchange(
+        user_id=user_id,
+        session_id=session.id,
+        user_content=user_content,
+        assistant_content=assistant_content,
+        model_used=model,
+        wait=False,
+        **kwargs,
+    )
+    return session.id, asst_msg
+
+
 @app.post("/api/chat", tags=["chat"])
 async def chat(
     req: ChatRequest,
@@ -2096,8 +2202,10 @@ async def chat(
                         logger.info(
                             f"Extracting text from attachment: {file_name} ({file_type})"
                         )
-                        extracted = extract_text_from_file(
-                            file_data, file_name if not file_type else file_type
+                        extracted = await asyncio.to_thread(
+                            extract_text_from_file,
+                            file_data,
+                            file_name if not file_type else file_type,
                         )
                         if extracted:
                             attachment_text.append(
@@ -2180,41 +2288,7 @@ async def chat(
                             "session_id": req.session_id,
                         }
 
-                        # Handle session creation if needed (e.g. first message)
-                        saved_session_id = req.session_id
                         try:
-                            # If we have a session ID, verify it
-                            if saved_session_id:
-                                try:
-                                    from uuid import UUID
-
-                                    if isinstance(saved_session_id, str):
-                                        # Just check if it's valid, we don't need the object here
-                                        UUID(saved_session_id)
-                                except ValueError:
-                                    saved_session_id = None
-
-                            # Create new session if needed
-                            if not saved_session_id:
-                                session = await chat_history_manager.create_session(
-                                    user_id=current_user.id,
-                                    title="New Chat",
-                                    model_used=req.model,
-                                )
-                                saved_session_id = str(session.id)
-                                # Update response data with new session ID
-                                response_data["session_id"] = saved_session_id
-
-                            # Save user message
-                            await chat_history_manager.add_message(
-                                user_id=current_user.id,
-                                session_id=saved_session_id,
-                                role="user",
-                                content=current_message_content,
-                                model_used=req.model,
-                                input_type="text",
-                            )
-
                             # Prepare metadata with sources and videos
                             research_metadata = {
                                 "sources": sources[:5] if sources else [],
@@ -2222,16 +2296,17 @@ async def chat(
                                 "auto_researched": True,
                             }
 
-                            # Save assistant message with metadata
-                            asst_msg = await chat_history_manager.add_message(
+                            # Save user + assistant messages (write-behind)
+                            saved_session_id, asst_msg = await save_chat_exchange(
                                 user_id=current_user.id,
-                                session_id=saved_session_id,
-                                role="assistant",
-                                content=analysis,
-                                model_used=req.model,
-                                input_type="text",
-                                metadata=research_metadata,
+                                session_id=req.session_id,
+                                model=req.model,
+                                user_content=current_message_content,
+                                assistant_content=analysis,
+                                assistant_metadata=research_metadata,
                             )
+                            saved_session_id = str(saved_session_id)
+                            response_data["session_id"] = saved_session_id
                             # Add message ID to response data
                             response_data["message_id"] = asst_msg.id
                             logger.info(
@@ -3109,76 +3184,25 @@ async def chat(
                     f"📝 Artifact has code: {bool(artifact_info.get('code'))}, code length: {len(artifact_info.get('code', ''))}"
                 )
 
-            if session_id:
-                try:
-                    session = await chat_history_manager.get_session(
-                        session_id, current_user.id
-                    )
-                    if not session:
-                        session = await chat_history_manager.create_session(
-                            user_id=current_user.id,
-                            title="New Chat",
-                            model_used=req.model,
-                        )
-                        session_id = session.id
-
-                    await chat_history_manager.add_message(
-                        user_id=current_user.id,
-                        session_id=session_id,
-                        role="user",
-                        content=current_message_content,
-                        model_used=req.model,
-                        input_type="text",
-                    )
-                    asst_msg = await chat_history_manager.add_message(
-                        user_id=current_user.id,
-                        session_id=session_id,
-                        role="assistant",
-                        content=final_answer,
-                        reasoning=reasoning_content if reasoning_content else None,
-                        model_used=req.model,
-                        input_type="text",
-                        metadata=msg_metadata,
-                    )
-                    message_id = asst_msg.id
-                    logger.info(
-                        f"💾 Saved chat messages to session {session_id} (msg_id: {message_id})"
-                    )
-                except Exception as e:
-                    logger.error(f"Error saving chat history: {e}")
-                    message_id = None
-            else:
-                try:
-                    session = await chat_history_manager.create_session(
-                        user_id=current_user.id, title="New Chat", model_used=req.model
-                    )
-                    session_id = session.id
-                    await chat_history_manager.add_message(
-                        user_id=current_user.id,
-                        session_id=session_id,
-                        role="user",
-                        content=current_message_content,
-                        model_used=req.model,
-                        input_type="text",
-                    )
-                    asst_msg = await chat_history_manager.add_message(
-                        user_id=current_user.id,
-                        session_id=session_id,
-                        role="assistant",
-                        content=final_answer,
-                        reasoning=reasoning_content if reasoning_content else None,
-                        model_used=req.model,
-                        input_type="text",
-                        metadata=msg_metadata,
-                    )
-                    message_id = asst_msg.id
-                    logger.info(
-                        f"💾 Created new session {session_id} and saved messages (msg_id: {message_id})"
-                    )
-                except Exception as e:
-                    logger.error(f"Error creating session and saving history: {e}")
-                    session_id = None
-                    message_id = None
+            try:
+                had_session = bool(session_id)
+                session_id, asst_msg = await save_chat_exchange(
+                    user_id=current_user.id,
+                    session_id=session_id,
+                    model=req.model,
+                    user_content=current_message_content,
+                    assistant_content=final_answer,
+                    reasoning=reasoning_content if reasoning_content else None,
+                    assistant_metadata=msg_metadata,
+                )
+                message_id = asst_msg.id
+                logger.info(
+                    f"💾 Saved chat messages to {'session' if had_session else 'new session'} "
+                    f"{session_id} (msg_id: {message_id})"
+                )
+            except Exception as e:
+                logger.error(f"Error saving chat history: {e}")
+                message_id = None
 
             new_history = history + [{"role": "assistant", "content": final_answer}]
 
@@ -3251,99 +3275,31 @@ async def vision_chat(
             # Extract base64 data from images and ensure proper format
             yield f"data: {json.dumps({'status': 'processing', 'detail': 'Processing images...'})}\n\n"
             processed_images = []
+            processed_mimes = []
             saved_image_paths = []  # Track saved image file paths
-            for idx, img in enumerate(req.images):
-                try:
-                    logger.info(
-                        f"🖼️ Processing image {idx + 1}/{len(req.images)} - Input length: {len(img)}"
-                    )
-
-                    if "," in img:
-                        header, data = img.split(",", 1)
-                        logger.info(
-                            f"🖼️ Image {idx + 1}: Found data URI header: {header[:50]}..."
-                        )
-                        img_data = data
-                    else:
-                        logger.info(f"🖼️ Image {idx + 1}: No data URI header found")
-                        img_data = img
-
-                    img_data = (
-                        img_data.strip()
-                        .replace("\n", "")
-                        .replace("\r", "")
-                        .replace(" ", "")
-                    )
-
-                    try:
-                        decoded = base64.b64decode(img_data)
-                        logger.info(
-                            f"🖼️ Image {idx + 1}: Valid base64, decoded size: {len(decoded)} bytes"
-                        )
-
-                        if len(decoded) > 8:
-                            if decoded[:8] == b"\x89PNG\r\n\x1a\n":
-                                logger.info(f"🖼️ Image {idx + 1}: PNG format detected")
-                            elif decoded[:2] == b"\xff\xd8":
-                                logger.info(f"🖼️ Image {idx + 1}: JPEG format detected")
-                            elif decoded[:4] == b"GIF8":
-                                logger.info(
-                                    f"🖼️ Image {idx + 1}: GIF format detected - Converting to PNG"
-                                )
-                            elif decoded[:4] == b"RIFF":
-                                logger.info(
-                                    f"🖼️ Image {idx + 1}: WEBP format detected - Converting to PNG"
-                                )
-                            else:
-                                logger.warning(
-                                    f"🖼️ Image {idx + 1}: Unknown format, first bytes: {decoded[:10].hex()} - Attempting conversion"
-                                )
-                        else:
-                            logger.warning(
-                                f"🖼️ Image {idx + 1}: Data too short to check magic bytes"
-                            )
-
-                        try:
-                            image_io = io.BytesIO(decoded)
-                            with Image.open(image_io) as pil_img:
-                                if pil_img.mode in ("RGBA", "P"):
-                                    pil_img = pil_img.convert("RGB")
-                                output_io = io.BytesIO()
-                                pil_img.save(output_io, format="PNG")
-                                decoded = output_io.getvalue()
-                                logger.info(
-                                    f"🖼️ Image {idx + 1}: Converted to PNG, new size: {len(decoded)} bytes"
-                                )
-                        except Exception as pil_err:
-                            logger.error(
-                                f"🖼️ Image {idx + 1}: Pillow conversion failed: {pil_err} - Sending original"
-                            )
-
-                        clean_b64 = base64.b64encode(decoded).decode("utf-8")
-                        processed_images.append(clean_b64)
-
-                        # Save image to disk for persistence
-                        try:
-                            image_filename = f"{uuid.uuid4()}.png"
-                            image_path = os.path.join(IMAGES_DIR, image_filename)
-                            with open(image_path, "wb") as img_file:
-                                img_file.write(decoded)
-                            saved_image_paths.append(f"/api/images/{image_filename}")
-                            logger.info(f"🖼️ Image {idx + 1}: Saved to {image_path}")
-                        except Exception as save_err:
-                            logger.error(
-                                f"🖼️ Image {idx + 1}: Failed to save to disk: {save_err}"
-                            )
-
-                    except Exception as decode_err:
-                        logger.error(
-                            f"🖼️ Image {idx + 1}: Failed to decode base64: {decode_err}"
-                        )
-                        processed_images.append(img_data)
-
-                except Exception as img_err:
-                    logger.error(f"🖼️ Error processing image {idx + 1}: {img_err}")
-                    continue
+            saved_thumbnails = []
+            image_stats = None
+            if req.images:
+                # Decode, downscale, re-encode and store off the event loop;
+                # images already seen in this session come from the cache
+                ingest_started = time.perf_counter()
+                ingested = await get_image_ingestor(IMAGES_DIR).ingest(
+                    req.images, session_id=req.session_id, model=req.model
+                )
+                image_stats = summarize_ingest(
+                    ingested, (time.perf_counter() - ingest_started) * 1000
+                )
+                for image in ingested:
+                    processed_images.append(image.data_b64)
+                    processed_mimes.append(image.mime)
+                    saved_image_paths.append(image.url)
+                    if image.thumbnail_url:
+                        saved_thumbnails.append(image.thumbnail_url)
+                logger.info(
+                    f"🖼️ Ingested {image_stats['images']} image(s) in {image_stats['preprocess_ms']}ms - "
+                    f"{image_stats['bytes_in']} -> {image_stats['bytes_out']} bytes, "
+                    f"{image_stats['deduped']} deduped, {image_stats['resized']} resized"
+                )
 
             # NEW: Process document files (PDF, DOCX) and convert to images
             if req.files:
@@ -3370,15 +3326,20 @@ async def vision_chat(
                         )
                         yield f"data: {json.dumps({'status': 'processing', 'detail': f'Converting {file_name}...'})}\n\n"
 
-                        # Convert file to images
-                        file_images = convert_file_to_images(file_data, file_type)
+                        # Convert file to images; pages stream in as they render
+                        page_count = 0
+                        async for img_base64, mime_type in aiter_file_images(
+                            file_data, file_type
+                        ):
+                            page_count += 1
+                            processed_images.append(img_base64)
+                            processed_mimes.append(mime_type)
+                            yield f"data: {json.dumps({'status': 'processing', 'detail': f'Rendered page {page_count} of {file_name}'})}\n\n"
 
-                        if file_images:
+                        if page_count:
                             logger.info(
-                                f"📄 {file_name}: Converted to {len(file_images)} images"
+                                f"📄 {file_name}: Converted to {page_count} images"
                             )
-                            for img_base64, mime_type in file_images:
-                                processed_images.append(img_base64)
                         else:
                             logger.warning(
                                 f"📄 {file_name}: No images generated from conversion"
@@ -3427,12 +3388,12 @@ async def vision_chat(
 
                     # Format messages for Moonshot vision (OpenAI-compatible format)
                     content = [{"type": "text", "text": req.message}]
-                    for img_b64 in processed_images:
+                    for img_b64, mime_type in zip(processed_images, processed_mimes):
                         content.append(
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{img_b64}"
+                                    "url": f"data:{mime_type};base64,{img_b64}"
                                 },
                             }
                         )
@@ -3604,6 +3565,8 @@ async def vision_chat(
                 if saved_image_paths:
                     metadata["images"] = saved_image_paths
                     metadata["image_count"] = len(saved_image_paths)
+                if saved_thumbnails:
+                    metadata["thumbnails"] = saved_thumbnails
 
                 await chat_history_manager.add_message(
                     user_id=current_user.id,
@@ -3678,6 +3641,9 @@ async def vision_chat(
                 "session_id": session_id,
             }
 
+            if image_stats:
+                response_data["image_stats"] = image_stats
+
             if reasoning_content:
                 response_data["reasoning"] = reasoning_content
 
@@ -3723,7 +3689,25 @@ async def serve_image(
     full_path = os.path.join(IMAGES_DIR, filename)
     if not os.path.exists(full_path):
         raise HTTPException(404, f"Image file not found: {filename}")
-    return FileResponse(full_path, media_type="image/png")
+    # Older uploads are all .png; ingested ones may be .jpg or _thumb.webp
+    media_type = mimetypes.guess_type(filename)[0] or "image/png"
+    return FileResponse(
+        full_path,
+        media_type=media_type,
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
+
+
+@app.get("/api/vision/ingest/stats", tags=["vision"])
+async def vision_ingest_stats():
+    """Image preprocessing counters: bytes saved, dedup hits, timings"""
+    return get_ingest_stats()
+
+
+@app.get("/api/vision/documents/stats", tags=["vision"])
+async def vision_document_stats():
+    """Document render cache hits, pages rendered and LibreOffice state"""
+    return get_renderer_stats()
 
 
 @app.post("/api/analyze-screen", tags=["vision"])
@@ -5293,6 +5277,12 @@ async def synthesize_speech(req: SynthesizeSpeechRequest):
         raise HTTPException(500, str(e)) from e
 
 
+@app.get("/api/tts/cache/stats", tags=["tts"])
+async def tts_cache_stats():
+    """Per-sentence TTS audio cache: hit rate, synthesis time saved, size and evictions"""
+    return get_tts_cache_stats()
+
+
 @app.get("/api/tts-engines", tags=["tts"])
 async def get_tts_engines():
     """
@@ -5471,6 +5461,14 @@ async def research_stats():
         except Exception:
             cache_stats = {"error": "Cache stats unavailable"}
 
+        # Tiered search/extraction/map-summary cache hit rates
+        try:
+            from research.cache.research_cache import get_research_cache_stats
+
+            cache_stats["research_cache"] = get_research_cache_stats()
+        except Exception:
+            cache_stats["research_cache"] = {"error": "Research cache stats unavailable"}
+
         # System info
         import psutil
 
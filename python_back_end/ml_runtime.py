@@ -0,0 +1,197 @@
+"""
+Lazy loading for the heavy ML stack
+
+torch, whisper, transformers and the TTS packages cost seconds of import time
+and hundreds of MB of RSS. Importing them at module level made every worker
+pay that before it could answer a health check, including workers that never
+touch speech or vision. Modules bind a ``LazyModule`` instead, so the import
+happens on first attribute access, and model loaders are wrapped with
+``single_init`` so concurrent first requests build a model exactly once.
+
+``get_ml_status()`` backs the /ready endpoint: which modules are imported,
+which models are resident, how long each took, and the process RSS.
+"""
+
+import functools
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Only underscore attributes live on the proxy itself, so anything else
+    (``torch.cuda``, ``sf.write``) is forwarded to the real module.
+    """
+
+    _OWN = ("_name", "_module", "_lock", "_load_s", "_error")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+        self._load_s: Optional[float] = None
+        self._error: Optional[str] = None
+
+    def _load(self):
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                try:
+                    self._module = importlib.import_module(self._name)
+                except Exception as e:
+                    self._error = str(e)
+                    raise
+                self._load_s = time.perf_counter() - started
+                self._error = None
+                logger.info(f"📦 Imported {self._name} on first use ({self._load_s:.2f}s)")
+            return self._module
+
+    @property
+    def _loaded(self) -> bool:
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr in self._OWN or (attr.startswith("__") and attr.endswith("__")):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+class _ModelState:
+    def __init__(self, name: str, probe: Callable[[], bool]):
+        self.name = name
+        self.probe = probe
+        self.lock = threading.RLock()
+        self.loads = 0
+        self.failures = 0
+        self.last_load_s: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def is_loaded(self) -> bool:
+        try:
+            return bool(self.probe())
+        except Exception:
+            return False
+
+
+_modules: Dict[str, LazyModule] = {}
+_models: Dict[str, _ModelState] = {}
+_registry_lock = threading.Lock()
+_started_at = time.time()
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Shared lazy proxy for ``name``; one per module across the process"""
+    with _registry_lock:
+        module = _modules.get(name)
+        if module is None:
+            module = _modules[name] = LazyModule(name)
+        return module
+
+
+def single_init(name: str, probe: Callable[[], bool]):
+    """
+    Serialize a model loader so concurrent callers build the model once.
+
+    ``probe`` reports whether the model is resident. The loaders already
+    return early when their global is set, so holding a per-model lock
+    around the call is enough: the second caller waits for the first load
+    and then takes the early return.
+    """
+    with _registry_lock:
+        state = _models.get(name)
+        if state is None:
+            state = _models[name] = _ModelState(name, probe)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with state.lock:
+                if state.is_loaded():
+                    return fn(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    state.failures += 1
+                    state.last_error = str(e)
+                    raise
+                if state.is_loaded():
+                    state.loads += 1
+                    state.last_load_s = time.perf_counter() - started
+                    state.last_error = None
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MiB (Linux), else peak RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+        except Exception:
+            return None
+
+
+def get_ml_status() -> Dict[str, Any]:
+    """Which ML modules are imported and which models are resident"""
+    with _registry_lock:
+        modules = dict(_modules)
+        models = dict(_models)
+
+    status = {
+        "uptime_s": round(time.time() - _started_at, 1),
+        "rss_mb": round(current_rss_mb() or 0, 1),
+        "modules": {
+            name: {
+                "loaded": module._loaded,
+                "import_s": round(module._load_s, 3) if module._load_s is not None else None,
+                "error": module._error,
+            }
+            for name, module in sorted(modules.items())
+        },
+        "models": {
+            name: {
+                "loaded": state.is_loaded(),
+                "loads": state.loads,
+                "failures": state.failures,
+                "last_load_s": round(state.last_load_s, 3) if state.last_load_s is not None else None,
+                "last_error": state.last_error,
+            }
+            for name, state in sorted(models.items())
+        },
+    }
+
+    # Only report CUDA when torch is already imported; asking would load it
+    torch = modules.get("torch")
+    if torch is not None and torch._loaded:
+        try:
+            status["cuda_available"] = bool(torch.cuda.is_available())
+        except Exception:
+            status["cuda_available"] = False
+    return status
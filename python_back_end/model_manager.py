@@ -7,12 +7,16 @@ when running in text_only mode. This prevents unnecessary memory usage.
 """
 
 import os
-import torch
 import logging
 import time
 import gc
 from typing import Optional
 
+from ml_runtime import lazy_import, single_init
+
+# torch is imported on first use so importing this module stays cheap
+torch = lazy_import("torch")
+
 logger = logging.getLogger(__name__)
 
 # ─── Lazy TTS Import ─────────────────────────────────────────────────────────
@@ -144,13 +148,18 @@ def get_vram_threshold():
     return max(int(total_mem * 0.8), 10 * 1024**3)
 
 
-THRESHOLD_BYTES = get_vram_threshold()
-logger.info(f"VRAM threshold set to {THRESHOLD_BYTES / 1024**3:.1f} GiB")
+THRESHOLD_BYTES = None  # Computed on first use; asking CUDA imports torch
 
 
-def wait_for_vram(threshold=THRESHOLD_BYTES, interval=0.5):
+def wait_for_vram(threshold=None, interval=0.5):
+    global THRESHOLD_BYTES
     if not torch.cuda.is_available():
         return
+    if threshold is None:
+        if THRESHOLD_BYTES is None:
+            THRESHOLD_BYTES = get_vram_threshold()
+            logger.info(f"VRAM threshold set to {THRESHOLD_BYTES / 1024**3:.1f} GiB")
+        threshold = THRESHOLD_BYTES
     used = torch.cuda.memory_allocated()
     while used > threshold:
         logger.info(
@@ -311,6 +320,7 @@ def auto_cleanup_if_needed(threshold_percent=75):
 
 
 # ─── Model Loading Functions ────────────────────────────────────────────────
+@single_init("chatterbox_tts", lambda: tts_model is not None)
 def load_tts_model(force_cpu=False):
     """Load TTS model with memory management.
 
@@ -582,6 +592,7 @@ def load_tts_model(force_cpu=False):
     return tts_model
 
 
+@single_init("whisper", lambda: whisper_model is not None)
 def load_whisper_model():
     """Load Whisper model with memory management.
 
@@ -998,6 +1009,7 @@ def unload_models():
 
 
 # ─── Qwen TTS Loading/Unloading ──────────────────────────────────────────────
+@single_init("qwen_tts", lambda: qwen_tts_model is not None)
 def load_qwen_tts_model(force_cpu=False, use_1_7b=False):
     """Load Qwen TTS (OuteTTS) model with memory management.
 
@@ -1236,68 +1248,85 @@ def generate_speech(
     """
     from chatterbox.tts import punc_norm
     import numpy as np
+    from tts_cache import get_tts_cache
 
-    if model is None:
-        model = load_tts_model()
+    def render(chunk):
+        nonlocal model
+        if model is None:
+            model = load_tts_model()
+
+        if torch.cuda.is_available():
+            try:
+                logger.info(f"🔊 TTS on CUDA: temp={temperature}, cfg={cfg_weight}")
+                chunk_wav = model.generate(
+                    chunk,
+                    audio_prompt_path=audio_prompt,
+                    exaggeration=exaggeration,
+                    temperature=temperature,
+                    cfg_weight=cfg_weight,
+                )
+                logger.info(f"✅ Chunk generated, shape: {chunk_wav.shape}")
+            except RuntimeError as e:
+                if "CUDA" in str(e):
+                    logger.error(f"CUDA Error on chunk: {e}")
+                    torch.cuda.empty_cache()
+                    try:
+                        chunk_wav = model.generate(
+                            chunk,
+                            audio_prompt_path=audio_prompt,
+                            exaggeration=exaggeration,
+                            temperature=temperature,
+                            cfg_weight=cfg_weight,
+                        )
+                    except RuntimeError as e2:
+                        logger.error(f"CUDA Retry Failed on chunk: {e2}")
+                        raise ValueError(
+                            "CUDA error persisted after cache clear"
+                        ) from e2
+                else:
+                    raise
+        else:
+            chunk_wav = model.generate(
+                chunk,
+                audio_prompt_path=audio_prompt,
+                exaggeration=exaggeration,
+                temperature=temperature,
+                cfg_weight=cfg_weight,
+                device="cpu",
+            )
+
+        return model.sr, chunk_wav.squeeze(0).numpy()
 
     try:
         logger.info(f"🎙️ Generating speech for text (length: {len(text)} chars)")
         logger.info(
             f"🔧 TTS params: temp={temperature}, cfg={cfg_weight}, exag={exaggeration}"
         )
+
+        # Per-sentence audio cache: only sentences never spoken before are synthesized,
+        # and the model is not even loaded when every sentence is cached
+        cache = get_tts_cache()
+        if cache is not None:
+            return cache.synthesize(
+                text,
+                lambda sentence: render(punc_norm(sentence)),
+                **_chatterbox_cache_spec(audio_prompt, exaggeration, temperature, cfg_weight),
+            )
+
         normalized = punc_norm(text)
         logger.info(f"📝 Normalized text: {normalized[:100]}...")
 
         # Chunk long texts to prevent hallucination
         chunks = chunk_text_for_tts(normalized, max_chars=500)
         all_wavs = []
+        sample_rate = None
 
         for i, chunk in enumerate(chunks):
             logger.info(
                 f"🔊 Generating chunk {i + 1}/{len(chunks)} ({len(chunk)} chars)"
             )
-
-            if torch.cuda.is_available():
-                try:
-                    logger.info(f"🔊 TTS on CUDA: temp={temperature}, cfg={cfg_weight}")
-                    chunk_wav = model.generate(
-                        chunk,
-                        audio_prompt_path=audio_prompt,
-                        exaggeration=exaggeration,
-                        temperature=temperature,
-                        cfg_weight=cfg_weight,
-                    )
-                    logger.info(f"✅ Chunk {i + 1} generated, shape: {chunk_wav.shape}")
-                except RuntimeError as e:
-                    if "CUDA" in str(e):
-                        logger.error(f"CUDA Error on chunk {i + 1}: {e}")
-                        torch.cuda.empty_cache()
-                        try:
-                            chunk_wav = model.generate(
-                                chunk,
-                                audio_prompt_path=audio_prompt,
-                                exaggeration=exaggeration,
-                                temperature=temperature,
-                                cfg_weight=cfg_weight,
-                            )
-                        except RuntimeError as e2:
-                            logger.error(f"CUDA Retry Failed on chunk {i + 1}: {e2}")
-                            raise ValueError(
-                                "CUDA error persisted after cache clear"
-                            ) from e2
-                    else:
-                        raise
-            else:
-                chunk_wav = model.generate(
-                    chunk,
-                    audio_prompt_path=audio_prompt,
-                    exaggeration=exaggeration,
-                    temperature=temperature,
-                    cfg_weight=cfg_weight,
-                    device="cpu",
-                )
-
-            all_wavs.append(chunk_wav.squeeze(0).numpy())
+            sample_rate, chunk_wav = render(chunk)
+            all_wavs.append(chunk_wav)
 
         # Concatenate all chunks
         if len(all_wavs) > 1:
@@ -1308,12 +1337,21 @@ def generate_speech(
         else:
             wav = all_wavs[0]
 
-        return (model.sr, wav)
+        return (sample_rate, wav)
     except Exception as e:
         logger.error(f"TTS Error: {e}")
         raise
 
 
+def _chatterbox_cache_spec(audio_prompt, exaggeration, temperature, cfg_weight) -> dict:
+    """TTS cache key fields for Chatterbox; shared by generate_speech and the unified pre-check"""
+    return {
+        "engine": "chatterbox",
+        "voice": audio_prompt,
+        "params": {"exaggeration": exaggeration, "temperature": temperature, "cfg_weight": cfg_weight},
+    }
+
+
 # ─── VRAM-Optimized Sequential Model Functions ─────────────────────────────
 def diagnose_whisper_issues():
     """Quick diagnostic to identify Whisper loading issues"""
@@ -1657,6 +1695,12 @@ def generate_speech_unified(
     logger.info(f"🔊 Generating speech with {engine} TTS for: {text[:50]}...")
 
     try:
+        # Fully cached replies are served without loading (or unloading) any model
+        cached = _lookup_cached_speech(text, engine, audio_prompt, exaggeration, temperature, cfg_weight)
+        if cached is not None:
+            logger.info(f"✅ {engine} TTS served from cache")
+            return cached
+
         if engine == "chatterbox":
             # Use existing Chatterbox generation
             return generate_speech_optimized(
@@ -1713,6 +1757,27 @@ def generate_speech_unified(
         return None, None
 
 
+def _lookup_cached_speech(text, engine, audio_prompt, exaggeration, temperature, cfg_weight):
+    """Audio for text if every sentence is in the TTS cache, else None"""
+    from tts_cache import get_tts_cache
+
+    cache = get_tts_cache()
+    if cache is None:
+        return None
+    if engine == "chatterbox":
+        spec = _chatterbox_cache_spec(audio_prompt, exaggeration, temperature, cfg_weight)
+    elif engine == "qwen":
+        qwen_tts = _lazy_import_qwen_tts()
+        if qwen_tts is None:
+            return None
+        spec = qwen_tts.qwen_cache_spec(
+            ref_audio=audio_prompt, temperature=max(0.1, min(temperature, 1.0)), repetition_penalty=1.1
+        )
+    else:
+        return None
+    return cache.lookup(text, **spec)
+
+
 def unload_all_tts_models():
     """Unload all TTS models (both Chatterbox and Qwen)"""
     logger.info("🗑️ Unloading ALL TTS models")
@@ -0,0 +1,306 @@
+"""
+Shared runner for Ollama calls that need SSE heartbeats
+
+Chat endpoints used to start a ThreadPoolExecutor per request just to run a
+blocking `requests.post` while they emitted keepalive heartbeats. Under many
+concurrent chats that meant one OS thread per conversation. This runner keeps
+everything on the event loop instead: one pooled httpx client for the
+process, a semaphore bounding how many generations are in flight, Ollama's
+native NDJSON stream read as it arrives, and heartbeats interleaved on a
+timer. When the client disconnects the consumer stops iterating, the request
+task is cancelled and closing the stream tells Ollama to stop generating.
+
+The final event carries an `OllamaResult` that answers `status_code`,
+`text` and `json()` like the `requests.Response` callers used before, with
+the streamed chunks folded back into a single non-streaming reply.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "32"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "60"))
+# Generations hold a connection for seconds, so reconnecting is cheap next to
+# them; a small idle pool also keeps httpcore's per-release sweep (quadratic in
+# idle connections) from dominating when a burst of chats finishes together.
+OLLAMA_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_KEEPALIVE_CONNECTIONS", "8"))
+HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "10"))
+
+
+class OllamaResult:
+    """Response-shaped result of a streamed Ollama call"""
+
+    def __init__(self, status_code: int, data: Optional[Dict[str, Any]] = None, text: Optional[str] = None):
+        self.status_code = status_code
+        self._data = data
+        self._text = text
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self._data) if self._data is not None else ""
+        return self._text
+
+    def json(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = json.loads(self._text or "{}")
+        return self._data
+
+
+class _StreamAssembler:
+    """Folds /api/chat or /api/generate NDJSON chunks into one reply"""
+
+    def __init__(self):
+        self.content: List[str] = []
+        self.thinking: List[str] = []
+        self.tool_calls: List[Any] = []
+        self.last: Dict[str, Any] = {}
+        self.role = "assistant"
+        self.is_chat = False
+        self.chunks = 0
+
+    def add(self, chunk: Dict[str, Any]):
+        self.chunks += 1
+        message = chunk.get("message")
+        if message is not None:
+            self.is_chat = True
+            self.role = message.get("role") or self.role
+            if message.get("content"):
+                self.content.append(message["content"])
+            if message.get("thinking"):
+                self.thinking.append(message["thinking"])
+            if message.get("tool_calls"):
+                self.tool_calls.extend(message["tool_calls"])
+        elif chunk.get("response"):
+            self.content.append(chunk["response"])
+        if chunk.get("thinking") and message is None:
+            self.thinking.append(chunk["thinking"])
+        self.last = chunk
+
+    def result(self) -> OllamaResult:
+        data = dict(self.last)
+        if "error" in data:
+            return OllamaResult(500, data=data)
+        text = "".join(self.content)
+        if self.is_chat:
+            message = {"role": self.role, "content": text}
+            if self.thinking:
+                message["thinking"] = "".join(self.thinking)
+            if self.tool_calls:
+                message["tool_calls"] = self.tool_calls
+            data["message"] = message
+        else:
+            data["response"] = text
+            if self.thinking:
+                data["thinking"] = "".join(self.thinking)
+        return OllamaResult(200, data=data)
+
+
+class OllamaRunner:
+    """
+    Process-wide, bounded runner for heartbeat-wrapped Ollama calls.
+    Use `get_ollama_runner()` rather than constructing one per request.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = OLLAMA_MAX_CONCURRENCY,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.heartbeat_interval = heartbeat_interval
+        self.connect_timeout = connect_timeout
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._latencies: Deque[float] = deque(maxlen=2000)
+
+        self.stats = {
+            "requests": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "heartbeats": 0,
+            "in_flight": 0,
+            "queued": 0,
+            "peak_in_flight": 0,
+        }
+
+    async def run(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 3600,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield `{"type": "heartbeat", ...}` every `heartbeat_interval` seconds
+        until the reply is complete, then one `{"type": "result", "data": OllamaResult}`.
+        Transport errors are raised to the consumer; closing the generator
+        early cancels the request.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        task = asyncio.create_task(self._request(url, payload, headers, timeout))
+        heartbeat_count = 0
+        self.stats["requests"] += 1
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                elapsed = loop.time() - started
+                if done:
+                    result = task.result()
+                    logger.info(
+                        f"💓 Ollama completed after {elapsed:.1f}s ({heartbeat_count} heartbeats sent)"
+                    )
+                    yield {"type": "result", "data": result}
+                    return
+
+                heartbeat_count += 1
+                self.stats["heartbeats"] += 1
+                logger.debug(f"💓 Heartbeat #{heartbeat_count} ({elapsed:.1f}s elapsed)")
+                yield {
+                    "type": "heartbeat",
+                    "count": heartbeat_count,
+                    "elapsed": round(elapsed, 1),
+                }
+        finally:
+            if not task.done():
+                # Consumer went away (client disconnect or generator closed)
+                task.cancel()
+                self.stats["cancelled"] += 1
+                try:
+                    await task
+                except BaseException:
+                    pass
+                logger.info(f"🛑 Ollama request cancelled after {loop.time() - started:.1f}s")
+
+    async def _request(
+        self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]], timeout: float
+    ) -> OllamaResult:
+        client = self._ensure_client()
+        self.stats["queued"] += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.stats["queued"] -= 1
+
+        self.stats["in_flight"] += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+        started = time.perf_counter()
+        try:
+            # Always stream from Ollama; the reply is reassembled below
+            body = {**payload, "stream": True}
+            request_timeout = httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout))
+            async with client.stream("POST", url, json=body, headers=headers, timeout=request_timeout) as response:
+                if response.status_code != 200:
+                    error = (await response.aread()).decode("utf-8", errors="ignore")
+                    logger.error(f"❌ Ollama returned status {response.status_code}: {error[:200]}")
+                    self.stats["failed"] += 1
+                    return OllamaResult(response.status_code, text=error)
+
+                assembler = _StreamAssembler()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        assembler.add(json.loads(line))
+
+            result = assembler.result()
+            if result.ok:
+                self.stats["completed"] += 1
+                self._latencies.append(time.perf_counter() - started)
+            else:
+                self.stats["failed"] += 1
+            return result
+        except asyncio.CancelledError:
+            raise
+        except httpx.ReadTimeout:
+            self.stats["failed"] += 1
+            logger.error(f"❌ Ollama read timeout after {timeout}s")
+            raise Exception("Ollama generation timed out")
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"❌ Ollama request failed: {e}")
+            raise
+        finally:
+            self.stats["in_flight"] -= 1
+            self._slots.release()
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(3600, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=min(self.max_concurrency, OLLAMA_KEEPALIVE_CONNECTIONS),
+                ),
+                transport=self._transport,
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else 0.0
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "heartbeat_interval": self.heartbeat_interval,
+            **self.stats,
+            "latency_ms": {
+                "count": len(latencies),
+                "p50": round(statistics.median(latencies) * 1000, 1) if latencies else 0.0,
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+            },
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_runner: Optional[OllamaRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_ollama_runner() -> OllamaRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = OllamaRunner()
+        return _runner
+
+
+def get_ollama_runner_stats() -> Dict[str, Any]:
+    with _runner_lock:
+        runner = _runner
+    return runner.get_stats() if runner else {"max_concurrency": OLLAMA_MAX_CONCURRENCY, "requests": 0}
+
+
+async def shutdown_ollama_runner():
+    global _runner
+    with _runner_lock:
+        runner, _runner = _runner, None
+    if runner:
+        await runner.close()
@@ -208,6 +208,8 @@ class ScreenshotCapturedPayload(BaseModel):
     width: int
     height: int
     taken_at: datetime
+    kind: str = "key"  # "key" or "delta" (patch against the previous keyframe)
+    bytes: Optional[int] = None
 
 
 # =============================================================================
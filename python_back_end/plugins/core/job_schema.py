@@ -91,6 +91,7 @@ class Job(BaseModel):
     # Execution context
     vm_id: Optional[str] = None
     policy_profile: str = "default"
+    priority: int = 0  # Higher runs first
 
     # Status
     status: JobStatus = JobStatus.PENDING
@@ -154,6 +155,7 @@ class CreateJobRequest(BaseModel):
     vm_id: Optional[str] = None
     policy_profile: str = "default"
     max_runtime_minutes: int = Field(default=30, ge=1, le=120)
+    priority: int = Field(default=0, ge=0, le=10)
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
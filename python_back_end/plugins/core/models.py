@@ -207,7 +207,11 @@ CREATE TABLE IF NOT EXISTS openclaw_tasks (
     completed_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     policy_profile VARCHAR(50) DEFAULT 'default',
-    max_runtime_minutes INTEGER DEFAULT 30
+    max_runtime_minutes INTEGER DEFAULT 30,
+    vm_id VARCHAR(255),
+    priority INTEGER DEFAULT 0,
+    job JSONB,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
 -- OpenClaw events (for real-time streaming)
@@ -260,8 +264,10 @@ CREATE INDEX IF NOT EXISTS idx_openclaw_instances_user_id ON openclaw_instances(
 CREATE INDEX IF NOT EXISTS idx_openclaw_tasks_instance_id ON openclaw_tasks(instance_id);
 CREATE INDEX IF NOT EXISTS idx_openclaw_tasks_session_id ON openclaw_tasks(session_id);
 CREATE INDEX IF NOT EXISTS idx_openclaw_tasks_user_id ON openclaw_tasks(user_id);
+CREATE INDEX IF NOT EXISTS idx_openclaw_tasks_status ON openclaw_tasks(status);
 CREATE INDEX IF NOT EXISTS idx_openclaw_events_task_id ON openclaw_events(task_id);
 CREATE INDEX IF NOT EXISTS idx_openclaw_events_created_at ON openclaw_events(created_at);
+CREATE INDEX IF NOT EXISTS idx_openclaw_events_task_created ON openclaw_events(task_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_screenshots_task_id ON screenshots(task_id);
 CREATE INDEX IF NOT EXISTS idx_approval_gates_task_id ON approval_gates(task_id);
 CREATE INDEX IF NOT EXISTS idx_approval_gates_status ON approval_gates(status);
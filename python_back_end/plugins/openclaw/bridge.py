@@ -6,23 +6,52 @@ Implements the "phone-home" pattern where VMs connect outbound to Harvis.
 """
 
 import asyncio
+import heapq
+import itertools
 import json
 import logging
-from typing import Dict, Optional, Callable, Set
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Callable, Set, Tuple
 from datetime import datetime
 from fastapi import WebSocket, WebSocketDisconnect
 
 from ..core.events import Event, EventType, create_event
 from ..core.job_schema import Job, JobStatus
+from .screenshots import ScreenshotPipeline, get_screenshot_pipeline, shutdown_screenshot_pipeline
+from .store import OpenClawEventStore
 
 logger = logging.getLogger(__name__)
 
+# Tasks a VM runs at once unless it advertises its own limit when connecting
+VM_CONCURRENCY = int(os.getenv("OPENCLAW_VM_CONCURRENCY", "1"))
+MAX_VM_CONCURRENCY = int(os.getenv("OPENCLAW_MAX_VM_CONCURRENCY", "8"))
+MAX_QUEUED_JOBS = int(os.getenv("OPENCLAW_MAX_QUEUED_JOBS", "1000"))
+# Finished jobs kept in memory; older ones are served from the database
+MAX_FINISHED_JOBS = int(os.getenv("OPENCLAW_MAX_FINISHED_JOBS", "500"))
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("OPENCLAW_SUBSCRIBER_QUEUE", "256"))
+SUBSCRIBER_SEND_TIMEOUT = float(os.getenv("OPENCLAW_SUBSCRIBER_SEND_TIMEOUT", "10"))
+
+EVENT_FLUSH_INTERVAL = int(os.getenv("OPENCLAW_EVENT_FLUSH_MS", "200")) / 1000
+EVENT_MAX_BATCH = int(os.getenv("OPENCLAW_EVENT_MAX_BATCH", "500"))
+
+# Only the newest pending message of these types matters to a client
+LATEST_ONLY_EVENTS = {EventType.VIDEO_FRAME}
+# Output a lagging client can lose without missing a state change
+LOSSY_EVENTS = {EventType.LOG, EventType.STDOUT, EventType.STDERR, EventType.VIDEO_FRAME}
+
 
 class VMConnection:
     """Represents a connected VM instance."""
 
     def __init__(
-        self, instance_id: str, websocket: WebSocket, bridge_token: str, user_id: int
+        self,
+        instance_id: str,
+        websocket: WebSocket,
+        bridge_token: str,
+        user_id: int,
+        max_concurrency: Optional[int] = None,
     ):
         self.instance_id = instance_id
         self.websocket = websocket
@@ -32,8 +61,26 @@ class VMConnection:
         self.last_ping = datetime.utcnow()
         self.status = "online"
         self.current_task_id: Optional[str] = None
+        self.running: Set[str] = set()
+        self.max_concurrency = max(
+            1, min(max_concurrency or VM_CONCURRENCY, MAX_VM_CONCURRENCY)
+        )
         self.message_handlers: Dict[str, Callable] = {}
 
+    @property
+    def load(self) -> float:
+        """Fraction of task slots in use."""
+        return len(self.running) / self.max_concurrency
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.status in ("online", "busy") and len(self.running) < self.max_concurrency
+
+    def update_status(self):
+        """Reflect slot usage in the online/busy status."""
+        if self.status in ("online", "busy"):
+            self.status = "busy" if len(self.running) >= self.max_concurrency else "online"
+
     async def send(self, message: dict):
         """Send a message to the VM."""
         try:
@@ -56,12 +103,123 @@ class VMConnection:
 
     def is_alive(self) -> bool:
         """Check if connection is still alive."""
-        if self.status != "online":
+        if self.status not in ("online", "busy"):
             return False
         # Timeout after 60 seconds without ping
         return (datetime.utcnow() - self.last_ping).total_seconds() < 60
 
 
+class EventSubscriber:
+    """
+    A client WebSocket with its own bounded send queue.
+
+    Broadcasting only appends to the queue; a per-subscriber task does the
+    actual sends, so a slow browser falls behind on its own instead of
+    stalling delivery to everyone else. When the queue is full, pending
+    frames are coalesced and log output is shed; a client that cannot keep up
+    with lifecycle events is disconnected and can resubscribe for a fresh
+    ``initial_state``.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_pending: int = SUBSCRIBER_QUEUE_SIZE,
+        send_timeout: float = SUBSCRIBER_SEND_TIMEOUT,
+        on_close: Optional[Callable[["EventSubscriber"], None]] = None,
+    ):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._pending: Deque[Tuple[Optional[EventType], dict]] = deque()
+        self._sending_since: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def offer(self, message: dict, event_type: Optional[EventType] = None) -> bool:
+        """Queue a message without waiting. Returns False once the subscriber is gone."""
+        if self.closed:
+            return False
+
+        # A send that has hung this long means the client is gone or stalled
+        if (
+            self._sending_since is not None
+            and asyncio.get_running_loop().time() - self._sending_since > self.send_timeout
+        ):
+            logger.warning("Dropping OpenClaw subscriber with a stalled send")
+            self.close()
+            return False
+
+        if event_type in LATEST_ONLY_EVENTS:
+            for i, (kind, _) in enumerate(self._pending):
+                if kind == event_type:
+                    self._pending[i] = (event_type, message)
+                    self.coalesced += 1
+                    return True
+
+        if len(self._pending) >= self.max_pending:
+            victim = next(
+                (i for i, (kind, _) in enumerate(self._pending) if kind in LOSSY_EVENTS),
+                None,
+            )
+            if victim is not None:
+                del self._pending[victim]
+                self.dropped += 1
+            elif event_type in LOSSY_EVENTS:
+                self.dropped += 1
+                return True
+            else:
+                logger.warning("Dropping OpenClaw subscriber that is too far behind")
+                self.close()
+                return False
+
+        self._pending.append((event_type, message))
+        self._wakeup.set()
+        return True
+
+    def close(self):
+        """Stop sending and close the socket in the background."""
+        if self.closed:
+            return
+        self.closed = True
+        self._task.cancel()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                while self._pending:
+                    _, message = self._pending.popleft()
+                    self._sending_since = loop.time()
+                    await self.websocket.send_json(message)
+                    self._sending_since = None
+                    self.sent += 1
+                self._wakeup.clear()
+                await self._wakeup.wait()
+        except asyncio.CancelledError:
+            # Closed by the bridge: tell the client to come back later
+            try:
+                await asyncio.wait_for(self.websocket.close(code=1013), 1.0)
+            except Exception:
+                pass
+        except Exception as e:
+            logger.debug(f"OpenClaw subscriber send failed: {e}")
+        finally:
+            self.closed = True
+            self._pending.clear()
+            if self.on_close:
+                self.on_close(self)
+
+
 class OpenClawBridge:
     """
     Central bridge managing VM connections and task execution.
@@ -69,7 +227,7 @@ class OpenClawBridge:
     This is the core component that:
     1. Accepts WebSocket connections from VMs (phone-home pattern)
     2. Routes events between VMs and the application
-    3. Manages job queue and execution
+    3. Schedules jobs onto VMs by priority, least-loaded VM first
     4. Handles approval gates and context requests
     """
 
@@ -79,26 +237,70 @@ class OpenClawBridge:
 
         # Job management
         self.jobs: Dict[str, Job] = {}
-        self.job_queues: Dict[str, asyncio.Queue] = {}  # instance_id -> Queue
+        self._finished_jobs: Deque[str] = deque()
+
+        # Scheduler: heaps of (-priority, seq, job_id). Jobs pinned to a VM
+        # wait in that VM's heap, everything else in the shared one. Entries
+        # for jobs that left the QUEUED state are discarded when popped.
+        self._queue: List[Tuple[int, int, str]] = []
+        self._pinned_queues: Dict[str, List[Tuple[int, int, str]]] = {}
+        self._queued: Set[str] = set()
+        self._pinned_jobs: Set[str] = set()
+        self._seq = itertools.count()
 
-        # Event subscribers: job_id -> Set[WebSocket]
-        self.event_subscribers: Dict[str, Set[WebSocket]] = {}
+        # Event subscribers: job_id -> {WebSocket: EventSubscriber}
+        self.event_subscribers: Dict[str, Dict[WebSocket, EventSubscriber]] = {}
 
         # Active tasks tracking
-        self.instance_tasks: Dict[str, str] = {}  # instance_id -> task_id
+        self.instance_tasks: Dict[str, Set[str]] = {}  # instance_id -> task_ids
+
+        # Outstanding approval/context requests: request_id -> job_id
+        self._pending_requests: Dict[str, str] = {}
+
+        # Batched job/event persistence (no-op until started with a pool)
+        self.store = OpenClawEventStore(
+            flush_interval=EVENT_FLUSH_INTERVAL, max_batch=EVENT_MAX_BATCH
+        )
+
+        # Screenshot dedup/encoding, created on the first screenshot
+        self._screenshots: Optional[ScreenshotPipeline] = None
 
         # Background tasks
         self._cleanup_task: Optional[asyncio.Task] = None
+        self._screenshot_tasks: Set[asyncio.Task] = set()
+        self._dispatch_tasks: Set[asyncio.Task] = set()
         self._running = False
 
+        self.stats = {
+            "submitted": 0,
+            "dispatched": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "requeued": 0,
+            "events_broadcast": 0,
+            "subscribers_dropped": 0,
+        }
+
         # Callbacks
         self._event_callbacks: Dict[EventType, list] = {}
         self._approval_callbacks: list = []
         self._context_callbacks: list = []
 
-    async def start(self):
-        """Start the bridge."""
+    async def start(self, db_pool=None):
+        """
+        Start the bridge.
+
+        With a database pool, jobs and events are persisted and jobs left
+        queued by a previous process are scheduled again.
+        """
         self._running = True
+        if db_pool is not None:
+            self.store.pool = db_pool
+            try:
+                await self._restore_jobs()
+            except Exception as e:
+                logger.error(f"Failed to restore OpenClaw jobs: {e}")
         self._cleanup_task = asyncio.create_task(self._cleanup_loop())
         logger.info("OpenClaw Bridge started")
 
@@ -108,6 +310,11 @@ class OpenClawBridge:
         if self._cleanup_task:
             self._cleanup_task.cancel()
 
+        for subscribers in list(self.event_subscribers.values()):
+            for subscriber in list(subscribers.values()):
+                subscriber.close()
+        self.event_subscribers.clear()
+
         # Close all connections
         for conn in self.connections.values():
             try:
@@ -116,8 +323,33 @@ class OpenClawBridge:
                 pass
 
         self.connections.clear()
+        if self._screenshot_tasks:
+            await asyncio.gather(*self._screenshot_tasks, return_exceptions=True)
+        await self.store.close()
+        if self._screenshots:
+            shutdown_screenshot_pipeline()
+            self._screenshots = None
         logger.info("OpenClaw Bridge stopped")
 
+    async def _restore_jobs(self):
+        """Re-queue jobs a previous process accepted but never started."""
+        restored = 0
+        for job in await self.store.load_jobs(active_only=True):
+            if job.id in self.jobs:
+                continue
+            self.jobs[job.id] = job
+            if job.status in (JobStatus.PENDING, JobStatus.QUEUED):
+                job.status = JobStatus.QUEUED
+                self._enqueue(job)
+                restored += 1
+            else:
+                # The VM lost its bridge connection when we went down
+                self._finish_job(
+                    job, JobStatus.FAILED, "Bridge restarted while the job was running"
+                )
+        if restored:
+            logger.info(f"Restored {restored} queued OpenClaw jobs")
+
     async def _cleanup_loop(self):
         """Periodic cleanup of dead connections."""
         while self._running:
@@ -139,17 +371,44 @@ class OpenClawBridge:
             except Exception as e:
                 logger.error(f"Cleanup loop error: {e}")
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Scheduler, fan-out and persistence counters for monitoring."""
+        return {
+            **self.stats,
+            "queued": len(self._queued),
+            "running": sum(len(tasks) for tasks in self.instance_tasks.values()),
+            "jobs_in_memory": len(self.jobs),
+            "vms": {
+                instance_id: {
+                    "status": conn.status,
+                    "running": len(conn.running),
+                    "max_concurrency": conn.max_concurrency,
+                }
+                for instance_id, conn in self.connections.items()
+            },
+            "subscribers": sum(len(subs) for subs in self.event_subscribers.values()),
+            "store": self.store.get_stats(),
+            "screenshots": self._screenshots.get_stats() if self._screenshots else None,
+        }
+
     # ==========================================================================
     # VM Connection Management
     # ==========================================================================
 
     async def connect_vm(
-        self, websocket: WebSocket, instance_id: str, bridge_token: str, user_id: int
+        self,
+        websocket: WebSocket,
+        instance_id: str,
+        bridge_token: str,
+        user_id: int,
+        max_concurrency: Optional[int] = None,
     ) -> VMConnection:
         """
         Accept a connection from a VM instance.
 
         This is the "phone-home" entry point where VMs connect to Harvis.
+        A VM may advertise how many tasks it runs at once; otherwise
+        OPENCLAW_VM_CONCURRENCY applies.
         """
         await websocket.accept()
 
@@ -164,6 +423,7 @@ class OpenClawBridge:
             websocket=websocket,
             bridge_token=bridge_token,
             user_id=user_id,
+            max_concurrency=max_concurrency,
         )
 
         self.connections[instance_id] = connection
@@ -173,15 +433,22 @@ class OpenClawBridge:
             {
                 "type": "connected",
                 "instance_id": instance_id,
+                "max_concurrency": connection.max_concurrency,
                 "timestamp": datetime.utcnow().isoformat(),
             }
         )
 
-        logger.info(f"VM connected: {instance_id} (user {user_id})")
+        logger.info(
+            f"VM connected: {instance_id} (user {user_id}, "
+            f"{connection.max_concurrency} slots)"
+        )
 
         # Start message handler
         asyncio.create_task(self._handle_vm_messages(connection))
 
+        # Hand it any queued work
+        self._schedule_dispatch()
+
         return connection
 
     async def disconnect_vm(self, instance_id: str):
@@ -198,27 +465,22 @@ class OpenClawBridge:
 
         del self.connections[instance_id]
 
-        # Release any active task
-        if instance_id in self.instance_tasks:
-            task_id = self.instance_tasks[instance_id]
-            if task_id in self.jobs:
-                job = self.jobs[task_id]
-                if job.is_active:
-                    job.status = JobStatus.FAILED
-                    job.error_message = "VM disconnected unexpectedly"
-                    job.completed_at = datetime.utcnow()
-                    await self._broadcast_event(
-                        task_id,
-                        Event(
-                            type=EventType.JOB_FAILED,
-                            job_id=task_id,
-                            payload={
-                                "error_message": "VM disconnected unexpectedly",
-                                "duration_seconds": job.duration_seconds,
-                            },
-                        ),
-                    )
-            del self.instance_tasks[instance_id]
+        # Fail the tasks it was running; jobs pinned to it stay queued
+        for task_id in list(self.instance_tasks.pop(instance_id, ())):
+            job = self.jobs.get(task_id)
+            if job and job.is_active:
+                self._finish_job(job, JobStatus.FAILED, "VM disconnected unexpectedly")
+                await self._broadcast_event(
+                    task_id,
+                    Event(
+                        type=EventType.JOB_FAILED,
+                        job_id=task_id,
+                        payload={
+                            "error_message": "VM disconnected unexpectedly",
+                            "duration_seconds": job.duration_seconds,
+                        },
+                    ),
+                )
 
         logger.info(f"VM disconnected: {instance_id}")
 
@@ -260,6 +522,18 @@ class OpenClawBridge:
             error = message.get("error")
             await self._handle_task_failed(connection, task_id, error)
 
+        elif msg_type == "screenshot":
+            # Raw screenshot bytes for a job; encoded off the message loop
+            self._spawn_screenshot(
+                message.get("job_id"),
+                message.get("data", ""),
+                {
+                    "step_index": message.get("step_index"),
+                    "caption": message.get("caption"),
+                    "taken_at": message.get("taken_at"),
+                },
+            )
+
         elif msg_type == "needs_approval":
             # VM needs approval for an action
             await self._handle_approval_request(connection, message)
@@ -273,13 +547,24 @@ class OpenClawBridge:
 
     async def _handle_vm_event(self, connection: VMConnection, event: Event):
         """Handle an event from a VM."""
-        # Broadcast to subscribers
-        await self._broadcast_event(event.job_id, event)
+        if event.type == EventType.SCREENSHOT_CAPTURED and event.payload.get("data"):
+            # Inline image: store it and broadcast the thumbnail-first event instead
+            payload = dict(event.payload)
+            self._spawn_screenshot(
+                event.job_id,
+                payload.pop("data"),
+                {key: payload.get(key) for key in ("step_index", "caption", "taken_at")},
+            )
+            return
 
-        # Store in database (async)
-        asyncio.create_task(self._persist_event(event))
+        # Broadcast to subscribers (and queue for persistence)
+        await self._broadcast_event(event.job_id, event)
 
         # Trigger callbacks
+        await self._run_event_callbacks(event)
+
+    async def _run_event_callbacks(self, event: Event):
+        """Trigger callbacks registered for the event's type."""
         if event.type in self._event_callbacks:
             for callback in self._event_callbacks[event.type]:
                 try:
@@ -287,10 +572,51 @@ class OpenClawBridge:
                 except Exception as e:
                     logger.error(f"Event callback error: {e}")
 
-    async def _persist_event(self, event: Event):
-        """Persist event to database."""
-        # TODO: Implement database persistence
-        pass
+    def _screenshot_pipeline(self) -> ScreenshotPipeline:
+        if self._screenshots is None:
+            self._screenshots = get_screenshot_pipeline()
+        return self._screenshots
+
+    def _spawn_screenshot(self, job_id: Optional[str], data: str, meta: dict):
+        """Process a screenshot in the background; the VM's next message is not held up."""
+        if not job_id or not data:
+            return
+        task = asyncio.create_task(self._handle_screenshot(job_id, data, meta))
+        self._screenshot_tasks.add(task)
+        task.add_done_callback(self._screenshot_tasks.discard)
+
+    async def _handle_screenshot(self, job_id: str, data: str, meta: dict):
+        """Dedup and store a screenshot, then announce it with URLs instead of bytes."""
+        try:
+            frame = await self._screenshot_pipeline().ingest_base64(
+                job_id,
+                data,
+                step_index=meta.get("step_index"),
+                caption=meta.get("caption"),
+                taken_at=meta.get("taken_at"),
+            )
+        except Exception as e:
+            logger.warning(f"Rejected screenshot for job {job_id}: {e}")
+            return
+        if frame is None:
+            return  # near-duplicate of the previous frame, or shed
+
+        event = Event(
+            type=EventType.SCREENSHOT_CAPTURED, job_id=job_id, payload=frame.to_payload()
+        )
+        job = self.jobs.get(job_id)
+        if job and meta.get("step_index") is not None and 0 <= meta["step_index"] < len(job.steps):
+            job.steps[meta["step_index"]].screenshots.append(frame.id)
+        await self._broadcast_event(job_id, event)
+        await self._run_event_callbacks(event)
+
+    def _persist_event(self, event: Event):
+        """Queue an event for the next batched database write."""
+        self.store.enqueue_event(event)
+
+    def _persist_job(self, job: Job):
+        """Queue the job's current state for the next batched database write."""
+        self.store.enqueue_job(job)
 
     # ==========================================================================
     # Task Management
@@ -300,31 +626,28 @@ class OpenClawBridge:
         """
         Submit a new job for execution.
 
+        Jobs wait in a priority queue until a VM slot is free; higher
+        ``job.priority`` runs first, FIFO within a priority.
+
         Args:
             job: The job to execute
-            instance_id: Specific VM to use (optional, auto-assigns if not provided)
+            instance_id: Specific VM to use (optional, least-loaded VM if not provided)
 
         Returns:
             job_id: The assigned job ID
         """
+        if len(self._queued) >= MAX_QUEUED_JOBS:
+            raise Exception("OpenClaw job queue is full")
+
         # Store job
         self.jobs[job.id] = job
         job.status = JobStatus.QUEUED
-
-        # Find available instance if not specified
-        if not instance_id:
-            instance_id = await self._find_available_instance()
-
-        if not instance_id:
-            raise Exception("No VM instances available")
-
-        job.vm_id = instance_id
-
-        # Create queue for this job
-        self.job_queues[job.id] = asyncio.Queue()
-
-        # Queue the job
-        await self.job_queues[job.id].put(job)
+        if instance_id:
+            job.vm_id = instance_id
+        self._enqueue(job)
+        self.stats["submitted"] += 1
+        self._persist_job(job)
+        queue_position = len(self._queued)
 
         # Notify subscribers
         await self._broadcast_event(
@@ -342,58 +665,143 @@ class OpenClawBridge:
                             "vm_id": job.vm_id,
                             "policy_profile": job.policy_profile,
                             "max_runtime_minutes": job.max_runtime_minutes,
+                            "priority": job.priority,
+                            "queue_position": queue_position,
                         }
                     },
                 )(),
             ),
         )
 
-        logger.info(f"Job {job.id} submitted for instance {instance_id}")
+        logger.info(
+            f"Job {job.id} queued (priority {job.priority}"
+            + (f", instance {job.vm_id})" if job.vm_id else ")")
+        )
 
-        # Try to start immediately if VM is online
-        asyncio.create_task(self._try_start_job(job.id))
+        # Start it right away if a VM has a free slot
+        self._schedule_dispatch()
 
         return job.id
 
+    def _enqueue(self, job: Job):
+        entry = (-job.priority, next(self._seq), job.id)
+        if job.vm_id:
+            self._pinned_jobs.add(job.id)
+            heapq.heappush(self._pinned_queues.setdefault(job.vm_id, []), entry)
+        else:
+            heapq.heappush(self._queue, entry)
+        self._queued.add(job.id)
+
+    def _peek(self, heap: Optional[list]) -> Optional[Tuple[int, int, str]]:
+        """Head of a queue, discarding entries for jobs no longer waiting."""
+        while heap and heap[0][2] not in self._queued:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
     async def _find_available_instance(self) -> Optional[str]:
-        """Find an available VM instance."""
-        for instance_id, connection in self.connections.items():
-            if connection.status == "online" and instance_id not in self.instance_tasks:
-                return instance_id
-        return None
+        """Least-loaded VM with a free task slot."""
+        available = [c for c in self.connections.values() if c.has_capacity]
+        if not available:
+            return None
+        return min(available, key=lambda c: (c.load, len(c.running))).instance_id
 
-    async def _try_start_job(self, job_id: str):
-        """Try to start a queued job."""
-        job = self.jobs.get(job_id)
-        if not job or job.status != JobStatus.QUEUED:
-            return
+    def _place_jobs(self) -> List[Tuple[VMConnection, Job]]:
+        """
+        Assign queued jobs to free VM slots.
+
+        VMs are visited least-loaded first; each takes the higher-priority of
+        the head of its own pinned queue and the head of the shared queue.
+        Slots are claimed synchronously, so concurrent dispatches never
+        double-book a VM.
+        """
+        placements = []
+        while self._queued:
+            available = sorted(
+                (c for c in self.connections.values() if c.has_capacity),
+                key=lambda c: (c.load, len(c.running)),
+            )
+            placed = False
+            for connection in available:
+                pinned = self._pinned_queues.get(connection.instance_id)
+                own, shared = self._peek(pinned), self._peek(self._queue)
+                if own is None and shared is None:
+                    continue
+                if shared is None or (own is not None and own < shared):
+                    heapq.heappop(pinned)
+                    job_id = own[2]
+                else:
+                    heapq.heappop(self._queue)
+                    job_id = shared[2]
+
+                job = self.jobs[job_id]
+                self._queued.discard(job_id)
+                job.vm_id = connection.instance_id
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.utcnow()
+                connection.running.add(job_id)
+                connection.current_task_id = job_id
+                connection.update_status()
+                self.instance_tasks.setdefault(connection.instance_id, set()).add(job_id)
+                placements.append((connection, job))
+                placed = True
+                break
+            if not placed:
+                break
+        return placements
 
-        if not job.vm_id or job.vm_id not in self.connections:
-            logger.warning(f"VM {job.vm_id} not available for job {job_id}")
+    def _schedule_dispatch(self):
+        """Run a dispatch pass in the background."""
+        if not self._queued:
             return
+        task = asyncio.create_task(self._dispatch())
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self):
+        """Place queued jobs and send them to their VMs concurrently."""
+        placements = self._place_jobs()
+        if placements:
+            await asyncio.gather(
+                *(self._start_job(connection, job) for connection, job in placements)
+            )
 
-        connection = self.connections[job.vm_id]
+    async def _try_start_job(self, job_id: str):
+        """Try to start a queued job."""
+        if job_id in self._queued:
+            await self._dispatch()
 
-        # Mark as running
-        job.status = JobStatus.RUNNING
-        job.started_at = datetime.utcnow()
-        self.instance_tasks[job.vm_id] = job_id
-        connection.current_task_id = job_id
-        connection.status = "busy"
+    async def _start_job(self, connection: VMConnection, job: Job):
+        """Send a placed job to its VM."""
+        job_id = job.id
+        try:
+            await connection.send(
+                {
+                    "type": "task_start",
+                    "task": {
+                        "id": job.id,
+                        "prompt": job.task_prompt,
+                        "policy": job.policy_profile,
+                        "max_runtime": job.max_runtime_minutes,
+                        "steps": [step.dict() for step in job.steps] if job.steps else [],
+                    },
+                }
+            )
+        except Exception:
+            # The VM is going away; put the job back for another one
+            self._release_slot(job)
+            if job.status == JobStatus.RUNNING:
+                job.status = JobStatus.QUEUED
+                job.started_at = None
+                if job.id not in self._pinned_jobs:
+                    job.vm_id = None
+                self._enqueue(job)
+                self.stats["requeued"] += 1
+            connection.status = "offline"
+            self._schedule_dispatch()
+            return
 
-        # Send task to VM
-        await connection.send(
-            {
-                "type": "task_start",
-                "task": {
-                    "id": job.id,
-                    "prompt": job.task_prompt,
-                    "policy": job.policy_profile,
-                    "max_runtime": job.max_runtime_minutes,
-                    "steps": [step.dict() for step in job.steps] if job.steps else [],
-                },
-            }
-        )
+        self.stats["dispatched"] += 1
+        self._persist_job(job)
 
         # Notify subscribers
         await self._broadcast_event(
@@ -417,28 +825,75 @@ class OpenClawBridge:
 
         logger.info(f"Job {job_id} started on VM {job.vm_id}")
 
+    def _release_slot(self, job: Job):
+        """Free the VM slot a job was using."""
+        tasks = self.instance_tasks.get(job.vm_id)
+        if tasks is not None:
+            tasks.discard(job.id)
+            if not tasks:
+                del self.instance_tasks[job.vm_id]
+        connection = self.connections.get(job.vm_id) if job.vm_id else None
+        if connection:
+            connection.running.discard(job.id)
+            if connection.current_task_id == job.id:
+                connection.current_task_id = next(iter(connection.running), None)
+            connection.update_status()
+
+    def _finish_job(self, job: Job, status: JobStatus, error_message: Optional[str] = None):
+        """Move a job to a terminal state, free its slot and schedule more work."""
+        self._queued.discard(job.id)
+        self._pinned_jobs.discard(job.id)
+        self._release_slot(job)
+        for request_id in [r for r, j in self._pending_requests.items() if j == job.id]:
+            del self._pending_requests[request_id]
+        if self._screenshots:
+            self._screenshots.release_job(job.id)
+        job.status = status
+        job.completed_at = datetime.utcnow()
+        if error_message is not None:
+            job.error_message = error_message
+        self.stats[status.value] = self.stats.get(status.value, 0) + 1
+        self._persist_job(job)
+
+        # Keep recent finished jobs in memory; older ones live in the database
+        self._finished_jobs.append(job.id)
+        while len(self._finished_jobs) > MAX_FINISHED_JOBS:
+            old_id = self._finished_jobs.popleft()
+            old = self.jobs.get(old_id)
+            if old is not None and not old.is_active and self.store.enabled:
+                del self.jobs[old_id]
+
+        self._schedule_dispatch()
+
+    async def get_job(self, job_id: str) -> Optional[Job]:
+        """A job from memory, or from the database if it has been evicted."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            try:
+                job = await self.store.load_job(job_id)
+            except Exception as e:
+                logger.error(f"Failed to load OpenClaw job {job_id}: {e}")
+        return job
+
+    async def get_job_events(self, job_id: str, limit: int = 500) -> List[Event]:
+        """Persisted event history for a job."""
+        return await self.store.get_events(job_id, limit=limit)
+
     async def cancel_job(self, job_id: str, reason: str = "User cancelled"):
-        """Cancel a running job."""
+        """Cancel a queued or running job."""
         job = self.jobs.get(job_id)
         if not job or not job.is_active:
             return False
 
         # Send cancel to VM
-        if job.vm_id and job.vm_id in self.connections:
+        if job_id not in self._queued and job.vm_id and job.vm_id in self.connections:
             connection = self.connections[job.vm_id]
             await connection.send(
                 {"type": "task_cancel", "task_id": job_id, "reason": reason}
             )
 
-        job.status = JobStatus.CANCELLED
-        job.completed_at = datetime.utcnow()
-
-        # Release instance
-        if job.vm_id and job.vm_id in self.instance_tasks:
-            del self.instance_tasks[job.vm_id]
-            if job.vm_id in self.connections:
-                self.connections[job.vm_id].status = "online"
-                self.connections[job.vm_id].current_task_id = None
+        # Releases the instance (a queued entry is discarded when popped)
+        self._finish_job(job, JobStatus.CANCELLED)
 
         # Notify subscribers
         await self._broadcast_event(
@@ -472,16 +927,13 @@ class OpenClawBridge:
             return
 
         job = self.jobs[task_id]
-        job.status = JobStatus.COMPLETED
-        job.completed_at = datetime.utcnow()
+        if not job.is_active:
+            # Late or duplicated VM message for a job that already ended
+            logger.debug(f"Ignoring completion of finished job {task_id} ({job.status.value})")
+            return
         job.result = result.get("result")
         job.artifacts = result.get("artifacts", [])
-
-        # Release instance
-        if connection.instance_id in self.instance_tasks:
-            del self.instance_tasks[connection.instance_id]
-        connection.status = "online"
-        connection.current_task_id = None
+        self._finish_job(job, JobStatus.COMPLETED)
 
         # Notify subscribers
         await self._broadcast_event(
@@ -516,16 +968,11 @@ class OpenClawBridge:
             return
 
         job = self.jobs[task_id]
-        job.status = JobStatus.FAILED
-        job.completed_at = datetime.utcnow()
-        job.error_message = error.get("message")
+        if not job.is_active:
+            logger.debug(f"Ignoring failure of finished job {task_id} ({job.status.value})")
+            return
         job.error_code = error.get("code")
-
-        # Release instance
-        if connection.instance_id in self.instance_tasks:
-            del self.instance_tasks[connection.instance_id]
-        connection.status = "online"
-        connection.current_task_id = None
+        self._finish_job(job, JobStatus.FAILED, error.get("message"))
 
         # Notify subscribers
         await self._broadcast_event(
@@ -553,38 +1000,61 @@ class OpenClawBridge:
     # Event Subscriptions
     # ==========================================================================
 
-    async def subscribe_to_job(self, job_id: str, websocket: WebSocket):
-        """Subscribe a WebSocket to receive events for a job."""
-        if job_id not in self.event_subscribers:
-            self.event_subscribers[job_id] = set()
-        self.event_subscribers[job_id].add(websocket)
+    async def subscribe_to_job(self, job_id: str, websocket: WebSocket) -> EventSubscriber:
+        """
+        Subscribe a WebSocket to receive events for a job.
+
+        Returns the subscriber; anything else sent to this socket should go
+        through ``subscriber.offer`` so it is ordered with the events.
+        """
+        subscribers = self.event_subscribers.setdefault(job_id, {})
+        existing = subscribers.pop(websocket, None)
+        if existing:
+            existing.on_close = None
+            existing.close()
+
+        def forget(subscriber: EventSubscriber):
+            current = self.event_subscribers.get(job_id)
+            if current and current.get(subscriber.websocket) is subscriber:
+                del current[subscriber.websocket]
+                self.stats["subscribers_dropped"] += 1
+                if not current:
+                    del self.event_subscribers[job_id]
+
+        subscriber = EventSubscriber(websocket, on_close=forget)
+        subscribers[websocket] = subscriber
         logger.debug(f"WebSocket subscribed to job {job_id}")
+        return subscriber
 
     async def unsubscribe_from_job(self, job_id: str, websocket: WebSocket):
         """Unsubscribe a WebSocket from a job."""
-        if job_id in self.event_subscribers:
-            self.event_subscribers[job_id].discard(websocket)
-            if not self.event_subscribers[job_id]:
+        subscribers = self.event_subscribers.get(job_id)
+        if subscribers is not None:
+            subscriber = subscribers.pop(websocket, None)
+            if subscriber:
+                subscriber.on_close = None
+                subscriber.close()
+            if not subscribers:
                 del self.event_subscribers[job_id]
         logger.debug(f"WebSocket unsubscribed from job {job_id}")
 
     async def _broadcast_event(self, job_id: str, event: Event):
-        """Broadcast an event to all subscribers."""
-        if job_id not in self.event_subscribers:
-            return
+        """
+        Broadcast an event to all subscribers and queue it for persistence.
 
-        dead_subscribers = []
-        message = {"type": "event", "event": event.dict()}
+        Never waits on a client: each subscriber has its own send queue.
+        """
+        self._persist_event(event)
 
-        for websocket in self.event_subscribers[job_id]:
-            try:
-                await websocket.send_json(message)
-            except Exception:
-                dead_subscribers.append(websocket)
+        subscribers = self.event_subscribers.get(job_id)
+        if not subscribers:
+            return
 
-        # Clean up dead subscribers
-        for ws in dead_subscribers:
-            self.event_subscribers[job_id].discard(ws)
+        self.stats["events_broadcast"] += 1
+        # Serialize once for every subscriber
+        message = {"type": "event", "event": json.loads(event.json())}
+        for subscriber in list(subscribers.values()):
+            subscriber.offer(message, event.type)
 
     # ==========================================================================
     # Approval Gates
@@ -594,6 +1064,8 @@ class OpenClawBridge:
         """Handle an approval request from a VM."""
         request_id = message.get("request_id")
         job_id = message.get("job_id")
+        if request_id and job_id:
+            self._pending_requests[request_id] = job_id
 
         # Broadcast to UI subscribers
         await self._broadcast_event(
@@ -619,42 +1091,55 @@ class OpenClawBridge:
     ):
         """Submit an approval response from the user."""
         # Find which job/VM this request belongs to
-        for job_id, job in self.jobs.items():
-            if job.vm_id and job.vm_id in self.connections:
-                connection = self.connections[job.vm_id]
-                await connection.send(
-                    {
-                        "type": "approval_response",
-                        "request_id": request_id,
-                        "approved": approved,
-                        "reason": reason,
-                    }
-                )
+        target = self._request_target(request_id)
+        if target:
+            job_id, connection = target
+            await connection.send(
+                {
+                    "type": "approval_response",
+                    "request_id": request_id,
+                    "approved": approved,
+                    "reason": reason,
+                }
+            )
 
-                await self._broadcast_event(
+            await self._broadcast_event(
+                job_id,
+                create_event(
+                    EventType.APPROVAL_GRANTED
+                    if approved
+                    else EventType.APPROVAL_DENIED,
                     job_id,
-                    create_event(
-                        EventType.APPROVAL_GRANTED
-                        if approved
-                        else EventType.APPROVAL_DENIED,
-                        job_id,
-                        type(
-                            "Payload",
-                            (),
-                            {
-                                "dict": lambda self: {
-                                    "request_id": request_id,
-                                    "approved": approved,
-                                    "reason": reason,
-                                }
-                            },
-                        )(),
-                    ),
-                )
-                return True
+                    type(
+                        "Payload",
+                        (),
+                        {
+                            "dict": lambda self: {
+                                "request_id": request_id,
+                                "approved": approved,
+                                "reason": reason,
+                            }
+                        },
+                    )(),
+                ),
+            )
+            return True
 
         return False
 
+    def _request_target(self, request_id: str) -> Optional[Tuple[str, VMConnection]]:
+        """The job and VM connection an approval/context request came from."""
+        job_id = self._pending_requests.pop(request_id, None)
+        job = self.jobs.get(job_id) if job_id else None
+        if job and job.vm_id in self.connections:
+            return job_id, self.connections[job.vm_id]
+
+        # Requests that did not say which job they belong to
+        for job_id, job in self.jobs.items():
+            if job.status in (JobStatus.RUNNING, JobStatus.PAUSED) and job.vm_id in self.connections:
+                return job_id, self.connections[job.vm_id]
+        return None
+
     # ==========================================================================
     # Context Requests
     # ==========================================================================
@@ -662,6 +1147,9 @@ class OpenClawBridge:
     async def _handle_context_request(self, connection: VMConnection, message: dict):
         """Handle a context request from a VM."""
         job_id = message.get("job_id")
+        request_id = message.get("request_id")
+        if request_id and job_id:
+            self._pending_requests[request_id] = job_id
 
         # Broadcast to UI subscribers
         await self._broadcast_event(
@@ -689,37 +1177,37 @@ class OpenClawBridge:
         attachments = attachments or []
 
         # Find which job/VM this request belongs to
-        for job_id, job in self.jobs.items():
-            if job.vm_id and job.vm_id in self.connections:
-                connection = self.connections[job.vm_id]
-                await connection.send(
-                    {
-                        "type": "context_response",
-                        "request_id": request_id,
-                        "response": response,
-                        "attachments": attachments,
-                    }
-                )
+        target = self._request_target(request_id)
+        if target:
+            job_id, connection = target
+            await connection.send(
+                {
+                    "type": "context_response",
+                    "request_id": request_id,
+                    "response": response,
+                    "attachments": attachments,
+                }
+            )
 
-                await self._broadcast_event(
+            await self._broadcast_event(
+                job_id,
+                create_event(
+                    EventType.CONTEXT_PROVIDED,
                     job_id,
-                    create_event(
-                        EventType.CONTEXT_PROVIDED,
-                        job_id,
-                        type(
-                            "Payload",
-                            (),
-                            {
-                                "dict": lambda self: {
-                                    "request_id": request_id,
-                                    "response": response,
-                                    "attachments": attachments,
-                                }
-                            },
-                        )(),
-                    ),
-                )
-                return True
+                    type(
+                        "Payload",
+                        (),
+                        {
+                            "dict": lambda self: {
+                                "request_id": request_id,
+                                "response": response,
+                                "attachments": attachments,
+                            }
+                        },
+                    )(),
+                ),
+            )
+            return True
 
         return False
 
@@ -6,6 +6,8 @@ FastAPI routes for OpenClaw integration.
 
 from typing import List, Optional
 from datetime import datetime, timedelta
+import json
+import os
 import uuid
 
 from fastapi import (
@@ -16,7 +18,7 @@ from fastapi import (
     HTTPException,
     BackgroundTasks,
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse
 
 from ..core.events import EventType
 from ..core.job_schema import (
@@ -28,6 +30,7 @@ from ..core.job_schema import (
 )
 from ..core.models import OpenClawInstance, OpenClawTask, OpenClawEvent
 from .bridge import bridge
+from .screenshots import get_screenshot_pipeline, get_screenshot_stats
 
 # Create router
 router = APIRouter(prefix="/api/openclaw", tags=["openclaw"])
@@ -135,6 +138,7 @@ async def create_task(
         vm_id=instance_id,
         policy_profile=request.policy_profile,
         max_runtime_minutes=request.max_runtime_minutes,
+        priority=request.priority,
         metadata=request.metadata,
     )
 
@@ -165,11 +169,10 @@ async def list_tasks(status: Optional[str] = None, limit: int = 50, user_id: int
 @router.get("/tasks/{task_id}", response_model=dict)
 async def get_task(task_id: str, user_id: int = 1):
     """Get details of a specific task."""
-    if task_id not in bridge.jobs:
+    job = await bridge.get_job(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    job = bridge.jobs[task_id]
-
     # TODO: Verify user owns this job
 
     return {
@@ -180,6 +183,20 @@ async def get_task(task_id: str, user_id: int = 1):
     }
 
 
+@router.get("/tasks/{task_id}/events", response_model=List[dict])
+async def get_task_events(task_id: str, limit: int = 500, user_id: int = 1):
+    """Get the stored event history of a task."""
+    await _owned_job(task_id, user_id)
+    events = await bridge.get_job_events(task_id, limit=min(limit, 5000))
+    return [event.dict() for event in events]
+
+
+@router.get("/stats", response_model=dict)
+async def get_bridge_stats():
+    """Scheduler, event fan-out and persistence statistics."""
+    return bridge.get_stats()
+
+
 @router.post("/tasks/{task_id}/cancel", response_model=dict)
 async def cancel_task(task_id: str, reason: str = "User cancelled", user_id: int = 1):
     """Cancel a running task."""
@@ -296,6 +313,7 @@ async def vm_websocket(websocket: WebSocket, instance_id: str):
             instance_id=instance_id,
             bridge_token=bridge_token,
             user_id=user_id,
+            max_concurrency=auth_msg.get("max_concurrency"),
         )
 
         # Keep connection alive
@@ -330,14 +348,14 @@ async def task_events_websocket(websocket: WebSocket, task_id: str):
     """
     await websocket.accept()
 
-    # Subscribe to job events
-    await bridge.subscribe_to_job(task_id, websocket)
+    # Subscribe to job events; all sends go through the subscriber's queue
+    subscriber = await bridge.subscribe_to_job(task_id, websocket)
 
     try:
         # Send initial state if job exists
-        if task_id in bridge.jobs:
-            job = bridge.jobs[task_id]
-            await websocket.send_json({"type": "initial_state", "job": job.dict()})
+        job = await bridge.get_job(task_id)
+        if job is not None:
+            subscriber.offer({"type": "initial_state", "job": json.loads(job.json())})
 
         # Keep connection alive and handle client messages
         while True:
@@ -346,7 +364,7 @@ async def task_events_websocket(websocket: WebSocket, task_id: str):
 
                 # Handle client messages (e.g., ping, requests)
                 if message.get("type") == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    subscriber.offer({"type": "pong"})
 
             except WebSocketDisconnect:
                 break
@@ -363,25 +381,61 @@ async def task_events_websocket(websocket: WebSocket, task_id: str):
 # =============================================================================
 
 
+async def _owned_job(task_id: str, user_id: int) -> Job:
+    """The task's job; 404 when it does not exist or belongs to another user."""
+    job = await bridge.get_job(task_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return job
+
+
 @router.get("/tasks/{task_id}/screenshots", response_model=List[dict])
 async def list_screenshots(task_id: str, user_id: int = 1):
-    """List screenshots for a task."""
-    # TODO: Query from database
-    return []
+    """List screenshots for a task, with thumbnail and full-size URLs."""
+    await _owned_job(task_id, user_id)
+    frames = get_screenshot_pipeline().list_frames(task_id)
+    return [
+        {**frame.to_payload(), "url": frame.url, "thumbnail_url": frame.thumbnail_url}
+        for frame in frames
+    ]
 
 
 @router.get("/tasks/{task_id}/screenshots/{screenshot_id}")
-async def get_screenshot(task_id: str, screenshot_id: str, user_id: int = 1):
-    """Get a specific screenshot."""
-    # TODO: Return screenshot file
-    raise HTTPException(status_code=404, detail="Screenshot not found")
+async def get_screenshot(
+    task_id: str, screenshot_id: str, size: str = "full", user_id: int = 1
+):
+    """
+    Get a specific screenshot as WebP.
+
+    ``size=thumb`` returns the thumbnail. Full frames stored as deltas are
+    rebuilt on first request. Range requests are supported.
+    """
+    await _owned_job(task_id, user_id)
+    path = await get_screenshot_pipeline().frame_path(
+        task_id, screenshot_id, thumbnail=(size == "thumb")
+    )
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+
+    # Frames never change once written
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
+
+
+@router.get("/screenshots/stats", response_model=dict)
+async def get_screenshot_pipeline_stats():
+    """Screenshot dedup, encoding and storage statistics."""
+    return get_screenshot_stats()
 
 
 @router.get("/tasks/{task_id}/artifacts", response_model=List[dict])
 async def list_artifacts(task_id: str, user_id: int = 1):
     """List artifacts generated by a task."""
-    if task_id not in bridge.jobs:
+    job = await bridge.get_job(task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    job = bridge.jobs[task_id]
     return job.artifacts or []
@@ -0,0 +1,455 @@
+"""
+OpenClaw Screenshot Pipeline
+
+Turns the screenshots VMs send with each automation step into compact,
+lazily served frames:
+
+- Near-identical consecutive frames are dropped by perceptual hash (dHash).
+- Frames are stored as WebP keyframes, or as a WebP patch of the region that
+  changed since the job's current keyframe. Any frame is rebuilt from its
+  keyframe plus at most one patch.
+- A small WebP thumbnail is written for every kept frame. Subscribers get
+  thumbnail URLs in the event; full frames are only decoded (and delta frames
+  only materialized) when someone asks for them.
+
+Encoding runs on a thread pool. Frames of one job are processed in order,
+frames of different jobs in parallel.
+"""
+
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_DIR = os.getenv(
+    "OPENCLAW_SCREENSHOT_DIR", os.path.join(tempfile.gettempdir(), "openclaw-screenshots")
+)
+SCREENSHOT_WORKERS = int(os.getenv("OPENCLAW_SCREENSHOT_WORKERS", str(min(4, os.cpu_count() or 1))))
+WEBP_QUALITY = int(os.getenv("OPENCLAW_SCREENSHOT_QUALITY", "80"))
+THUMBNAIL_SIDE = int(os.getenv("OPENCLAW_SCREENSHOT_THUMBNAIL_SIDE", "320"))
+# A frame is a near-duplicate of the last kept one when their dHashes differ by at
+# most DEDUP_MAX_BITS and, at DEDUP_SIDE resolution, under DEDUP_MAX_CHANGE of the
+# pixels changed visibly. The hash alone is too coarse to see a filled-in field.
+DEDUP_MAX_BITS = int(os.getenv("OPENCLAW_SCREENSHOT_DEDUP_BITS", "3"))
+DEDUP_MAX_CHANGE = float(os.getenv("OPENCLAW_SCREENSHOT_DEDUP_MAX_CHANGE", "0.002"))
+DEDUP_SIDE = 256
+KEYFRAME_INTERVAL = int(os.getenv("OPENCLAW_SCREENSHOT_KEYFRAME_INTERVAL", "30"))
+# A change covering more than this fraction of the frame starts a new keyframe
+DELTA_MAX_AREA = float(os.getenv("OPENCLAW_SCREENSHOT_DELTA_MAX_AREA", "0.4"))
+# Frames waiting per job before new ones are shed
+MAX_PENDING_PER_JOB = int(os.getenv("OPENCLAW_SCREENSHOT_MAX_PENDING", "8"))
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 grayscale thumbnail"""
+    small = image.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _encode_webp(image: Image.Image, quality: int = WEBP_QUALITY) -> bytes:
+    buf = io.BytesIO()
+    # method=2 encodes about twice as fast as the default for ~5% larger files
+    image.save(buf, format="WEBP", quality=quality, method=2)
+    return buf.getvalue()
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+@dataclass
+class ScreenshotFrame:
+    """One stored frame, as listed in the job's index"""
+    id: str
+    job_id: str
+    kind: str  # "key" or "delta"
+    keyframe_id: str
+    width: int
+    height: int
+    phash: str
+    bytes: int
+    thumbnail_bytes: int
+    box: Optional[Tuple[int, int, int, int]] = None  # changed region for deltas
+    step_index: Optional[int] = None
+    caption: Optional[str] = None
+    taken_at: Optional[str] = None
+
+    @property
+    def url(self) -> str:
+        return f"/api/openclaw/tasks/{self.job_id}/screenshots/{self.id}"
+
+    @property
+    def thumbnail_url(self) -> str:
+        return f"{self.url}?size=thumb"
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Fields for the screenshot_captured event"""
+        return {
+            "screenshot_id": self.id,
+            "step_index": self.step_index,
+            "caption": self.caption,
+            "storage_path": self.url,
+            "thumbnail_path": self.thumbnail_url,
+            "width": self.width,
+            "height": self.height,
+            "taken_at": self.taken_at,
+            "kind": self.kind,
+            "bytes": self.bytes,
+        }
+
+
+@dataclass
+class _JobFrames:
+    """Per-job state; only touched by one worker at a time"""
+    frames: List[ScreenshotFrame] = field(default_factory=list)
+    last_hash: Optional[int] = None
+    last_small: Optional[Image.Image] = None
+    keyframe: Optional[Image.Image] = None
+    keyframe_id: Optional[str] = None
+    since_keyframe: int = 0
+    pending: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class ScreenshotPipeline:
+    """
+    Dedup, delta-encode and store OpenClaw screenshots per job.
+
+    Files live under ``{root}/{job_id}/``: ``{id}.webp`` for keyframes,
+    ``{id}.delta.webp`` for patches, ``{id}.thumb.webp`` for thumbnails and an
+    append-only ``index.jsonl`` describing every kept frame, so listings and
+    reconstruction keep working after a restart.
+    """
+
+    def __init__(self, root: str = SCREENSHOT_DIR, workers: int = SCREENSHOT_WORKERS,
+                 quality: int = WEBP_QUALITY, thumbnail_side: int = THUMBNAIL_SIDE,
+                 dedup_bits: int = DEDUP_MAX_BITS, dedup_max_change: float = DEDUP_MAX_CHANGE,
+                 keyframe_interval: int = KEYFRAME_INTERVAL,
+                 delta_max_area: float = DELTA_MAX_AREA, max_pending: int = MAX_PENDING_PER_JOB):
+        self.root = root
+        self.workers = workers
+        self.quality = quality
+        self.thumbnail_side = thumbnail_side
+        self.dedup_bits = dedup_bits
+        self.dedup_max_change = dedup_max_change
+        self.keyframe_interval = keyframe_interval
+        self.delta_max_area = delta_max_area
+        self.max_pending = max_pending
+        os.makedirs(root, exist_ok=True)
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="openclaw-shot")
+        self._jobs: Dict[str, _JobFrames] = {}
+        self._lock = threading.Lock()
+        self._process_ms: List[float] = []
+
+        self.stats = {
+            "frames_in": 0,
+            "kept": 0,
+            "deduped": 0,
+            "shed": 0,
+            "failed": 0,
+            "keyframes": 0,
+            "deltas": 0,
+            "materialized": 0,
+            "bytes_in": 0,
+            "bytes_stored": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    async def ingest(self, job_id: str, data: bytes, step_index: Optional[int] = None,
+                     caption: Optional[str] = None,
+                     taken_at: Optional[str] = None) -> Optional[ScreenshotFrame]:
+        """
+        Process one screenshot. Returns the stored frame, or None when it was
+        a near-duplicate of the previous one or the job is too far behind.
+        """
+        if not _SAFE_ID.match(job_id):
+            raise ValueError(f"Invalid job id for screenshot: {job_id!r}")
+
+        state = self._job(job_id)
+        self._bump("frames_in")
+        self._bump("bytes_in", len(data))
+        if state.pending >= self.max_pending:
+            # Screenshots are a live view; an old frame is worth less than keeping up
+            self._bump("shed")
+            return None
+
+        state.pending += 1
+        try:
+            async with state.lock:
+                loop = asyncio.get_running_loop()
+                started = time.perf_counter()
+                frame = await loop.run_in_executor(
+                    self._executor, self._process, job_id, state, data,
+                    step_index, caption, taken_at or datetime.utcnow().isoformat(),
+                )
+                self._record((time.perf_counter() - started) * 1000)
+                return frame
+        except Exception as e:
+            self._bump("failed")
+            logger.warning(f"Failed to process screenshot for job {job_id}: {e}")
+            return None
+        finally:
+            state.pending -= 1
+
+    async def ingest_base64(self, job_id: str, data_b64: str, **kwargs) -> Optional[ScreenshotFrame]:
+        if "," in data_b64[:100] and data_b64.startswith("data:"):
+            data_b64 = data_b64.split(",", 1)[1]
+        return await self.ingest(job_id, base64.b64decode(data_b64), **kwargs)
+
+    def _process(self, job_id: str, state: _JobFrames, data: bytes, step_index: Optional[int],
+                 caption: Optional[str], taken_at: str) -> Optional[ScreenshotFrame]:
+        image = Image.open(io.BytesIO(data))
+        image.draft("RGB", image.size)
+        image = image.convert("RGB")
+
+        small = image.convert("L")
+        small.thumbnail((DEDUP_SIDE, DEDUP_SIDE))
+        phash = dhash(small)
+        if self._is_duplicate(state, small, phash):
+            self._bump("deduped")
+            return None
+        state.last_hash, state.last_small = phash, small
+
+        job_dir = os.path.join(self.root, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        frame_id = f"{len(state.frames):06d}"
+
+        box = None
+        if (
+            state.keyframe is not None
+            and state.keyframe.size == image.size
+            and state.since_keyframe < self.keyframe_interval
+        ):
+            box = ImageChops.difference(state.keyframe, image).getbbox()
+            if box is not None:
+                area = (box[2] - box[0]) * (box[3] - box[1])
+                if area > self.delta_max_area * image.width * image.height:
+                    box = None
+
+        if box is None:
+            encoded = _encode_webp(image, self.quality)
+            _atomic_write(os.path.join(job_dir, f"{frame_id}.webp"), encoded)
+            # Diff later frames against the source pixels so compression noise
+            # in the keyframe does not count as change
+            state.keyframe = image
+            state.keyframe_id = frame_id
+            state.since_keyframe = 0
+            kind = "key"
+            self._bump("keyframes")
+        else:
+            encoded = _encode_webp(image.crop(box), self.quality)
+            _atomic_write(os.path.join(job_dir, f"{frame_id}.delta.webp"), encoded)
+            state.since_keyframe += 1
+            kind = "delta"
+            self._bump("deltas")
+
+        scale = self.thumbnail_side / max(image.size)
+        thumb = image if scale >= 1 else image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.BILINEAR, reducing_gap=2.0,
+        )
+        thumb_bytes = _encode_webp(thumb, quality=70)
+        _atomic_write(os.path.join(job_dir, f"{frame_id}.thumb.webp"), thumb_bytes)
+
+        frame = ScreenshotFrame(
+            id=frame_id,
+            job_id=job_id,
+            kind=kind,
+            keyframe_id=state.keyframe_id,
+            width=image.width,
+            height=image.height,
+            phash=f"{phash:016x}",
+            bytes=len(encoded),
+            thumbnail_bytes=len(thumb_bytes),
+            box=box,
+            step_index=step_index,
+            caption=caption,
+            taken_at=taken_at,
+        )
+        with open(os.path.join(job_dir, "index.jsonl"), "a") as index:
+            index.write(json.dumps(asdict(frame)) + "\n")
+        state.frames.append(frame)
+
+        self._bump("kept")
+        self._bump("bytes_stored", len(encoded) + len(thumb_bytes))
+        return frame
+
+    def _is_duplicate(self, state: _JobFrames, small: Image.Image, phash: int) -> bool:
+        if state.last_hash is None or hamming(phash, state.last_hash) > self.dedup_bits:
+            return False
+        if state.last_small is None or state.last_small.size != small.size:
+            return False
+        # Count pixels that changed beyond compression noise
+        changed = ImageChops.difference(state.last_small, small).point(lambda p: 255 if p > 12 else 0)
+        return changed.histogram()[255] <= self.dedup_max_change * small.width * small.height
+
+    # ------------------------------------------------------------------
+    # Serving
+    # ------------------------------------------------------------------
+
+    def list_frames(self, job_id: str) -> List[ScreenshotFrame]:
+        if not _SAFE_ID.match(job_id):
+            return []
+        return list(self._job(job_id).frames)
+
+    def get_frame(self, job_id: str, frame_id: str) -> Optional[ScreenshotFrame]:
+        if not (_SAFE_ID.match(job_id) and _SAFE_ID.match(frame_id)):
+            return None
+        frames = self._job(job_id).frames
+        index = int(frame_id) if frame_id.isdigit() else -1
+        if 0 <= index < len(frames) and frames[index].id == frame_id:
+            return frames[index]
+        return None
+
+    async def frame_path(self, job_id: str, frame_id: str, thumbnail: bool = False) -> Optional[str]:
+        """
+        Path of a servable WebP file for a frame. Delta frames are rebuilt
+        from their keyframe on first request and kept next to it.
+        """
+        frame = self.get_frame(job_id, frame_id)
+        if frame is None:
+            return None
+        job_dir = os.path.join(self.root, job_id)
+        if thumbnail:
+            return os.path.join(job_dir, f"{frame.id}.thumb.webp")
+        if frame.kind == "key":
+            return os.path.join(job_dir, f"{frame.id}.webp")
+
+        path = os.path.join(job_dir, f"{frame.id}.full.webp")
+        if not os.path.exists(path):
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._materialize, job_dir, frame, path
+            )
+        return path
+
+    def _materialize(self, job_dir: str, frame: ScreenshotFrame, path: str):
+        with Image.open(os.path.join(job_dir, f"{frame.keyframe_id}.webp")) as key:
+            image = key.convert("RGB")
+        with Image.open(os.path.join(job_dir, f"{frame.id}.delta.webp")) as patch:
+            image.paste(patch.convert("RGB"), tuple(frame.box[:2]))
+        _atomic_write(path, _encode_webp(image, self.quality))
+        self._bump("materialized")
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def release_job(self, job_id: str):
+        """Drop the in-memory keyframe of a finished job; its index stays on disk"""
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is not None and state.pending == 0:
+                del self._jobs[job_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = sorted(self._process_ms)
+            active = len(self._jobs)
+            stats = dict(self.stats)
+        return {
+            "workers": self.workers,
+            **stats,
+            "bytes_saved": max(0, stats["bytes_in"] - stats["bytes_stored"]),
+            "active_jobs": active,
+            "process_ms": {
+                "count": len(timings),
+                "p50": round(statistics.median(timings), 1) if timings else 0.0,
+                "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1) if timings else 0.0,
+            },
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _job(self, job_id: str) -> _JobFrames:
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                state = self._jobs[job_id] = _JobFrames(frames=self._load_index(job_id))
+            return state
+
+    def _load_index(self, job_id: str) -> List[ScreenshotFrame]:
+        path = os.path.join(self.root, job_id, "index.jsonl")
+        frames = []
+        if os.path.exists(path):
+            with open(path) as index:
+                for line in index:
+                    try:
+                        record = json.loads(line)
+                        if record.get("box"):
+                            record["box"] = tuple(record["box"])
+                        frames.append(ScreenshotFrame(**record))
+                    except (ValueError, TypeError):
+                        continue  # torn last line after a crash
+        return frames
+
+    def _bump(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _record(self, elapsed_ms: float):
+        with self._lock:
+            self._process_ms.append(elapsed_ms)
+            if len(self._process_ms) > 1000:
+                del self._process_ms[:500]
+
+
+_pipeline: Optional[ScreenshotPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_screenshot_pipeline() -> ScreenshotPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ScreenshotPipeline()
+        return _pipeline
+
+
+def get_screenshot_stats() -> Dict[str, Any]:
+    with _pipeline_lock:
+        pipeline = _pipeline
+    return pipeline.get_stats() if pipeline else {"workers": 0}
+
+
+def shutdown_screenshot_pipeline():
+    global _pipeline
+    with _pipeline_lock:
+        pipeline, _pipeline = _pipeline, None
+    if pipeline:
+        pipeline.close()
@@ -0,0 +1,307 @@
+"""
+OpenClaw Event Store - Batched Job/Event Persistence
+
+Buffers job snapshots and events from the bridge and writes them to Postgres
+in batches, so task history survives restarts without putting a database
+round trip on the event fan-out path.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from ..core.events import Event
+from ..core.job_schema import Job
+
+logger = logging.getLogger(__name__)
+
+
+# Columns the bridge needs on top of the base openclaw_tasks table. Kept
+# idempotent so it can run on every start (also part of MIGRATION_SQL).
+STORE_SCHEMA_SQL = """
+ALTER TABLE openclaw_tasks ADD COLUMN IF NOT EXISTS vm_id VARCHAR(255);
+ALTER TABLE openclaw_tasks ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 0;
+ALTER TABLE openclaw_tasks ADD COLUMN IF NOT EXISTS job JSONB;
+ALTER TABLE openclaw_tasks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX IF NOT EXISTS idx_openclaw_tasks_status ON openclaw_tasks(status);
+CREATE INDEX IF NOT EXISTS idx_openclaw_events_task_created ON openclaw_events(task_id, created_at);
+"""
+
+# Rows for users that no longer exist are skipped instead of failing the batch
+UPSERT_JOBS_SQL = """
+INSERT INTO openclaw_tasks (
+    id, user_id, session_id, description, status, steps, current_step,
+    result, error_message, started_at, completed_at, created_at,
+    policy_profile, max_runtime_minutes, vm_id, priority, job, updated_at
+)
+SELECT j.id, j.user_id, s.id, j.description, j.status, j.steps, j.current_step,
+       j.result, j.error_message, j.started_at, j.completed_at, j.created_at,
+       j.policy_profile, j.max_runtime_minutes, j.vm_id, j.priority, j.job, NOW()
+FROM unnest(
+    $1::uuid[], $2::int[], $3::text[], $4::text[], $5::text[], $6::jsonb[], $7::int[],
+    $8::text[], $9::text[], $10::timestamptz[], $11::timestamptz[], $12::timestamptz[],
+    $13::text[], $14::int[], $15::text[], $16::int[], $17::jsonb[]
+) AS j(id, user_id, session_id, description, status, steps, current_step,
+       result, error_message, started_at, completed_at, created_at,
+       policy_profile, max_runtime_minutes, vm_id, priority, job)
+JOIN users u ON u.id = j.user_id
+LEFT JOIN chat_sessions s ON s.id::text = j.session_id
+ON CONFLICT (id) DO UPDATE SET
+    status = EXCLUDED.status,
+    steps = EXCLUDED.steps,
+    current_step = EXCLUDED.current_step,
+    result = EXCLUDED.result,
+    error_message = EXCLUDED.error_message,
+    started_at = EXCLUDED.started_at,
+    completed_at = EXCLUDED.completed_at,
+    vm_id = EXCLUDED.vm_id,
+    priority = EXCLUDED.priority,
+    job = EXCLUDED.job,
+    updated_at = NOW()
+"""
+
+# Events for tasks that were never stored (e.g. skipped above) are dropped
+INSERT_EVENTS_SQL = """
+INSERT INTO openclaw_events (task_id, event_type, payload, created_at)
+SELECT e.task_id, e.event_type, e.payload, e.created_at
+FROM unnest($1::uuid[], $2::text[], $3::jsonb[], $4::timestamptz[])
+     WITH ORDINALITY AS e(task_id, event_type, payload, created_at, ord)
+JOIN openclaw_tasks t ON t.id = e.task_id
+ORDER BY e.ord
+"""
+
+
+def _json(value: Any) -> str:
+    return json.dumps(value, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+
+def _job_row(job: Job) -> tuple:
+    data = json.loads(job.json())
+    return (
+        job.id,
+        job.user_id,
+        job.session_id,
+        job.description or job.task_prompt,
+        job.status.value if hasattr(job.status, "value") else str(job.status),
+        _json(data.get("steps", [])),
+        job.current_step,
+        job.result,
+        job.error_message,
+        job.started_at,
+        job.completed_at,
+        job.created_at,
+        job.policy_profile,
+        job.max_runtime_minutes,
+        job.vm_id,
+        job.priority,
+        _json(data),
+    )
+
+
+class OpenClawEventStore:
+    """
+    Write-behind persistence for OpenClaw jobs and events.
+
+    Job snapshots are coalesced per job id (the latest state wins) and events
+    are appended; both are flushed after a short window, or as soon as
+    ``max_batch`` items are pending, with one ``unnest`` insert per table in a
+    single transaction. Jobs are written before events so the foreign key on
+    ``openclaw_events.task_id`` holds. Without a pool the store is a no-op.
+    """
+
+    def __init__(self, pool=None, flush_interval: float = 0.2, max_batch: int = 500,
+                 max_pending: int = 20000, max_attempts: int = 3):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        self._jobs: Dict[str, tuple] = {}
+        self._events: Deque[tuple] = deque()
+        self._attempts = 0
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._schema_ready = False
+        self._closed = False
+
+        self.stats = {
+            "events_enqueued": 0,
+            "events_written": 0,
+            "jobs_written": 0,
+            "flushes": 0,
+            "failed": 0,
+            "dropped": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    def enqueue_job(self, job: Job):
+        """Queue the current state of a job; earlier pending snapshots are replaced"""
+        if not self.enabled or self._closed:
+            return
+        self._jobs[job.id] = _job_row(job)
+        self._kick()
+
+    def enqueue_event(self, event: Event):
+        """Queue an event for the next batch"""
+        if not self.enabled or self._closed:
+            return
+        if len(self._events) >= self.max_pending:
+            # Database is not keeping up; shed the oldest history rather than grow unbounded
+            self._events.popleft()
+            self.stats["dropped"] += 1
+        event_type = event.type.value if hasattr(event.type, "value") else str(event.type)
+        self._events.append((event.job_id, event_type, _json(event.payload), event.timestamp))
+        self.stats["events_enqueued"] += 1
+        self._kick()
+
+    async def flush(self) -> int:
+        """Write everything pending now. Returns the number of events written."""
+        if not self.enabled:
+            return 0
+        async with self._flush_lock:
+            jobs, self._jobs = self._jobs, {}
+            events, self._events = self._events, deque()
+            if not jobs and not events:
+                return 0
+
+            try:
+                async with self.pool.acquire() as conn:
+                    await self._ensure_schema(conn)
+                    async with conn.transaction():
+                        if jobs:
+                            await conn.execute(UPSERT_JOBS_SQL, *map(list, zip(*jobs.values())))
+                        if events:
+                            await conn.execute(INSERT_EVENTS_SQL, *map(list, zip(*events)))
+            except Exception as e:
+                self.stats["failed"] += 1
+                self._attempts += 1
+                if self._attempts < self.max_attempts:
+                    # Newer snapshots queued during the failed write take precedence
+                    self._jobs = {**jobs, **self._jobs}
+                    events.extend(self._events)
+                    self._events = events
+                    self._wakeup.set()
+                else:
+                    self._attempts = 0
+                    self.stats["dropped"] += len(events)
+                logger.error(f"OpenClaw event store flush failed: {e}")
+                return 0
+
+            self._attempts = 0
+            self.stats["flushes"] += 1
+            self.stats["jobs_written"] += len(jobs)
+            self.stats["events_written"] += len(events)
+            return len(events)
+
+    async def load_jobs(self, active_only: bool = True) -> List[Job]:
+        """Jobs persisted by a previous process, oldest first"""
+        if not self.enabled:
+            return []
+        query = "SELECT job FROM openclaw_tasks WHERE job IS NOT NULL"
+        if active_only:
+            query += " AND status IN ('pending', 'queued', 'vm_booting', 'running', 'paused')"
+        async with self.pool.acquire() as conn:
+            await self._ensure_schema(conn)
+            rows = await conn.fetch(query + " ORDER BY created_at")
+
+        jobs = []
+        for row in rows:
+            data = row["job"]
+            try:
+                jobs.append(Job(**(json.loads(data) if isinstance(data, str) else data)))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable persisted OpenClaw job: {e}")
+        return jobs
+
+    async def load_job(self, job_id: str) -> Optional[Job]:
+        """A single persisted job, or None"""
+        if not self.enabled:
+            return None
+        await self.flush()
+        async with self.pool.acquire() as conn:
+            data = await conn.fetchval(
+                "SELECT job FROM openclaw_tasks WHERE id::text = $1 AND job IS NOT NULL", job_id
+            )
+        if data is None:
+            return None
+        return Job(**(json.loads(data) if isinstance(data, str) else data))
+
+    async def get_events(self, job_id: str, limit: int = 500,
+                         after: Optional[datetime] = None) -> List[Event]:
+        """Stored event history for a job, oldest first"""
+        if not self.enabled:
+            return []
+        # Make sure anything still buffered for this job is visible
+        await self.flush()
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT event_type, payload, created_at FROM openclaw_events
+                WHERE task_id::text = $1 AND ($2::timestamptz IS NULL OR created_at > $2)
+                ORDER BY created_at LIMIT $3
+                """,
+                job_id, after, limit,
+            )
+        return [
+            Event(
+                type=row["event_type"],
+                job_id=job_id,
+                timestamp=row["created_at"],
+                payload=json.loads(row["payload"]) if isinstance(row["payload"], str) else row["payload"],
+            )
+            for row in rows
+        ]
+
+    async def close(self):
+        """Stop the flusher and write whatever is still pending"""
+        self._closed = True
+        if self._task:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        for _ in range(self.max_attempts):
+            if not self._jobs and not self._events:
+                break
+            await self.flush()
+        if self._events:
+            self.stats["dropped"] += len(self._events)
+            logger.error(f"Dropped {len(self._events)} OpenClaw events that could not be written on shutdown")
+        self._jobs, self._events = {}, deque()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "pending_jobs": len(self._jobs),
+            "pending_events": len(self._events),
+        }
+
+    async def _ensure_schema(self, conn):
+        if not self._schema_ready:
+            await conn.execute(STORE_SCHEMA_SQL)
+            self._schema_ready = True
+
+    def _kick(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if len(self._events) + len(self._jobs) < self.max_batch and not self._closed:
+                # Let a burst of events from concurrent jobs land in one batch
+                await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"OpenClaw event store flush loop error: {e}")
@@ -481,6 +481,26 @@ def chunk_text_for_qwen_tts(text: str, max_chars: int = 500) -> list:
     return chunks
 
 
+def qwen_cache_spec(
+    ref_audio: str = None,
+    ref_text: str = None,
+    language: str = None,
+    temperature: float = 0.3,
+    repetition_penalty: float = 1.1,
+) -> dict:
+    """TTS cache key fields for Qwen3-TTS, with the same defaults generate_qwen_speech applies"""
+    return {
+        "engine": "qwen",
+        "voice": ref_audio or DEFAULT_REF_AUDIO,
+        "params": {
+            "ref_text": ref_text,
+            "language": language or DEFAULT_LANGUAGE,
+            "temperature": temperature,
+            "repetition_penalty": repetition_penalty,
+        },
+    }
+
+
 def generate_qwen_speech_chunked(
     text: str,
     interface=None,
@@ -499,6 +519,31 @@ def generate_qwen_speech_chunked(
         Tuple of (sample_rate, concatenated_audio_numpy_array)
     """
     model = interface
+
+    # Per-sentence audio cache: only new sentences are synthesized, and the
+    # model is not loaded at all when every sentence is cached
+    from tts_cache import get_tts_cache
+
+    cache = get_tts_cache()
+    if cache is not None:
+
+        def render(sentence):
+            nonlocal model
+            if model is None:
+                model = load_qwen_tts_model()
+            return generate_qwen_speech(
+                text=sentence,
+                interface=model,
+                ref_audio=ref_audio,
+                ref_text=ref_text,
+                language=language,
+                temperature=temperature,
+                repetition_penalty=repetition_penalty,
+            )
+
+        spec = qwen_cache_spec(ref_audio, ref_text, language, temperature, repetition_penalty)
+        return cache.synthesize(text, render, **spec)
+
     if model is None:
         model = load_qwen_tts_model()
 
@@ -17,6 +17,7 @@ Usage:
 """
 
 from .job_manager import JobManager, Job, JobStatus
+from .job_store import JobStore, MemoryJobStore, PostgresJobStore
 from .source_fetchers import (
     BaseFetcher,
     NextJSDocsFetcher,
@@ -30,6 +31,7 @@ from .source_fetchers import (
     get_fetcher_for_config,
 )
 from .chunker import DocumentChunker, Chunk, RawDocument
+from .chunk_store import ChunkStore, get_chunk_store
 from .embedding_adapter import EmbeddingAdapter
 from .vectordb_adapter import (
     VectorDBAdapter,
@@ -61,6 +63,9 @@ __all__ = [
     "JobManager",
     "Job",
     "JobStatus",
+    "JobStore",
+    "MemoryJobStore",
+    "PostgresJobStore",
     # Fetchers
     "BaseFetcher",
     "NextJSDocsFetcher",
@@ -76,6 +81,8 @@ __all__ = [
     "DocumentChunker",
     "Chunk",
     "RawDocument",
+    "ChunkStore",
+    "get_chunk_store",
     # Adapters
     "EmbeddingAdapter",
     "VectorDBAdapter",
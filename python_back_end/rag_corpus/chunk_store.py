@@ -0,0 +1,442 @@
+"""
+Segment-based chunk store for the RAG corpus
+
+Chunks used to be written as one pretty-printed JSON file each, so a large
+docs source meant hundreds of thousands of tiny files that were slow to
+write, slow to list and hard on inodes. The store keeps the same per-source
+directories but appends chunks to a few large segment files instead:
+
+rag_dir/
+  kubernetes_docs/
+    MANIFEST            live segments for the source, swapped atomically
+    seg-000001.jsonl    one compact JSON chunk per line, append-only
+    seg-000001.idx      "<chunk_id>\\t<offset>\\t<length>" per chunk
+    ...
+
+Re-persisting a chunk id appends a new record and the index points at the
+newest copy. Replacing a source writes fresh segments and swaps the
+manifest. Compaction copies live records into new segments and runs
+automatically once dead bytes pass RAG_CHUNK_COMPACT_RATIO. Legacy
+<chunk_id>.json files are migrated the first time the store opens a
+directory.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .chunker import Chunk
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAX_BYTES = int(os.getenv("RAG_CHUNK_SEGMENT_MB", "64")) * 1024 * 1024
+COMPACT_RATIO = float(os.getenv("RAG_CHUNK_COMPACT_RATIO", "0.5"))
+COMPACT_MIN_BYTES = 1024 * 1024
+
+MANIFEST = "MANIFEST"
+
+# chunk id -> (segment name, byte offset, byte length)
+Location = Tuple[str, int, int]
+
+
+class _SourceState:
+    """In-memory manifest and offset index for one source"""
+
+    def __init__(self, segments: List[str], next_segment: int):
+        self.segments = segments
+        self.next_segment = next_segment
+        self.index: Dict[str, Location] = {}
+        self.segment_sizes: Dict[str, int] = {}
+        self.live_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.segment_sizes.values())
+
+    @property
+    def dead_bytes(self) -> int:
+        return self.total_bytes - self.live_bytes
+
+    def add(self, chunk_id: str, location: Location):
+        previous = self.index.get(chunk_id)
+        if previous:
+            self.live_bytes -= previous[2] + 1
+        self.index[chunk_id] = location
+        self.live_bytes += location[2] + 1
+
+
+class ChunkStore:
+    """
+    Append-only segment store for chunks, grouped by source.
+    Use `get_chunk_store(rag_dir)` so every chunker shares one instance per directory.
+    """
+
+    def __init__(self, root: str, segment_max_bytes: int = SEGMENT_MAX_BYTES,
+                 compact_ratio: float = COMPACT_RATIO):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_ratio = compact_ratio
+        self._sources: Optional[Dict[str, _SourceState]] = None
+        self._fds: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.RLock()
+
+    # ── Reads ────────────────────────────────────────────────────────────────
+
+    def get(self, chunk_id: str, source: Optional[str] = None) -> Optional[Chunk]:
+        """Random access by chunk id (optionally scoped to a source)"""
+        with self._lock:
+            sources = self._ensure_loaded()
+            names = [source] if source else list(sources)
+            for name in names:
+                state = sources.get(name)
+                location = state.index.get(chunk_id) if state else None
+                if location:
+                    segment, offset, length = location
+                    record = os.pread(self._fd(name, segment), length, offset)
+                    break
+            else:
+                return None
+        return Chunk.from_dict(_decoder.decode(record.decode("utf-8")))
+
+    def iter_chunks(self, source: Optional[str] = None) -> Iterator[Chunk]:
+        """Stream the live chunks of one source, or all of them"""
+        # Open the segments under the lock; an open file survives a concurrent
+        # compaction unlinking it, so the iteration sees one consistent snapshot
+        with self._lock:
+            sources = self._ensure_loaded()
+            names = [source] if source else sorted(sources)
+            plans = []
+            for name in names:
+                state = sources.get(name)
+                if state:
+                    index = dict(state.index) if state.dead_bytes else None
+                    for segment in state.segments:
+                        plans.append((segment, open(self.root / name / f"{segment}.jsonl", "rb"), index))
+
+        try:
+            for segment, f, index in plans:
+                if index is None:
+                    # Nothing superseded in this source: every complete line is live
+                    *lines, _ = f.read().decode("utf-8").split("\n")
+                    for line in lines:
+                        if line:
+                            yield Chunk.from_dict(_decoder.decode(line))
+                    continue
+                for chunk_id, offset, record in self._scan_from(f, 0):
+                    if index.get(chunk_id, (None, None))[:2] != (segment, offset):
+                        continue  # superseded by a newer copy
+                    yield Chunk.from_dict(_decoder.decode(record.decode("utf-8")))
+        finally:
+            for _, f, _ in plans:
+                f.close()
+
+    def load(self, source: Optional[str] = None) -> List[Chunk]:
+        return list(self.iter_chunks(source))
+
+    def count(self, source: Optional[str] = None) -> int:
+        with self._lock:
+            sources = self._ensure_loaded()
+            if source:
+                return len(sources[source].index) if source in sources else 0
+            return sum(len(state.index) for state in sources.values())
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-source chunk counts, segment counts and dead bytes"""
+        with self._lock:
+            return {
+                name: {
+                    "chunks": len(state.index),
+                    "segments": len(state.segments),
+                    "bytes": state.total_bytes,
+                    "dead_bytes": state.dead_bytes,
+                }
+                for name, state in sorted(self._ensure_loaded().items())
+            }
+
+    # ── Writes ───────────────────────────────────────────────────────────────
+
+    def append(self, chunks: Iterable[Chunk]) -> int:
+        """Add chunks under their metadata source; a repeated id supersedes the old copy"""
+        by_source: Dict[str, List[Chunk]] = {}
+        for chunk in chunks:
+            by_source.setdefault(chunk.metadata.get("source", "unknown"), []).append(chunk)
+
+        written = 0
+        with self._lock:
+            self._ensure_loaded()
+            for source, items in by_source.items():
+                state = self._state(source)
+                written += self._write_records(source, state, _encode(items), reuse_tail=True)
+                self._write_manifest(source, state)
+                self._maybe_compact(source)
+        return written
+
+    def replace_source(self, source: str, chunks: Iterable[Chunk]) -> int:
+        """Atomically replace every chunk of `source` with `chunks`"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._rewrite(source, _encode(chunks))
+
+    def delete_source(self, source: str) -> int:
+        """Drop a source's segments; returns the number of chunks removed"""
+        with self._lock:
+            sources = self._ensure_loaded()
+            state = sources.pop(source, None)
+            if state is None:
+                return 0
+            source_dir = self.root / source
+            (source_dir / MANIFEST).unlink(missing_ok=True)
+            self._remove_segments(source, state.segments)
+            try:
+                source_dir.rmdir()
+            except OSError:
+                pass  # other files live here too
+            return len(state.index)
+
+    def compact(self, source: Optional[str] = None) -> int:
+        """Rewrite sources so only live records remain; returns bytes reclaimed"""
+        reclaimed = 0
+        with self._lock:
+            sources = self._ensure_loaded()
+            for name in [source] if source else list(sources):
+                state = sources.get(name)
+                if state is None or (state.dead_bytes == 0 and len(state.segments) <= 1):
+                    continue
+                before = state.total_bytes
+                self._rewrite(name, self._live_records(name, state))
+                reclaimed += before - sources[name].total_bytes
+        return reclaimed
+
+    def migrate_legacy(self) -> int:
+        """Fold legacy <source>/<chunk_id>.json files into segments, then delete them"""
+        migrated = 0
+        with self._lock:
+            self._ensure_loaded()
+            for source_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+                files = sorted(source_dir.glob("*.json"))
+                if not files:
+                    continue
+                chunks, done = [], []
+                for chunk_file in files:
+                    try:
+                        with open(chunk_file, "r", encoding="utf-8") as f:
+                            chunks.append(Chunk.from_dict(json.load(f)))
+                        done.append(chunk_file)
+                    except Exception as e:
+                        logger.warning(f"Error migrating {chunk_file}: {e}")
+                # Legacy layout named the directory after the source
+                for chunk in chunks:
+                    chunk.metadata["source"] = source_dir.name
+                state = self._state(source_dir.name)
+                self._write_records(source_dir.name, state, _encode(chunks), reuse_tail=True)
+                self._write_manifest(source_dir.name, state)
+                for chunk_file in done:
+                    chunk_file.unlink()
+                migrated += len(chunks)
+                logger.info(f"Migrated {len(chunks)} legacy chunk files from {source_dir.name} into segments")
+        return migrated
+
+    def close(self):
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+
+    # ── Internals ────────────────────────────────────────────────────────────
+
+    def _ensure_loaded(self) -> Dict[str, _SourceState]:
+        if self._sources is None:
+            self._sources = {}
+            for source_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+                if (source_dir / MANIFEST).exists():
+                    self._sources[source_dir.name] = self._load_source(source_dir)
+            legacy = any(next(p.glob("*.json"), None) for p in self.root.iterdir() if p.is_dir())
+            if legacy:
+                self.migrate_legacy()
+        return self._sources
+
+    def _load_source(self, source_dir: Path) -> _SourceState:
+        with open(source_dir / MANIFEST, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        state = _SourceState(manifest["segments"], manifest["next_segment"])
+        for segment in state.segments:
+            data_path = source_dir / f"{segment}.jsonl"
+            index_path = source_dir / f"{segment}.idx"
+            end = 0
+            if index_path.exists():
+                with open(index_path, "rb") as f:
+                    raw = f.read()
+                complete = raw.rfind(b"\n") + 1
+                if complete < len(raw):
+                    # Torn final line; trim it so the next append starts on a fresh line
+                    with open(index_path, "r+b") as f:
+                        f.truncate(complete)
+                for line in raw[:complete].decode("utf-8").split("\n")[:-1]:
+                    chunk_id, offset, length = line.split("\t")
+                    state.add(chunk_id, (segment, int(offset), int(length)))
+                    end = int(offset) + int(length) + 1
+            size = data_path.stat().st_size if data_path.exists() else 0
+            if size > end:
+                end = self._recover_tail(data_path, index_path, segment, end, state)
+                if end < size:
+                    # Drop a half-written record so later appends stay line-aligned
+                    with open(data_path, "r+b") as f:
+                        f.truncate(end)
+            state.segment_sizes[segment] = end
+        return state
+
+    def _recover_tail(self, data_path: Path, index_path: Path, segment: str, start: int,
+                      state: _SourceState) -> int:
+        """Re-index complete records written after the last index entry (crash between writes)"""
+        entries = []
+        end = start
+        with open(data_path, "rb") as f:
+            f.seek(start)
+            for chunk_id, offset, record in self._scan_from(f, start):
+                entries.append((chunk_id, offset, len(record)))
+                end = offset + len(record) + 1
+        if entries:
+            with open(index_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{i}\t{o}\t{n}\n" for i, o, n in entries))
+            for chunk_id, offset, length in entries:
+                state.add(chunk_id, (segment, offset, length))
+            logger.warning(f"Recovered {len(entries)} unindexed chunks in {data_path}")
+        return end
+
+    def _state(self, source: str) -> _SourceState:
+        sources = self._sources
+        if source not in sources:
+            (self.root / source).mkdir(parents=True, exist_ok=True)
+            sources[source] = _SourceState([], 1)
+        return sources[source]
+
+    def _write_records(self, source: str, state: _SourceState,
+                       records: Iterable[Tuple[str, bytes]], reuse_tail: bool) -> int:
+        """Append encoded records to the source's segments, rolling over by size"""
+        source_dir = self.root / source
+        segment = state.segments[-1] if reuse_tail and state.segments else None
+        written = 0
+        data_f = index_f = None
+        try:
+            for chunk_id, record in records:
+                if segment is None or state.segment_sizes.get(segment, 0) >= self.segment_max_bytes:
+                    if data_f:
+                        data_f.close()
+                        index_f.close()
+                        data_f = None
+                    segment = f"seg-{state.next_segment:06d}"
+                    state.next_segment += 1
+                    state.segments.append(segment)
+                    state.segment_sizes[segment] = 0
+                if data_f is None:
+                    data_f = open(source_dir / f"{segment}.jsonl", "ab")
+                    index_f = open(source_dir / f"{segment}.idx", "a", encoding="utf-8")
+                offset = state.segment_sizes[segment]
+                data_f.write(record + b"\n")
+                index_f.write(f"{chunk_id}\t{offset}\t{len(record)}\n")
+                state.segment_sizes[segment] = offset + len(record) + 1
+                state.add(chunk_id, (segment, offset, len(record)))
+                written += 1
+        finally:
+            if data_f:
+                # Data before index, so a crash leaves records to recover, not dangling offsets
+                data_f.close()
+                index_f.close()
+        return written
+
+    def _rewrite(self, source: str, records: Iterable[Tuple[str, bytes]]) -> int:
+        """Write `records` to fresh segments, swap the manifest, then drop the old segments"""
+        old = self._sources.get(source)
+        fresh = _SourceState([], old.next_segment if old else 1)
+        (self.root / source).mkdir(parents=True, exist_ok=True)
+        written = self._write_records(source, fresh, records, reuse_tail=False)
+        self._write_manifest(source, fresh)
+        self._sources[source] = fresh
+        if old:
+            self._remove_segments(source, old.segments)
+        return written
+
+    def _live_records(self, source: str, state: _SourceState) -> Iterator[Tuple[str, bytes]]:
+        for segment in list(state.segments):
+            with open(self.root / source / f"{segment}.jsonl", "rb") as f:
+                for chunk_id, offset, record in self._scan_from(f, 0):
+                    if state.index.get(chunk_id, (None, None))[:2] == (segment, offset):
+                        yield chunk_id, record
+
+    def _maybe_compact(self, source: str):
+        state = self._sources[source]
+        if state.total_bytes >= COMPACT_MIN_BYTES and state.dead_bytes > state.total_bytes * self.compact_ratio:
+            reclaimed = self.compact(source)
+            logger.info(f"Compacted {source} chunk segments, reclaimed {reclaimed} bytes")
+
+    def _write_manifest(self, source: str, state: _SourceState):
+        path = self.root / source / MANIFEST
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": state.segments, "next_segment": state.next_segment}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _remove_segments(self, source: str, segments: List[str]):
+        for segment in segments:
+            fd = self._fds.pop((source, segment), None)
+            if fd is not None:
+                os.close(fd)
+            for suffix in (".jsonl", ".idx"):
+                (self.root / source / f"{segment}{suffix}").unlink(missing_ok=True)
+
+    def _fd(self, source: str, segment: str) -> int:
+        """Cached read-only descriptor for point lookups (pread needs no seek)"""
+        fd = self._fds.get((source, segment))
+        if fd is None:
+            fd = self._fds[(source, segment)] = os.open(self.root / source / f"{segment}.jsonl", os.O_RDONLY)
+        return fd
+
+    @staticmethod
+    def _scan_from(f, start: int) -> Iterator[Tuple[str, int, bytes]]:
+        """Yield (chunk_id, offset, record) for each complete line from `start`"""
+        data = f.read()
+        offset = start
+        pos = 0
+        while True:
+            newline = data.find(b"\n", pos)
+            if newline < 0:
+                return
+            record = data[pos:newline]
+            if record:
+                # Records are written as {"id":"<chunk_id>",...; avoid a full parse for the id
+                if record.startswith(b'{"id":"'):
+                    chunk_id = record[7:record.index(b'"', 7)].decode()
+                else:
+                    chunk_id = json.loads(record)["id"]
+                yield chunk_id, offset, record
+            offset += newline + 1 - pos
+            pos = newline + 1
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_decoder = json.JSONDecoder()
+
+
+def _encode(chunks: Iterable[Chunk]) -> Iterator[Tuple[str, bytes]]:
+    for chunk in chunks:
+        yield chunk.id, _encoder.encode(chunk.to_dict()).encode("utf-8")
+
+
+_stores: Dict[str, ChunkStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_chunk_store(rag_dir: str) -> ChunkStore:
+    """Shared store per directory so concurrent jobs append to the same segments safely"""
+    key = os.path.realpath(rag_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ChunkStore(key)
+        return store
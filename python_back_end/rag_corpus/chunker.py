@@ -6,7 +6,6 @@ Preserves metadata and structure.
 """
 
 import hashlib
-import json
 import logging
 import os
 import re
@@ -17,6 +16,12 @@ from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Hard cap on chunk text (_create_chunk truncates past it); token-budgeted chunks stay under it
+MAX_CHUNK_CHARS = 6000
+
+# Progressively finer split points for text that exceeds the token budget
+_SPLIT_LEVELS = (r"(?<=[.!?])\s+", r"\n+", r"\s+")
+
 
 @dataclass
 class RawDocument:
@@ -60,30 +65,55 @@ class DocumentChunker:
     Splits documents into chunks for embedding.
     
     Uses a simple sentence/paragraph-aware splitting strategy with overlap.
+    With a tokenizer, chunk_size and overlap are token counts and no chunk
+    exceeds chunk_size tokens (see `for_model`).
     """
     
     def __init__(
         self,
         chunk_size: int = 1000,
         overlap: int = 200,
-        rag_dir: Optional[str] = None
+        rag_dir: Optional[str] = None,
+        tokenizer=None,
     ):
         """
         Initialize the chunker.
         
         Args:
-            chunk_size: Target size of each chunk in characters
-            overlap: Overlap between chunks for context
+            chunk_size: Target size of each chunk in characters (tokens with a tokenizer)
+            overlap: Overlap between chunks for context (same unit as chunk_size)
             rag_dir: Directory to persist chunks
+            tokenizer: Optional tokenization.Tokenizer to budget chunks in tokens
         """
         self.chunk_size = chunk_size
         self.overlap = overlap
         self.rag_dir = Path(rag_dir) if rag_dir else None
+        self.tokenizer = tokenizer
         
         # Ensure RAG directory exists
         if self.rag_dir:
             self.rag_dir.mkdir(parents=True, exist_ok=True)
     
+    @classmethod
+    def for_model(cls, model_name: str, rag_dir: Optional[str] = None):
+        """
+        Chunker sized in tokens for an embedding model's tier, so the
+        embedding adapter never has to truncate its chunks.
+        
+        Args:
+            model_name: Embedding model the chunks are destined for
+            rag_dir: Directory to persist chunks
+        """
+        from .tokenization import get_token_budget
+        
+        budget = get_token_budget(model_name)
+        return cls(
+            chunk_size=budget.chunk_tokens,
+            overlap=budget.overlap_tokens,
+            rag_dir=rag_dir,
+            tokenizer=budget.tokenizer,
+        )
+    
     def chunk_document(self, doc: RawDocument) -> List[Chunk]:
         """
         Split a document into chunks.
@@ -99,6 +129,11 @@ class DocumentChunker:
         # Split content into paragraphs
         paragraphs = self._split_paragraphs(doc.content)
         
+        if self.tokenizer:
+            chunks = self._pack_tokens(doc, paragraphs)
+            logger.debug(f"Split document {doc.id} into {len(chunks)} chunks")
+            return chunks
+        
         current_chunk = []
         current_size = 0
         chunk_index = 0
@@ -145,12 +180,101 @@ class DocumentChunker:
         
         return paragraphs
     
+    def _pack_tokens(self, doc: RawDocument, units: List[str]) -> List[Chunk]:
+        """Greedily pack text units into chunks of at most chunk_size tokens"""
+        count = self.tokenizer.count
+        separator = count("\n\n")
+        chunks = []
+        current: List[str] = []
+        size = chars = 0
+        has_new = False  # current holds more than the carried-over overlap
+        
+        for piece in (p for unit in units for p in self._fit_tokens(unit)):
+            n = count(piece)
+            if has_new and (size + separator + n > self.chunk_size or chars + 2 + len(piece) > MAX_CHUNK_CHARS):
+                chunk_text = "\n\n".join(current)
+                chunks.append(self._create_chunk(doc, chunk_text, len(chunks)))
+                
+                # Keep overlap (in tokens) from the end of the previous chunk
+                overlap_text = self._token_tail(chunk_text)
+                current = [overlap_text] if overlap_text else []
+                size, chars, has_new = count(overlap_text), len(overlap_text), False
+            
+            if current and (size + separator + n > self.chunk_size or chars + 2 + len(piece) > MAX_CHUNK_CHARS):
+                # Overlap and this piece don't fit together; the piece wins
+                current, size, chars = [], 0, 0
+            
+            if current:
+                size += separator
+                chars += 2
+            current.append(piece)
+            size += n
+            chars += len(piece)
+            has_new = True
+        
+        if has_new:
+            chunks.append(self._create_chunk(doc, "\n\n".join(current), len(chunks)))
+        
+        return chunks
+    
+    def _fits(self, text: str) -> bool:
+        return self.tokenizer.count(text) <= self.chunk_size and len(text) <= MAX_CHUNK_CHARS
+    
+    def _fit_tokens(self, text: str, level: int = 0) -> List[str]:
+        """Split text at sentence, line, then word boundaries until every piece fits"""
+        if self._fits(text):
+            return [text]
+        
+        if level == len(_SPLIT_LEVELS):
+            # A single run with no whitespace (minified code, base64): cut by tokens
+            pieces = []
+            while text:
+                head = self.tokenizer.truncate(text[:MAX_CHUNK_CHARS], self.chunk_size) or text[:1]
+                pieces.append(head)
+                text = text[len(head):]
+            return pieces
+        
+        # Split keeping the separators, then merge runs back up to the budget
+        parts = re.split(f"({_SPLIT_LEVELS[level]})", text)
+        pieces = []
+        buffer = ""
+        size = 0
+        for i in range(0, len(parts), 2):
+            segment = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+            n = self.tokenizer.count(segment)
+            if buffer and (size + n > self.chunk_size or len(buffer) + len(segment) > MAX_CHUNK_CHARS):
+                pieces.extend(self._fit_tokens(buffer.strip(), level + 1))
+                buffer, size = "", 0
+            buffer += segment
+            size += n
+        if buffer.strip():
+            pieces.extend(self._fit_tokens(buffer.strip(), level + 1))
+        
+        return [p for p in pieces if p]
+    
+    def _token_tail(self, text: str) -> str:
+        """Longest suffix starting at a word with at most `overlap` tokens"""
+        if self.overlap <= 0:
+            return ""
+        
+        starts = [m.start() for m in re.finditer(r"\S+", text)]
+        lo, hi = 0, len(starts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.tokenizer.count(text[starts[mid]:]) <= self.overlap:
+                hi = mid
+            else:
+                lo = mid + 1
+        
+        # lo == 0 would repeat the whole chunk
+        return text[starts[lo]:] if 0 < lo < len(starts) else ""
+    
     def _create_chunk(
         self,
         doc: RawDocument,
         text: str,
         index: int,
-        max_chunk_size: int = 6000  # Safe limit for most embedding models
+        max_chunk_size: int = MAX_CHUNK_CHARS  # Safe limit for most embedding models
     ) -> Chunk:
         """Create a chunk with metadata."""
         # Hard cap on chunk size to prevent context length errors
@@ -184,31 +308,41 @@ class DocumentChunker:
             metadata=metadata,
         )
     
-    def persist_chunks(self, chunks: List[Chunk]) -> None:
+    @property
+    def store(self):
+        """Segment store backing persistence (shared per rag_dir)"""
+        from .chunk_store import get_chunk_store
+
+        return get_chunk_store(str(self.rag_dir)) if self.rag_dir else None
+
+    def persist_chunks(self, chunks: List[Chunk], replace: bool = False) -> None:
         """
         Persist chunks to the RAG directory.
         
-        Organizes by source:
+        Chunks are appended to per-source segment files (see chunk_store):
         rag_dir/
           nextjs_docs/
-            <chunk_id>.json
-          stack_overflow/
-            <chunk_id>.json
+            MANIFEST
+            seg-000001.jsonl
+            seg-000001.idx
           ...
+        
+        Args:
+            chunks: Chunks to persist; a chunk id seen before supersedes the old copy
+            replace: Replace every stored chunk of the sources present in `chunks`
         """
         if not self.rag_dir:
             logger.warning("No RAG directory configured, skipping persistence")
             return
         
-        for chunk in chunks:
-            source = chunk.metadata.get("source", "unknown")
-            source_dir = self.rag_dir / source
-            source_dir.mkdir(exist_ok=True)
-            
-            chunk_file = source_dir / f"{chunk.id}.json"
-            
-            with open(chunk_file, "w", encoding="utf-8") as f:
-                json.dump(chunk.to_dict(), f, indent=2, ensure_ascii=False)
+        if replace:
+            by_source: Dict[str, List[Chunk]] = {}
+            for chunk in chunks:
+                by_source.setdefault(chunk.metadata.get("source", "unknown"), []).append(chunk)
+            for source, source_chunks in by_source.items():
+                self.store.replace_source(source, source_chunks)
+        else:
+            self.store.append(chunks)
         
         logger.info(f"Persisted {len(chunks)} chunks to {self.rag_dir}")
     
@@ -225,33 +359,23 @@ class DocumentChunker:
         if not self.rag_dir or not self.rag_dir.exists():
             return []
         
-        chunks = []
-        
-        if source:
-            source_dir = self.rag_dir / source
-            if source_dir.exists():
-                chunks.extend(self._load_from_dir(source_dir))
-        else:
-            # Load from all subdirectories
-            for source_dir in self.rag_dir.iterdir():
-                if source_dir.is_dir():
-                    chunks.extend(self._load_from_dir(source_dir))
-        
-        return chunks
+        return self.store.load(source)
     
-    def _load_from_dir(self, directory: Path) -> List[Chunk]:
-        """Load chunks from a directory."""
-        chunks = []
+    def get_chunk(self, chunk_id: str, source: Optional[str] = None) -> Optional[Chunk]:
+        """
+        Look up a single chunk by id.
         
-        for chunk_file in directory.glob("*.json"):
-            try:
-                with open(chunk_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    chunks.append(Chunk.from_dict(data))
-            except Exception as e:
-                logger.warning(f"Error loading {chunk_file}: {e}")
+        Args:
+            chunk_id: Chunk id
+            source: Optional source to narrow the lookup
+            
+        Returns:
+            The chunk, or None if it is not stored
+        """
+        if not self.rag_dir or not self.rag_dir.exists():
+            return None
         
-        return chunks
+        return self.store.get(chunk_id, source)
     
     def clear_source(self, source: str) -> int:
         """
@@ -261,19 +385,12 @@ class DocumentChunker:
             source: Source to clear
             
         Returns:
-            Number of files deleted
+            Number of chunks deleted
         """
         if not self.rag_dir:
             return 0
         
-        source_dir = self.rag_dir / source
-        if not source_dir.exists():
-            return 0
-        
-        count = 0
-        for chunk_file in source_dir.glob("*.json"):
-            chunk_file.unlink()
-            count += 1
+        count = self.store.delete_source(source)
         
         logger.info(f"Cleared {count} chunks from {source}")
         return count
@@ -285,17 +402,10 @@ class DocumentChunker:
         Returns:
             Dictionary mapping source to chunk count
         """
-        stats = {}
-        
         if not self.rag_dir or not self.rag_dir.exists():
-            return stats
-        
-        for source_dir in self.rag_dir.iterdir():
-            if source_dir.is_dir():
-                count = len(list(source_dir.glob("*.json")))
-                stats[source_dir.name] = count
+            return {}
         
-        return stats
+        return {source: stats["chunks"] for source, stats in self.store.get_stats().items()}
 
 
 class MarkdownChunker(DocumentChunker):
@@ -356,6 +466,19 @@ class CodeAwareChunker(DocumentChunker):
         # Split around code blocks
         parts = re.split(f"({code_block_pattern})", doc.content)
         
+        if self.tokenizer:
+            units = []
+            for part in parts:
+                part = part.strip()
+                if not part:
+                    continue
+                if part.startswith("```"):
+                    # Keep code blocks whole when they fit, else split on lines
+                    units.extend([part] if self._fits(part) else self._split_code_block(part))
+                else:
+                    units.extend(self._split_paragraphs(part))
+            return self._pack_tokens(doc, units)
+        
         current_chunk = []
         current_size = 0
         chunk_index = 0
@@ -430,10 +553,16 @@ class CodeAwareChunker(DocumentChunker):
         first_line = lines[0] if lines else "```"
         last_line = "```"
         
+        # Room for the fences in each piece
+        if self.tokenizer:
+            limit = self.chunk_size - self.tokenizer.count(f"{first_line}\n{last_line}") - 2
+        else:
+            limit = self.chunk_size - 10
+        
         for line in lines[1:-1]:  # Skip first and last ```
-            line_size = len(line) + 1
+            line_size = (self.tokenizer.count(line) if self.tokenizer else len(line)) + 1
             
-            if current_size + line_size > self.chunk_size - 10 and current:
+            if current_size + line_size > limit and current:
                 # Create chunk with proper fencing
                 chunk_text = f"{first_line}\n" + "\n".join(current) + f"\n{last_line}"
                 chunks.append(chunk_text)
@@ -13,6 +13,8 @@ from typing import List, Optional
 
 import aiohttp
 
+from .tokenization import EMBED_MAX_CHARS, TokenBudget, get_token_budget
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,6 +30,7 @@ class EmbeddingAdapter:
         model_name: str = "nomic-embed-text",  # 768 dims, excellent quality
         ollama_url: str = "http://ollama:11434",
         use_huggingface_fallback: bool = True,
+        token_budget: Optional[TokenBudget] = None,
     ):
         """
         Initialize the embedding adapter.
@@ -36,10 +39,14 @@ class EmbeddingAdapter:
             model_name: Ollama embedding model name
             ollama_url: URL of Ollama server
             use_huggingface_fallback: Whether to fall back to HuggingFace
+            token_budget: Token limit and tokenizer (defaults to the model's tier)
         """
         self.model_name = model_name
         self.ollama_url = ollama_url.rstrip("/")
         self.use_huggingface_fallback = use_huggingface_fallback
+        self.token_budget = token_budget or get_token_budget(model_name)
+        # Texts cut short before embedding; stays 0 for token-budgeted chunks
+        self.truncations = 0
 
         self._session: Optional[aiohttp.ClientSession] = None
         self._hf_model = None
@@ -145,28 +152,34 @@ class EmbeddingAdapter:
 
         return embeddings
 
-    def _truncate_text(self, text: str, max_chars: int = 8000) -> str:
+    def _truncate_text(
+        self, text: str, max_chars: int = EMBED_MAX_CHARS, max_tokens: Optional[int] = None
+    ) -> str:
         """
         Truncate text to stay within model context limits.
 
-        Most embedding models have 8192 token limits.
-        Using ~4 chars per token as rough estimate, 8000 chars ≈ 2000 tokens (safe margin).
+        Caps at max_chars, then at max_tokens as counted by the tier's
+        tokenizer. Chunks from DocumentChunker.for_model never hit either.
         """
-        if len(text) <= max_chars:
-            return text
-
-        # Truncate and try to end at a sentence/word boundary
         truncated = text[:max_chars]
+        if max_tokens is not None:
+            truncated = self.token_budget.tokenizer.truncate(truncated, max_tokens)
+        if len(truncated) == len(text):
+            return text
+        cut = len(truncated)
 
         # Try to end at sentence boundary
         last_period = truncated.rfind(". ")
         last_newline = truncated.rfind("\n")
         break_point = max(last_period, last_newline)
 
-        if break_point > max_chars * 0.8:  # Only use if we keep at least 80%
+        if break_point > cut * 0.8:  # Only use if we keep at least 80%
             truncated = truncated[: break_point + 1]
 
-        logger.debug(f"Truncated text from {len(text)} to {len(truncated)} chars")
+        self.truncations += 1
+        logger.warning(
+            f"Truncated text for {self.model_name} from {len(text)} to {len(truncated)} chars"
+        )
         return truncated
 
     async def _embed_with_ollama(self, text: str) -> List[float]:
@@ -174,7 +187,7 @@ class EmbeddingAdapter:
         session = await self._get_session()
 
         # Truncate text to prevent context length errors
-        text = self._truncate_text(text)
+        text = self._truncate_text(text, max_tokens=self.token_budget.max_tokens)
 
         payload = {"model": self.model_name, "prompt": text}
 
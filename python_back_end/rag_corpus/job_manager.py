@@ -3,10 +3,16 @@ Job Manager for RAG Corpus Updates
 
 Manages background jobs for fetching, chunking, and embedding documents
 into the vector database.
+
+Jobs are persisted (see job_store) and run through the shared job queue, so
+a restart resumes them instead of starting over: sources that were already
+fetched and chunked are reloaded from the chunk store, and chunks whose
+embedding batch was committed are not embedded again.
 """
 
 import asyncio
 import logging
+import os
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -15,6 +21,16 @@ from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+RAG_JOB_QUEUE = "rag-ingest"
+# Chunks embedded and committed together; a crash re-embeds at most one batch
+RAG_JOB_BATCH_SIZE = int(os.getenv("RAG_JOB_BATCH_SIZE", "64"))
+RAG_JOB_RETRY_LIMIT = int(os.getenv("RAG_JOB_RETRY_LIMIT", "3"))
+# A RUNNING job whose heartbeat is older than RAG_JOB_STALE_S lost its worker
+RAG_JOB_HEARTBEAT_S = float(os.getenv("RAG_JOB_HEARTBEAT_S", "30"))
+RAG_JOB_STALE_S = float(os.getenv("RAG_JOB_STALE_S", str(RAG_JOB_HEARTBEAT_S * 4)))
+# How often workers look for jobs that lost their worker
+RAG_JOB_SWEEP_S = float(os.getenv("RAG_JOB_SWEEP_S", str(RAG_JOB_HEARTBEAT_S)))
+
 
 class JobStatus(str, Enum):
     """Status of a RAG update job."""
@@ -44,14 +60,13 @@ class Job:
     )  # For ansible_playbooks source
     progress: Dict[str, Any] = field(default_factory=dict)
     error: Optional[str] = None
+    attempts: int = 0
     created_at: datetime = field(default_factory=datetime.utcnow)
     updated_at: datetime = field(default_factory=datetime.utcnow)
 
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert job to dictionary for API responses."""
+    def params(self) -> Dict[str, Any]:
+        """What the job was asked to do (fixed at creation)."""
         return {
-            "id": self.id,
-            "status": self.status.value,
             "sources": self.sources,
             "keywords": self.keywords,
             "extra_urls": self.extra_urls,
@@ -59,19 +74,49 @@ class Job:
             "docker_topics": self.docker_topics,
             "kubernetes_topics": self.kubernetes_topics,
             "ansible_paths": self.ansible_paths,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to dictionary for API responses."""
+        return {
+            "id": self.id,
+            "status": self.status.value,
+            **self.params(),
             "progress": self.progress,
             "error": self.error,
+            "attempts": self.attempts,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        """Inverse of to_dict."""
+        return cls(
+            id=data["id"],
+            status=JobStatus(data["status"]),
+            sources=data.get("sources", []),
+            keywords=data.get("keywords", []),
+            extra_urls=data.get("extra_urls", []),
+            python_libraries=data.get("python_libraries", []),
+            docker_topics=data.get("docker_topics", []),
+            kubernetes_topics=data.get("kubernetes_topics", []),
+            ansible_paths=data.get("ansible_paths", []),
+            progress=data.get("progress", {}),
+            error=data.get("error"),
+            attempts=data.get("attempts", 0),
+            created_at=datetime.fromisoformat(data["created_at"]),
+            updated_at=datetime.fromisoformat(data["updated_at"]),
+        )
+
 
 class JobManager:
     """
     Manages RAG corpus update jobs.
 
-    Provides in-memory job queue with background execution.
-    Jobs are persisted to database for recovery.
+    Jobs are persisted in a JobStore (Postgres when a pool is given) and
+    executed by workers on the shared job queue; without a queue they run
+    as background tasks in this process.
     """
 
     def __init__(
@@ -80,6 +125,7 @@ class JobManager:
         rag_dir: str,
         ollama_url: str = "http://ollama:11434",
         embedding_model: str = "nomic-embed-text",  # 768 dims, excellent quality
+        store=None,
     ):
         """
         Initialize the job manager.
@@ -89,12 +135,17 @@ class JobManager:
             rag_dir: Directory for storing RAG documents
             ollama_url: URL of Ollama server
             embedding_model: Model to use for embeddings
+            store: JobStore override (defaults to Postgres, or memory without a pool)
         """
+        from .job_store import MemoryJobStore, PostgresJobStore
+
         self.db_pool = db_pool
         self.rag_dir = rag_dir
         self.ollama_url = ollama_url
         self.embedding_model = embedding_model
-        self._jobs: Dict[str, Job] = {}
+        self.store = store or (PostgresJobStore(db_pool) if db_pool else MemoryJobStore())
+        self._queue = None
+        self._sweeper: Optional[asyncio.Task] = None
         self._running_tasks: Dict[str, asyncio.Task] = {}
 
         # Will be initialized lazily
@@ -184,18 +235,70 @@ class JobManager:
                 "current_phase": "pending",
             },
         )
-        self._jobs[job_id] = job
+        await self.store.save_job(job)
         logger.info(f"Created RAG update job {job_id} for sources: {sources}")
         return job_id
 
-    def get_job(self, job_id: str) -> Optional[Job]:
+    async def initialize(self) -> None:
+        """Create the job tables."""
+        await self.store.initialize()
+
+    async def get_job(self, job_id: str) -> Optional[Job]:
         """Get a job by ID."""
-        return self._jobs.get(job_id)
+        return await self.store.get_job(job_id)
 
-    def list_jobs(self, limit: int = 10) -> List[Job]:
+    async def list_jobs(self, limit: int = 10) -> List[Job]:
         """List recent jobs."""
-        jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
-        return jobs[:limit]
+        return await self.store.list_jobs(limit)
+
+    # ─── Queue workers ────────────────────────────────────────────────────────
+
+    async def start_worker(self, queue=None, concurrency: int = 1) -> None:
+        """
+        Run jobs from the shared job queue, and every RAG_JOB_SWEEP_S requeue
+        jobs whose worker died (no heartbeat for RAG_JOB_STALE_S).
+        """
+        if queue is None:
+            from job_queue import get_job_queue
+
+            queue = await get_job_queue()
+        self._queue = queue
+        for _ in range(concurrency):
+            queue.work(RAG_JOB_QUEUE, self.process_queue_job)
+        await self.resume_interrupted_jobs()
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop_worker(self) -> None:
+        """Stop sweeping; running jobs are requeued when the queue cancels its workers."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(RAG_JOB_SWEEP_S)
+            try:
+                await self.resume_interrupted_jobs()
+            except Exception as e:
+                logger.warning(f"Stale RAG job sweep failed: {e}")
+
+    async def resume_interrupted_jobs(self) -> List[str]:
+        """
+        Requeue jobs left RUNNING by a worker that stopped heartbeating. Their
+        queue jobs, still active, are handed out again; a job without one
+        gets a new queue job.
+        """
+        requeued = set()
+        if self._queue is not None:
+            for queue_job in await self._queue.requeue_stale(RAG_JOB_QUEUE, RAG_JOB_STALE_S):
+                requeued.add(queue_job["data"].get("rag_job_id"))
+        job_ids = await self.store.stale_job_ids(RAG_JOB_STALE_S)
+        for job_id in job_ids:
+            logger.info(f"Job {job_id}: Resuming interrupted RAG update")
+            if job_id not in requeued:
+                await self.run_job_async(job_id)
+        return job_ids
 
     async def run_job_async(self, job_id: str) -> None:
         """
@@ -204,13 +307,17 @@ class JobManager:
         Args:
             job_id: ID of the job to run
         """
-        job = self._jobs.get(job_id)
+        if self._queue is not None:
+            await self._queue.send(RAG_JOB_QUEUE, {"rag_job_id": job_id}, retry_limit=RAG_JOB_RETRY_LIMIT)
+            return
+
+        job = await self.store.claim_job(job_id, RAG_JOB_STALE_S)
         if not job:
-            logger.error(f"Job {job_id} not found")
+            logger.error(f"Job {job_id} not found or already running")
             return
 
         # Create background task
-        task = asyncio.create_task(self._execute_job(job))
+        task = asyncio.create_task(self._run_claimed(job))
         self._running_tasks[job_id] = task
 
         # Clean up task reference when done
@@ -219,18 +326,172 @@ class JobManager:
 
         task.add_done_callback(cleanup)
 
-    async def _execute_job(self, job: Job) -> None:
-        """Execute the job pipeline with per-source embedding models."""
+    async def process_queue_job(self, queue_job) -> None:
+        """job_queue handler for RAG_JOB_QUEUE."""
+        job_id = queue_job.data.get("rag_job_id")
+        job = await self.store.claim_job(job_id, RAG_JOB_STALE_S)
+        if not job:
+            # Finished, cancelled, or running on another worker
+            await queue_job.done({"status": "skipped"})
+            return
+
+        # On failure the queue retries it while attempts remain; checkpoints keep the work done so far
+        retry = queue_job.retry_count < queue_job.retry_limit
+        task = asyncio.create_task(self._run_claimed(job, queue_job, retry=retry))
+        self._running_tasks[job_id] = task
+        try:
+            # wait() rather than await: a user cancel ends the task, not this worker
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            # The worker is shutting down: hand the job to the next one
+            task.cancel()
+            await asyncio.wait({task}, timeout=5)
+            await self._requeue(job, queue_job)
+            raise
+        finally:
+            self._running_tasks.pop(job_id, None)
+
+        if job.status == JobStatus.COMPLETED or task.cancelled():
+            status = "cancelled" if task.cancelled() else job.status.value
+            await queue_job.done({"status": status, "processed": job.progress.get("processed", 0)})
+        else:
+            await queue_job.fail(job.error)
+
+    async def _requeue(self, job: Job, queue_job) -> None:
+        """Back to PENDING and into the queue without using up an attempt."""
+        try:
+            job.status = JobStatus.PENDING
+            job.progress["current_phase"] = "pending"
+            await self.store.save_job(job)
+            await queue_job.release()
+            logger.info(f"Job {job.id}: Requeued by a stopping worker")
+        except Exception as e:
+            # Left RUNNING: the stale-job sweep picks it up
+            logger.warning(f"Job {job.id}: Could not requeue: {e}")
+
+    async def _run_claimed(self, job: Job, queue_job=None, retry: bool = False) -> None:
+        """
+        Execute a claimed job while heartbeating it (and its queue job). Stops
+        early once the job is no longer RUNNING in the store, e.g. cancelled
+        from another process.
+        """
+        running = asyncio.current_task()
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(RAG_JOB_HEARTBEAT_S)
+                try:
+                    still_running = await self.store.touch_job(job.id)
+                    if queue_job is not None:
+                        await queue_job.touch()
+                except Exception as e:
+                    logger.warning(f"Job {job.id}: Heartbeat failed: {e}")
+                    continue
+                if not still_running:
+                    logger.info(f"Job {job.id}: No longer running in the store, stopping")
+                    running.cancel()
+                    return
+
+        beating = asyncio.create_task(heartbeat())
+        try:
+            await self._execute_job(job, retry=retry)
+        finally:
+            beating.cancel()
+
+    # ─── Pipeline ─────────────────────────────────────────────────────────────
+
+    def _create_embedding_adapter(self, model_name: str):
+        from .embedding_adapter import EmbeddingAdapter
+
+        return EmbeddingAdapter(model_name=model_name, ollama_url=self.ollama_url)
+
+    def _create_vectordb_adapter(self, collection_name: str):
+        from .vectordb_adapter import VectorDBAdapter
+
+        return VectorDBAdapter(db_pool=self.db_pool, collection_name=collection_name)
+
+    async def _fetch_source(self, job: Job, source: str) -> List[Any]:
+        """Fetch the raw documents of one source."""
+        fetcher = None
+        try:
+            # Try to get source config for dynamic fetcher creation
+            source_config = None
+            try:
+                from rag_corpus.source_config import get_config_manager
+
+                config_mgr = await get_config_manager()
+                source_config = config_mgr.get(source)
+            except Exception:
+                pass  # Fall back to legacy fetcher selection
+
+            if source_config:
+                # Use dynamic config-based fetcher
+                from .source_fetchers import get_fetcher_for_config
+
+                fetcher = get_fetcher_for_config(source_config)
+                return await fetcher.fetch(keywords=job.keywords, extra_urls=job.extra_urls)
+            # Legacy handling for python_docs source
+            elif source == "python_docs":
+                from .source_fetchers import PythonDocsFetcher
+
+                fetcher = PythonDocsFetcher(python_libraries=job.python_libraries)
+                return await fetcher.fetch(
+                    keywords=job.keywords,
+                    extra_urls=job.extra_urls,
+                    python_libraries=job.python_libraries,
+                )
+            # Legacy handling for local_docs source
+            elif source == "local_docs":
+                from .source_fetchers import LocalDocsFetcher
+
+                fetcher = LocalDocsFetcher(docs_dirs=[self.rag_dir, "/app/docs", "./docs"])
+                return await fetcher.fetch(keywords=job.keywords, extra_urls=job.extra_urls)
+            else:
+                fetcher = self._get_fetcher(source, job)
+                return await fetcher.fetch(keywords=job.keywords, extra_urls=job.extra_urls)
+        finally:
+            if fetcher and hasattr(fetcher, "close"):
+                await fetcher.close()
+
+    async def _source_chunks(self, job: Job, model_name: str, source: str, chunker,
+                             checkpoints: Dict[Any, List[str]]) -> List[Any]:
+        """Chunks of one source: from its checkpoint if there is one, else fetched and chunked."""
+        chunk_ids = checkpoints.get((model_name, source))
+        if chunk_ids is not None:
+            # Stored under each document's own source label, which may differ from `source`
+            chunks = [chunker.get_chunk(chunk_id) for chunk_id in chunk_ids]
+            if all(chunks):
+                logger.info(f"Job {job.id}: {source} resumed from checkpoint ({len(chunks)} chunks)")
+                return chunks
+            logger.warning(f"Job {job.id}: Checkpointed chunks of {source} missing, refetching")
+
+        logger.info(f"Job {job.id}: Fetching from {source}")
+        documents = await self._fetch_source(job, source)
+        logger.info(f"Job {job.id}: Fetched {len(documents)} documents from {source}")
+
+        chunks = []
+        for doc in documents:
+            chunks.extend(chunker.chunk_document(doc))
+
+        # Persist chunks to the RAG directory, then checkpoint the source
+        chunker.persist_chunks(chunks)
+        if chunker.rag_dir:
+            await self.store.save_source_checkpoint(job.id, model_name, source, [c.id for c in chunks])
+        return chunks
+
+    async def _execute_job(self, job: Job, retry: bool = False) -> None:
+        """
+        Execute the job pipeline with per-source embedding models. A failure
+        leaves the job FAILED, or PENDING when `retry` says it will be retried.
+        """
         try:
             job.status = JobStatus.RUNNING
-            job.updated_at = datetime.utcnow()
+            job.error = None
             job.progress["current_phase"] = "fetching"
+            await self.store.save_job(job)
 
             from .chunker import DocumentChunker
-
-            chunker = DocumentChunker(
-                chunk_size=1000, overlap=200, rag_dir=self.rag_dir
-            )
+            from .vectordb_adapter import VectorRecord
 
             # Import source-to-model mapping
             try:
@@ -260,6 +521,8 @@ class JobManager:
                 f"Job {job.id}: Processing sources grouped by model: {sources_by_model}"
             )
 
+            checkpoints = await self.store.load_source_checkpoints(job.id)
+            total_docs = 0
             total_processed = 0
 
             # Process each model group separately
@@ -268,106 +531,31 @@ class JobManager:
                     f"Job {job.id}: Processing {sources} with model {model_name}"
                 )
 
-                # Create embedding adapter for this model
-                from .embedding_adapter import EmbeddingAdapter
-
-                embedding_adapter = EmbeddingAdapter(
-                    model_name=model_name,
-                    ollama_url=self.ollama_url,
-                )
+                # Chunk in this model's tokens so nothing is truncated at embed time
+                chunker = DocumentChunker.for_model(model_name, rag_dir=self.rag_dir)
+                embedding_adapter = self._create_embedding_adapter(model_name)
 
                 try:
                     # Get collection for this model
                     collection_name = get_collection_for_source(sources[0])
-
-                    # Create vectordb adapter for this collection
-                    from .vectordb_adapter import VectorDBAdapter
-
-                    vectordb_adapter = VectorDBAdapter(
-                        db_pool=self.db_pool,
-                        collection_name=collection_name,
-                    )
+                    vectordb_adapter = self._create_vectordb_adapter(collection_name)
 
                     logger.info(
                         f"Job {job.id}: Using model '{model_name}' → collection '{collection_name}'"
                     )
 
-                    all_chunks = []
-
                     # Phase 1: Fetch and chunk documents from each source in this group
+                    all_chunks = {}
                     for source in sources:
                         job.progress["current_source"] = source
                         job.progress["current_model"] = model_name
-                        job.updated_at = datetime.utcnow()
-                        logger.info(f"Job {job.id}: Fetching from {source}")
-
-                        fetcher = None
+                        await self.store.save_job(job)
                         try:
-                            # Try to get source config for dynamic fetcher creation
-                            source_config = None
-                            try:
-                                from rag_corpus.source_config import get_config_manager
-
-                                config_mgr = await get_config_manager()
-                                source_config = config_mgr.get(source)
-                            except Exception:
-                                pass  # Fall back to legacy fetcher selection
-
-                            if source_config:
-                                # Use dynamic config-based fetcher
-                                from .source_fetchers import get_fetcher_for_config
-
-                                fetcher = get_fetcher_for_config(source_config)
-                                documents = await fetcher.fetch(
-                                    keywords=job.keywords, extra_urls=job.extra_urls
-                                )
-                            # Legacy handling for python_docs source
-                            elif source == "python_docs":
-                                from .source_fetchers import PythonDocsFetcher
-
-                                fetcher = PythonDocsFetcher(
-                                    python_libraries=job.python_libraries
-                                )
-                                documents = await fetcher.fetch(
-                                    keywords=job.keywords,
-                                    extra_urls=job.extra_urls,
-                                    python_libraries=job.python_libraries,
-                                )
-                            # Legacy handling for local_docs source
-                            elif source == "local_docs":
-                                from .source_fetchers import LocalDocsFetcher
-
-                                fetcher = LocalDocsFetcher(
-                                    docs_dirs=[
-                                        self.rag_dir,
-                                        "/app/docs",
-                                        "./docs",
-                                    ]
-                                )
-                                documents = await fetcher.fetch(
-                                    keywords=job.keywords, extra_urls=job.extra_urls
-                                )
-                            else:
-                                fetcher = self._get_fetcher(source, job)
-                                documents = await fetcher.fetch(
-                                    keywords=job.keywords, extra_urls=job.extra_urls
-                                )
-
-                            logger.info(
-                                f"Job {job.id}: Fetched {len(documents)} documents from {source}"
-                            )
-
-                            # Chunk documents
-                            for doc in documents:
-                                chunks = chunker.chunk_document(doc)
-                                all_chunks.extend(chunks)
-
+                            for chunk in await self._source_chunks(job, model_name, source, chunker, checkpoints):
+                                all_chunks[chunk.id] = chunk
                         except Exception as e:
                             logger.error(f"Job {job.id}: Error fetching from {source}: {e}")
                             # Continue with other sources
-                        finally:
-                            if fetcher and hasattr(fetcher, "close"):
-                                await fetcher.close()
 
                     if not all_chunks:
                         logger.warning(
@@ -375,45 +563,42 @@ class JobManager:
                         )
                         continue
 
-                    job.progress["total_docs"] = job.progress.get("total_docs", 0) + len(
-                        all_chunks
-                    )
+                    committed = await self.store.committed_chunk_ids(job.id, model_name)
+                    pending = [c for chunk_id, c in all_chunks.items() if chunk_id not in committed]
+                    total_docs += len(all_chunks)
+                    total_processed += len(all_chunks) - len(pending)
+                    job.progress["total_docs"] = total_docs
+                    job.progress["processed"] = total_processed
                     job.progress["current_phase"] = "embedding"
-                    job.updated_at = datetime.utcnow()
+                    await self.store.save_job(job)
 
-                    # Phase 2: Generate embeddings
+                    # Phase 2: Embed and upsert batch by batch; each batch commits with its checkpoint
                     logger.info(
-                        f"Job {job.id}: Generating embeddings for {len(all_chunks)} chunks with {model_name}"
+                        f"Job {job.id}: Generating embeddings for {len(pending)} chunks with {model_name}"
+                        + (f" ({len(committed)} already committed)" if committed else "")
                     )
-
-                    # Persist chunks to RAG directory
-                    chunker.persist_chunks(all_chunks)
-
-                    # Generate embeddings in batches
-                    texts = [chunk.text for chunk in all_chunks]
-                    embeddings = await embedding_adapter.embed_batch(texts, batch_size=32)
-
-                    # Phase 3: Upsert to vector database
-                    job.progress["current_phase"] = "upserting"
-                    job.updated_at = datetime.utcnow()
-                    logger.info(f"Job {job.id}: Upserting to {collection_name}")
-
-                    from .vectordb_adapter import VectorRecord
-
-                    records = []
-                    for chunk, embedding in zip(all_chunks, embeddings):
-                        records.append(
+                    for i in range(0, len(pending), RAG_JOB_BATCH_SIZE):
+                        batch = pending[i : i + RAG_JOB_BATCH_SIZE]
+                        embeddings = await embedding_adapter.embed_batch(
+                            [chunk.text for chunk in batch], batch_size=32
+                        )
+                        records = [
                             VectorRecord(
                                 id=chunk.id,
                                 embedding=embedding,
                                 text=chunk.text,
                                 metadata=chunk.metadata,
                             )
-                        )
+                            for chunk, embedding in zip(batch, embeddings)
+                        ]
 
-                    await vectordb_adapter.upsert_vectors(records)
-                    total_processed += len(records)
-                    job.progress["processed"] = total_processed
+                        async def write(conn, records=records):
+                            await vectordb_adapter.upsert_vectors(records, conn=conn)
+
+                        await self.store.commit_batch(job.id, model_name, [c.id for c in batch], write)
+                        total_processed += len(records)
+                        job.progress["processed"] = total_processed
+                        await self.store.save_job(job)
 
                 finally:
                     # Close embedding adapter session
@@ -422,35 +607,40 @@ class JobManager:
             # Done!
             job.status = JobStatus.COMPLETED
             job.progress["current_phase"] = "completed"
-            job.updated_at = datetime.utcnow()
+            await self.store.save_job(job)
             logger.info(
                 f"Job {job.id}: Completed successfully. Processed {total_processed} chunks across {len(sources_by_model)} model groups."
             )
 
         except Exception as e:
             logger.exception(f"Job {job.id}: Failed with error: {e}")
-            job.status = JobStatus.FAILED
+            job.status = JobStatus.PENDING if retry else JobStatus.FAILED
             job.error = str(e)
-            job.progress["current_phase"] = "failed"
-            job.updated_at = datetime.utcnow()
+            job.progress["current_phase"] = "pending" if retry else "failed"
+            await self.store.save_job(job)
 
     async def cancel_job(self, job_id: str) -> bool:
         """
-        Cancel a running job.
+        Cancel a pending or running job.
 
         Args:
             job_id: ID of the job to cancel
 
         Returns:
-            True if cancelled, False if job not found or not running
+            True if cancelled, False if job not found or already finished
         """
+        job = await self.store.get_job(job_id)
+        if not job or job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            return False
+
+        # Stop it if it runs here (before writing, so its own progress saves cannot
+        # overwrite the cancel), then mark it so a queued copy is not claimed
         task = self._running_tasks.get(job_id)
         if task and not task.done():
             task.cancel()
-            job = self._jobs.get(job_id)
-            if job:
-                job.status = JobStatus.FAILED
-                job.error = "Cancelled by user"
-                job.updated_at = datetime.utcnow()
-            return True
-        return False
+            await asyncio.wait({task}, timeout=5)
+        job.status = JobStatus.FAILED
+        job.error = "Cancelled by user"
+        job.progress["current_phase"] = "failed"
+        await self.store.save_job(job)
+        return True
@@ -0,0 +1,343 @@
+"""
+Persistence for RAG corpus update jobs.
+
+A job survives a restart through three kinds of records:
+
+- the job itself (status, parameters, progress)
+- a source checkpoint per (model, source): the ids of the chunks it produced,
+  which are already in the chunk store, so a resumed job does not refetch
+- a batch commit per embedded batch: the chunk ids written to the vector
+  table, recorded in the same transaction as the vectors themselves
+
+PostgresJobStore keeps these in rag_jobs / rag_job_sources / rag_job_batches.
+MemoryJobStore is the fallback when no database pool is available.
+"""
+
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .job_manager import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Writes the batch's vectors; receives the transaction's connection (None in memory)
+BatchWriter = Callable[[Any], Awaitable[Any]]
+
+FINAL_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+
+
+class JobStore(ABC):
+    """Where JobManager keeps job state and checkpoints"""
+
+    async def initialize(self) -> None:
+        pass
+
+    @abstractmethod
+    async def save_job(self, job: Job) -> None:
+        """
+        Insert or update the job row (updated_at is refreshed). A COMPLETED or
+        FAILED row is final: a cancel from any process is not overwritten by
+        the run's own progress saves.
+        """
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    async def list_jobs(self, limit: int = 10) -> List[Job]:
+        ...
+
+    @abstractmethod
+    async def claim_job(self, job_id: str, stale_after_s: float) -> Optional[Job]:
+        """
+        Atomically mark the job RUNNING if it is PENDING, or RUNNING with no
+        heartbeat for `stale_after_s` (its worker died). None if not claimable.
+        """
+
+    @abstractmethod
+    async def touch_job(self, job_id: str) -> bool:
+        """Heartbeat: refresh updated_at of a running job; False once it is no longer RUNNING"""
+
+    @abstractmethod
+    async def stale_job_ids(self, stale_after_s: float) -> List[str]:
+        """RUNNING jobs whose worker stopped heartbeating"""
+
+    @abstractmethod
+    async def save_source_checkpoint(self, job_id: str, model_name: str, source: str,
+                                     chunk_ids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def load_source_checkpoints(self, job_id: str) -> Dict[Tuple[str, str], List[str]]:
+        """(model, source) -> chunk ids, for sources already fetched and chunked"""
+
+    @abstractmethod
+    async def commit_batch(self, job_id: str, model_name: str, chunk_ids: List[str],
+                           write: BatchWriter) -> None:
+        """Run `write` and record the batch as committed, atomically"""
+
+    @abstractmethod
+    async def committed_chunk_ids(self, job_id: str, model_name: str) -> Set[str]:
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store; jobs are kept as snapshots, like database rows"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._sources: Dict[str, Dict[Tuple[str, str], List[str]]] = {}
+        self._batches: Dict[Tuple[str, str], List[List[str]]] = {}
+
+    @staticmethod
+    def _load(row: Dict[str, Any]) -> Job:
+        return Job.from_dict(json.loads(json.dumps(row)))
+
+    async def save_job(self, job: Job) -> None:
+        job.updated_at = datetime.utcnow()
+        with self._lock:
+            row = self._jobs.get(job.id)
+            if row and row["status"] in FINAL_STATUSES:
+                return
+            self._jobs[job.id] = json.loads(json.dumps(job.to_dict()))
+
+    async def get_job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._jobs.get(job_id)
+        return self._load(row) if row else None
+
+    async def list_jobs(self, limit: int = 10) -> List[Job]:
+        with self._lock:
+            rows = sorted(self._jobs.values(), key=lambda r: r["created_at"], reverse=True)[:limit]
+        return [self._load(row) for row in rows]
+
+    def _is_stale(self, row: Dict[str, Any], stale_after_s: float) -> bool:
+        updated = datetime.fromisoformat(row["updated_at"])
+        return row["status"] == JobStatus.RUNNING.value and \
+            datetime.utcnow() - updated >= timedelta(seconds=stale_after_s)
+
+    async def claim_job(self, job_id: str, stale_after_s: float) -> Optional[Job]:
+        with self._lock:
+            row = self._jobs.get(job_id)
+            if row is None or not (row["status"] == JobStatus.PENDING.value or self._is_stale(row, stale_after_s)):
+                return None
+            row["status"] = JobStatus.RUNNING.value
+            row["attempts"] = row.get("attempts", 0) + 1
+            row["updated_at"] = datetime.utcnow().isoformat()
+            return self._load(row)
+
+    async def touch_job(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._jobs.get(job_id)
+            if row is None or row["status"] != JobStatus.RUNNING.value:
+                return False
+            row["updated_at"] = datetime.utcnow().isoformat()
+            return True
+
+    async def stale_job_ids(self, stale_after_s: float) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, row in self._jobs.items() if self._is_stale(row, stale_after_s)]
+
+    async def save_source_checkpoint(self, job_id: str, model_name: str, source: str,
+                                     chunk_ids: List[str]) -> None:
+        with self._lock:
+            self._sources.setdefault(job_id, {})[(model_name, source)] = list(chunk_ids)
+
+    async def load_source_checkpoints(self, job_id: str) -> Dict[Tuple[str, str], List[str]]:
+        with self._lock:
+            return {key: list(ids) for key, ids in self._sources.get(job_id, {}).items()}
+
+    async def commit_batch(self, job_id: str, model_name: str, chunk_ids: List[str],
+                           write: BatchWriter) -> None:
+        await write(None)
+        with self._lock:
+            self._batches.setdefault((job_id, model_name), []).append(list(chunk_ids))
+
+    async def committed_chunk_ids(self, job_id: str, model_name: str) -> Set[str]:
+        with self._lock:
+            return {cid for batch in self._batches.get((job_id, model_name), []) for cid in batch}
+
+
+class PostgresJobStore(JobStore):
+    """Job state and checkpoints in Postgres, shared by every worker on the database"""
+
+    def __init__(self, db_pool):
+        self.db_pool = db_pool
+
+    async def initialize(self) -> None:
+        async with self.db_pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS rag_jobs (
+                    id VARCHAR(64) PRIMARY KEY,
+                    status VARCHAR(16) NOT NULL,
+                    params JSONB NOT NULL DEFAULT '{}'::jsonb,
+                    progress JSONB NOT NULL DEFAULT '{}'::jsonb,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMPTZ DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ DEFAULT NOW()
+                );
+                CREATE INDEX IF NOT EXISTS idx_rag_jobs_status ON rag_jobs(status, updated_at);
+
+                CREATE TABLE IF NOT EXISTS rag_job_sources (
+                    job_id VARCHAR(64) REFERENCES rag_jobs(id) ON DELETE CASCADE,
+                    model_name VARCHAR(128) NOT NULL,
+                    source VARCHAR(128) NOT NULL,
+                    chunk_ids JSONB NOT NULL,
+                    created_at TIMESTAMPTZ DEFAULT NOW(),
+                    PRIMARY KEY (job_id, model_name, source)
+                );
+
+                CREATE TABLE IF NOT EXISTS rag_job_batches (
+                    job_id VARCHAR(64) REFERENCES rag_jobs(id) ON DELETE CASCADE,
+                    model_name VARCHAR(128) NOT NULL,
+                    batch_index INTEGER NOT NULL,
+                    chunk_ids JSONB NOT NULL,
+                    committed_at TIMESTAMPTZ DEFAULT NOW(),
+                    PRIMARY KEY (job_id, model_name, batch_index)
+                );
+            """)
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        params = json.loads(row["params"]) if row["params"] else {}
+        return Job(
+            id=row["id"],
+            status=JobStatus(row["status"]),
+            sources=params.get("sources", []),
+            keywords=params.get("keywords", []),
+            extra_urls=params.get("extra_urls", []),
+            python_libraries=params.get("python_libraries", []),
+            docker_topics=params.get("docker_topics", []),
+            kubernetes_topics=params.get("kubernetes_topics", []),
+            ansible_paths=params.get("ansible_paths", []),
+            progress=json.loads(row["progress"]) if row["progress"] else {},
+            error=row["error"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+    async def save_job(self, job: Job) -> None:
+        job.updated_at = datetime.utcnow()
+        async with self.db_pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO rag_jobs (id, status, params, progress, error, attempts, created_at, updated_at)
+                VALUES ($1, $2, $3::jsonb, $4::jsonb, $5, $6, $7, NOW())
+                ON CONFLICT (id) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    progress = EXCLUDED.progress,
+                    error = EXCLUDED.error,
+                    attempts = EXCLUDED.attempts,
+                    updated_at = NOW()
+                WHERE rag_jobs.status NOT IN ('COMPLETED', 'FAILED')
+            """,
+                job.id,
+                job.status.value,
+                json.dumps(job.params()),
+                json.dumps(job.progress),
+                job.error,
+                job.attempts,
+                job.created_at,
+            )
+
+    async def get_job(self, job_id: str) -> Optional[Job]:
+        async with self.db_pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM rag_jobs WHERE id = $1", job_id)
+        return self._row_to_job(row) if row else None
+
+    async def list_jobs(self, limit: int = 10) -> List[Job]:
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch("SELECT * FROM rag_jobs ORDER BY created_at DESC LIMIT $1", limit)
+        return [self._row_to_job(row) for row in rows]
+
+    async def claim_job(self, job_id: str, stale_after_s: float) -> Optional[Job]:
+        async with self.db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                UPDATE rag_jobs
+                SET status = 'RUNNING', attempts = attempts + 1, updated_at = NOW()
+                WHERE id = $1
+                  AND (status = 'PENDING'
+                       OR (status = 'RUNNING' AND updated_at < NOW() - make_interval(secs => $2)))
+                RETURNING *
+            """,
+                job_id,
+                float(stale_after_s),
+            )
+        return self._row_to_job(row) if row else None
+
+    async def touch_job(self, job_id: str) -> bool:
+        async with self.db_pool.acquire() as conn:
+            touched = await conn.fetchval(
+                "UPDATE rag_jobs SET updated_at = NOW() WHERE id = $1 AND status = 'RUNNING' RETURNING id",
+                job_id,
+            )
+        return touched is not None
+
+    async def stale_job_ids(self, stale_after_s: float) -> List[str]:
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id FROM rag_jobs
+                WHERE status = 'RUNNING' AND updated_at < NOW() - make_interval(secs => $1)
+                ORDER BY created_at
+            """,
+                float(stale_after_s),
+            )
+        return [row["id"] for row in rows]
+
+    async def save_source_checkpoint(self, job_id: str, model_name: str, source: str,
+                                     chunk_ids: List[str]) -> None:
+        async with self.db_pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO rag_job_sources (job_id, model_name, source, chunk_ids)
+                VALUES ($1, $2, $3, $4::jsonb)
+                ON CONFLICT (job_id, model_name, source) DO UPDATE SET chunk_ids = EXCLUDED.chunk_ids
+            """,
+                job_id,
+                model_name,
+                source,
+                json.dumps(chunk_ids),
+            )
+
+    async def load_source_checkpoints(self, job_id: str) -> Dict[Tuple[str, str], List[str]]:
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT model_name, source, chunk_ids FROM rag_job_sources WHERE job_id = $1", job_id
+            )
+        return {(row["model_name"], row["source"]): json.loads(row["chunk_ids"]) for row in rows}
+
+    async def commit_batch(self, job_id: str, model_name: str, chunk_ids: List[str],
+                           write: BatchWriter) -> None:
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await write(conn)
+                await conn.execute(
+                    """
+                    INSERT INTO rag_job_batches (job_id, model_name, batch_index, chunk_ids)
+                    SELECT $1, $2, COALESCE(MAX(batch_index) + 1, 0), $3::jsonb
+                    FROM rag_job_batches WHERE job_id = $1 AND model_name = $2
+                """,
+                    job_id,
+                    model_name,
+                    json.dumps(chunk_ids),
+                )
+                await conn.execute("UPDATE rag_jobs SET updated_at = NOW() WHERE id = $1", job_id)
+
+    async def committed_chunk_ids(self, job_id: str, model_name: str) -> Set[str]:
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT chunk_ids FROM rag_job_batches WHERE job_id = $1 AND model_name = $2",
+                job_id,
+                model_name,
+            )
+        return {cid for row in rows for cid in json.loads(row["chunk_ids"])}
@@ -226,6 +226,14 @@ async def initialize_rag_corpus(db_pool) -> bool:
             ollama_url=OLLAMA_URL,
             embedding_model=EMBEDDING_MODEL,
         )
+        await _job_manager.initialize()
+
+        # Run update jobs on the shared queue so they survive restarts
+        try:
+            await _job_manager.start_worker()
+            logger.info("✅ RAG ingestion worker started")
+        except Exception as e:
+            logger.warning(f"⚠️ RAG job queue unavailable, running update jobs in-process: {e}")
 
         logger.info("✅ RAG corpus services initialized (multi-model + dynamic config)")
         logger.info(f"   Models: {list(_embedding_adapters.keys())}")
@@ -241,6 +249,12 @@ async def initialize_rag_corpus(db_pool) -> bool:
         return False
 
 
+async def shutdown_rag_worker():
+    """Stop the RAG job manager's stale-job sweep (before the job queue shuts down)."""
+    if _job_manager is not None:
+        await _job_manager.stop_worker()
+
+
 def get_job_manager():
     """Get the job manager instance."""
     if _job_manager is None:
@@ -360,7 +374,7 @@ async def get_job_status(job_id: str):
     """Get the status of a RAG update job."""
     job_manager = get_job_manager()
 
-    job = job_manager.get_job(job_id)
+    job = await job_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
@@ -372,7 +386,7 @@ async def list_jobs(limit: int = 10):
     """List recent RAG update jobs."""
     job_manager = get_job_manager()
 
-    jobs = job_manager.list_jobs(limit=limit)
+    jobs = await job_manager.list_jobs(limit=limit)
     return {"jobs": [job.to_dict() for job in jobs], "count": len(jobs)}
 
 
@@ -37,12 +37,19 @@ EMBEDDING_TIER_CONFIG = {
         "collection": "local_rag_corpus_code",
         "dimensions": 4096,
         "description": "High-dimensional embeddings for complex technical content",
+        # Token budget (see tokenization.py); max_tokens is what the adapter lets through
+        "max_tokens": 4096,
+        "chunk_tokens": 512,
+        "overlap_tokens": 64,
     },
     EmbeddingTier.STANDARD: {
         "model": "nomic-embed-text",
         "collection": "local_rag_corpus_docs",
         "dimensions": 768,
         "description": "Standard embeddings for general documentation",
+        "max_tokens": 2048,
+        "chunk_tokens": 384,
+        "overlap_tokens": 64,
     },
 }
 
@@ -0,0 +1,196 @@
+"""
+Token budgets for RAG chunking and embedding
+
+Chunks used to be sized in characters while embedding models are limited in
+tokens, so dense text (code, numbers, CJK) overflowed the model window and
+EmbeddingAdapter._truncate_text quietly cut the tail off. Each embedding tier
+now has a tokenizer and a budget shared by the chunker and the adapter:
+chunks are packed to `chunk_tokens`, overlap is measured in tokens, and
+the adapter only truncates past `max_tokens`, which token-budgeted chunks
+never reach.
+
+The default tokenizer is a dependency-free estimate that errs high. For
+exact counts point RAG_TOKENIZER_HIGH / RAG_TOKENIZER_STANDARD at a local
+tokenizer.json (or a cached HuggingFace name); that needs the `tokenizers`
+package. Tests and callers can also plug one in with `register_tokenizer`.
+"""
+
+import logging
+import os
+import re
+import statistics
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from .source_config import EMBEDDING_TIER_CONFIG, EmbeddingTier
+
+logger = logging.getLogger(__name__)
+
+# Character cap applied by EmbeddingAdapter before text reaches Ollama
+EMBED_MAX_CHARS = 8000
+
+
+class Tokenizer:
+    """Counts tokens; subclasses only need `count`"""
+
+    name = "tokenizer"
+
+    def count(self, text: str) -> int:
+        raise NotImplementedError
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of `text` with at most `max_tokens` tokens"""
+        if self.count(text) <= max_tokens:
+            return text
+        # No real token is longer than this, which keeps the search window small
+        hi = min(len(text), max_tokens * 32)
+        if self.count(text[:hi]) <= max_tokens:
+            return text[:hi]
+        lo = 0
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count(text[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo]
+
+
+class HeuristicTokenizer(Tokenizer):
+    """
+    Estimate for WordPiece/BPE vocabularies that errs high: one token per
+    four letters, per two digits and per other non-space character (which
+    covers punctuation, symbols and CJK).
+    """
+
+    name = "heuristic"
+
+    _LETTERS = re.compile(r"[A-Za-z]+")
+    _DIGITS = re.compile(r"[0-9]+")
+    _OTHER = re.compile(r"[^A-Za-z0-9\s]")
+
+    def count(self, text: str) -> int:
+        tokens = sum((len(run) + 3) // 4 for run in self._LETTERS.findall(text))
+        tokens += sum((len(run) + 1) // 2 for run in self._DIGITS.findall(text))
+        return tokens + len(self._OTHER.findall(text))
+
+
+class HFTokenizer(Tokenizer):
+    """Exact counts from a local HuggingFace `tokenizers` file or cached model name"""
+
+    def __init__(self, spec: str):
+        from tokenizers import Tokenizer as _Tokenizer
+
+        if os.path.exists(spec):
+            self._tokenizer = _Tokenizer.from_file(spec)
+        else:
+            self._tokenizer = _Tokenizer.from_pretrained(spec)
+        # A tokenizer.json may ship with truncation enabled, which would cap counts
+        self._tokenizer.no_truncation()
+        self.name = spec
+
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        encoding = self._tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        return text[: encoding.offsets[max_tokens - 1][1]] if max_tokens > 0 else ""
+
+
+def load_tokenizer(spec: Optional[str]) -> Tokenizer:
+    """'heuristic' (default), a tokenizer.json path or a cached HuggingFace name"""
+    if not spec or spec == "heuristic":
+        return HeuristicTokenizer()
+    try:
+        return HFTokenizer(spec)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer '{spec}' ({e}), using heuristic token counts")
+        return HeuristicTokenizer()
+
+
+@dataclass
+class TokenBudget:
+    """How an embedding tier sizes chunks, in its own tokenizer's tokens"""
+
+    tier: EmbeddingTier
+    tokenizer: Tokenizer
+    chunk_tokens: int
+    overlap_tokens: int
+    max_tokens: int
+
+
+_tokenizers: Dict[EmbeddingTier, Tokenizer] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def register_tokenizer(tier: EmbeddingTier, tokenizer: Tokenizer) -> None:
+    """Use `tokenizer` for every chunker and adapter of `tier`"""
+    with _tokenizers_lock:
+        _tokenizers[tier] = tokenizer
+
+
+def get_tokenizer(tier: EmbeddingTier) -> Tokenizer:
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(tier)
+        if tokenizer is None:
+            tokenizer = _tokenizers[tier] = load_tokenizer(os.getenv(f"RAG_TOKENIZER_{tier.name}"))
+            logger.info(f"Using {tokenizer.name} tokenizer for {tier.value} embeddings")
+        return tokenizer
+
+
+def tier_for_model(model_name: str) -> EmbeddingTier:
+    for tier, config in EMBEDDING_TIER_CONFIG.items():
+        if model_name == config["model"] or model_name.startswith(f"{config['model']}:"):
+            return tier
+    return EmbeddingTier.STANDARD
+
+
+def get_token_budget(model_name: str) -> TokenBudget:
+    tier = tier_for_model(model_name)
+    config = EMBEDDING_TIER_CONFIG[tier]
+    return TokenBudget(
+        tier=tier,
+        tokenizer=get_tokenizer(tier),
+        chunk_tokens=config["chunk_tokens"],
+        overlap_tokens=config["overlap_tokens"],
+        max_tokens=config["max_tokens"],
+    )
+
+
+def token_report(texts: Iterable[str], budget: TokenBudget, max_chars: int = EMBED_MAX_CHARS) -> Dict[str, Any]:
+    """
+    Token-length distribution of chunk texts and how many the embedding
+    adapter would truncate (over `max_tokens` or `max_chars`).
+    """
+    texts = list(texts)
+    per_text = [budget.tokenizer.count(text) for text in texts]
+    counts = sorted(per_text)
+    buckets: Dict[str, int] = {}
+    edge = 64
+    while edge < budget.max_tokens:
+        buckets[f"<={edge}"] = 0
+        edge *= 2
+    buckets[f"<={budget.max_tokens}"] = 0
+    buckets[f">{budget.max_tokens}"] = 0
+    for n in counts:
+        for label in buckets:
+            if label.startswith(">") or n <= int(label[2:]):
+                buckets[label] += 1
+                break
+
+    return {
+        "tokenizer": budget.tokenizer.name,
+        "chunks": len(texts),
+        "tokens": {
+            "p50": statistics.median(counts) if counts else 0,
+            "p95": counts[min(len(counts) - 1, int(len(counts) * 0.95))] if counts else 0,
+            "max": counts[-1] if counts else 0,
+        },
+        "histogram": buckets,
+        "truncated": sum(
+            1 for text, n in zip(texts, per_text) if n > budget.max_tokens or len(text) > max_chars
+        ),
+    }
@@ -215,12 +215,15 @@ class VectorDBAdapter:
                     logger.error(f"Failed to initialize vector table: {e}")
                     raise
     
-    async def upsert_vectors(self, records: List[VectorRecord]) -> int:
+    async def upsert_vectors(self, records: List[VectorRecord], conn=None) -> int:
         """
         Upsert records into the vector database.
         
         Args:
             records: List of records to upsert
+            conn: Optional connection inside a caller's transaction; a failing
+                record then raises (and rolls the transaction back) instead of
+                being skipped
             
         Returns:
             Number of records upserted
@@ -236,47 +239,56 @@ class VectorDBAdapter:
         # Allow recreation because we are writing new data with known dimension
         await self.initialize(embedding_dimension=embedding_dim, recreate_if_mismatch=True)
         
-        upserted = 0
-        
         # Determine vector cast type
         vector_cast = "halfvec" if embedding_dim > 2000 else "vector"
         
-        async with self.db_pool.acquire() as conn:
-            for record in records:
-                try:
-                    # Extract source from metadata
-                    source = record.metadata.get("source", "unknown")
-                    
-                    # Convert embedding to pgvector format
-                    embedding_str = "[" + ",".join(str(x) for x in record.embedding) + "]"
-                    
-                    # Use EXCLUDED.embedding for conflict update which automatically handles the type
-                    await conn.execute(
-                        f"""
-                        INSERT INTO {self.table_name} 
-                        (id, embedding, text, metadata, source, updated_at)
-                        VALUES ($1, $2::{vector_cast}, $3, $4::jsonb, $5, NOW())
-                        ON CONFLICT (id) DO UPDATE SET
-                            embedding = EXCLUDED.embedding,
-                            text = EXCLUDED.text,
-                            metadata = EXCLUDED.metadata,
-                            source = EXCLUDED.source,
-                            updated_at = NOW()
-                        """,
-                        record.id,
-                        embedding_str,
-                        record.text,
-                        json.dumps(record.metadata),
-                        source
-                    )
-                    upserted += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error upserting record {record.id}: {e}")
+        if conn is not None:
+            upserted = await self._upsert_records(conn, records, vector_cast, skip_errors=False)
+        else:
+            async with self.db_pool.acquire() as conn:
+                upserted = await self._upsert_records(conn, records, vector_cast, skip_errors=True)
         
         logger.info(f"Upserted {upserted} records to {self.table_name}")
         return upserted
     
+    async def _upsert_records(self, conn, records: List[VectorRecord], vector_cast: str,
+                              skip_errors: bool) -> int:
+        upserted = 0
+        for record in records:
+            try:
+                # Extract source from metadata
+                source = record.metadata.get("source", "unknown")
+                
+                # Convert embedding to pgvector format
+                embedding_str = "[" + ",".join(str(x) for x in record.embedding) + "]"
+                
+                # Use EXCLUDED.embedding for conflict update which automatically handles the type
+                await conn.execute(
+                    f"""
+                    INSERT INTO {self.table_name} 
+                    (id, embedding, text, metadata, source, updated_at)
+                    VALUES ($1, $2::{vector_cast}, $3, $4::jsonb, $5, NOW())
+                    ON CONFLICT (id) DO UPDATE SET
+                        embedding = EXCLUDED.embedding,
+                        text = EXCLUDED.text,
+                        metadata = EXCLUDED.metadata,
+                        source = EXCLUDED.source,
+                        updated_at = NOW()
+                    """,
+                    record.id,
+                    embedding_str,
+                    record.text,
+                    json.dumps(record.metadata),
+                    source
+                )
+                upserted += 1
+                
+            except Exception as e:
+                if not skip_errors:
+                    raise
+                logger.error(f"Error upserting record {record.id}: {e}")
+        return upserted
+    
     async def search(
         self,
         query_embedding: List[float],
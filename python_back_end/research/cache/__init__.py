@@ -6,10 +6,14 @@ to improve performance and reduce redundant network requests.
 """
 
 from .http_cache import HTTPCache, CacheConfig, cache_request, setup_cache
+from .research_cache import ResearchCache, get_research_cache, get_research_cache_stats
 
 __all__ = [
     "HTTPCache",
     "CacheConfig", 
     "cache_request",
     "setup_cache",
+    "ResearchCache",
+    "get_research_cache",
+    "get_research_cache_stats",
 ]
\ No newline at end of file
@@ -0,0 +1,500 @@
+"""
+Tiered, content-addressed cache for research results.
+
+Lookups go memory LRU -> local SQLite store -> optional shared Postgres table,
+and a hit in a lower tier is promoted into the tiers above it. Three kinds of
+entries are stored, each in its own namespace:
+
+- "search": normalized hits per (provider, query, max_results, region, safesearch)
+- "doc":    extracted documents per canonical URL, with ETag/Last-Modified so
+            stale entries can be revalidated with a conditional GET
+- "map":    map-phase summaries per (model, prompt hash, chunk hash)
+
+Keys are SHA-256 digests of the namespace and its key parts, so the same
+content always lands on the same entry regardless of which component asks.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import psycopg
+    PSYCOPG_AVAILABLE = True
+except ImportError:
+    PSYCOPG_AVAILABLE = False
+
+from ..config.settings import RESEARCH_CACHE_DIR, get_settings
+
+logger = logging.getLogger(__name__)
+
+TIERS = ("memory", "disk", "postgres")
+
+
+@dataclass
+class CacheEntry:
+    """A cached value with its freshness and validators"""
+    value: Any
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    stored_at: float = field(default_factory=time.time)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def to_row(self) -> Tuple[str, float, Optional[str], Optional[str], float]:
+        return json.dumps(self.value, default=str), self.expires_at, self.etag, self.last_modified, self.stored_at
+
+    @classmethod
+    def from_row(cls, value: str, expires_at: float, etag: Optional[str],
+                 last_modified: Optional[str], stored_at: float) -> "CacheEntry":
+        return cls(json.loads(value), expires_at, etag, last_modified, stored_at)
+
+
+@dataclass
+class NamespaceStats:
+    hits: Dict[str, int] = field(default_factory=lambda: {tier: 0 for tier in TIERS})
+    stale_hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    revalidated: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.stale_hits + self.misses
+        return {
+            "hits": total_hits,
+            "hits_by_tier": dict(self.hits),
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "revalidated": self.revalidated,
+            "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class MemoryTier:
+    """Bounded LRU keyed by digest"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskTier:
+    """
+    Single-file SQLite store. Bounded by total value size; least recently
+    used rows are dropped first, and rows past the stale retention window
+    are purged on the same pass.
+    """
+
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: Path, max_bytes: int, stale_retention_s: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stale_retention_s = stale_retention_s
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, etag, last_modified, stored_at FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry.from_row(*row)
+
+    def set(self, namespace: str, key: str, entry: CacheEntry):
+        value, expires_at, etag, last_modified, stored_at = entry.to_row()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, value, len(value), expires_at, etag, last_modified, stored_at, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+    def _prune(self):
+        cutoff = time.time() - self.stale_retention_s
+        self.evictions += self._conn.execute("DELETE FROM entries WHERE expires_at < ?", (cutoff,)).rowcount
+
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until we are back under 90% of the budget
+        excess = total - int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        victims = []
+        for key, size in rows:
+            if excess <= 0:
+                break
+            victims.append((key,))
+            excess -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PostgresTier:
+    """
+    Optional shared tier so several backend replicas reuse each other's work.
+    Any database error disables the tier for `retry_after_s` instead of
+    failing the lookup.
+    """
+
+    SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS research_cache (
+        key TEXT PRIMARY KEY,
+        namespace TEXT NOT NULL,
+        value JSONB NOT NULL,
+        expires_at DOUBLE PRECISION NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        stored_at DOUBLE PRECISION NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_research_cache_expires ON research_cache(expires_at);
+    """
+
+    def __init__(self, dsn: str, stale_retention_s: int, retry_after_s: float = 60.0):
+        self.dsn = dsn
+        self.stale_retention_s = stale_retention_s
+        self.retry_after_s = retry_after_s
+        self._conn = None
+        self._disabled_until = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        row = self._run(
+            "SELECT value::text, expires_at, etag, last_modified, stored_at FROM research_cache WHERE key = %s",
+            (key,), fetch=True,
+        )
+        return CacheEntry.from_row(*row) if row else None
+
+    def set(self, namespace: str, key: str, entry: CacheEntry):
+        value, expires_at, etag, last_modified, stored_at = entry.to_row()
+        self._run(
+            """
+            INSERT INTO research_cache (key, namespace, value, expires_at, etag, last_modified, stored_at)
+            VALUES (%s, %s, %s::jsonb, %s, %s, %s, %s)
+            ON CONFLICT (key) DO UPDATE SET
+                value = EXCLUDED.value,
+                expires_at = EXCLUDED.expires_at,
+                etag = EXCLUDED.etag,
+                last_modified = EXCLUDED.last_modified,
+                stored_at = EXCLUDED.stored_at
+            """,
+            (key, namespace, value, expires_at, etag, last_modified, stored_at),
+        )
+
+    def delete(self, key: str):
+        self._run("DELETE FROM research_cache WHERE key = %s", (key,))
+
+    def purge_expired(self):
+        self._run("DELETE FROM research_cache WHERE expires_at < %s", (time.time() - self.stale_retention_s,))
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    def _run(self, sql: str, params: tuple, fetch: bool = False):
+        if not self.available:
+            return None
+        with self._lock:
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = psycopg.connect(self.dsn, autocommit=True, connect_timeout=3)
+                    self._conn.execute(self.SCHEMA_SQL)
+                cur = self._conn.execute(sql, params)
+                return cur.fetchone() if fetch else None
+            except Exception as e:
+                logger.warning(f"Research cache Postgres tier unavailable, retrying in {self.retry_after_s}s: {e}")
+                self._disabled_until = time.monotonic() + self.retry_after_s
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception:
+                        pass
+                    self._conn = None
+                return None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ResearchCache:
+    """
+    Memory -> disk -> Postgres cache shared by search, extraction and synthesis.
+
+    The sync methods are safe to call from any thread. From async code use
+    `aget`/`aset`, which answer memory hits inline and push disk and database
+    work onto a worker thread.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = RESEARCH_CACHE_DIR,
+        memory_entries: int = 2048,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+        dsn: Optional[str] = None,
+        stale_retention_s: int = 7 * 86400,
+    ):
+        self.stale_retention_s = stale_retention_s
+        self.memory = MemoryTier(memory_entries)
+        self.disk: Optional[DiskTier] = None
+        self.postgres: Optional[PostgresTier] = None
+        self._stats: Dict[str, NamespaceStats] = {}
+
+        try:
+            self.disk = DiskTier(Path(cache_dir) / "research_cache.sqlite3", disk_max_bytes, stale_retention_s)
+        except Exception as e:
+            logger.warning(f"Research cache disk tier disabled: {e}")
+
+        if dsn:
+            if PSYCOPG_AVAILABLE:
+                self.postgres = PostgresTier(dsn, stale_retention_s)
+            else:
+                logger.warning("RESEARCH_CACHE_DSN is set but psycopg is not installed; shared tier disabled")
+
+    # ---- keys ----
+
+    @staticmethod
+    def make_key(namespace: str, *parts: Any) -> str:
+        """Content address for a namespace and its key parts"""
+        raw = json.dumps([namespace, *parts], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---- sync API ----
+
+    def get(self, namespace: str, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """
+        Look up `key`. Expired entries are only returned with `allow_stale`
+        (used for conditional revalidation) and are counted as stale hits.
+        """
+        stats = self._stats_for(namespace)
+        entry = self.memory.get(key)
+        found_in = "memory" if entry is not None else None
+        if entry is None or not entry.fresh:
+            # Another replica may have refreshed the entry in a lower tier
+            for tier_name, tier in (("disk", self.disk), ("postgres", self.postgres)):
+                if tier is None:
+                    continue
+                lower = tier.get(key)
+                if lower is not None and (entry is None or lower.expires_at > entry.expires_at):
+                    entry, found_in = lower, tier_name
+                    self._promote(namespace, key, entry, tier_name)
+                if entry is not None and entry.fresh:
+                    break
+
+        if entry is None or time.time() > entry.expires_at + self.stale_retention_s:
+            stats.misses += 1
+            return None
+        if entry.fresh:
+            stats.hits[found_in] += 1
+            return entry
+        if allow_stale:
+            stats.stale_hits += 1
+            return entry
+        stats.misses += 1
+        return None
+
+    def get_value(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self.get(namespace, key)
+        return entry.value if entry is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl_s: float,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheEntry:
+        entry = CacheEntry(value=value, expires_at=time.time() + ttl_s, etag=etag, last_modified=last_modified)
+        self.memory.set(key, entry)
+        for tier in (self.disk, self.postgres):
+            if tier is None:
+                continue
+            try:
+                tier.set(namespace, key, entry)
+            except Exception as e:
+                logger.warning(f"Research cache write failed ({namespace}): {e}")
+        self._stats_for(namespace).sets += 1
+        return entry
+
+    def refresh(self, namespace: str, key: str, entry: CacheEntry, ttl_s: float) -> CacheEntry:
+        """Extend a revalidated entry (e.g. after a 304) without changing its value"""
+        self._stats_for(namespace).revalidated += 1
+        return self.set(namespace, key, entry.value, ttl_s, etag=entry.etag, last_modified=entry.last_modified)
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        for tier in (self.disk, self.postgres):
+            if tier is not None:
+                tier.delete(key)
+
+    def clear(self):
+        """Drop local tiers; the shared Postgres tier is left alone"""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    # ---- async API ----
+
+    async def aget(self, namespace: str, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is not None and entry.fresh:
+            self._stats_for(namespace).hits["memory"] += 1
+            return entry
+        return await asyncio.to_thread(self.get, namespace, key, allow_stale)
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl_s: float,
+                   etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheEntry:
+        return await asyncio.to_thread(self.set, namespace, key, value, ttl_s, etag, last_modified)
+
+    async def arefresh(self, namespace: str, key: str, entry: CacheEntry, ttl_s: float) -> CacheEntry:
+        return await asyncio.to_thread(self.refresh, namespace, key, entry, ttl_s)
+
+    # ---- reporting ----
+
+    def get_stats(self) -> Dict[str, Any]:
+        namespaces = {name: stats.snapshot() for name, stats in self._stats.items()}
+        hits = sum(s["hits"] for s in namespaces.values())
+        lookups = hits + sum(s["stale_hits"] + s["misses"] for s in namespaces.values())
+        return {
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "lookups": lookups,
+            "namespaces": namespaces,
+            "tiers": {
+                "memory": {"entries": len(self.memory), "max_entries": self.memory.max_entries,
+                           "evictions": self.memory.evictions},
+                "disk": self.disk.info() if self.disk is not None else None,
+                "postgres": {"available": self.postgres.available} if self.postgres is not None else None,
+            },
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+        if self.postgres is not None:
+            self.postgres.close()
+
+    def _promote(self, namespace: str, key: str, entry: CacheEntry, found_in: str):
+        self.memory.set(key, entry)
+        if found_in == "postgres" and self.disk is not None:
+            try:
+                self.disk.set(namespace, key, entry)
+            except Exception as e:
+                logger.debug(f"Research cache promotion to disk failed: {e}")
+
+    def _stats_for(self, namespace: str) -> NamespaceStats:
+        if namespace not in self._stats:
+            self._stats[namespace] = NamespaceStats()
+        return self._stats[namespace]
+
+
+# Global cache instance
+_research_cache: Optional[ResearchCache] = None
+_research_cache_lock = threading.Lock()
+
+
+def get_research_cache(settings=None) -> Optional[ResearchCache]:
+    """Shared ResearchCache, or None when disabled in settings"""
+    global _research_cache
+    cfg = settings or get_settings()
+    if not cfg.enable_research_cache:
+        return None
+    if _research_cache is None:
+        with _research_cache_lock:
+            if _research_cache is None:
+                _research_cache = ResearchCache(
+                    cache_dir=cfg.research_cache_dir,
+                    memory_entries=cfg.research_cache_memory_entries,
+                    disk_max_bytes=cfg.research_cache_disk_mb * 1024 * 1024,
+                    dsn=cfg.research_cache_dsn or None,
+                )
+    return _research_cache
+
+
+def get_research_cache_stats() -> Dict[str, Any]:
+    """Hit rates for the shared cache (empty when it has not been used yet)"""
+    if _research_cache is None:
+        return {"enabled": get_settings().enable_research_cache, "hit_rate": 0.0, "lookups": 0}
+    return {"enabled": True, **_research_cache.get_stats()}
@@ -1,6 +1,7 @@
 # python_back_end/research/config/settings.py
 from __future__ import annotations
 import os
+import tempfile
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
@@ -67,6 +68,29 @@ REQUESTS_RETRIES = int(os.getenv("REQUESTS_RETRIES", "2"))
 REQUESTS_CACHE_NAME = os.getenv("REQUESTS_CACHE_NAME", "requests_cache")
 REQUESTS_CACHE_EXPIRY_S = int(os.getenv("REQUESTS_CACHE_EXPIRY_S", "7200"))
 
+# Shared async fetch layer (research/extract/fetcher.py)
+EXTRACT_MAX_CONCURRENCY = int(os.getenv("EXTRACT_MAX_CONCURRENCY", "16"))   # in-flight fetches, all hosts
+EXTRACT_PER_HOST = int(os.getenv("EXTRACT_PER_HOST", "4"))                  # in-flight fetches per host
+EXTRACT_MAX_BYTES = int(os.getenv("EXTRACT_MAX_BYTES", str(15 * 1024 * 1024)))
+EXTRACT_CPU_WORKERS = int(os.getenv("EXTRACT_CPU_WORKERS", "2"))            # 0 = parse in threads
+
+# Tiered research cache (research/cache/research_cache.py)
+ENABLE_RESEARCH_CACHE = os.getenv("ENABLE_RESEARCH_CACHE", "true").lower() == "true"
+RESEARCH_CACHE_DIR = os.getenv(
+    "RESEARCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "harvis_research_cache")
+)
+RESEARCH_CACHE_MEMORY_ENTRIES = int(os.getenv("RESEARCH_CACHE_MEMORY_ENTRIES", "2048"))
+RESEARCH_CACHE_DISK_MB = int(os.getenv("RESEARCH_CACHE_DISK_MB", "512"))
+RESEARCH_CACHE_DSN = os.getenv("RESEARCH_CACHE_DSN", "")               # empty = no shared Postgres tier
+SEARCH_CACHE_TTL_S = int(os.getenv("SEARCH_CACHE_TTL_S", "1800"))
+MAP_CACHE_TTL_S = int(os.getenv("MAP_CACHE_TTL_S", str(7 * 86400)))
+
+# Semantic reranking (research/rank/rerank.py)
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "64"))              # texts per embedding call
+RERANK_CACHE_ENTRIES = int(os.getenv("RERANK_CACHE_ENTRIES", "20000"))     # cached candidate vectors
+RERANK_CROSS_TOP_K = int(os.getenv("RERANK_CROSS_TOP_K", "20"))            # candidates sent to the cross-encoder
+RERANK_CROSS_BUDGET_MS = int(os.getenv("RERANK_CROSS_BUDGET_MS", "250"))   # cross-encoder time per query
+
 # ---------- Search preferences ----------
 DEFAULT_REGION = os.getenv("SEARCH_REGION", "us-en")
 DEFAULT_SAFESEARCH = os.getenv("SEARCH_SAFESEARCH", "moderate")
@@ -110,6 +134,21 @@ class Settings:
     requests_retries: int = REQUESTS_RETRIES
     requests_cache_name: str = REQUESTS_CACHE_NAME
     requests_cache_expiry_s: int = REQUESTS_CACHE_EXPIRY_S
+    extract_max_concurrency: int = EXTRACT_MAX_CONCURRENCY
+    extract_per_host: int = EXTRACT_PER_HOST
+    extract_max_bytes: int = EXTRACT_MAX_BYTES
+    extract_cpu_workers: int = EXTRACT_CPU_WORKERS
+    enable_research_cache: bool = ENABLE_RESEARCH_CACHE
+    research_cache_dir: str = RESEARCH_CACHE_DIR
+    research_cache_memory_entries: int = RESEARCH_CACHE_MEMORY_ENTRIES
+    research_cache_disk_mb: int = RESEARCH_CACHE_DISK_MB
+    research_cache_dsn: str = RESEARCH_CACHE_DSN
+    search_cache_ttl_s: int = SEARCH_CACHE_TTL_S
+    map_cache_ttl_s: int = MAP_CACHE_TTL_S
+    rerank_batch_size: int = RERANK_BATCH_SIZE
+    rerank_cache_entries: int = RERANK_CACHE_ENTRIES
+    rerank_cross_top_k: int = RERANK_CROSS_TOP_K
+    rerank_cross_budget_ms: int = RERANK_CROSS_BUDGET_MS
     search_region: str = DEFAULT_REGION
     safesearch: str = DEFAULT_SAFESEARCH
 
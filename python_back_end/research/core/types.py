@@ -1,7 +1,7 @@
 # python_back_end/research/core/types.py
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 
 @dataclass
 class Hit:
@@ -14,6 +14,18 @@ class Hit:
     score: float
     source: str   # provider name e.g. "ddg", "tavily", "bing"
 
+@dataclass
+class ExtractedDoc:
+    """
+    Clean text pulled from one URL by the extraction layer.
+    """
+    url: str
+    title: str
+    text: str
+    language: Optional[str]
+    meta: Dict[str, Any]
+    success: bool
+
 @dataclass
 class DocChunk:
     """
@@ -1,2 +1,3 @@
 
 from .router import extract_url, extract_many, ExtractedDoc
+from .fetcher import FetchService, FetchResult, get_fetch_service
@@ -0,0 +1,448 @@
+# python_back_end/research/extract/fetcher.py
+"""
+Shared async fetch layer for research extraction.
+
+- One streamed GET per URL. The content type is sniffed from the response
+  headers and the first bytes of the body, replacing the old HEAD + GET pair.
+  Bodies that are neither HTML, text nor PDF are abandoned after the first chunk.
+- One keep-alive httpx pool for the whole process, with a global concurrency
+  budget and a per-host limit.
+- CPU-bound parsing (trafilatura, pypdf) runs in a small process pool.
+- Extracted documents are kept in the research cache per canonical URL and
+  revalidated with If-None-Match / If-Modified-Since once they go stale.
+
+All network I/O runs on a single background event loop owned by FetchService,
+so synchronous callers (WebSearchAgent, ExtractionRouter) and async callers on
+any loop (research.pipeline stages) share the same connections.
+"""
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import concurrent.futures as futures
+import logging
+import mimetypes
+import multiprocessing
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from ..cache.http_cache import CacheConfig
+from ..cache.research_cache import CacheEntry, get_research_cache
+from ..config.settings import get_settings
+from ..core.types import ExtractedDoc
+from ..core.utils import canonicalize_url
+from .html_trafilatura import parse_html
+from .pdf import parse_pdf_bytes
+from .youtube import extract_youtube
+
+logger = logging.getLogger(__name__)
+
+EXTRACTABLE_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "application/pdf")
+
+
+@dataclass
+class FetchResult:
+    url: str                 # final URL after redirects
+    status: int              # 0 when the request never completed
+    content_type: str        # sniffed, lower-case, without parameters
+    body: bytes = b""
+    encoding: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    truncated: bool = False
+    error: Optional[str] = None
+    elapsed_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 400
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.content_type == "application/pdf"
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+def sniff_content_type(header_value: Optional[str], head: bytes, url: str) -> str:
+    """
+    Decide the real content type from the header, the leading body bytes and
+    the URL extension. Servers often send PDFs as octet-stream and HTML without
+    any header at all.
+    """
+    declared = (header_value or "").split(";")[0].strip().lower()
+    lead = head[:1024].lstrip()
+
+    if lead.startswith(b"%PDF-"):
+        return "application/pdf"
+    if declared and declared not in ("application/octet-stream", "binary/octet-stream", "text/plain"):
+        return declared
+
+    low = lead[:512].lower()
+    if low.startswith(b"<!doctype html") or b"<html" in low or b"<head" in low:
+        return "text/html"
+
+    guessed, _ = mimetypes.guess_type(urlsplit(url).path)
+    return guessed or declared or "text/html"
+
+
+def is_youtube(url: str) -> bool:
+    return any(h in url for h in ("youtube.com", "youtu.be"))
+
+
+def to_extracted_doc(data: Dict[str, Any], url: str) -> ExtractedDoc:
+    return ExtractedDoc(
+        url=data.get("url", url),
+        title=data.get("title", "") or "",
+        text=data.get("text", "") or "",
+        language=data.get("language"),
+        meta=data.get("meta", {}),
+        success=bool(data.get("success")),
+    )
+
+
+def _doc_from_cache(value: Dict[str, Any]) -> ExtractedDoc:
+    # The memory tier hands out the stored dict itself, so copy what callers may mutate
+    return ExtractedDoc(**{**value, "meta": dict(value.get("meta") or {})})
+
+
+def _failed_doc(url: str, error: str) -> ExtractedDoc:
+    return ExtractedDoc(url=url, title="", text="", language=None, meta={"error": error}, success=False)
+
+
+@dataclass
+class FetchStats:
+    fetches: int = 0
+    errors: int = 0
+    skipped_types: int = 0
+    bytes_read: int = 0
+    not_modified: int = 0
+    fetch_time_s: float = 0.0
+    parse_time_s: float = 0.0
+    hosts: Dict[str, int] = field(default_factory=dict)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "skipped_types": self.skipped_types,
+            "bytes_read": self.bytes_read,
+            "not_modified": self.not_modified,
+            "avg_fetch_ms": round(self.fetch_time_s / self.fetches * 1000, 1) if self.fetches else 0.0,
+            "parse_time_s": round(self.parse_time_s, 3),
+            "distinct_hosts": len(self.hosts),
+        }
+
+
+class FetchService:
+    """
+    Process-wide owner of the fetch event loop, the HTTP pool and the CPU pool.
+    Use `get_fetch_service()` rather than constructing one per request.
+    """
+
+    def __init__(self, settings=None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cfg = settings or get_settings()
+        self.max_concurrency = max(1, self.cfg.extract_max_concurrency)
+        self.per_host = max(1, self.cfg.extract_per_host)
+        self.max_bytes = self.cfg.extract_max_bytes
+        self.stats = FetchStats()
+        self.cache = get_research_cache(self.cfg)
+        self.ttl_policy = CacheConfig()
+
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._cpu_pool: Optional[futures.Executor] = None
+        self._cpu_lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="research-fetch", daemon=True)
+        self._thread.start()
+        self._closed = False
+
+    # ---- async API (usable from any event loop) ----
+
+    async def fetch(self, url: str) -> FetchResult:
+        return await asyncio.wrap_future(self._submit(self._fetch(url)))
+
+    async def extract(self, url: str) -> ExtractedDoc:
+        return await asyncio.wrap_future(self._submit(self._extract(url)))
+
+    async def extract_many(self, urls: List[str]) -> List[ExtractedDoc]:
+        """Extract all URLs concurrently; results keep the input order."""
+        return await asyncio.wrap_future(self._submit(self._extract_many(urls)))
+
+    async def extract_as_completed(self, items: AsyncIterable[Any]) -> AsyncIterator[ExtractedDoc]:
+        """
+        Start extracting each URL (or Hit) as soon as it arrives from `items`
+        and yield documents in completion order. Pairs with
+        SearchAggregator.stream() so extraction overlaps with search.
+        """
+        source = items.__aiter__()
+        next_item: Optional[asyncio.Future] = asyncio.ensure_future(source.__anext__())
+        running = set()
+        try:
+            while next_item is not None or running:
+                waiting = set(running)
+                if next_item is not None:
+                    waiting.add(next_item)
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    if fut is next_item:
+                        try:
+                            item = fut.result()
+                        except StopAsyncIteration:
+                            next_item = None
+                            continue
+                        url = getattr(item, "url", item)
+                        running.add(asyncio.wrap_future(self._submit(self._extract(url))))
+                        next_item = asyncio.ensure_future(source.__anext__())
+                    else:
+                        running.discard(fut)
+                        yield fut.result()
+        finally:
+            if next_item is not None:
+                next_item.cancel()
+            for fut in running:
+                fut.cancel()
+
+    # ---- sync API (blocking; never call from the fetch loop itself) ----
+
+    def fetch_sync(self, url: str) -> FetchResult:
+        return self._submit(self._fetch(url)).result()
+
+    def extract_sync(self, url: str) -> ExtractedDoc:
+        return self._submit(self._extract(url)).result()
+
+    def extract_many_sync(self, urls: List[str]) -> List[ExtractedDoc]:
+        return self._submit(self._extract_many(urls)).result()
+
+    def run_cpu(self, fn: Callable, *args) -> Any:
+        """Run a picklable CPU-bound function in the shared process pool."""
+        return self._submit(self._run_cpu(fn, *args)).result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.stats.snapshot()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---- internals (run on the fetch loop) ----
+
+    def _submit(self, coro) -> futures.Future:
+        if self._closed:
+            coro.close()
+            raise RuntimeError("FetchService is closed")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.cfg.requests_timeout_s, connect=min(5.0, self.cfg.requests_timeout_s)),
+                headers={"User-Agent": self.cfg.user_agent},
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=30.0,
+                ),
+                transport=self._transport,
+            )
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def _fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        client = self._ensure_client()
+        host = (urlsplit(url).hostname or "").lower()
+        started = time.monotonic()
+
+        async with self._global, self._host_limit(host):
+            self.stats.fetches += 1
+            self.stats.hosts[host] = self.stats.hosts.get(host, 0) + 1
+            try:
+                async with client.stream("GET", url, headers=headers) as resp:
+                    chunks: List[bytes] = []
+                    size = 0
+                    content_type = None
+                    truncated = False
+                    async for chunk in resp.aiter_bytes():
+                        if content_type is None:
+                            content_type = sniff_content_type(
+                                resp.headers.get("content-type"), chunk, str(resp.url)
+                            )
+                            if content_type not in EXTRACTABLE_TYPES:
+                                # Images, video, archives: nothing to extract, stop downloading
+                                self.stats.skipped_types += 1
+                                break
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.max_bytes:
+                            truncated = True
+                            break
+
+                    self.stats.bytes_read += size
+                    elapsed = time.monotonic() - started
+                    self.stats.fetch_time_s += elapsed
+                    return FetchResult(
+                        url=str(resp.url),
+                        status=resp.status_code,
+                        content_type=content_type or sniff_content_type(
+                            resp.headers.get("content-type"), b"", str(resp.url)
+                        ),
+                        body=b"".join(chunks),
+                        encoding=resp.charset_encoding,
+                        etag=resp.headers.get("etag"),
+                        last_modified=resp.headers.get("last-modified"),
+                        truncated=truncated,
+                        elapsed_s=elapsed,
+                    )
+            except Exception as e:
+                self.stats.errors += 1
+                logger.debug(f"Fetch failed for {url}: {e}")
+                return FetchResult(
+                    url=url, status=0, content_type="", error=str(e),
+                    elapsed_s=time.monotonic() - started,
+                )
+
+    async def _extract(self, url: str) -> ExtractedDoc:
+        if self.cache is None:
+            doc, _ = await self._extract_uncached(url)
+            return doc
+
+        key = self.cache.make_key("doc", canonicalize_url(url))
+        entry = await self.cache.aget("doc", key, allow_stale=True)
+        if entry is not None and entry.fresh:
+            return _doc_from_cache(entry.value)
+
+        doc, res = await self._extract_uncached(url, cached=entry)
+        if res is not None and res.status == 304 and entry is not None:
+            self.stats.not_modified += 1
+            await self.cache.arefresh("doc", key, entry, self._ttl_for(url, res))
+            return _doc_from_cache(entry.value)
+
+        if doc.success:
+            await self.cache.aset(
+                "doc", key, asdict(doc), ttl_s=self._ttl_for(url, res),
+                etag=res.etag if res else None,
+                last_modified=res.last_modified if res else None,
+            )
+        return doc
+
+    async def _extract_uncached(
+        self, url: str, cached: Optional[CacheEntry] = None
+    ) -> Tuple[ExtractedDoc, Optional[FetchResult]]:
+        res: Optional[FetchResult] = None
+        try:
+            if is_youtube(url) and self.cfg.enable_youtube:
+                data = await asyncio.to_thread(extract_youtube, url, self.cfg.requests_timeout_s)
+                return to_extracted_doc(data, url), None
+
+            conditional = {}
+            if cached is not None:
+                if cached.etag:
+                    conditional["If-None-Match"] = cached.etag
+                if cached.last_modified:
+                    conditional["If-Modified-Since"] = cached.last_modified
+
+            res = await self._fetch(url, headers=conditional or None)
+            if res.error:
+                return _failed_doc(url, res.error), res
+            if res.status == 304:
+                return _failed_doc(url, "not modified"), res
+            if res.status >= 400:
+                return _failed_doc(url, f"HTTP {res.status}"), res
+
+            if res.is_pdf:
+                if not self.cfg.enable_pdf:
+                    return _failed_doc(url, "pdf extraction disabled"), res
+                data = await self._run_cpu(parse_pdf_bytes, url, res.body)
+            elif res.content_type in EXTRACTABLE_TYPES:
+                data = await self._run_cpu(parse_html, url, res.text)
+            else:
+                return _failed_doc(url, f"unsupported content type {res.content_type}"), res
+
+            doc = to_extracted_doc(data, url)
+            doc.meta.setdefault("final_url", res.url)
+            if res.truncated:
+                doc.meta["truncated"] = True
+            return doc, res
+        except Exception as e:
+            logger.warning(f"Extraction failed for {url}: {e}")
+            return _failed_doc(url, str(e)), res
+
+    def _ttl_for(self, url: str, res: Optional[FetchResult]) -> int:
+        return self.ttl_policy.get_expiration(url, res.content_type if res else None)
+
+    async def _extract_many(self, urls: List[str]) -> List[ExtractedDoc]:
+        return list(await asyncio.gather(*(self._extract(u) for u in urls)))
+
+    async def _run_cpu(self, fn: Callable, *args) -> Any:
+        started = time.monotonic()
+        pool = self._get_cpu_pool()
+        try:
+            if pool is None:
+                return await asyncio.to_thread(fn, *args)
+            try:
+                return await asyncio.wrap_future(pool.submit(fn, *args))
+            except futures.process.BrokenProcessPool:
+                logger.warning("Extraction process pool broke; parsing in a thread instead")
+                self._cpu_pool = None
+                return await asyncio.to_thread(fn, *args)
+        finally:
+            self.stats.parse_time_s += time.monotonic() - started
+
+    def _get_cpu_pool(self) -> Optional[futures.Executor]:
+        if self.cfg.extract_cpu_workers <= 0:
+            return None
+        with self._cpu_lock:
+            if self._cpu_pool is None:
+                # spawn: the parent runs threads, so forking it is not safe
+                self._cpu_pool = futures.ProcessPoolExecutor(
+                    max_workers=self.cfg.extract_cpu_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._cpu_pool
+
+
+_service: Optional[FetchService] = None
+_service_lock = threading.Lock()
+
+
+def get_fetch_service(settings=None) -> FetchService:
+    """
+    Shared FetchService for the process. `settings` only applies on first use.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = FetchService(settings=settings)
+    return _service
+
+
+def shutdown_fetch_service():
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+            _service = None
@@ -13,14 +13,14 @@ except Exception:
     trafilatura = None 
 
 try:
-    from readablity import Document 
+    from readability import Document
 except Exception:
     Document = None 
 
 @dataclass
 class HtmlExtractionResult:
     title: str
-    test: str 
+    text: str
     language: Optional[str]
     meta: Dict[str, Any]
 
@@ -59,9 +59,9 @@ def _trafilatura_extract(html: str) -> HtmlExtractionResult:
 
     return HtmlExtractionResult(title=title or "", text=text or "", language=lang, meta=meta)
 
-def readablity_fallback(html: str) -> HtmlExtractionResult:
+def _readability_fallback(html: str) -> HtmlExtractionResult:
     if not  Document:
-        return HtmlExtractionResult(title="", test="", language=None, meta={})
+        return HtmlExtractionResult(title="", text="", language=None, meta={})
     try:
         doc = Document(html)
         title = (doc.short_title() or "").strip()
@@ -72,17 +72,14 @@ def readablity_fallback(html: str) -> HtmlExtractionResult:
         return HtmlExtractionResult(title=title, text=text, language=None, meta={"engine":"readablity"})
     except Exception as e:
         logger.debug(f"readablity_fallback failed: {e}")
-        return HtmlExtractionResult(title=" ", text=" ", language=None, meta={})
+        return HtmlExtractionResult(title="", text="", language=None, meta={})
 
-def extract_html(url: str, html: Optional[str], user_agent: str, timeout_s: int) -> Dict[str, Any]:
+def parse_html(url: str, html: str) -> Dict[str, Any]:
     """
-    Extract title & clean text from HTML using trafilatura, falling back to readability.
-    Returns a dict that upper layers convert into ExtractedDoc.
+    CPU-bound half of extraction: title & clean text from an HTML string.
+    Top-level so it can run in the fetch layer's process pool.
     """
     try:
-        if html is None:
-            html = fetch_html(url, user_agent=user_agent, timeout_s=timeout_s)
-
         res = _trafilatura_extract(html)
         if not res.text:
             res = _readability_fallback(html)
@@ -106,4 +103,23 @@ def extract_html(url: str, html: Optional[str], user_agent: str, timeout_s: int)
             "success": False,
         }
 
+def extract_html(url: str, html: Optional[str], user_agent: str, timeout_s: int) -> Dict[str, Any]:
+    """
+    Extract title & clean text from HTML using trafilatura, falling back to readability.
+    Returns a dict that upper layers convert into ExtractedDoc.
+    """
+    try:
+        if html is None:
+            html = fetch_html(url, user_agent=user_agent, timeout_s=timeout_s)
+    except Exception as e:
+        logger.warning(f"HTML extraction failed for {url}: {e}")
+        return {
+            "url": url,
+            "title": "",
+            "text": "",
+            "language": None,
+            "meta": {"error": str(e)},
+            "success": False,
+        }
 
+    return parse_html(url, html)
@@ -25,15 +25,16 @@ def _download_pdf_bytes(url: str, user_agent: str, timeout_s: int) -> bytes:
     r.raise_for_status()
     return r.content
 
-def extract_pdf(url: str, user_agent: str, timeout_s: int) -> Dict[str, Any]:
+def parse_pdf_bytes(url: str, raw: bytes) -> Dict[str, Any]:
     """
-    Extract text from a PDF and build a page map (list of spans with absolute char offsets).
+    CPU-bound half of extraction: text and a page map (list of spans with
+    absolute char offsets) from PDF bytes. Top-level so it can run in the
+    fetch layer's process pool.
     """
     try:
         if not PdfReader:
             raise RuntimeError("pypdf not installed (pip install pypdf)")
 
-        raw = _download_pdf_bytes(url, user_agent=user_agent, timeout_s=timeout_s)
         reader = PdfReader(io.BytesIO(raw))
 
         texts: List[str] = []
@@ -83,3 +84,23 @@ def extract_pdf(url: str, user_agent: str, timeout_s: int) -> Dict[str, Any]:
             "success": False,
         }
 
+def extract_pdf(url: str, user_agent: str, timeout_s: int) -> Dict[str, Any]:
+    """
+    Download a PDF and extract its text and page map.
+    """
+    try:
+        if not PdfReader:
+            raise RuntimeError("pypdf not installed (pip install pypdf)")
+        raw = _download_pdf_bytes(url, user_agent=user_agent, timeout_s=timeout_s)
+    except Exception as e:
+        logger.warning(f"PDF extraction failed for {url}: {e}")
+        return {
+            "url": url,
+            "title": "",
+            "text": "",
+            "language": None,
+            "meta": {"error": str(e)},
+            "success": False,
+        }
+
+    return parse_pdf_bytes(url, raw)
@@ -15,7 +15,7 @@ from enum import Enum
 # Import from your modules (will be available once integrated)
 # from ..planners.query_planner import QueryPlanner
 # from ..search.aggregator import SearchAggregator  
-# from ..extract.router import ExtractionRouter
+from ..extract.fetcher import get_fetch_service
 from ..rank.bm25 import BM25Ranker, quick_bm25_rank
 from ..rank.rerank import ReRanker, quick_rerank
 from ..synth.map_reduce import MapReduceProcessor, quick_map_reduce
@@ -228,34 +228,38 @@ class ResearchAgent:
         return all_results[:self.config.max_search_results]
     
     async def _extraction_stage(self, search_results: List[Dict]) -> List[Dict]:
-        """Extract content from search results (placeholder for your extraction router)"""
-        # This will integrate with your ExtractionRouter once ready
-        
+        """Extract content from search results via the shared fetch service"""
+        urls = [result["url"] for result in search_results]
+
+        try:
+            docs = await asyncio.wait_for(
+                get_fetch_service().extract_many(urls),
+                timeout=self.config.extract_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Extraction timed out after {self.config.extract_timeout}s")
+            docs = [None] * len(urls)
+
         extracted_content = []
-        for result in search_results:
-            # Simulate content extraction
-            content = f"""
-            Title: {result['title']}
-            
-            This is the extracted content for {result['title']}.
-            It contains detailed information about the topic with multiple paragraphs
-            of relevant content that would be useful for research synthesis.
-            
-            The content includes facts, examples, and explanations that directly
-            relate to the search query and provide valuable insights.
-            
-            URL: {result['url']}
-            Relevance: {result['relevance_score']:.2f}
-            """
-            
+        for result, doc in zip(search_results, docs):
+            if doc is not None and doc.success and doc.text.strip():
+                title = doc.title or result["title"]
+                content = doc.text
+                success = True
+            else:
+                # Fall back to the search snippet so ranking still sees the source
+                title = result["title"]
+                content = result.get("snippet", "")
+                success = False
+
             extracted_content.append({
                 "url": result["url"],
-                "title": result["title"],
-                "content": content.strip(),
+                "title": title,
+                "content": content,
                 "length": len(content),
-                "extraction_success": True
+                "extraction_success": success
             })
-        
+
         return extracted_content
     
     async def _ranking_stage(self, query: str, extracted_content: List[Dict]) -> List[Any]:
@@ -0,0 +1,274 @@
+"""
+Batched text embeddings for semantic reranking.
+
+Backends turn a list of texts into a row-normalized float32 matrix, so
+cosine similarity against a query is a single matrix-vector product:
+
+- OllamaEmbeddingBackend:         POST /api/embed with a batch of inputs
+- SentenceTransformerBackend:     local CPU model (needs sentence-transformers)
+- HashingEmbeddingBackend:        dependency-free hashed word/char-gram vectors,
+                                  used when neither of the above is available
+
+EmbeddingCache keeps vectors keyed by a SHA-256 of (backend, text), so a
+candidate that shows up again in a later search is never re-embedded.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row; zero rows stay zero"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingBackend(ABC):
+    """Embeds batches of texts; `name` identifies the vector space for caching"""
+
+    name: str = "embedding"
+    batch_size: int = 64
+
+    @abstractmethod
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Raw (unnormalized) vectors for one batch"""
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Row-normalized (len(texts), dim) matrix"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        parts = [await self._embed_batch(texts[i:i + self.batch_size])
+                 for i in range(0, len(texts), self.batch_size)]
+        return normalize_rows(np.vstack(parts))
+
+    async def close(self):
+        pass
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """Ollama /api/embed, which accepts a list of inputs per request"""
+
+    def __init__(self, model: str = "nomic-embed-text", base_url: Optional[str] = None,
+                 batch_size: int = 64, timeout: float = 60.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.model = model
+        self.base_url = (base_url or get_settings().local_ollama_url).rstrip("/")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.name = f"ollama:{model}"
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=self._transport)
+        resp = await self._client.post(f"{self.base_url}/api/embed",
+                                       json={"model": self.model, "input": texts})
+        resp.raise_for_status()
+        embeddings = resp.json().get("embeddings") or []
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs")
+        return np.asarray(embeddings, dtype=np.float32)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Local sentence-transformers model, encoded in a worker thread"""
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 batch_size: int = 64, device: str = "cpu"):
+        from sentence_transformers import SentenceTransformer  # ImportError if not installed
+
+        self._model_cls = SentenceTransformer
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self.name = f"st:{model_name}"
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            if self._model is None:
+                logger.info(f"Loading embedding model: {self.model_name}")
+                self._model = self._model_cls(self.model_name, device=self.device)
+            return self._model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                      show_progress_bar=False)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        # The model batches internally; one thread hop for the whole list
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return normalize_rows(await asyncio.to_thread(self._encode, texts))
+
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._encode, texts)
+
+
+@lru_cache(maxsize=262144)
+def _feature_hash(feature: str) -> int:
+    # Stable across processes, unlike hash(); vocabularies repeat, hence the memo
+    return zlib.crc32(feature.encode("utf-8", "surrogatepass"))
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Signed feature hashing of words and character trigrams. No model to load,
+    so it is always available; similarity is lexical-ish but smoother than BM25.
+    """
+
+    _TOKEN = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 384, batch_size: int = 256):
+        self.dim = dim
+        self.batch_size = batch_size
+        self.name = f"hashing:{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = self._TOKEN.findall(text.lower())
+        grams = [w[i:i + 3] for w in words if len(w) > 3 for i in range(len(w) - 2)]
+        return words + grams
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            digests = np.fromiter((_feature_hash(f) for f in features), dtype=np.int64, count=len(features))
+            signs = np.where(digests & 1, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], (digests >> 1) % self.dim, signs)
+        return matrix
+
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._encode, texts)
+
+
+_backends: Dict[str, EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_embedding_backend(model_name: str) -> EmbeddingBackend:
+    """
+    Shared backend per model name, so the model loads once per process.
+    "ollama:<model>" uses Ollama; anything else is a local sentence-transformers
+    model, falling back to hashed vectors when that package is missing.
+    """
+    with _backends_lock:
+        backend = _backends.get(model_name)
+        if backend is None:
+            batch_size = get_settings().rerank_batch_size
+            if model_name.startswith("ollama:"):
+                backend = OllamaEmbeddingBackend(model=model_name.split(":", 1)[1], batch_size=batch_size)
+            else:
+                try:
+                    backend = SentenceTransformerBackend(model_name, batch_size=batch_size)
+                except ImportError:
+                    logger.warning(f"sentence-transformers not installed, reranking with hashed "
+                                   f"embeddings instead of {model_name}")
+                    backend = HashingEmbeddingBackend()
+            _backends[model_name] = backend
+        return backend
+
+
+class EmbeddingCache:
+    """LRU of normalized vectors keyed by SHA-256 of (backend name, text)"""
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(backend_name: str, text: str) -> str:
+        return hashlib.sha256(f"{backend_name}\0{text}".encode("utf-8", "surrogatepass")).hexdigest()
+
+    async def embed(self, backend: EmbeddingBackend, texts: List[str]) -> np.ndarray:
+        """Vectors for `texts`, embedding only the ones not cached (each once)"""
+        keys = [self.key(backend.name, text) for text in texts]
+        rows: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: Dict[str, int] = {}  # key -> index of first text with it
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    rows[i] = vector
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, i)
+                    self.misses += 1
+
+        if missing:
+            fresh = await backend.embed([texts[i] for i in missing.values()])
+            with self._lock:
+                for key, vector in zip(missing, fresh):
+                    self._entries[key] = vector
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            by_key = dict(zip(missing, fresh))
+            for i, key in enumerate(keys):
+                if rows[i] is None:
+                    rows[i] = by_key[key]
+
+        return np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Global cache instance
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide candidate embedding cache shared by all rerankers"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(get_settings().rerank_cache_entries)
+    return _embedding_cache
+
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    if _embedding_cache is None:
+        return {"entries": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
+    return _embedding_cache.get_stats()
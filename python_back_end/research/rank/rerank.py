@@ -6,13 +6,19 @@ initial BM25 results with semantic understanding.
 """
 
 import asyncio
+import threading
+import time
 from typing import List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 import logging
 
+import numpy as np
+
 # Import from your core module
 from .bm25 import RankedChunk
+from .embeddings import EmbeddingBackend, EmbeddingCache, get_embedding_backend, get_embedding_cache
+from ..config.settings import get_settings
 from ..core.types import DocChunk
 
 logger = logging.getLogger(__name__)
@@ -48,158 +54,195 @@ class BaseReranker(ABC):
         pass
 
 
+_cross_encoder_models: Dict[str, Any] = {}
+_cross_encoder_lock = threading.Lock()
+
+
+def _load_cross_encoder(model_name: str):
+    """Shared CrossEncoder per model name, or None without sentence-transformers"""
+    with _cross_encoder_lock:
+        if model_name not in _cross_encoder_models:
+            try:
+                from sentence_transformers import CrossEncoder
+
+                logger.info(f"Loading cross-encoder model: {model_name}")
+                _cross_encoder_models[model_name] = CrossEncoder(model_name, device="cpu")
+            except ImportError:
+                logger.warning("sentence-transformers not installed, cross-encoder falls back to term overlap")
+                _cross_encoder_models[model_name] = None
+        return _cross_encoder_models[model_name]
+
+
 class CrossEncoderReranker(BaseReranker):
     """
-    Cross-encoder reranker using sentence transformers or similar models.
-    
-    This is a placeholder implementation - would integrate with actual
-    cross-encoder models like ms-marco-MiniLM-L-12-v2.
+    Cross-encoder reranker using a sentence-transformers CrossEncoder
+    (ms-marco-MiniLM-L-12-v2 by default), scored in batches on CPU.
+
+    Without sentence-transformers installed it scores by query term overlap.
     """
     
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-12-v2", lexical_weight: float = 0.3):
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-12-v2", lexical_weight: float = 0.3,
+                 batch_size: int = 16):
         self.model_name = model_name
         self.lexical_weight = lexical_weight
         self.semantic_weight = 1.0 - lexical_weight
+        self.batch_size = batch_size
         self._model = None
+        self._loaded = False
     
     async def _load_model(self):
-        """Load cross-encoder model (placeholder)"""
-        if self._model is None:
-            # Placeholder - would load actual sentence-transformers model
-            logger.info(f"Loading cross-encoder model: {self.model_name}")
-            # self._model = CrossEncoder(self.model_name)
-            self._model = "placeholder_model"
+        """Load the cross-encoder off the event loop (once per process)"""
+        if not self._loaded:
+            self._model = await asyncio.to_thread(_load_cross_encoder, self.model_name)
+            self._loaded = True
+    
+    @staticmethod
+    def _term_overlap(query: str, texts: List[str]) -> np.ndarray:
+        """Fraction of query terms present in each text"""
+        query_terms = set(query.lower().split())
+        return np.array([
+            min(1.0, len(query_terms.intersection(text.lower().split())) / max(1, len(query_terms)))
+            for text in texts
+        ], dtype=np.float32)
     
-    async def _score_query_chunk_pair(self, query: str, chunk_text: str) -> float:
-        """Score a query-chunk pair using cross-encoder (placeholder)"""
+    async def score(self, query: str, texts: List[str], deadline: Optional[float] = None) -> np.ndarray:
+        """
+        Relevance in [0, 1] for each (query, text) pair. Batches that would
+        start after `deadline` (time.perf_counter()) are left as NaN.
+        """
         await self._load_model()
+        scores = np.full(len(texts), np.nan, dtype=np.float32)
+        if self._model is None:
+            scores[:] = self._term_overlap(query, texts)
+            return scores
         
-        # Placeholder scoring - would use actual model
-        # return self._model.predict([(query, chunk_text)])[0]
-        
-        # Simple heuristic for demo: higher score for more query terms present
-        query_terms = set(query.lower().split())
-        chunk_terms = set(chunk_text.lower().split())
-        overlap = len(query_terms.intersection(chunk_terms))
-        return min(1.0, overlap / max(1, len(query_terms)))
+        for i in range(0, len(texts), self.batch_size):
+            if deadline is not None and time.perf_counter() >= deadline:
+                logger.debug(f"Cross-encoder budget spent after {i} of {len(texts)} candidates")
+                break
+            pairs = [(query, text) for text in texts[i:i + self.batch_size]]
+            batch = await asyncio.to_thread(self._model.predict, pairs, batch_size=self.batch_size,
+                                            show_progress_bar=False)
+            scores[i:i + len(pairs)] = np.clip(np.asarray(batch, dtype=np.float32), 0.0, 1.0)
+        return scores
     
     async def rerank(self, query: str, ranked_chunks: List[RankedChunk], top_k: Optional[int] = None) -> List[RerankedChunk]:
         """Rerank using cross-encoder semantic scoring"""
         if not ranked_chunks:
             return []
         
-        reranked = []
+        semantic = await self.score(query, [ranked_chunk.chunk.text for ranked_chunk in ranked_chunks])
+        lexical = np.array([ranked_chunk.score for ranked_chunk in ranked_chunks], dtype=np.float32)
+        combined = self.lexical_weight * lexical + self.semantic_weight * semantic
         
-        # Score each chunk semantically
-        for ranked_chunk in ranked_chunks:
-            semantic_score = await self._score_query_chunk_pair(query, ranked_chunk.chunk.text)
-            
-            # Combine lexical and semantic scores
-            combined_score = (
-                self.lexical_weight * ranked_chunk.score + 
-                self.semantic_weight * semantic_score
-            )
-            
-            reranked.append(RerankedChunk(
-                chunk=ranked_chunk.chunk,
-                lexical_score=ranked_chunk.score,
-                semantic_score=semantic_score,
-                combined_score=combined_score,
-                term_matches=ranked_chunk.term_matches,
+        # Stable descending order, same tie-breaking as list.sort(reverse=True)
+        order = np.argsort(-combined, kind="stable")[:top_k]
+        return [
+            RerankedChunk(
+                chunk=ranked_chunks[i].chunk,
+                lexical_score=ranked_chunks[i].score,
+                semantic_score=float(semantic[i]),
+                combined_score=float(combined[i]),
+                term_matches=ranked_chunks[i].term_matches,
                 metadata={"model": self.model_name}
-            ))
-        
-        # Sort by combined score
-        reranked.sort(key=lambda x: x.combined_score, reverse=True)
-        
-        if top_k is not None:
-            reranked = reranked[:top_k]
-        
-        return reranked
+            )
+            for i in order
+        ]
 
 
 class EmbeddingReranker(BaseReranker):
     """
     Embedding-based reranker using cosine similarity.
     
-    Uses sentence embeddings to compute semantic similarity between
-    query and document chunks.
+    Query and candidates are embedded in batches through a pluggable backend
+    (see embeddings.py), candidate vectors are cached by content hash, and
+    all similarities come from one matrix-vector product. An optional
+    cross-encoder then rescores the top candidates within a latency budget.
     """
     
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", lexical_weight: float = 0.4):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        lexical_weight: float = 0.4,
+        backend: Optional[EmbeddingBackend] = None,
+        cache: Optional[EmbeddingCache] = None,
+        cross_encoder: Optional[CrossEncoderReranker] = None,
+        cross_encoder_top_k: Optional[int] = None,
+        cross_encoder_budget_ms: Optional[int] = None,
+    ):
+        """
+        Args:
+            model_name: Local sentence-transformers model, or "ollama:<model>"
+            lexical_weight: Weight of the BM25 score in the combined score
+            backend: Embedding backend (defaults to the shared one for model_name)
+            cache: Vector cache (defaults to the process-wide cache)
+            cross_encoder: Second stage for the top candidates; enabled by default
+                when settings.enable_cross_rerank is set
+            cross_encoder_top_k: How many top candidates the cross-encoder rescores
+            cross_encoder_budget_ms: Time the cross-encoder may spend per query
+        """
+        settings = get_settings()
         self.model_name = model_name
         self.lexical_weight = lexical_weight
         self.semantic_weight = 1.0 - lexical_weight
-        self._model = None
+        self._backend = backend
+        self.cache = cache or get_embedding_cache()
+        if cross_encoder is None and settings.enable_cross_rerank:
+            cross_encoder = CrossEncoderReranker()
+        self.cross_encoder = cross_encoder
+        self.cross_encoder_top_k = settings.rerank_cross_top_k if cross_encoder_top_k is None else cross_encoder_top_k
+        self.cross_encoder_budget_ms = (settings.rerank_cross_budget_ms if cross_encoder_budget_ms is None
+                                        else cross_encoder_budget_ms)
     
-    async def _load_model(self):
-        """Load sentence embedding model (placeholder)"""
-        if self._model is None:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            # Would load actual SentenceTransformer model
-            # self._model = SentenceTransformer(self.model_name)
-            self._model = "placeholder_embedding_model"
+    @property
+    def backend(self) -> EmbeddingBackend:
+        if self._backend is None:
+            self._backend = get_embedding_backend(self.model_name)
+        return self._backend
     
-    async def _compute_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Compute embeddings for text list (placeholder)"""
-        await self._load_model()
-        
-        # Placeholder - would use actual model
-        # return self._model.encode(texts).tolist()
-        
-        # Return dummy embeddings for demo
-        return [[0.1] * 384 for _ in texts]
-    
-    async def _cosine_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
-        """Compute cosine similarity between embeddings"""
-        # Simple dot product for demo (assumes normalized embeddings)
-        if len(embedding1) != len(embedding2):
-            return 0.0
-        
-        dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
-        return max(0.0, min(1.0, dot_product))  # Clamp to [0,1]
+    async def _compute_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings for texts, from cache where possible"""
+        return await self.cache.embed(self.backend, texts)
     
     async def rerank(self, query: str, ranked_chunks: List[RankedChunk], top_k: Optional[int] = None) -> List[RerankedChunk]:
         """Rerank using embedding similarity"""
         if not ranked_chunks:
             return []
         
-        # Prepare texts for embedding
-        texts = [query] + [chunk.chunk.text for chunk in ranked_chunks]
-        embeddings = await self._compute_embeddings(texts)
+        texts = [ranked_chunk.chunk.text for ranked_chunk in ranked_chunks]
+        embeddings = await self._compute_embeddings([query] + texts)
         
-        query_embedding = embeddings[0]
-        chunk_embeddings = embeddings[1:]
+        # Rows are unit length, so cosine similarity is a dot product; clamp to [0, 1]
+        semantic = np.clip(embeddings[1:] @ embeddings[0], 0.0, 1.0)
+        lexical = np.array([ranked_chunk.score for ranked_chunk in ranked_chunks], dtype=np.float32)
+        combined = self.lexical_weight * lexical + self.semantic_weight * semantic
+        order = np.argsort(-combined, kind="stable")
+        stage = ["embedding"] * len(ranked_chunks)
         
-        reranked = []
+        if self.cross_encoder is not None and self.cross_encoder_top_k > 0:
+            head = order[:self.cross_encoder_top_k]
+            deadline = time.perf_counter() + self.cross_encoder_budget_ms / 1000
+            cross = await self.cross_encoder.score(query, [texts[i] for i in head], deadline=deadline)
+            for i, score in zip(head, cross):
+                if not np.isnan(score):
+                    semantic[i] = score
+                    combined[i] = self.lexical_weight * lexical[i] + self.semantic_weight * score
+                    stage[i] = "cross_encoder"
+            # Rescored candidates are reordered among themselves and stay ahead of the rest
+            order = np.concatenate([head[np.argsort(-combined[head], kind="stable")], order[len(head):]])
         
-        # Score each chunk
-        for i, ranked_chunk in enumerate(ranked_chunks):
-            chunk_embedding = chunk_embeddings[i]
-            semantic_score = await self._cosine_similarity(query_embedding, chunk_embedding)
-            
-            # Combine scores
-            combined_score = (
-                self.lexical_weight * ranked_chunk.score +
-                self.semantic_weight * semantic_score
+        dim = embeddings.shape[1]
+        return [
+            RerankedChunk(
+                chunk=ranked_chunks[i].chunk,
+                lexical_score=ranked_chunks[i].score,
+                semantic_score=float(semantic[i]),
+                combined_score=float(combined[i]),
+                term_matches=ranked_chunks[i].term_matches,
+                metadata={"model": self.backend.name, "embedding_dim": dim, "stage": stage[i]}
             )
-            
-            reranked.append(RerankedChunk(
-                chunk=ranked_chunk.chunk,
-                lexical_score=ranked_chunk.score,
-                semantic_score=semantic_score,
-                combined_score=combined_score,
-                term_matches=ranked_chunk.term_matches,
-                metadata={"model": self.model_name, "embedding_dim": len(chunk_embedding)}
-            ))
-        
-        # Sort by combined score
-        reranked.sort(key=lambda x: x.combined_score, reverse=True)
-        
-        if top_k is not None:
-            reranked = reranked[:top_k]
-        
-        return reranked
+            for i in order[:top_k]
+        ]
 
 
 class ReRanker:
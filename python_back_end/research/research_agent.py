@@ -26,6 +26,12 @@ LOCAL_OLLAMA_URL = os.getenv(
 )  # Use environment variable for merged deployment
 API_KEY = os.getenv("OLLAMA_API_KEY", "key")
 
+# ─── Async research fan-out limits ───────────────────────────────────────────
+# Search clients (ddgs, Tavily) are blocking, so each call takes a worker thread
+RESEARCH_SEARCH_CONCURRENCY = int(os.getenv("RESEARCH_SEARCH_CONCURRENCY", "4"))
+RESEARCH_SEARCH_TIMEOUT_S = float(os.getenv("RESEARCH_SEARCH_TIMEOUT_S", "20"))
+RESEARCH_TRANSCRIPT_CONCURRENCY = int(os.getenv("RESEARCH_TRANSCRIPT_CONCURRENCY", "3"))
+
 
 def make_ollama_request(endpoint, payload, timeout=90):
     """Make a POST request to Ollama with automatic fallback from cloud to local.
@@ -538,61 +544,30 @@ DO NOT include a Sources section - that's handled separately.
         search_queries = await self._async_generate_search_queries(topic, model)
         logger.info(f"[Async] Generated search queries: {search_queries}")
 
-        # Search the web with improved queries (including videos)
-        all_search_data = {"search_results": [], "extracted_content": [], "videos": []}
-
-        for query in search_queries:
-            logger.info(f"[Async] Searching for: '{query}'")
-            # Use video-enabled search if available
-            if hasattr(self.search_agent, "search_and_extract_with_videos"):
-                query_data = self.search_agent.search_and_extract_with_videos(
-                    query,
-                    extract_content=params["extract_content"],
-                    max_web_results=params["max_results"],
-                    max_video_results=params.get("max_videos", 4),
-                )
-            elif hasattr(self.search_agent, "search_and_extract"):
-                query_data = self.search_agent.search_and_extract(
-                    query, extract_content=params["extract_content"]
-                )
-                query_data["videos"] = []
-            else:
-                query_data = {
-                    "query": query,
-                    "search_results": self.search_agent.search_web(
-                        query, params["max_results"]
-                    ),
-                    "extracted_content": [],
-                    "videos": [],
-                }
-
-            # Combine results from all queries
-            all_search_data["search_results"].extend(
-                query_data.get("search_results", [])
-            )
-            all_search_data["extracted_content"].extend(
-                query_data.get("extracted_content", [])
-            )
-            all_search_data["videos"].extend(query_data.get("videos", []))
+        # Search every sub-query (web and video) at once, off the event loop
+        all_search_data = await self._async_search_queries(search_queries, params)
 
-        # Remove duplicates and limit results
+        # Remove duplicates and limit results before fetching any page, so
+        # each URL is extracted at most once per research run
         search_data = self._deduplicate_search_results(
             all_search_data, params["max_results"]
         )
+        if params["extract_content"]:
+            search_data["extracted_content"] = await self._async_extract_content(
+                search_data["search_results"]
+            )
 
         # Deduplicate videos
         videos = self._deduplicate_videos(
             all_search_data.get("videos", []), params.get("max_videos", 4)
         )
 
-        # Fetch transcripts for top videos (if search agent supports it)
-        if videos and hasattr(self.search_agent, "fetch_video_transcripts"):
+        # Fetch transcripts for top videos (bounded, with a per-video deadline)
+        if videos:
             logger.info(
                 f"[Async] Fetching transcripts for {min(3, len(videos))} videos..."
             )
-            videos = self.search_agent.fetch_video_transcripts(
-                videos, max_videos=3, timeout_s=15
-            )
+            videos = await self._async_fetch_video_transcripts(videos)
             transcript_count = sum(1 for v in videos if v.get("hasTranscript", False))
             logger.info(f"[Async] Fetched {transcript_count} video transcripts")
 
@@ -699,6 +674,109 @@ DO NOT include a Sources section - that's handled separately.
         )
         return result
 
+    async def _async_search_queries(
+        self, queries: List[str], params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Run web and video searches for all queries concurrently.
+
+        Each blocking search call runs on a worker thread, at most
+        RESEARCH_SEARCH_CONCURRENCY at a time and each bounded by
+        RESEARCH_SEARCH_TIMEOUT_S. Results keep the query order, so the
+        later dedup and cap behave as in the sequential version. Nothing
+        is extracted here.
+        """
+        limit = asyncio.Semaphore(max(1, RESEARCH_SEARCH_CONCURRENCY))
+
+        async def run(fn, query: str, max_results: int) -> List[Dict[str, Any]]:
+            async with limit:
+                try:
+                    results = await asyncio.wait_for(
+                        asyncio.to_thread(fn, query, max_results),
+                        timeout=RESEARCH_SEARCH_TIMEOUT_S,
+                    )
+                    return results or []
+                except asyncio.TimeoutError:
+                    logger.warning(f"[Async] Search timed out for: '{query}'")
+                except Exception as e:
+                    logger.warning(f"[Async] Search failed for '{query}': {e}")
+                return []
+
+        logger.info(f"[Async] Searching {len(queries)} queries concurrently: {queries}")
+
+        searches = [
+            run(self.search_agent.search_web, query, params["max_results"])
+            for query in queries
+        ]
+        if hasattr(self.search_agent, "search_youtube_videos"):
+            searches += [
+                run(
+                    self.search_agent.search_youtube_videos,
+                    query,
+                    params.get("max_videos", 4),
+                )
+                for query in queries
+            ]
+
+        results = await asyncio.gather(*searches)
+        web_results, video_results = results[: len(queries)], results[len(queries) :]
+
+        return {
+            "search_results": [r for batch in web_results for r in batch],
+            "extracted_content": [],
+            "videos": [v for batch in video_results for v in batch],
+        }
+
+    async def _async_extract_content(
+        self, search_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract page content for already deduplicated search results
+        """
+        urls = [
+            r["url"]
+            for r in search_results
+            if r.get("url") and "youtube.com" not in r["url"] and "youtu.be" not in r["url"]
+        ]
+        if not urls:
+            return []
+
+        try:
+            if hasattr(self.search_agent, "async_extract_content_from_urls"):
+                return await self.search_agent.async_extract_content_from_urls(urls)
+            if hasattr(self.search_agent, "extract_content_from_urls"):
+                return await asyncio.to_thread(
+                    self.search_agent.extract_content_from_urls, urls
+                )
+        except Exception as e:
+            logger.error(f"[Async] Content extraction failed: {e}")
+        return []
+
+    async def _async_fetch_video_transcripts(
+        self, videos: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch transcripts for the top videos without blocking the event loop
+        """
+        try:
+            if hasattr(self.search_agent, "async_fetch_video_transcripts"):
+                return await self.search_agent.async_fetch_video_transcripts(
+                    videos,
+                    max_videos=3,
+                    timeout_s=15,
+                    max_concurrency=RESEARCH_TRANSCRIPT_CONCURRENCY,
+                )
+            if hasattr(self.search_agent, "fetch_video_transcripts"):
+                return await asyncio.to_thread(
+                    self.search_agent.fetch_video_transcripts,
+                    videos,
+                    max_videos=3,
+                    timeout_s=15,
+                )
+        except Exception as e:
+            logger.error(f"[Async] Transcript fetching failed: {e}")
+        return videos
+
     def fact_check(self, claim: str, model: str = None) -> Dict[str, Any]:
         """
         Fact-check a claim using web search
@@ -1305,8 +1383,9 @@ Queries:"""
 
         for result in search_data.get("search_results", []):
             url = result.get("url", "")
-            if url and url not in seen_urls:
-                seen_urls.add(url)
+            key = self._canonicalize_url(url)
+            if url and key not in seen_urls:
+                seen_urls.add(key)
                 unique_results.append(result)
 
                 if len(unique_results) >= max_results:
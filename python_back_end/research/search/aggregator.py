@@ -1,9 +1,15 @@
 # python_back_end/research/search/aggregator.py
 from __future__ import annotations
-from typing import List, Iterable, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Iterable, Optional, Tuple
+import asyncio
 import logging
-from dataclasses import dataclass
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
 
+from ..cache.research_cache import get_research_cache
 from ..config.settings import get_settings
 from ..core.types import Hit
 from ..core.utils import canonicalize_url
@@ -17,6 +23,44 @@ logger = logging.getLogger(__name__)
 class ProviderSpec:
     name: str
     weight: float = 1.0   # you can change provider influence later
+    max_concurrency: int = 4            # in-flight queries against this provider
+    timeout_s: Optional[float] = None   # per-query timeout (defaults to the depth budget)
+    hedge_after_s: Optional[float] = None  # fire a duplicate request if the first is this slow
+    min_interval_s: float = 0.0         # spacing between request starts (rate limiting)
+
+
+@dataclass
+class ProviderMetrics:
+    """
+    Rolling latency and error counters for one provider.
+    """
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    hedges: int = 0
+    deadline_misses: int = 0
+    cache_hits: int = 0
+    hits: int = 0
+    latencies_s: deque = field(default_factory=lambda: deque(maxlen=256))
+
+    def record(self, latency_s: float, hits: int):
+        self.calls += 1
+        self.hits += hits
+        self.latencies_s.append(latency_s)
+
+    def snapshot(self) -> Dict[str, float]:
+        lat = sorted(self.latencies_s)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "deadline_misses": self.deadline_misses,
+            "cache_hits": self.cache_hits,
+            "hits": self.hits,
+            "p50_ms": round(statistics.median(lat) * 1000, 1) if lat else 0.0,
+            "p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000, 1) if lat else 0.0,
+        }
 
 
 class SearchAggregator:
@@ -36,15 +80,23 @@ class SearchAggregator:
         if providers is None:
             providers = []
             # DDG is always present
-            providers.append(ProviderSpec("ddg", weight=1.0))
+            # (DDG rate-limits aggressively, so keep it narrow and spaced out)
+            providers.append(ProviderSpec("ddg", weight=1.0, max_concurrency=2, min_interval_s=0.35))
             # Include Tavily if a key exists
             if self.cfg.tavily_api_key:
-                providers.append(ProviderSpec("tavily", weight=1.0))
+                providers.append(ProviderSpec("tavily", weight=1.0, max_concurrency=4, hedge_after_s=4.0))
         self.providers = providers
 
         # instances cache
         self._provider_clients = {}
 
+        # Shared research cache (None when disabled)
+        self.cache = get_research_cache(self.cfg)
+
+        # per-provider concurrency/rate state and metrics
+        self._metrics: Dict[str, ProviderMetrics] = {p.name: ProviderMetrics() for p in self.providers}
+        self._last_start: Dict[str, float] = {}
+
     # ---- public API ----
 
     def search(
@@ -56,40 +108,261 @@ class SearchAggregator:
     ) -> List[Hit]:
         """
         Run queries across providers, merge, dedupe, re-score, and return top-N hits.
+        Synchronous wrapper around `asearch` for callers outside the event loop.
+        """
+        coro = self.asearch(queries, depth=depth, region=region, safesearch=safesearch)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+
+        # Called from inside a running loop: run the fan-out on a helper thread
+        result: Dict[str, object] = {}
+
+        def runner():
+            try:
+                result["hits"] = asyncio.run(coro)
+            except Exception as e:  # pragma: no cover - surfaced below
+                result["error"] = e
+
+        t = threading.Thread(target=runner, daemon=True)
+        t.start()
+        t.join()
+        if "error" in result:
+            raise result["error"]
+        return result["hits"]
+
+    async def asearch(
+        self,
+        queries: List[str],
+        depth: str = "standard",
+        region: Optional[str] = None,
+        safesearch: Optional[str] = None,
+        deadline_s: Optional[float] = None,
+    ) -> List[Hit]:
+        """
+        Concurrent (provider x query) fan-out. Whatever has arrived by the
+        deadline is merged, deduped, re-scored and truncated to the budget.
         """
         budget = self.cfg.budgets.get(depth, self.cfg.budgets["standard"])
+
+        all_hits: List[Hit] = []
+        async for _, hits in self._fan_out(queries, depth, region, safesearch, deadline_s):
+            all_hits.extend(hits)
+
+        logger.info(f"Aggregator collected {len(all_hits)} raw hits")
+
+        deduped = self._dedupe_hits(all_hits)
+        logger.info(f"After dedupe: {len(deduped)} hits")
+
+        rescored = self._score_hits(deduped, queries)
+        topn = sorted(rescored, key=lambda h: h.score, reverse=True)[:budget.max_hits]
+        return topn
+
+    async def stream(
+        self,
+        queries: List[str],
+        depth: str = "standard",
+        region: Optional[str] = None,
+        safesearch: Optional[str] = None,
+        deadline_s: Optional[float] = None,
+    ) -> AsyncIterator[Hit]:
+        """
+        Yield scored, deduped hits as provider calls complete, so extraction can
+        start on the first results instead of waiting for the slowest provider.
+        The first copy of a URL wins; at most `max_hits` are yielded.
+        """
+        budget = self.cfg.budgets.get(depth, self.cfg.budgets["standard"])
+        seen = set()
+        emitted = 0
+
+        async for _, hits in self._fan_out(queries, depth, region, safesearch, deadline_s):
+            for h in self._score_hits(hits, queries):
+                key = canonicalize_url(h.url)
+                if not key or key in seen or h.score <= 0.0:
+                    continue
+                seen.add(key)
+                emitted += 1
+                yield h
+                if emitted >= budget.max_hits:
+                    return
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-provider latency/error counters since this aggregator was created.
+        """
+        return {name: m.snapshot() for name, m in self._metrics.items()}
+
+    # ---- internals ----
+
+    async def _fan_out(
+        self,
+        queries: List[str],
+        depth: str,
+        region: Optional[str],
+        safesearch: Optional[str],
+        deadline_s: Optional[float],
+    ) -> AsyncIterator[Tuple[ProviderSpec, List[Hit]]]:
+        budget = self.cfg.budgets.get(depth, self.cfg.budgets["standard"])
         max_providers = min(budget.max_providers, len(self.providers))
 
         chosen = self.providers[:max_providers]
         logger.info(f"Search using providers: {[p.name for p in chosen]} with depth={depth}")
 
-        all_hits: List[Hit] = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (deadline_s or budget.request_timeout_s)
+        # Semaphores are bound to the running loop, so build them per fan-out
+        limits = {spec.name: asyncio.Semaphore(max(1, spec.max_concurrency)) for spec in chosen}
+        pacing = {spec.name: asyncio.Lock() for spec in chosen}
+
+        tasks: Dict[asyncio.Task, ProviderSpec] = {}
         for spec in chosen:
-            prov = self._get_provider(spec.name)
-            try:
-                hits = prov.search(
-                    queries=queries,
+            for q in queries:
+                task = asyncio.create_task(self._query_cached(
+                    spec, q,
                     max_results=budget.max_hits * 2,  # collect more; we'll dedupe
                     region=region or self.cfg.search_region,
                     safesearch=safesearch or self.cfg.safesearch,
+                    timeout_s=spec.timeout_s or budget.request_timeout_s,
+                    limit=limits[spec.name],
+                    pacing=pacing[spec.name],
+                ))
+                tasks[task] = spec
+
+        pending = set(tasks)
+        timed_out = False
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
                 )
-                # mark provider weight in score later
-                for h in hits:
-                    h.score = max(0.0, h.score) + (0.02 * spec.weight)
-                all_hits.extend(hits)
-            except Exception as e:
-                logger.warning(f"Provider {spec.name} failed: {e}")
+                for task in done:
+                    spec = tasks[task]
+                    hits = task.result()
+                    # mark provider weight in score later
+                    for h in hits:
+                        h.score = max(0.0, h.score) + (0.02 * spec.weight)
+                    yield spec, hits
+        finally:
+            # Either the deadline passed or the consumer stopped early (stream budget)
+            for task in pending:
+                if timed_out:
+                    self._metrics_for(tasks[task].name).deadline_misses += 1
+                task.cancel()
+            if pending and timed_out:
+                logger.warning(f"Search deadline reached; returning partial results ({len(pending)} calls dropped)")
 
-        logger.info(f"Aggregator collected {len(all_hits)} raw hits")
+    async def _query_cached(self, spec: ProviderSpec, query: str, **kwargs) -> List[Hit]:
+        """
+        Serve (provider, normalized query) from the research cache when fresh;
+        otherwise query the provider and store non-empty results.
+        """
+        if self.cache is None:
+            return await self._query_with_hedge(spec, query, **kwargs)
 
-        deduped = self._dedupe_hits(all_hits)
-        logger.info(f"After dedupe: {len(deduped)} hits")
+        key = self.cache.make_key(
+            "search", spec.name, " ".join(query.lower().split()),
+            kwargs["max_results"], kwargs["region"], kwargs["safesearch"],
+        )
+        entry = await self.cache.aget("search", key)
+        if entry is not None:
+            self._metrics_for(spec.name).cache_hits += 1
+            return [Hit(**h) for h in entry.value]
 
-        rescored = self._score_hits(deduped, queries)
-        topn = sorted(rescored, key=lambda h: h.score, reverse=True)[:budget.max_hits]
-        return topn
+        hits = await self._query_with_hedge(spec, query, **kwargs)
+        if hits:
+            await self.cache.aset("search", key, [asdict(h) for h in hits], ttl_s=self.cfg.search_cache_ttl_s)
+        return hits
 
-    # ---- internals ----
+    async def _query_with_hedge(self, spec: ProviderSpec, query: str, **kwargs) -> List[Hit]:
+        """
+        Run one provider query; if it is slower than `hedge_after_s`, race a
+        duplicate request and take whichever succeeds first.
+        """
+        primary = asyncio.create_task(self._query_once(spec, query, **kwargs))
+        if spec.hedge_after_s is None:
+            return await self._result_or_empty(primary)
+
+        done, _ = await asyncio.wait({primary}, timeout=spec.hedge_after_s)
+        if done:
+            return await self._result_or_empty(primary)
+
+        self._metrics_for(spec.name).hedges += 1
+        backup = asyncio.create_task(self._query_once(spec, query, **kwargs))
+        racers = {primary, backup}
+        try:
+            while racers:
+                done, racers = await asyncio.wait(racers, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        return task.result()
+            return []
+        finally:
+            for task in racers:
+                task.cancel()
+
+    async def _query_once(
+        self,
+        spec: ProviderSpec,
+        query: str,
+        max_results: int,
+        region: str,
+        safesearch: str,
+        timeout_s: float,
+        limit: asyncio.Semaphore,
+        pacing: asyncio.Lock,
+    ) -> List[Hit]:
+        metrics = self._metrics_for(spec.name)
+        prov = self._get_provider(spec.name)
+
+        async with limit:
+            if spec.min_interval_s:
+                async with pacing:
+                    wait = self._last_start.get(spec.name, 0.0) + spec.min_interval_s - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    self._last_start[spec.name] = time.monotonic()
+
+            started = time.monotonic()
+            try:
+                hits = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        prov.search_one, query,
+                        max_results=max_results, region=region, safesearch=safesearch,
+                    ),
+                    timeout=timeout_s,
+                )
+            except asyncio.TimeoutError:
+                metrics.timeouts += 1
+                logger.warning(f"Provider {spec.name} timed out after {timeout_s}s for '{query}'")
+                raise
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.errors += 1
+                logger.warning(f"Provider {spec.name} failed for '{query}': {e}")
+                raise
+
+            metrics.record(time.monotonic() - started, len(hits))
+            return hits
+
+    @staticmethod
+    async def _result_or_empty(task: asyncio.Task) -> List[Hit]:
+        try:
+            return await task
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return []
+
+    def _metrics_for(self, name: str) -> ProviderMetrics:
+        if name not in self._metrics:
+            self._metrics[name] = ProviderMetrics()
+        return self._metrics[name]
 
     def _get_provider(self, name: str):
         if name in self._provider_clients:
@@ -26,38 +26,53 @@ class DDGProvider:
         region: str = None,
         safesearch: str = None,
     ) -> List[Hit]:
+        out: List[Hit] = []
+        for q in queries:
+            # small delay to avoid rate limiting
+            time.sleep(0.35)
+            try:
+                out.extend(self.search_one(q, max_results=max_results, region=region, safesearch=safesearch))
+            except Exception as e:
+                logger.warning(f"DDG search failed for '{q}': {e}")
+                continue
+        return out
+
+    def search_one(
+        self,
+        query: str,
+        max_results: int = 10,
+        region: str = None,
+        safesearch: str = None,
+    ) -> List[Hit]:
+        """
+        Run a single query. Safe to call from several threads at once; each
+        call uses its own DDGS session. Raises on failure so the aggregator can
+        count errors; `search` swallows them per query.
+        """
         region = region or self.cfg.search_region
         safesearch = safesearch or self.cfg.safesearch
 
         out: List[Hit] = []
         with DDGS() as ddg:
-            for q in queries:
-                # small delay to avoid rate limiting
-                time.sleep(0.35)
-                try:
-                    results = list(ddg.text(
-                        q,
-                        max_results=max_results,
-                        backend="api",
-                        region=region,
-                        safesearch=safesearch
-                    ))
-                except Exception as e:
-                    logger.warning(f"DDG search failed for '{q}': {e}")
-                    continue
+            results = list(ddg.text(
+                query,
+                max_results=max_results,
+                backend="api",
+                region=region,
+                safesearch=safesearch
+            ))
 
-                for r in results:
-                    url = r.get("href") or r.get("link") or ""
-                    title = r.get("title") or ""
-                    body = r.get("body") or ""
-                    if not url:
-                        continue
-                    out.append(Hit(
-                        title=title,
-                        url=url,
-                        snippet=body,
-                        score=0.0,
-                        source="ddg"
-                    ))
+            for r in results:
+                url = r.get("href") or r.get("link") or ""
+                title = r.get("title") or ""
+                body = r.get("body") or ""
+                if not url:
+                    continue
+                out.append(Hit(
+                    title=title,
+                    url=url,
+                    snippet=body,
+                    score=0.0,
+                    source="ddg"
+                ))
         return out
-
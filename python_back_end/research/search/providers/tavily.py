@@ -32,40 +32,57 @@ class TavilyProvider:
         hits: List[Hit] = []
         for q in queries:
             try:
-                # Preferred: official client
-                try:
-                    import tavily
-                    client = tavily.TavilyClient(api_key=self.api_key)
-                    resp = client.search(q, max_results=max_results)
-                    results = resp.get("results", [])
-                except Exception as e:
-                    # Fallback to HTTP if client not present
-                    logger.debug(f"Tavily client not available/failed ({e}); trying HTTP")
-                    import requests
-                    r = requests.post(
-                        "https://api.tavily.com/search",
-                        json={"api_key": self.api_key, "query": q, "max_results": max_results},
-                        timeout=15,
-                    )
-                    r.raise_for_status()
-                    results = r.json().get("results", [])
-
-                for r in results:
-                    url = r.get("url") or ""
-                    title = r.get("title") or ""
-                    body = r.get("content") or ""
-                    if not url:
-                        continue
-                    hits.append(Hit(
-                        title=title,
-                        url=url,
-                        snippet=body,
-                        score=0.0,
-                        source="tavily"
-                    ))
+                hits.extend(self.search_one(q, max_results=max_results))
             except Exception as e:
                 logger.warning(f"Tavily search failed for '{q}': {e}")
                 continue
 
         return hits
 
+    def search_one(
+        self,
+        query: str,
+        max_results: int = 10,
+        region: str = None,
+        safesearch: str = None,
+    ) -> List[Hit]:
+        """
+        Run a single query. Raises on transport errors so the aggregator can
+        count them (and hedge/retry); `search` swallows them per query.
+        """
+        if not self.api_key:
+            return []
+
+        # Preferred: official client
+        try:
+            import tavily
+            client = tavily.TavilyClient(api_key=self.api_key)
+            resp = client.search(query, max_results=max_results)
+            results = resp.get("results", [])
+        except Exception as e:
+            # Fallback to HTTP if client not present
+            logger.debug(f"Tavily client not available/failed ({e}); trying HTTP")
+            import requests
+            r = requests.post(
+                "https://api.tavily.com/search",
+                json={"api_key": self.api_key, "query": query, "max_results": max_results},
+                timeout=15,
+            )
+            r.raise_for_status()
+            results = r.json().get("results", [])
+
+        hits: List[Hit] = []
+        for r in results:
+            url = r.get("url") or ""
+            title = r.get("title") or ""
+            body = r.get("content") or ""
+            if not url:
+                continue
+            hits.append(Hit(
+                title=title,
+                url=url,
+                snippet=body,
+                score=0.0,
+                source="tavily"
+            ))
+        return hits
@@ -13,6 +13,9 @@ from datetime import datetime
 import time
 
 # Will import from your modules once ready
+from ..cache.research_cache import ResearchCache, get_research_cache
+from ..config.settings import get_settings
+from ..core.utils import compute_hash
 from ..rank.rerank import RerankedChunk
 from .prompts import get_map_prompt, get_reduce_prompt
 
@@ -59,11 +62,22 @@ class MapReduceProcessor:
         timeout_seconds: int = 30,
         min_successful_maps: int = 1,
         enable_fallback: bool = True,
+        cache: Optional[ResearchCache] = None,
+        use_cache: bool = True,
     ):
         self.max_concurrent = max_concurrent
         self.timeout_seconds = timeout_seconds
         self.min_successful_maps = min_successful_maps
         self.enable_fallback = enable_fallback
+        self._cache = cache
+        self.use_cache = use_cache
+
+    @property
+    def cache(self) -> Optional[ResearchCache]:
+        """Research cache for map-phase summaries (resolved lazily)"""
+        if self._cache is None and self.use_cache:
+            self._cache = get_research_cache()
+        return self._cache if self.use_cache else None
 
     async def _process_single_chunk(
         self,
@@ -85,6 +99,24 @@ class MapReduceProcessor:
                 source_url=source_url,
             )
 
+            # Same model + prompt + chunk text means the same summary; reuse it
+            cache = self.cache
+            cache_key = None
+            if cache is not None:
+                cache_key = cache.make_key(
+                    "map", model, compute_hash(prompt), compute_hash(chunk.chunk.content)
+                )
+                entry = await cache.aget("map", cache_key)
+                if entry is not None:
+                    return MapResult(
+                        chunk_id=chunk_id,
+                        source_url=source_url,
+                        content=entry.value["content"],
+                        success=True,
+                        processing_time=time.time() - start_time,
+                        token_count=entry.value.get("token_count"),
+                    )
+
             # Call LLM for actual analysis
             logger.debug(
                 f"MAP phase calling LLM for chunk {chunk_id} from {source_url}"
@@ -97,6 +129,12 @@ class MapReduceProcessor:
                 raise Exception(f"LLM call failed: {llm_response.error}")
 
             response = llm_response.content
+            token_count = llm_response.token_count or len(response.split())
+            if cache_key is not None and response.strip():
+                await cache.aset(
+                    "map", cache_key, {"content": response, "token_count": token_count},
+                    ttl_s=get_settings().map_cache_ttl_s,
+                )
             logger.debug(
                 f"MAP phase received {len(response)} chars from LLM for chunk {chunk_id}"
             )
@@ -109,7 +147,7 @@ class MapReduceProcessor:
                 content=response,
                 success=True,
                 processing_time=processing_time,
-                token_count=llm_response.token_count or len(response.split()),
+                token_count=token_count,
             )
 
         except Exception as e:
@@ -0,0 +1,115 @@
+"""
+Tests for the shared async fetch layer.
+"""
+
+import asyncio
+import threading
+from dataclasses import replace
+
+import httpx
+import pytest
+
+from ..config.settings import get_settings
+from ..extract.fetcher import FetchService, sniff_content_type
+
+HTML = b"<!doctype html><html><head><title>Pooling</title></head><body><p>" + b"keep-alive " * 50 + b"</p></body></html>"
+
+
+class CountingHandler:
+    """MockTransport handler recording methods and peak concurrency per host"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.methods = []
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self._lock = threading.Lock()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        with self._lock:
+            self.methods.append(request.method)
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.max_in_flight[host] = max(self.max_in_flight.get(host, 0), self.in_flight[host])
+        try:
+            await asyncio.sleep(self.delay)
+            if request.url.path.endswith("missing"):
+                return httpx.Response(404, content=b"not found")
+            if request.url.path.endswith(".bin"):
+                return httpx.Response(200, content=b"%PDF-1.4 fake", headers={"Content-Type": "application/octet-stream"})
+            return httpx.Response(200, content=HTML)
+        finally:
+            with self._lock:
+                self.in_flight[host] -= 1
+
+
+@pytest.fixture
+def service_factory():
+    created = []
+
+    def make(handler, **overrides):
+        cfg = replace(get_settings(), extract_cpu_workers=0, enable_research_cache=False, **overrides)
+        service = FetchService(settings=cfg, transport=httpx.MockTransport(handler))
+        created.append(service)
+        return service
+
+    yield make
+    for service in created:
+        service.close()
+
+
+class TestSniffing:
+
+    def test_pdf_magic_beats_header(self):
+        assert sniff_content_type("application/octet-stream", b"%PDF-1.7\n", "https://x.org/file") == "application/pdf"
+
+    def test_html_without_header(self):
+        assert sniff_content_type(None, b"  <!DOCTYPE html><html>", "https://x.org/") == "text/html"
+
+    def test_declared_type_is_kept(self):
+        assert sniff_content_type("image/png; charset=binary", b"\x89PNG", "https://x.org/a") == "image/png"
+
+
+class TestFetchService:
+
+    def test_single_get_per_url(self, service_factory):
+        handler = CountingHandler()
+        service = service_factory(handler)
+
+        result = service.fetch_sync("https://docs.example.com/page")
+
+        assert result.ok and result.content_type == "text/html"
+        assert handler.methods == ["GET"]
+
+    def test_sniffs_pdf_served_as_octet_stream(self, service_factory):
+        service = service_factory(CountingHandler())
+        result = service.fetch_sync("https://docs.example.com/report.bin")
+        assert result.is_pdf
+
+    def test_http_error_becomes_failed_doc(self, service_factory):
+        service = service_factory(CountingHandler())
+        doc = service.extract_sync("https://docs.example.com/missing")
+        assert not doc.success
+        assert doc.meta["error"] == "HTTP 404"
+
+    @pytest.mark.asyncio
+    async def test_per_host_limit(self, service_factory):
+        handler = CountingHandler(delay=0.05)
+        service = service_factory(handler, extract_per_host=2, extract_max_concurrency=16)
+
+        urls = [f"https://a.example.com/{i}" for i in range(6)] + [f"https://b.example.com/{i}" for i in range(6)]
+        results = await asyncio.gather(*(service.fetch(u) for u in urls))
+
+        assert all(r.ok for r in results)
+        assert handler.max_in_flight["a.example.com"] == 2
+        assert handler.max_in_flight["b.example.com"] == 2
+
+    @pytest.mark.asyncio
+    async def test_extract_many_keeps_order(self, service_factory):
+        service = service_factory(CountingHandler(delay=0.01))
+        urls = [f"https://site{i}.example.com/" for i in range(5)]
+
+        docs = await service.extract_many(urls)
+
+        assert [d.url for d in docs] == urls
+        assert service.get_stats()["fetches"] == 5
@@ -0,0 +1,130 @@
+"""
+Tests for the tiered research cache.
+"""
+
+import time
+from dataclasses import replace
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from ..cache.research_cache import ResearchCache
+from ..config.settings import get_settings
+from ..extract.fetcher import FetchService
+from ..synth.map_reduce import MapReduceProcessor
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = ResearchCache(cache_dir=str(tmp_path), memory_entries=4)
+    yield c
+    c.close()
+
+
+class TestResearchCache:
+
+    def test_keys_are_content_addressed(self):
+        a = ResearchCache.make_key("search", "ddg", "python asyncio", 10)
+        b = ResearchCache.make_key("search", "ddg", "python asyncio", 10)
+        c = ResearchCache.make_key("search", "tavily", "python asyncio", 10)
+        assert a == b and a != c
+
+    def test_disk_hit_is_promoted_to_memory(self, cache):
+        key = cache.make_key("doc", "https://example.com/a")
+        cache.set("doc", key, {"text": "hello"}, ttl_s=60)
+        cache.memory.clear()
+
+        assert cache.get_value("doc", key) == {"text": "hello"}
+        assert cache.get_value("doc", key) == {"text": "hello"}
+
+        hits = cache.get_stats()["namespaces"]["doc"]["hits_by_tier"]
+        assert hits["disk"] == 1 and hits["memory"] == 1
+
+    def test_memory_tier_is_bounded(self, cache):
+        for i in range(10):
+            cache.set("map", cache.make_key("map", i), {"content": str(i)}, ttl_s=60)
+        assert len(cache.memory) == 4
+        # Evicted from memory but still on disk
+        assert cache.get_value("map", cache.make_key("map", 0)) == {"content": "0"}
+
+    def test_stale_entries_need_allow_stale(self, cache):
+        key = cache.make_key("doc", "https://example.com/old")
+        cache.set("doc", key, {"text": "old"}, ttl_s=-1, etag='"v1"')
+
+        assert cache.get("doc", key) is None
+        entry = cache.get("doc", key, allow_stale=True)
+        assert entry is not None and entry.etag == '"v1"' and not entry.fresh
+
+    def test_hit_rate(self, cache):
+        key = cache.make_key("search", "q")
+        cache.get("search", key)
+        cache.set("search", key, [], ttl_s=60)
+        cache.get("search", key)
+        cache.get("search", key)
+
+        stats = cache.get_stats()
+        assert stats["namespaces"]["search"]["misses"] == 1
+        assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-3)
+
+
+HTML = b"<html><head><title>Cached</title></head><body><p>" + b"cache me " * 80 + b"</p></body></html>"
+
+
+class TestDocRevalidation:
+
+    def test_stale_doc_is_revalidated_with_etag(self, cache):
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request.headers.get("if-none-match"))
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=HTML, headers={"ETag": '"v1"', "Content-Type": "text/html"})
+
+        cfg = replace(get_settings(), extract_cpu_workers=0)
+        service = FetchService(settings=cfg, transport=httpx.MockTransport(handler))
+        service.cache = cache
+        try:
+            url = "https://docs.example.com/page"
+            first = service.extract_sync(url)
+            assert service.extract_sync(url) == first      # fresh: no request
+            assert seen == [None]
+
+            # Expire the entry; the next call revalidates instead of re-downloading
+            key = cache.make_key("doc", "https://docs.example.com/page")
+            entry = cache.get("doc", key)
+            entry.expires_at = time.time() - 1
+            cache.disk.set("doc", key, entry)
+
+            again = service.extract_sync(url)
+            assert seen == [None, '"v1"']
+            assert again.text == first.text
+            assert service.get_stats()["not_modified"] == 1
+            assert cache.get_stats()["namespaces"]["doc"]["revalidated"] == 1
+        finally:
+            service.close()
+
+
+class TestMapCache:
+
+    @pytest.mark.asyncio
+    async def test_map_summary_reused_across_runs(self, cache):
+        calls = []
+
+        class FakeLLM:
+            async def generate(self, prompt, model=None, temperature=None):
+                calls.append(prompt)
+                return SimpleNamespace(success=True, content="summary", token_count=3, error=None)
+
+        chunk = SimpleNamespace(chunk=SimpleNamespace(
+            chunk_id="c1", url="https://example.com", content="Python asyncio schedules coroutines."
+        ))
+        processor = MapReduceProcessor(cache=cache)
+
+        first = await processor._process_single_chunk("asyncio", chunk, FakeLLM(), model="m1")
+        second = await processor._process_single_chunk("asyncio", chunk, FakeLLM(), model="m1")
+        other_model = await processor._process_single_chunk("asyncio", chunk, FakeLLM(), model="m2")
+
+        assert first.content == second.content == other_model.content == "summary"
+        assert len(calls) == 2
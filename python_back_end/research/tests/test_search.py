@@ -0,0 +1,154 @@
+"""
+Tests for the concurrent search aggregator.
+"""
+
+import asyncio
+import threading
+import time
+from typing import List
+
+import pytest
+
+from ..config.settings import get_settings
+from ..core.types import Hit
+from ..search.aggregator import SearchAggregator, ProviderSpec
+
+
+class FakeProvider:
+    """Provider stub that sleeps to simulate network latency"""
+
+    def __init__(self, name: str, delay: float = 0.1, fail: bool = False, slow_first: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.slow_first = slow_first
+        self.calls = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def search_one(self, query: str, max_results: int = 10, region: str = None, safesearch: str = None) -> List[Hit]:
+        with self._lock:
+            self.calls += 1
+            call_no = self.calls
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.slow_first if (self.slow_first and call_no == 1) else self.delay)
+            if self.fail:
+                raise RuntimeError("provider down")
+            slug = query.replace(" ", "-")
+            return [
+                Hit(title=f"{query} guide", url=f"https://{self.name}.example.com/{slug}/{i}",
+                    snippet=f"{query} tutorial", score=0.0, source=self.name)
+                for i in range(2)
+            ] + [
+                Hit(title=f"{query} shared", url=f"https://shared.example.com/{slug}",
+                    snippet=query, score=0.0, source=self.name)
+            ]
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def make_aggregator(*providers: FakeProvider, specs: List[ProviderSpec] = None) -> SearchAggregator:
+    specs = specs or [ProviderSpec(p.name) for p in providers]
+    agg = SearchAggregator(providers=specs, settings=get_settings())
+    agg.cache = None  # call counts below assume every query reaches the provider
+    for p in providers:
+        agg._provider_clients[p.name] = p
+    return agg
+
+
+QUERIES = ["python asyncio", "python threads", "python multiprocessing"]
+
+
+class TestSearchAggregator:
+    """Fan-out, deadlines, hedging and metrics"""
+
+    @pytest.mark.asyncio
+    async def test_fan_out_runs_concurrently(self):
+        a, b = FakeProvider("alpha", delay=0.2), FakeProvider("beta", delay=0.2)
+        agg = make_aggregator(a, b)
+
+        start = time.perf_counter()
+        hits = await agg.asearch(QUERIES, depth="standard")
+        elapsed = time.perf_counter() - start
+
+        assert a.calls == 3 and b.calls == 3
+        # 6 calls of 0.2s each would take 1.2s serialized
+        assert elapsed < 0.6
+        assert hits
+        # shared URL reported by both providers is deduped
+        urls = [h.url for h in hits]
+        assert len(urls) == len(set(urls))
+
+    @pytest.mark.asyncio
+    async def test_per_provider_concurrency_limit(self):
+        a = FakeProvider("alpha", delay=0.05)
+        agg = make_aggregator(a, specs=[ProviderSpec("alpha", max_concurrency=1)])
+
+        await agg.asearch(QUERIES, depth="standard")
+
+        assert a.calls == 3
+        assert a.max_in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_provider_returns_partial_results(self):
+        fast, slow = FakeProvider("fast", delay=0.01), FakeProvider("slow", delay=2.0)
+        agg = make_aggregator(fast, slow)
+
+        start = time.perf_counter()
+        hits = await agg.asearch(QUERIES, depth="standard", deadline_s=0.3)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 1.0
+        assert hits and all(h.source == "fast" for h in hits)
+        assert agg.get_metrics()["slow"]["deadline_misses"] == 3
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_beats_slow_primary(self):
+        flaky = FakeProvider("flaky", delay=0.02, slow_first=1.5)
+        agg = make_aggregator(flaky, specs=[ProviderSpec("flaky", hedge_after_s=0.1)])
+
+        start = time.perf_counter()
+        hits = await agg.asearch(["python asyncio"], depth="standard")
+        elapsed = time.perf_counter() - start
+
+        assert hits
+        assert elapsed < 1.0
+        assert agg.get_metrics()["flaky"]["hedges"] == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_are_counted_and_isolated(self):
+        ok, broken = FakeProvider("ok", delay=0.01), FakeProvider("broken", delay=0.01, fail=True)
+        agg = make_aggregator(ok, broken)
+
+        hits = await agg.asearch(QUERIES, depth="standard")
+
+        assert hits and all(h.source == "ok" for h in hits)
+        metrics = agg.get_metrics()
+        assert metrics["broken"]["errors"] == 3
+        assert metrics["ok"]["calls"] == 3
+        assert metrics["ok"]["p50_ms"] > 0
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_before_slow_provider_finishes(self):
+        fast, slow = FakeProvider("fast", delay=0.01), FakeProvider("slow", delay=0.5)
+        agg = make_aggregator(fast, slow)
+
+        start = time.perf_counter()
+        first_at = None
+        urls = []
+        async for hit in agg.stream(QUERIES, depth="standard"):
+            if first_at is None:
+                first_at = time.perf_counter() - start
+            urls.append(hit.url)
+
+        assert first_at is not None and first_at < 0.3
+        assert len(urls) == len(set(urls))
+
+    def test_sync_search_wrapper(self):
+        agg = make_aggregator(FakeProvider("alpha", delay=0.01))
+        hits = agg.search(QUERIES, depth="quick")
+        assert 0 < len(hits) <= get_settings().budgets["quick"].max_hits
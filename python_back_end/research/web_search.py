@@ -3,6 +3,7 @@ Web search functionality using LangChain and multiple search engines
 """
 
 import os
+import asyncio
 import logging
 from typing import List, Dict, Any
 from ddgs import DDGS
@@ -12,13 +13,14 @@ try:
 except ImportError:
     # Fallback for older langchain versions
     from langchain.text_splitter import RecursiveCharacterTextSplitter
-import requests
 from newspaper import Article
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
 # Import YouTube transcript extraction
 from research.extract.youtube import extract_youtube
+from research.extract.fetcher import get_fetch_service
+from research.extract.pdf import parse_pdf_bytes
 
 logger = logging.getLogger(__name__)
 
@@ -192,10 +194,12 @@ class WebSearchAgent:
             Dictionary with title, text, authors, and publish_date
         """
         try:
-            # Quick URL validation first
-            response = requests.head(url, timeout=5, allow_redirects=True)
-            if response.status_code >= 400:
-                logger.warning(f"URL returned {response.status_code}: {url}")
+            # One pooled GET; the status and content type come from the same response
+            response = get_fetch_service().fetch_sync(url)
+            if response.error:
+                raise RuntimeError(response.error)
+            if response.status >= 400:
+                logger.warning(f"URL returned {response.status}: {url}")
                 return {
                     "title": "",
                     "text": "",
@@ -203,11 +207,23 @@ class WebSearchAgent:
                     "publish_date": None,
                     "url": url,
                     "success": False,
-                    "error": f"HTTP {response.status_code}",
+                    "error": f"HTTP {response.status}",
                 }
 
+            if response.is_pdf:
+                data = parse_pdf_bytes(url, response.body)
+                return {
+                    "title": data.get("title", ""),
+                    "text": data.get("text", ""),
+                    "authors": [],
+                    "publish_date": None,
+                    "url": url,
+                    "success": bool(data.get("success")),
+                }
+
+            # Parse the already downloaded HTML instead of fetching it again
             article = Article(url)
-            article.download()
+            article.download(input_html=response.text)
             article.parse()
 
             return {
@@ -241,7 +257,9 @@ class WebSearchAgent:
         Returns:
             List of content dictionaries
         """
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        # Network concurrency is bounded by the shared fetch service; the pool
+        # here only overlaps newspaper's parsing
+        with ThreadPoolExecutor(max_workers=max(self.max_workers, 1)) as executor:
             results = list(executor.map(self.extract_content_from_url, urls))
 
         successful_results = [r for r in results if r.get("success", False)]
@@ -703,46 +721,10 @@ class WebSearchAgent:
         videos_to_process = videos[:max_videos]
         logger.info(f"Fetching transcripts for {len(videos_to_process)} videos")
 
-        def fetch_single_transcript(video: Dict[str, Any]) -> Dict[str, Any]:
-            """Fetch transcript for a single video"""
-            url = video.get("url", "")
-            video_id = video.get("videoId", "")
-
-            if not url and not video_id:
-                return video
-
-            try:
-                # Use the existing extract_youtube function
-                transcript_url = (
-                    url if url else f"https://youtube.com/watch?v={video_id}"
-                )
-                transcript_data = extract_youtube(transcript_url, timeout_s=timeout_s)
-
-                if transcript_data.get("success") and transcript_data.get("text"):
-                    # Limit transcript length to avoid context overflow
-                    video["transcript"] = transcript_data["text"][:4000]
-                    video["hasTranscript"] = True
-                    logger.info(
-                        f"Successfully fetched transcript for: {video.get('title', 'Unknown')[:50]}"
-                    )
-                else:
-                    video["transcript"] = ""
-                    video["hasTranscript"] = False
-                    logger.debug(
-                        f"No transcript available for: {video.get('title', 'Unknown')[:50]}"
-                    )
-
-            except Exception as e:
-                logger.warning(f"Transcript fetch failed for {url}: {e}")
-                video["transcript"] = ""
-                video["hasTranscript"] = False
-
-            return video
-
         # Fetch transcripts in parallel with timeout
         with ThreadPoolExecutor(max_workers=min(3, len(videos_to_process))) as executor:
             future_to_video = {
-                executor.submit(fetch_single_transcript, video): video
+                executor.submit(self._fetch_video_transcript, video, timeout_s): video
                 for video in videos_to_process
             }
 
@@ -765,6 +747,102 @@ class WebSearchAgent:
 
         return videos
 
+    async def async_extract_content_from_urls(
+        self, urls: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Async version of extract_content_from_urls for callers on an event loop.
+
+        Fetching and newspaper parsing stay on worker threads, so the caller's
+        loop keeps serving other requests while pages are extracted.
+        """
+        if not urls:
+            return []
+        return await asyncio.to_thread(self.extract_content_from_urls, urls)
+
+    async def async_fetch_video_transcripts(
+        self,
+        videos: List[Dict[str, Any]],
+        max_videos: int = 3,
+        timeout_s: int = 15,
+        max_concurrency: int = 3,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async version of fetch_video_transcripts.
+
+        At most ``max_concurrency`` transcripts are fetched at once, each on a
+        worker thread with its own ``timeout_s`` deadline. A video that times
+        out is returned without a transcript instead of holding up the others.
+        """
+        if not videos:
+            return videos
+
+        videos_to_process = videos[:max_videos]
+        limit = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def fetch_one(video: Dict[str, Any]):
+            async with limit:
+                try:
+                    # Work on a copy so a straggling thread cannot modify the
+                    # video after its deadline has passed
+                    fetched = await asyncio.wait_for(
+                        asyncio.to_thread(self._fetch_video_transcript, dict(video), timeout_s),
+                        timeout=timeout_s,
+                    )
+                    video.update(fetched)
+                    return
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        f"Transcript fetch timed out for: {video.get('title', 'Unknown')[:50]}"
+                    )
+                except Exception as e:
+                    logger.warning(f"Transcript fetch failed for {video.get('url', '')}: {e}")
+            video["transcript"] = ""
+            video["hasTranscript"] = False
+
+        await asyncio.gather(*(fetch_one(v) for v in videos_to_process))
+
+        success_count = sum(1 for v in videos_to_process if v.get("hasTranscript", False))
+        logger.info(
+            f"Fetched {success_count}/{len(videos_to_process)} video transcripts"
+        )
+        return videos
+
+    def _fetch_video_transcript(
+        self, video: Dict[str, Any], timeout_s: int
+    ) -> Dict[str, Any]:
+        """Fetch the transcript for a single video, updating it in place"""
+        url = video.get("url", "")
+        video_id = video.get("videoId", "")
+
+        if not url and not video_id:
+            return video
+
+        try:
+            # Use the existing extract_youtube function
+            transcript_url = url if url else f"https://youtube.com/watch?v={video_id}"
+            transcript_data = extract_youtube(transcript_url, timeout_s=timeout_s)
+
+            if transcript_data.get("success") and transcript_data.get("text"):
+                # Limit transcript length to avoid context overflow
+                video["transcript"] = transcript_data["text"][:4000]
+                video["hasTranscript"] = True
+                logger.info(
+                    f"Successfully fetched transcript for: {video.get('title', 'Unknown')[:50]}"
+                )
+            else:
+                video["transcript"] = ""
+                video["hasTranscript"] = False
+                logger.debug(
+                    f"No transcript available for: {video.get('title', 'Unknown')[:50]}"
+                )
+
+        except Exception as e:
+            logger.warning(f"Transcript fetch failed for {url}: {e}")
+            video["transcript"] = ""
+            video["hasTranscript"] = False
+
+        return video
 
 class TavilySearchAgent:
     """
@@ -0,0 +1,214 @@
+"""
+Frame sampling and backpressure for screen-share analysis.
+
+Clients push screen frames as fast as they capture them, while analyzing
+one (vision caption + OCR + an LLM query) takes seconds. Analyzing every
+frame in arrival order queues unbounded work and answers about a screen the
+user left long ago. Each session instead keeps:
+
+- a latest-frame-wins slot: while an analysis runs, a newer frame replaces
+  the waiting one, so at most one frame is ever queued
+- a minimum interval between analyses (SCREEN_FRAME_MIN_INTERVAL_S)
+- a near-duplicate check: a frame whose downscaled grayscale thumbnail
+  differs from the last analyzed one by less than SCREEN_FRAME_DIFF_THRESHOLD
+  (mean absolute difference, 0-1) is skipped
+
+Frames received, dropped (stale or duplicate) and analyzed are counted per
+session and process-wide (get_screen_share_stats()). A session's on_stats
+callback gets its stats after each analysis, once the frame is counted.
+"""
+
+import asyncio
+import base64
+import io
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+SCREEN_FRAME_MIN_INTERVAL_S = float(os.getenv("SCREEN_FRAME_MIN_INTERVAL_S", "2.0"))
+SCREEN_FRAME_DIFF_THRESHOLD = float(os.getenv("SCREEN_FRAME_DIFF_THRESHOLD", "0.01"))
+# Thumbnail the duplicate check compares (width, height)
+THUMBNAIL_SIZE = (64, 36)
+
+
+@dataclass
+class Frame:
+    """One screen_data event"""
+    image_data: str  # base64, optionally a data: URL
+    model_name: str = "mistral"
+    received_at: float = field(default_factory=time.monotonic)
+
+
+Analyze = Callable[[Frame], Awaitable[Any]]
+OnStats = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def frame_thumbnail(image_data: str) -> Optional[np.ndarray]:
+    """Grayscale THUMBNAIL_SIZE thumbnail in [0, 1]; None if the image cannot be decoded"""
+    try:
+        raw = base64.b64decode(image_data.split(",")[-1])
+        with Image.open(io.BytesIO(raw)) as image:
+            small = image.convert("L").resize(THUMBNAIL_SIZE, Image.BILINEAR)
+        return np.asarray(small, dtype=np.float32) / 255.0
+    except Exception:
+        return None
+
+
+def frame_difference(a: Optional[np.ndarray], b: Optional[np.ndarray]) -> float:
+    """Mean absolute difference of two thumbnails; 1.0 when either is missing"""
+    if a is None or b is None or a.shape != b.shape:
+        return 1.0
+    return float(np.abs(a - b).mean())
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_COUNTERS = ("received", "analyzed", "dropped_stale", "dropped_duplicate", "errors")
+_totals: Dict[str, int] = {name: 0 for name in _COUNTERS}
+
+
+class FrameSession:
+    """Per-client frame scheduler: submit() never blocks, one analysis at a time"""
+
+    def __init__(self, analyze: Analyze, min_interval_s: float = SCREEN_FRAME_MIN_INTERVAL_S,
+                 diff_threshold: float = SCREEN_FRAME_DIFF_THRESHOLD,
+                 thumbnail: Callable[[str], Optional[np.ndarray]] = frame_thumbnail,
+                 on_stats: Optional[OnStats] = None):
+        self.analyze = analyze
+        self.on_stats = on_stats
+        self.min_interval_s = min_interval_s
+        self.diff_threshold = diff_threshold
+        self._thumbnail = thumbnail
+        self._pending: Optional[Frame] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._last_thumbnail: Optional[np.ndarray] = None
+        self._last_started: Optional[float] = None
+        self._stats = {name: 0 for name in _COUNTERS}
+        # Seconds from a frame arriving to its analysis finishing
+        self._latencies: "deque[float]" = deque(maxlen=256)
+
+    def _count(self, name: str):
+        self._stats[name] += 1
+        _totals[name] += 1
+
+    def submit(self, frame: Frame) -> None:
+        """Offer a frame; it replaces any frame still waiting for analysis"""
+        if self._closed:
+            return
+        self._count("received")
+        if self._pending is not None:
+            self._count("dropped_stale")
+        self._pending = frame
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._pending is not None:
+            # Sampling: frames arriving during the wait keep replacing the slot
+            if self._last_started is not None:
+                wait = self._last_started + self.min_interval_s - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            frame, self._pending = self._pending, None
+            if frame is None:
+                break
+
+            thumbnail = await asyncio.to_thread(self._thumbnail, frame.image_data)
+            if (self._last_thumbnail is not None
+                    and frame_difference(thumbnail, self._last_thumbnail) < self.diff_threshold):
+                self._count("dropped_duplicate")
+                continue
+
+            self._last_started = time.monotonic()
+            try:
+                await self.analyze(frame)
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Screen frame analysis failed: {e}")
+            else:
+                self._count("analyzed")
+                self._last_thumbnail = thumbnail
+                self._latencies.append(time.monotonic() - frame.received_at)
+            await self._report()
+
+    async def _report(self):
+        if self.on_stats is None:
+            return
+        try:
+            await self.on_stats(self.get_stats())
+        except Exception as e:
+            logger.warning(f"Screen frame stats callback failed: {e}")
+
+    async def close(self):
+        """Drop the waiting frame and stop any analysis in flight"""
+        self._closed = True
+        if self._pending is not None:
+            self._pending = None
+            self._count("dropped_stale")
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @property
+    def busy(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = list(self._latencies)
+        stats = dict(self._stats)
+        stats.update({
+            "dropped": stats["dropped_stale"] + stats["dropped_duplicate"],
+            "busy": self.busy,
+            "latency_p50_s": round(_percentile(latencies, 0.5), 3),
+            "latency_p95_s": round(_percentile(latencies, 0.95), 3),
+        })
+        return stats
+
+
+# Sessions by client id
+_sessions: Dict[str, FrameSession] = {}
+
+
+def open_session(key: str, analyze: Analyze, **kwargs) -> FrameSession:
+    """The client's session, created on its first frame"""
+    session = _sessions.get(key)
+    if session is None:
+        session = _sessions[key] = FrameSession(analyze, **kwargs)
+    return session
+
+
+def get_session(key: str) -> Optional[FrameSession]:
+    return _sessions.get(key)
+
+
+async def close_session(key: str) -> Optional[Dict[str, Any]]:
+    """Close the client's session; returns its final stats"""
+    session = _sessions.pop(key, None)
+    if session is None:
+        return None
+    await session.close()
+    return session.get_stats()
+
+
+def get_screen_share_stats() -> Dict[str, Any]:
+    """Process-wide frame counters and the number of open sessions"""
+    return {
+        **_totals,
+        "dropped": _totals["dropped_stale"] + _totals["dropped_duplicate"],
+        "sessions": len(_sessions),
+        "busy_sessions": sum(1 for s in _sessions.values() if s.busy),
+    }
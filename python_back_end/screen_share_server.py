@@ -1,6 +1,10 @@
+import asyncio
+import functools
+import threading
 import socketio
 from aiohttp import web
 from screen_analyzer import analyze_image_base64
+from screen_frames import Frame, open_session, get_session, close_session, get_screen_share_stats
 from vison_models.llm_connector import query_llm, unload_qwen_model, load_qwen_model, log_gpu_memory
 import logging
 
@@ -24,6 +28,7 @@ async def disconnect(sid):
     print(f"Client {sid} disconnected")
     if sid in connections:
         del connections[sid]
+    await close_session(sid)
 
 @sio.event
 async def offer(sid, data):
@@ -48,27 +53,42 @@ async def candidate(sid, data):
 @sio.event
 async def screen_data(sid, data): # data is now an object { imageData, modelName }
     """
-    Process screen data with intelligent model management.
-    Automatically loads Qwen2VL when needed and manages memory efficiently.
+    Hand the frame to the client's session, which samples it, skips
+    near-duplicates and keeps only the latest frame while one is analyzed.
     """
-    try:
-        # Process screen data
-        image_data = data.get("imageData")
-        model_name = data.get("modelName", "mistral") # Default to mistral if not provided
-        
-        logger.info(f"🖼️ Processing screen data for client {sid} with model {model_name}")
-        
+    image_data = data.get("imageData")
+    if not image_data:
+        return
+    session = open_session(sid, functools.partial(analyze_frame, sid),
+                           on_stats=functools.partial(emit_stats, sid))
+    session.submit(Frame(image_data=image_data, model_name=data.get("modelName", "mistral")))
+
+
+# Qwen2VL and the LLM share the GPU: one client's load/analyze/unload/query
+# sequence (or an idle unload) at a time. A threading lock, held on the worker
+# thread, so a cancelled analysis keeps it until its model call returns.
+_model_lock = threading.Lock()
+
+
+def _analyze_with_models(sid, frame: Frame):
+    """
+    Caption and OCR the frame with Qwen2VL, unload it, then query the LLM,
+    all under the model lock. Returns (analysis_results, llm_response), or
+    None if the client stopped sharing while waiting for the lock.
+    """
+    with _model_lock:
+        if get_session(sid) is None:
+            return None
+
         # Log memory before processing
         log_gpu_memory("before screen processing")
-        
+
         # Ensure Qwen2VL is loaded for screen analysis
         load_qwen_model()
-        
-        analysis_results = analyze_image_base64(image_data)
+
+        analysis_results = analyze_image_base64(frame.image_data)
         if "error" in analysis_results:
-            logger.error(f"Screen analysis error: {analysis_results['error']}")
-            await sio.emit("error", {"message": analysis_results['error']}, room=sid)
-            return
+            return analysis_results, None
 
         caption = analysis_results.get("caption", "")
         ocr_text = analysis_results.get("ocr_text", "")
@@ -76,14 +96,35 @@ async def screen_data(sid, data): # data is now an object { imageData, modelName
         # Unload Qwen2VL immediately after screen analysis
         logger.info("🔄 Unloading Qwen2VL after screen analysis")
         unload_qwen_model()
-        
+
         # Generate LLM response
         llm_prompt = f"Analyze the following screen content. Caption: {caption}. OCR text: {ocr_text}. Provide a concise summary or relevant insights."
-        llm_response = query_llm(llm_prompt, model_name=model_name)
+        return analysis_results, query_llm(llm_prompt, model_name=frame.model_name)
+
+
+async def analyze_frame(sid, frame: Frame):
+    """
+    Process screen data with intelligent model management.
+    Automatically loads Qwen2VL when needed and manages memory efficiently.
+    The model calls block, so they run in a thread to keep the socket responsive.
+    """
+    try:
+        model_name = frame.model_name
+        
+        logger.info(f"🖼️ Processing screen data for client {sid} with model {model_name}")
+        
+        result = await asyncio.to_thread(_analyze_with_models, sid, frame)
+        if result is None:
+            return
+        analysis_results, llm_response = result
+        if "error" in analysis_results:
+            logger.error(f"Screen analysis error: {analysis_results['error']}")
+            await sio.emit("error", {"message": analysis_results['error']}, room=sid)
+            return
 
         logger.info(f"✅ Screen analysis complete for client {sid}")
         await sio.emit("llm_response", {
-            "caption": caption, 
+            "caption": analysis_results.get("caption", ""), 
             "llm_response": llm_response,
             "model_used": model_name,
             "processing_info": "Qwen2VL + " + model_name,
@@ -93,6 +134,21 @@ async def screen_data(sid, data): # data is now an object { imageData, modelName
     except Exception as e:
         logger.error(f"Screen data processing failed for client {sid}: {e}")
         await sio.emit("error", {"message": f"Processing failed: {str(e)}"}, room=sid)
+        raise
+
+
+async def emit_stats(sid, stats):
+    """Send the session's frame counters once the analyzed frame is counted"""
+    await sio.emit("screen_share_stats", stats, room=sid)
+
+
+def _unload_if_idle():
+    """Unload Qwen2VL unless a screen share is still active (under the model lock)"""
+    with _model_lock:
+        if any(conn is not None for conn in connections.values()):
+            return
+        logger.info("🗑️ No active screen shares, unloading Qwen2VL to free memory")
+        unload_qwen_model()
 
 @sio.event
 async def stopShare(sid):
@@ -102,12 +158,22 @@ async def stopShare(sid):
     logger.info(f"🛑 Client {sid} stopped screen sharing")
     if sid in connections and connections[sid] is not None:
         connections[sid] = None
+    stats = await close_session(sid)
+    if stats:
+        logger.info(
+            f"📊 Screen share {sid}: {stats['received']} frames received, "
+            f"{stats['analyzed']} analyzed, {stats['dropped']} dropped"
+        )
     
-    # Optional: Unload Qwen2VL if no active connections
-    active_connections = sum(1 for conn in connections.values() if conn is not None)
-    if active_connections == 0:
-        logger.info("🗑️ No active screen shares, unloading Qwen2VL to free memory")
-        unload_qwen_model()
+    # Optional: Unload Qwen2VL if no active connections, once any analysis
+    # still running on a worker thread has finished with it
+    await asyncio.to_thread(_unload_if_idle)
+
+async def screen_share_stats(request):
+    """Frame counters across all screen-share sessions"""
+    return web.json_response(get_screen_share_stats())
+
+app.router.add_get("/screen-share/stats", screen_share_stats)
 
 # Start the server
 if __name__ == "__main__":
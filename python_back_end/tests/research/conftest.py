@@ -0,0 +1,16 @@
+"""
+Fixtures shared by the research tests
+"""
+
+import pytest
+
+from research.cache import research_cache
+
+
+@pytest.fixture(autouse=True)
+def research_cache_dir(tmp_path, monkeypatch):
+    """Give each test its own shared research cache under tmp_path"""
+    cache = research_cache.ResearchCache(cache_dir=str(tmp_path / "research_cache"))
+    monkeypatch.setattr(research_cache, "_research_cache", cache)
+    yield cache
+    cache.close()
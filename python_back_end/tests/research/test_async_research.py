@@ -0,0 +1,223 @@
+"""
+Tests for the concurrent async research path
+
+Search, page fetches and YouTube transcripts are stubbed with blocking
+sleeps, the way ddgs/newspaper/youtube-transcript-api behave, and a probe
+task measures how long the event loop is stalled while research runs.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import research.web_search as web_search
+from research.research_agent import ResearchAgent
+from research.web_search import WebSearchAgent
+
+DELAY = 0.1
+QUERIES = ["rust async runtime", "tokio vs async-std", "rust async benchmarks"]
+
+
+class StubSearchAgent(WebSearchAgent):
+    """WebSearchAgent with the network replaced by blocking sleeps"""
+
+    def __init__(self, delay=DELAY):
+        super().__init__(max_results=5)
+        self.delay = delay
+        self.extracted = []
+        self.lock = threading.Lock()
+
+    def search_web(self, query, num_results=None):
+        time.sleep(self.delay)
+        # Every query returns the same shared pages plus one of its own
+        shared = [
+            {"title": f"Shared {i}", "url": f"https://www.example.com/shared/{i}/?utm_source=ddg",
+             "snippet": "shared"}
+            for i in range(3)
+        ]
+        own = {"title": query, "url": f"https://example.org/{query.replace(' ', '-')}", "snippet": query}
+        video = {"title": "Video page", "url": "https://www.youtube.com/watch?v=abcdefghijk", "snippet": ""}
+        return shared + [own, video]
+
+    def search_youtube_videos(self, query, max_results=5):
+        time.sleep(self.delay)
+        return [
+            {"title": f"Video {i}", "url": f"https://youtube.com/watch?v=video{i:06d}",
+             "videoId": f"video{i:06d}", "transcript": "", "hasTranscript": False}
+            for i in range(3)
+        ]
+
+    def extract_content_from_url(self, url):
+        time.sleep(self.delay)
+        with self.lock:
+            self.extracted.append(url)
+        return {"title": url, "text": f"Body of {url}", "authors": [], "publish_date": None,
+                "url": url, "success": True}
+
+
+def fake_extract_youtube(delay=DELAY, hang=(), active=None):
+    """Blocking transcript fetch; video ids in ``hang`` never finish in time"""
+    active = active if active is not None else {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def extract(url, timeout_s):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        try:
+            time.sleep(delay * 20 if any(v in url for v in hang) else delay)
+            return {"url": url, "text": f"transcript of {url}", "success": True}
+        finally:
+            with lock:
+                active["now"] -= 1
+
+    return extract
+
+
+@pytest.fixture
+def agent():
+    research_agent = ResearchAgent(search_engine="duckduckgo", default_model="test-model")
+    research_agent.search_agent = StubSearchAgent()
+    return research_agent
+
+
+async def run_with_probe(coro, interval=0.005):
+    """Run ``coro`` while measuring the worst event-loop stall"""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    done = False
+
+    async def probe():
+        nonlocal worst
+        while not done:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            worst = max(worst, loop.time() - started - interval)
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(0)  # let the probe start its first interval
+    try:
+        result = await coro
+    finally:
+        done = True
+        await probe_task
+    return result, worst
+
+
+def stub_llm(agent):
+    """Patch out every LLM round trip so only search/extract/transcripts remain"""
+    validation = {"is_valid": True, "issues": []}
+
+    async def async_rewrite(analysis, *args, **kwargs):
+        return analysis, validation
+
+    return [
+        patch.object(agent, "_generate_search_queries", return_value=QUERIES),
+        patch.object(agent, "_async_generate_search_queries", return_value=QUERIES),
+        patch.object(agent, "query_llm", return_value="Analysis [1]."),
+        patch.object(agent, "async_query_llm", return_value="Analysis [1]."),
+        patch.object(agent, "_rewrite_with_validation", return_value=("Analysis [1].", validation)),
+        patch.object(agent, "_async_rewrite_with_validation", side_effect=async_rewrite),
+    ]
+
+
+class TestAsyncResearch:
+    """Test cases for ResearchAgent.async_research_topic"""
+
+    def test_urls_deduplicated_and_capped_before_extraction(self, agent):
+        with patch.object(web_search, "extract_youtube", fake_extract_youtube(delay=0)):
+            patches = stub_llm(agent)
+            for p in patches:
+                p.start()
+            try:
+                result = asyncio.run(agent.async_research_topic("rust async", research_depth="standard"))
+            finally:
+                for p in patches:
+                    p.stop()
+
+        extracted = agent.search_agent.extracted
+        # 3 queries x 5 results collapse to 3 shared pages + 3 own pages + 1 video page,
+        # capped at 5 before any page is fetched
+        assert len(extracted) == len(set(extracted)) == 4
+        assert not any("youtube.com" in url for url in extracted)
+        assert result["sources_found"] == 5
+        assert len(result["videos"]) == 3
+        assert all(v["hasTranscript"] for v in result["videos"])
+
+    def test_searches_run_concurrently_without_stalling_loop(self, agent):
+        async def scenario():
+            started = time.perf_counter()
+            data, stall = await run_with_probe(
+                agent._async_search_queries(QUERIES, {"max_results": 5, "max_videos": 3})
+            )
+            return data, stall, time.perf_counter() - started
+
+        data, stall, elapsed = asyncio.run(scenario())
+        assert len(data["search_results"]) == 15 and len(data["videos"]) == 9
+        # Six blocking searches of DELAY each; sequentially that is 6 * DELAY
+        assert elapsed < 3 * DELAY
+        assert stall < 0.05
+
+    def test_transcripts_bounded_and_time_out_individually(self):
+        search_agent = StubSearchAgent()
+        active = {"now": 0, "max": 0}
+        videos = [{"title": f"Video {i}", "url": f"https://youtube.com/watch?v=video{i:06d}"}
+                  for i in range(6)]
+
+        async def scenario():
+            started = time.perf_counter()
+            result = await search_agent.async_fetch_video_transcripts(
+                videos, max_videos=5, timeout_s=DELAY * 5, max_concurrency=2
+            )
+            return result, time.perf_counter() - started
+
+        with patch.object(web_search, "extract_youtube",
+                          fake_extract_youtube(hang=("video000001",), active=active)):
+            # asyncio.run joins the hung worker thread on exit, so time inside the loop
+            result, elapsed = asyncio.run(scenario())
+
+        assert active["max"] <= 2
+        assert [v.get("hasTranscript") for v in result[:5]] == [True, False, True, True, True]
+        assert result[1]["transcript"] == ""
+        assert "hasTranscript" not in result[5]  # beyond max_videos
+        # The hung fetch only costs its own deadline, not 20 * DELAY
+        assert elapsed < DELAY * 10
+
+    @pytest.mark.slow
+    def test_benchmark_against_sequential_research(self, agent):
+        patches = stub_llm(agent)
+        for p in patches:
+            p.start()
+        try:
+            with patch.object(web_search, "extract_youtube", fake_extract_youtube()):
+                async def sequential():
+                    # The previous behaviour: blocking calls made directly on the loop
+                    return agent.research_topic("rust async", research_depth="deep")
+
+                started = time.perf_counter()
+                _, sequential_stall = asyncio.run(run_with_probe(sequential()))
+                sequential_s = time.perf_counter() - started
+
+                agent.search_agent.extracted.clear()
+                started = time.perf_counter()
+                _, concurrent_stall = asyncio.run(run_with_probe(
+                    agent.async_research_topic("rust async", research_depth="deep")
+                ))
+                concurrent_s = time.perf_counter() - started
+        finally:
+            for p in patches:
+                p.stop()
+
+        print(f"\nsequential: {sequential_s:.2f}s (worst stall {sequential_stall * 1000:.0f}ms), "
+              f"concurrent: {concurrent_s:.2f}s (worst stall {concurrent_stall * 1000:.0f}ms)")
+        assert concurrent_s < sequential_s / 2
+        assert concurrent_stall < 0.05
+        assert sequential_stall > 10 * concurrent_stall
@@ -0,0 +1,220 @@
+"""
+Tests for batched embedding reranking and the cross-encoder stage
+
+Ollama is replaced by an httpx.MockTransport that derives vectors from the
+text, and the cross-encoder by a fake model with a fixed per-batch cost.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from research.core.types import DocChunk
+from research.rank.bm25 import RankedChunk
+from research.rank.embeddings import EmbeddingCache, HashingEmbeddingBackend, OllamaEmbeddingBackend
+from research.rank.rerank import CrossEncoderReranker, EmbeddingReranker
+
+TOPICS = ["rust async runtime tokio executor", "python asyncio event loop coroutine",
+          "postgres index vacuum query planner", "kubernetes pod scheduling node affinity",
+          "cuda kernel memory coalescing warp", "react component state hooks rendering"]
+
+
+def candidates(n, seed=46):
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(n):
+        topic = TOPICS[i % len(TOPICS)].split()
+        words = [rng.choice(topic) for _ in range(40)] + [rng.choice(TOPICS).split()[0] for _ in range(20)]
+        rng.shuffle(words)
+        chunk = DocChunk(url=f"https://example.com/{i}", title=f"Doc {i}", text=" ".join(words),
+                         start=0, end=0, meta={})
+        chunks.append(RankedChunk(chunk=chunk, score=rng.random(), term_matches={}))
+    return chunks
+
+
+def fake_vector(text, dim=64):
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(dim).tolist()
+
+
+def ollama_transport(requests_seen):
+    def handler(request):
+        body = json.loads(request.content)
+        requests_seen.append(len(body["input"]))
+        return httpx.Response(200, json={"model": body["model"],
+                                         "embeddings": [fake_vector(t) for t in body["input"]]})
+    return httpx.MockTransport(handler)
+
+
+class FakeCrossEncoderModel:
+    """CrossEncoder.predict stand-in: favours texts sharing words with the query"""
+
+    def __init__(self, seconds_per_batch=0.0):
+        self.seconds_per_batch = seconds_per_batch
+        self.pairs_scored = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        time.sleep(self.seconds_per_batch)
+        self.pairs_scored += len(pairs)
+        return [len(set(q.split()) & set(t.split())) / 10 for q, t in pairs]
+
+
+def cross_encoder_with(model):
+    cross_encoder = CrossEncoderReranker(batch_size=4)
+    cross_encoder._model, cross_encoder._loaded = model, True
+    return cross_encoder
+
+
+class TestEmbeddingReranker:
+
+    def test_batched_ollama_embeddings_are_cached_by_content(self):
+        seen = []
+        backend = OllamaEmbeddingBackend(model="nomic-embed-text", base_url="http://ollama:11434",
+                                         batch_size=64, transport=ollama_transport(seen))
+        reranker = EmbeddingReranker(backend=backend, cache=EmbeddingCache(), cross_encoder_top_k=0)
+        ranked = candidates(150)
+
+        async def scenario():
+            try:
+                first = await reranker.rerank("tokio executor", ranked, top_k=10)
+                second = await reranker.rerank("tokio executor", list(reversed(ranked)), top_k=10)
+                return first, second
+            finally:
+                await backend.close()
+
+        first, second = asyncio.run(scenario())
+        assert seen == [64, 64, 23]  # 151 texts (query first) in three requests, then all cached
+        assert reranker.cache.get_stats()["hits"] == 151
+
+        # Same ordering as scoring each candidate by hand
+        q = np.array(fake_vector("tokio executor"))
+        expected = []
+        for rc in ranked:
+            v = np.array(fake_vector(rc.chunk.text))
+            cosine = max(0.0, min(1.0, float(q @ v / np.linalg.norm(q) / np.linalg.norm(v))))
+            expected.append((0.4 * rc.score + 0.6 * cosine, rc.chunk.url))
+        expected.sort(key=lambda x: x[0], reverse=True)
+        assert [r.chunk.url for r in first] == [url for _, url in expected[:10]]
+        assert [r.combined_score for r in first] == pytest.approx([score for score, _ in expected[:10]], abs=1e-5)
+        assert [r.chunk.url for r in second] == [r.chunk.url for r in first]
+        assert first[0].metadata == {"model": "ollama:nomic-embed-text", "embedding_dim": 64, "stage": "embedding"}
+
+    def test_hashing_backend_ranks_on_topic_text_first(self):
+        reranker = EmbeddingReranker(backend=HashingEmbeddingBackend(), cache=EmbeddingCache(),
+                                     lexical_weight=0.0, cross_encoder_top_k=0)
+        ranked = candidates(60)
+        reranked = asyncio.run(reranker.rerank("postgres query planner vacuum", ranked, top_k=10))
+        assert all("postgres" in r.chunk.text for r in reranked)
+        assert all(0.0 <= r.semantic_score <= 1.0 for r in reranked)
+
+    def test_cross_encoder_stage_respects_latency_budget(self):
+        model = FakeCrossEncoderModel(seconds_per_batch=0.05)
+        reranker = EmbeddingReranker(backend=HashingEmbeddingBackend(), cache=EmbeddingCache(),
+                                     cross_encoder=cross_encoder_with(model),
+                                     cross_encoder_top_k=20, cross_encoder_budget_ms=120)
+        ranked = candidates(100)
+
+        started = time.perf_counter()
+        reranked = asyncio.run(reranker.rerank("rust tokio executor", ranked))
+        elapsed = time.perf_counter() - started
+
+        # Batches of 4 at 50ms each: the budget admits three batches, not all five
+        assert model.pairs_scored == 12
+        assert elapsed < 0.5
+        stages = [r.metadata["stage"] for r in reranked]
+        assert stages.count("cross_encoder") == 12
+        # Rescored candidates stay in the head, sorted by their new scores
+        head = reranked[:20]
+        assert sum(r.metadata["stage"] == "cross_encoder" for r in head) == 12
+        assert [r.combined_score for r in head] == sorted((r.combined_score for r in head), reverse=True)
+        assert len(reranked) == 100
+
+    def test_cross_encoder_falls_back_to_term_overlap(self, monkeypatch):
+        import research.rank.rerank as rerank_module
+
+        monkeypatch.setattr(rerank_module, "_load_cross_encoder", lambda name: None)
+        reranker = CrossEncoderReranker()
+        ranked = candidates(12)
+        reranked = asyncio.run(reranker.rerank("python asyncio", ranked, top_k=3))
+        assert len(reranked) == 3
+        assert reranked[0].semantic_score == 1.0
+
+
+async def legacy_rerank(query, ranked_chunks, embed, lexical_weight=0.4):
+    """The previous EmbeddingReranker.rerank: list embeddings, per-document Python cosine"""
+    async def cosine_similarity(embedding1, embedding2):
+        if len(embedding1) != len(embedding2):
+            return 0.0
+        dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
+        return max(0.0, min(1.0, dot_product))
+
+    texts = [query] + [chunk.chunk.text for chunk in ranked_chunks]
+    embeddings = await embed(texts)
+    query_embedding = embeddings[0]
+    reranked = []
+    for i, ranked_chunk in enumerate(ranked_chunks):
+        semantic_score = await cosine_similarity(query_embedding, embeddings[i + 1])
+        reranked.append((lexical_weight * ranked_chunk.score + (1 - lexical_weight) * semantic_score,
+                         ranked_chunk.chunk.url))
+    reranked.sort(key=lambda x: x[0], reverse=True)
+    return reranked
+
+
+@pytest.mark.slow
+def test_benchmark_500_candidates():
+    ranked = candidates(500)
+    queries = [f"{topic} performance" for topic in TOPICS]
+    backend = HashingEmbeddingBackend(dim=384)
+
+    async def embed_as_lists(texts):
+        return (await backend.embed(texts)).tolist()
+
+    async def legacy():
+        return [await legacy_rerank(q, ranked, embed_as_lists) for q in queries]
+
+    async def batched(reranker):
+        return [await reranker.rerank(q, ranked) for q in queries]
+
+    def timed(coro):
+        started = time.perf_counter()
+        result = asyncio.run(coro)
+        return result, (time.perf_counter() - started) / len(queries)
+
+    legacy_results, legacy_s = timed(legacy())
+    reranker = EmbeddingReranker(backend=backend, cache=EmbeddingCache(), cross_encoder_top_k=0)
+    cold_results, cold_s = timed(batched(reranker))  # first query embeds, the rest hit the cache
+    warm_results, warm_s = timed(batched(reranker))
+
+    # Scoring alone, given the vectors
+    vectors = asyncio.run(backend.embed([queries[0]] + [rc.chunk.text for rc in ranked]))
+    as_lists = vectors.tolist()
+    started = time.perf_counter()
+    for _ in range(20):
+        [sum(a * b for a, b in zip(as_lists[0], row)) for row in as_lists[1:]]
+    python_scoring = (time.perf_counter() - started) / 20
+    started = time.perf_counter()
+    for _ in range(20):
+        np.clip(vectors[1:] @ vectors[0], 0.0, 1.0)
+    numpy_scoring = (time.perf_counter() - started) / 20
+
+    print(f"\n500 candidates, per query: legacy {legacy_s * 1000:.1f}ms, batched cold {cold_s * 1000:.1f}ms, "
+          f"warm cache {warm_s * 1000:.1f}ms; scoring only: python {python_scoring * 1000:.2f}ms, "
+          f"numpy {numpy_scoring * 1000:.3f}ms")
+
+    for legacy_ranking, new_ranking in zip(legacy_results, warm_results):
+        assert [url for _, url in legacy_ranking] == [r.chunk.url for r in new_ranking]
+    if os.getenv("BENCHMARK_ASSERT_SPEEDUP"):
+        # Wall-clock ratios depend on the machine and its load; opt in where it is quiet
+        assert warm_s < legacy_s / 5
+        assert numpy_scoring < python_scoring / 10
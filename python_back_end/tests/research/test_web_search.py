@@ -49,14 +49,17 @@ class TestWebSearchAgent:
         # Assertions
         assert results == []
     
-    @patch('research.web_search.requests.head')
+    @patch('research.web_search.get_fetch_service')
     @patch('research.web_search.Article')
-    def test_extract_content_from_url_success(self, mock_article_class, mock_requests_head, web_search_agent):
+    def test_extract_content_from_url_success(self, mock_article_class, mock_get_fetch_service, web_search_agent):
         """Test successful content extraction from URL"""
-        # Mock the requests.head call to return success
+        # Mock the pooled GET to return an HTML page
         mock_response = Mock()
-        mock_response.status_code = 200
-        mock_requests_head.return_value = mock_response
+        mock_response.status = 200
+        mock_response.error = None
+        mock_response.is_pdf = False
+        mock_response.text = "<html><body>This is the full article text.</body></html>"
+        mock_get_fetch_service.return_value.fetch_sync.return_value = mock_response
         # Mock the Article instance
         mock_article = Mock()
         mock_article.title = "Test Article"
@@ -75,20 +78,21 @@ class TestWebSearchAgent:
         assert result["authors"] == ["Author 1", "Author 2"]
         assert result["url"] == "https://example.com/article"
         
-        # Verify requests.head was called
-        mock_requests_head.assert_called_once()
+        # Verify the page was fetched once and handed to newspaper
+        mock_get_fetch_service.return_value.fetch_sync.assert_called_once()
         # Verify Article methods were called
-        mock_article.download.assert_called_once()
+        mock_article.download.assert_called_once_with(input_html=mock_response.text)
         mock_article.parse.assert_called_once()
     
-    @patch('research.web_search.requests.head')
+    @patch('research.web_search.get_fetch_service')
     @patch('research.web_search.Article')
-    def test_extract_content_from_url_failure(self, mock_article_class, mock_requests_head, web_search_agent):
+    def test_extract_content_from_url_failure(self, mock_article_class, mock_get_fetch_service, web_search_agent):
         """Test content extraction failure handling"""
-        # Mock the requests.head call to return failure
+        # Mock the pooled GET to return a 404
         mock_response = Mock()
-        mock_response.status_code = 404
-        mock_requests_head.return_value = mock_response
+        mock_response.status = 404
+        mock_response.error = None
+        mock_get_fetch_service.return_value.fetch_sync.return_value = mock_response
         # Mock the Article instance to raise an exception
         mock_article = Mock()
         mock_article.download.side_effect = Exception("Download failed")
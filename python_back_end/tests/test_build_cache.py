@@ -0,0 +1,107 @@
+"""
+Tests for the artifact executor's build cache
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from executor_service.build_cache import BuildCache, dependency_hash, lockfile_matches, scripts_hash, sync_files
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = BuildCache(root=tmp_path / "cache", max_snapshots=2)
+    c.ensure_dirs()
+    return c
+
+
+def fake_install(workspace, name="react"):
+    pkg = workspace / "node_modules" / name
+    pkg.mkdir(parents=True)
+    (pkg / "index.js").write_text("module.exports = 1")
+    (workspace / "node_modules" / ".cache").mkdir()
+    (workspace / "package-lock.json").write_text("{}")
+
+
+class TestBuildCache:
+
+    def test_dependency_hash_ignores_everything_but_dependencies(self):
+        a = dependency_hash({"name": "a", "dependencies": {"react": "^18"}}, "v18.19.0")
+        b = dependency_hash({"name": "b", "dependencies": {"react": "^18"}}, "v18.19.0")
+        c = dependency_hash({"dependencies": {"react": "^18"}}, "v20.11.0")
+        d = dependency_hash({"dependencies": {"react": "^18"}}, "v18.19.0", lockfile="{}")
+        assert a == b
+        assert len({a, c, d}) == 3
+
+    def test_lockfile_must_match_the_generated_package(self):
+        package = {"scripts": {"build": "vite build"}, "dependencies": {"react": "^18.2.0"},
+                   "devDependencies": {"vite": "^5.0.0"}}
+
+        def lock(dependencies, dev=None, version=3):
+            root = {"name": "artifact-app", "dependencies": dependencies}
+            if dev:
+                root["devDependencies"] = dev
+            return json.dumps({"lockfileVersion": version, "packages": {"": root}})
+
+        assert lockfile_matches(package, lock({"react": "^18.2.0"}, {"vite": "^5.0.0"}))
+        assert not lockfile_matches(package, lock({"react": "^18.2.0", "zod": "^3"}, {"vite": "^5.0.0"}))
+        assert not lockfile_matches(package, lock({"react": "^17.0.0"}, {"vite": "^5.0.0"}))
+        assert not lockfile_matches(package, json.dumps({"lockfileVersion": 1, "dependencies": {}}))
+        assert not lockfile_matches(package, "not json")
+        assert not lockfile_matches(package, None)
+
+    def test_scripts_hash_tracks_only_scripts(self):
+        vite = {"scripts": {"build": "vite build"}, "dependencies": {"react": "^18"}}
+        assert scripts_hash(vite) == scripts_hash({**vite, "dependencies": {}})
+        assert scripts_hash(vite) != scripts_hash({**vite, "scripts": {"start": "node index.js"}})
+
+    def test_sync_files_only_touches_changes(self, tmp_path):
+        ws = tmp_path / "ws"
+        manifest, changed, _ = sync_files({"a.tsx": "a", "/lib/b.ts": "b"}, ws)
+        assert sorted(changed) == ["a.tsx", "lib/b.ts"]
+
+        mtime = (ws / "lib" / "b.ts").stat().st_mtime_ns
+        _, changed, removed = sync_files({"lib/b.ts": "b", "c.ts": "c"}, ws, manifest)
+        assert changed == ["c.ts"] and removed == ["a.tsx"]
+        assert not (ws / "a.tsx").exists()
+        assert (ws / "lib" / "b.ts").stat().st_mtime_ns == mtime
+
+    def test_snapshot_restored_as_hardlinks(self, cache, tmp_path):
+        first = tmp_path / "job1"
+        fake_install(first)
+        assert cache.save_dependencies(first, "h1")
+        assert not (cache.deps_dir / "h1" / "node_modules" / ".cache").exists()
+
+        second = tmp_path / "job2"
+        second.mkdir()
+        assert cache.restore_dependencies(second, "h1")
+        restored = second / "node_modules" / "react" / "index.js"
+        assert restored.read_text() == "module.exports = 1"
+        assert restored.stat().st_ino == (first / "node_modules" / "react" / "index.js").stat().st_ino
+        assert (second / "package-lock.json").exists()
+        assert not cache.restore_dependencies(second, "missing")
+
+    def test_snapshots_are_bounded(self, cache, tmp_path):
+        for i in range(4):
+            ws = tmp_path / f"job{i}"
+            fake_install(ws)
+            cache.save_dependencies(ws, f"h{i}")
+            os.utime(cache.deps_dir / f"h{i}", (i, i))
+        assert sorted(p.name for p in cache.deps_dir.iterdir()) == ["h2", "h3"]
+
+    def test_workspace_parked_and_reused(self, cache, tmp_path):
+        job1 = tmp_path / "job1"
+        assert not cache.checkout_workspace("art", job1)
+        (job1 / "App.tsx").write_text("x")
+        cache.park_workspace("art", job1)
+        assert not job1.exists()
+
+        job2 = tmp_path / "job2"
+        assert cache.checkout_workspace("art", job2)
+        assert (job2 / "App.tsx").read_text() == "x"
+        assert cache.get_stats()["parked_workspaces"] == 0
@@ -0,0 +1,154 @@
+"""
+Tests for the materialized chat_user_stats table: the install-time repair,
+the trigger's delta and recount paths, and the lazy refresh in
+ChatHistoryStorage.get_user_stats.
+
+They need a real Postgres: set CHAT_STATS_TEST_DATABASE_URL and each test
+installs chat_user_stats.sql into a throwaway schema.
+
+    CHAT_STATS_TEST_DATABASE_URL=postgresql://... pytest tests/test_chat_user_stats.py
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_history_module.storage import ChatHistoryStorage
+from chat_history_module.user_stats import ensure_user_stats_schema
+
+TEST_DATABASE_URL = os.getenv("CHAT_STATS_TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="CHAT_STATS_TEST_DATABASE_URL not set")
+
+# The columns the stats functions read; no users table or message triggers
+TABLES_SQL = """
+CREATE TABLE chat_sessions (
+    id UUID PRIMARY KEY,
+    user_id INTEGER,
+    last_message_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    message_count INTEGER DEFAULT 0,
+    is_active BOOLEAN DEFAULT true
+);
+CREATE TABLE chat_messages (
+    id SERIAL PRIMARY KEY,
+    session_id UUID NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE
+);
+"""
+
+
+def with_schema(scenario):
+    """Run scenario(pool) against a fresh schema holding the chat tables"""
+
+    async def run():
+        import asyncpg
+
+        schema = f"chat_stats_test_{uuid.uuid4().hex[:8]}"
+        admin = await asyncpg.connect(TEST_DATABASE_URL)
+        await admin.execute(f'CREATE SCHEMA "{schema}"')
+        pool = await asyncpg.create_pool(TEST_DATABASE_URL, min_size=1, max_size=2,
+                                         server_settings={"search_path": schema})
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(TABLES_SQL)
+            return await scenario(pool)
+        finally:
+            await pool.close()
+            await admin.execute(f'DROP SCHEMA "{schema}" CASCADE')
+            await admin.close()
+
+    return asyncio.run(run())
+
+
+async def add_session(conn, user_id, messages, message_count=None):
+    session_id = uuid.uuid4()
+    await conn.execute("INSERT INTO chat_sessions (id, user_id, message_count) VALUES ($1, $2, $3)",
+                       session_id, user_id, messages if message_count is None else message_count)
+    await conn.execute("INSERT INTO chat_messages (session_id) SELECT $1 FROM generate_series(1, $2)",
+                       session_id, messages)
+    return session_id
+
+
+async def add_messages(conn, session_id, n):
+    """What the statement trigger on chat_messages does for one insert"""
+    await conn.execute("INSERT INTO chat_messages (session_id) SELECT $1 FROM generate_series(1, $2)",
+                       session_id, n)
+    await conn.execute("UPDATE chat_sessions SET message_count = message_count + $2 WHERE id = $1",
+                       session_id, n)
+
+
+async def totals(conn, user_id):
+    row = await conn.fetchrow("SELECT total_sessions, total_messages FROM chat_user_stats WHERE user_id = $1",
+                              user_id)
+    return tuple(row) if row else None
+
+
+class TestChatUserStats:
+
+    def test_install_repairs_double_counted_sessions(self):
+        async def scenario(pool):
+            async with pool.acquire() as conn:
+                # Sessions written before the fix counted every message twice
+                drifted = await add_session(conn, 1, messages=4, message_count=8)
+                await add_session(conn, 1, messages=2, message_count=4)
+                await add_session(conn, 2, messages=3)
+                await ensure_user_stats_schema(conn)
+
+                counts = await conn.fetchval("SELECT message_count FROM chat_sessions WHERE id = $1", drifted)
+                return counts, await totals(conn, 1), await totals(conn, 2)
+
+        repaired, user_1, user_2 = with_schema(scenario)
+        assert repaired == 4
+        assert user_1 == (2, 6) and user_2 == (1, 3)
+
+    def test_trigger_tracks_inserts_clears_and_soft_deletes(self):
+        async def scenario(pool):
+            seen = []
+            async with pool.acquire() as conn:
+                await ensure_user_stats_schema(conn)
+                first = await add_session(conn, 1, messages=0)
+                second = await add_session(conn, 1, messages=0)
+                seen.append(await totals(conn, 1))
+
+                await add_messages(conn, first, 2)
+                await add_messages(conn, second, 3)
+                seen.append(await totals(conn, 1))
+
+                # Clearing a session
+                await conn.execute("DELETE FROM chat_messages WHERE session_id = $1", first)
+                await conn.execute("UPDATE chat_sessions SET message_count = 0 WHERE id = $1", first)
+                seen.append(await totals(conn, 1))
+
+                # Soft delete, then hard delete
+                await conn.execute("UPDATE chat_sessions SET is_active = FALSE WHERE id = $1", second)
+                seen.append(await totals(conn, 1))
+                await conn.execute("DELETE FROM chat_sessions WHERE id = $1", first)
+                seen.append(await totals(conn, 1))
+            return seen
+
+        assert with_schema(scenario) == [(2, 0), (2, 5), (2, 3), (1, 0), (0, 0)]
+
+    def test_lazy_refresh_and_check_agree_with_messages(self):
+        async def scenario(pool):
+            async with pool.acquire() as conn:
+                await ensure_user_stats_schema(conn)
+                session_id = await add_session(conn, 7, messages=5)
+                # A row missing (e.g. the table was created after the user's activity)
+                await conn.execute("DELETE FROM chat_user_stats WHERE user_id = 7")
+                # and a session counter that drifted without the trigger noticing
+                await conn.execute("ALTER TABLE chat_sessions DISABLE TRIGGER trigger_update_user_chat_stats")
+                await conn.execute("UPDATE chat_sessions SET message_count = 10 WHERE id = $1", session_id)
+                await conn.execute("ALTER TABLE chat_sessions ENABLE TRIGGER trigger_update_user_chat_stats")
+
+            storage = ChatHistoryStorage(pool)
+            stats = await storage.get_user_stats(7)
+            return stats, await storage.check_user_stats(), await storage.get_user_stats(8)
+
+        stats, mismatches, empty = with_schema(scenario)
+        assert stats["total_sessions"] == 1 and stats["total_messages"] == 5
+        assert mismatches == []
+        assert empty == {"total_sessions": 0, "total_messages": 0, "last_activity": None}
@@ -0,0 +1,144 @@
+"""
+Tests for the chat history write-behind buffer, driven by an in-memory
+stand-in for ChatHistoryStorage
+"""
+
+import asyncio
+import os
+import sys
+from uuid import uuid4
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_history_module import (
+    ChatHistoryManager,
+    ChatHistoryWriteBuffer,
+    CreateMessageRequest,
+    SessionNotFoundError,
+)
+
+
+class MemoryStorage:
+    """Sessions and messages in memory; only what the buffer and manager call"""
+
+    def __init__(self):
+        self.sessions = {}  # session_id -> user_id
+        self.rows = []  # (session_id, message id, role, content) in insert order
+        self.inserts = 0
+        self.fail_next = 0
+        self.next_id = 1
+
+    def add_session(self, user_id):
+        session_id = uuid4()
+        self.sessions[session_id] = user_id
+        return session_id
+
+    async def get_session(self, session_id, user_id):
+        if self.sessions.get(session_id) != user_id:
+            raise SessionNotFoundError(str(session_id))
+        return session_id
+
+    async def reserve_message_ids(self, count):
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        return ids
+
+    async def add_messages(self, user_id, session_id, requests, message_ids=None, created_at=None):
+        await asyncio.sleep(0)
+        if self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError("connection reset")
+        if self.sessions.get(session_id) != user_id:
+            raise SessionNotFoundError(str(session_id))
+        self.inserts += 1
+        for request, message_id in zip(requests, message_ids):
+            self.rows.append((session_id, message_id, request.role, request.content))
+        return []
+
+
+def turn(session_id, n):
+    return [
+        CreateMessageRequest(session_id=session_id, role="user", content=f"question {n}"),
+        CreateMessageRequest(session_id=session_id, role="assistant", content=f"answer {n}"),
+    ]
+
+
+class TestChatWriteBuffer:
+
+    def test_concurrent_turns_are_coalesced_and_keep_their_order(self):
+        storage = MemoryStorage()
+        session_id = storage.add_session(user_id=1)
+
+        async def scenario():
+            buffer = ChatHistoryWriteBuffer(storage, flush_interval=0.02)
+            returned = await asyncio.gather(*(buffer.enqueue(1, session_id, turn(session_id, n)) for n in range(10)))
+            assert not storage.rows  # nothing written on the request path
+            await asyncio.sleep(0.1)
+            await buffer.close()
+            return returned, buffer.get_stats()
+
+        returned, stats = asyncio.run(scenario())
+        assert storage.inserts == 1
+        assert stats["written"] == 20 and stats["dropped"] == 0 and stats["pending"] == 0
+        # Rows land in enqueue order under the ids handed back to the callers
+        assert [content for _, _, _, content in storage.rows] == [
+            text for n in range(10) for text in (f"question {n}", f"answer {n}")
+        ]
+        assert [message_id for _, message_id, _, _ in storage.rows] == [m.id for ms in returned for m in ms]
+        ids = [message_id for _, message_id, _, _ in storage.rows]
+        assert ids == sorted(ids)
+
+    def test_failed_flush_is_retried_then_dropped(self):
+        storage = MemoryStorage()
+        session_id = storage.add_session(user_id=1)
+
+        async def scenario(failures):
+            storage.fail_next = failures
+            buffer = ChatHistoryWriteBuffer(storage, flush_interval=0.0, max_attempts=3)
+            await buffer.enqueue(1, session_id, turn(session_id, failures))
+            await buffer.close()
+            return buffer.get_stats()
+
+        retried = asyncio.run(scenario(2))
+        assert retried["written"] == 2 and retried["failed"] == 4 and retried["dropped"] == 0
+        dropped = asyncio.run(scenario(3))
+        assert dropped["written"] == 0 and dropped["dropped"] == 2
+        assert [content for _, _, _, content in storage.rows] == ["question 2", "answer 2"]
+
+    def test_reads_flush_pending_writes_first(self):
+        storage = MemoryStorage()
+        session_id = storage.add_session(user_id=1)
+
+        async def scenario():
+            buffer = ChatHistoryWriteBuffer(storage, flush_interval=0.3)
+            await buffer.enqueue(1, session_id, turn(session_id, 0))
+            assert buffer.has_pending(session_id) and not buffer.has_pending(uuid4())
+            written = await buffer.flush()
+            assert not buffer.has_pending(session_id)
+            await buffer.close()
+            return written
+
+        assert asyncio.run(scenario()) == 2
+        assert len(storage.rows) == 2
+
+    def test_write_behind_rejects_foreign_sessions_before_queueing(self):
+        storage = MemoryStorage()
+        own, foreign = storage.add_session(user_id=1), storage.add_session(user_id=2)
+
+        async def scenario():
+            manager = ChatHistoryManager(db_pool=None, write_behind=True, flush_interval=0.0)
+            manager.storage = manager.write_buffer.storage = storage
+            with pytest.raises(SessionNotFoundError):
+                await manager.add_exchange(1, foreign, "hi", "hello", wait=False)
+            with pytest.raises(SessionNotFoundError):
+                await manager.add_exchange(1, uuid4(), "hi", "hello", wait=False)
+            user_msg, asst_msg = await manager.add_exchange(1, own, "hi", "hello", wait=False)
+            await manager.close()
+            return manager.write_buffer.get_stats(), user_msg, asst_msg
+
+        stats, user_msg, asst_msg = asyncio.run(scenario())
+        assert stats["enqueued"] == 2 and stats["written"] == 2 and stats["dropped"] == 0
+        assert asst_msg.id == user_msg.id + 1
+        assert [(s, role) for s, _, role, _ in storage.rows] == [(own, "user"), (own, "assistant")]
@@ -0,0 +1,197 @@
+"""
+Tests for the segment-based RAG chunk store
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_corpus import chunk_store as chunk_store_module
+from rag_corpus.chunk_store import ChunkStore
+from rag_corpus.chunker import Chunk, DocumentChunker, RawDocument
+
+PARAGRAPH = ("Kubernetes schedules pods onto nodes based on resource requests, affinity rules and taints. "
+             "A Deployment keeps the desired number of replicas running and rolls out new versions. ")
+
+
+def make_chunk(i, source="kubernetes_docs", text=None):
+    return Chunk(
+        id=f"{i:016x}",
+        text=text if text is not None else f"Section {i}. " + PARAGRAPH * 5,
+        metadata={"source": source, "url": f"https://kubernetes.io/docs/{i}", "title": f"Doc {i // 4}",
+                  "chunk_index": i % 4, "doc_id": f"doc-{i // 4}", "fetched_at": "2026-01-01T00:00:00"},
+    )
+
+
+def segment_files(path):
+    return sorted(p.name for p in path.iterdir() if p.name.startswith("seg-"))
+
+
+class TestChunkStore:
+
+    def test_append_lookup_and_load(self, tmp_path):
+        store = ChunkStore(str(tmp_path))
+        chunks = [make_chunk(i) for i in range(50)] + [make_chunk(i, source="helm_docs") for i in range(50, 60)]
+        assert store.append(chunks) == 60
+
+        assert store.get(make_chunk(7).id).text == chunks[7].text
+        assert store.get(make_chunk(55).id, source="helm_docs").metadata["source"] == "helm_docs"
+        assert store.get(make_chunk(55).id, source="kubernetes_docs") is None
+        assert store.get("missing") is None
+        assert [c.id for c in store.load("kubernetes_docs")] == [c.id for c in chunks[:50]]
+        assert store.count() == 60
+        # One segment per source instead of one file per chunk
+        assert segment_files(tmp_path / "kubernetes_docs") == ["seg-000001.idx", "seg-000001.jsonl"]
+
+        # Same id again: the newer copy wins everywhere, even after reopening
+        store.append([make_chunk(7, text="updated")])
+        store.close()
+        reopened = ChunkStore(str(tmp_path))
+        assert reopened.get(make_chunk(7).id).text == "updated"
+        loaded = reopened.load("kubernetes_docs")
+        assert len(loaded) == 50 and sum(c.text == "updated" for c in loaded) == 1
+        assert reopened.get_stats()["kubernetes_docs"]["dead_bytes"] > 0
+
+    def test_replace_source_and_compaction(self, tmp_path, monkeypatch):
+        store = ChunkStore(str(tmp_path), segment_max_bytes=16 * 1024)
+        store.append([make_chunk(i) for i in range(100)] + [make_chunk(i, source="helm_docs") for i in range(100, 110)])
+        assert len(segment_files(tmp_path / "kubernetes_docs")) > 2  # rolled over by size
+
+        store.replace_source("kubernetes_docs", [make_chunk(i) for i in range(200, 210)])
+        assert sorted(c.id for c in store.load("kubernetes_docs")) == [make_chunk(i).id for i in range(200, 210)]
+        assert store.get(make_chunk(5).id) is None
+        assert store.count("helm_docs") == 10
+        assert "seg-000001.jsonl" not in segment_files(tmp_path / "kubernetes_docs")
+
+        # Rewriting the same ids leaves dead records until compaction
+        for _ in range(3):
+            store.append([make_chunk(i, text=f"v{_} {i}") for i in range(200, 210)])
+        before = store.get_stats()["kubernetes_docs"]
+        reclaimed = store.compact("kubernetes_docs")
+        after = store.get_stats()["kubernetes_docs"]
+        assert reclaimed == before["bytes"] - after["bytes"] > 0
+        assert after["dead_bytes"] == 0 and after["segments"] == 1
+        assert store.get(make_chunk(203).id).text == "v2 203"
+
+        # Past the dead-bytes ratio, appends compact automatically
+        monkeypatch.setattr(chunk_store_module, "COMPACT_MIN_BYTES", 0)
+        store.append([make_chunk(i, text="again") for i in range(200, 210)])
+        assert store.get_stats()["kubernetes_docs"]["dead_bytes"] == 0
+
+        assert store.delete_source("kubernetes_docs") == 10
+        assert not (tmp_path / "kubernetes_docs").exists()
+
+    def test_legacy_layout_migrated_on_first_use(self, tmp_path):
+        for i in range(20):
+            chunk = make_chunk(i, source="docker_docs")
+            (tmp_path / "docker_docs").mkdir(exist_ok=True)
+            with open(tmp_path / "docker_docs" / f"{chunk.id}.json", "w", encoding="utf-8") as f:
+                json.dump(chunk.to_dict(), f, indent=2, ensure_ascii=False)
+
+        chunker = DocumentChunker(rag_dir=str(tmp_path))
+        assert chunker.get_source_stats() == {"docker_docs": 20}
+        assert not list((tmp_path / "docker_docs").glob("*.json"))
+        assert chunker.get_chunk(make_chunk(3).id).text == make_chunk(3).text
+        assert len(chunker.load_chunks("docker_docs")) == 20
+
+    def test_chunker_persists_through_store(self, tmp_path):
+        chunker = DocumentChunker(chunk_size=300, overlap=50, rag_dir=str(tmp_path / "rag"))
+        doc = RawDocument(id="d1", url="https://example.com", title="T", source="python_docs",
+                          content="\n\n".join(PARAGRAPH for _ in range(10)))
+        chunks = chunker.chunk_document(doc)
+        chunker.persist_chunks(chunks)
+        chunker.persist_chunks(chunks[:2], replace=True)
+        assert [c.id for c in chunker.load_chunks()] == [c.id for c in chunks[:2]]
+        assert chunker.clear_source("python_docs") == 2
+        assert chunker.load_chunks() == []
+
+    def test_unindexed_tail_recovered_after_crash(self, tmp_path):
+        store = ChunkStore(str(tmp_path))
+        store.append([make_chunk(i) for i in range(10)])
+        store.close()
+
+        source_dir = tmp_path / "kubernetes_docs"
+        # Crash after the data write but before its index lines, plus a torn record
+        with open(source_dir / "seg-000001.idx", "r+") as f:
+            lines = f.readlines()
+            f.seek(0)
+            f.truncate()
+            f.writelines(lines[:7] + [lines[7][:5]])
+        with open(source_dir / "seg-000001.jsonl", "ab") as f:
+            f.write(b'{"id":"torn","text":"half')
+
+        recovered = ChunkStore(str(tmp_path))
+        assert recovered.count() == 10
+        assert recovered.get(make_chunk(9).id).id == make_chunk(9).id
+        recovered.append([make_chunk(10)])
+        assert [c.id for c in recovered.load()][-2:] == [make_chunk(9).id, make_chunk(10).id]
+
+
+def legacy_persist(rag_dir, chunks):
+    """The previous DocumentChunker.persist_chunks: one pretty-printed file per chunk"""
+    for chunk in chunks:
+        source_dir = rag_dir / chunk.metadata.get("source", "unknown")
+        source_dir.mkdir(exist_ok=True)
+        with open(source_dir / f"{chunk.id}.json", "w", encoding="utf-8") as f:
+            json.dump(chunk.to_dict(), f, indent=2, ensure_ascii=False)
+
+
+def legacy_load(rag_dir):
+    chunks = []
+    for source_dir in rag_dir.iterdir():
+        for chunk_file in source_dir.glob("*.json"):
+            with open(chunk_file, "r", encoding="utf-8") as f:
+                chunks.append(Chunk.from_dict(json.load(f)))
+    return chunks
+
+
+def legacy_get(rag_dir, source, chunk_id):
+    with open(rag_dir / source / f"{chunk_id}.json", "r", encoding="utf-8") as f:
+        return Chunk.from_dict(json.load(f))
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+@pytest.mark.slow
+def test_benchmark_100k_chunks(tmp_path):
+    count, lookups = 100_000, 2_000
+    sources = ["kubernetes_docs", "docker_docs", "python_docs", "helm_docs"]
+    chunks = [make_chunk(i, source=sources[i % len(sources)]) for i in range(count)]
+    sample = random.Random(0).sample(chunks, lookups)
+
+    legacy_dir = tmp_path / "legacy"
+    legacy_dir.mkdir()
+    _, legacy_write = timed(lambda: legacy_persist(legacy_dir, chunks))
+    loaded, legacy_read = timed(lambda: legacy_load(legacy_dir))
+    assert len(loaded) == count
+    _, legacy_lookup = timed(lambda: [legacy_get(legacy_dir, c.metadata["source"], c.id) for c in sample])
+
+    store = ChunkStore(str(tmp_path / "segments"))
+    _, store_write = timed(lambda: store.append(chunks))
+    store.close()
+    store = ChunkStore(str(tmp_path / "segments"))  # cold: index rebuilt from .idx files
+    loaded, store_read = timed(lambda: store.load())
+    assert len(loaded) == count
+    _, store_lookup = timed(lambda: [store.get(c.id, c.metadata["source"]) for c in sample])
+    files = sum(len(os.listdir(tmp_path / "segments" / s)) for s in sources)
+
+    print(f"\n{count} chunks  write: legacy {legacy_write:.2f}s / segments {store_write:.2f}s"
+          f"  full load: {legacy_read:.2f}s / {store_read:.2f}s"
+          f"  point lookup: {legacy_lookup / lookups * 1e6:.0f}us / {store_lookup / lookups * 1e6:.0f}us"
+          f"  files: {count} / {files}")
+    assert files <= 4 * len(sources)
+    if os.getenv("BENCHMARK_ASSERT_SPEEDUP"):
+        # Wall-clock ratios depend on the machine and its load; opt in where it is quiet
+        assert store_write < legacy_write / 3
+        assert store_read < legacy_read / 2
+        assert store_lookup < legacy_lookup
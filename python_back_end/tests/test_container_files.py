@@ -0,0 +1,123 @@
+"""
+Tests for archive-based vibecoding container file transfer
+
+A fake container maps the container filesystem onto a temp directory and
+runs the real find/tar binaries, so the find -printf format and tar batches
+are exercised as they would be inside the dev container.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import tarfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docker.errors import NotFound
+
+from vibecoding import container_files
+
+
+class FakeContainer:
+    def __init__(self, root):
+        self.root = str(root)
+        self.calls = []
+
+    def _host(self, path):
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def put_archive(self, path, data):
+        self.calls.append("put_archive")
+        if not os.path.isdir(self._host(path)):
+            raise NotFound("no such directory")
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            tar.extractall(self._host(path))
+        return True
+
+    def get_archive(self, path):
+        self.calls.append("get_archive")
+        host = self._host(path)
+        if not os.path.exists(host):
+            raise NotFound("no such file")
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            tar.add(host, arcname=os.path.basename(path))
+        return iter([buf.getvalue()]), {"size": os.path.getsize(host)}
+
+    def exec_run(self, cmd, demux=False, **kwargs):
+        self.calls.append(cmd[0])
+        if cmd[0] == "find":
+            cmd = ["find", self._host(cmd[1])] + cmd[2:]
+        elif cmd[0] == "tar":
+            cmd = [self.root if arg == "/" else arg for arg in cmd]
+        elif cmd[0] == "mkdir":
+            cmd = ["mkdir", "-p", self._host(cmd[2])]
+        proc = subprocess.run(cmd, capture_output=True)
+        output = (proc.stdout, proc.stderr) if demux else proc.stdout + proc.stderr
+        return SimpleNamespace(exit_code=proc.returncode, output=output)
+
+
+@pytest.fixture
+def container(tmp_path):
+    (tmp_path / "workspace").mkdir()
+    return FakeContainer(tmp_path)
+
+
+class TestContainerFiles:
+
+    def test_batch_write_is_one_upload(self, container, tmp_path):
+        big = "x = 1\n" * 100_000  # well past ARG_MAX for echo | tee
+        files = {f"src/mod_{i}.py": f"print({i})\n" for i in range(200)}
+        files["/workspace/big.py"] = big
+        files["quote's \"and\" $vars.txt"] = "it's `fine`"
+
+        container_files.write_files(container, files)
+
+        assert container.calls == ["put_archive"]
+        assert (tmp_path / "workspace" / "big.py").read_text() == big
+        assert (tmp_path / "workspace" / "src" / "mod_7.py").read_text() == "print(7)\n"
+        assert (tmp_path / "workspace" / "quote's \"and\" $vars.txt").read_text() == "it's `fine`"
+
+    def test_write_creates_missing_root(self, container, tmp_path):
+        container_files.write_files(container, {"/opt/app/deep/a.txt": "a", "/opt/app/deep/b.txt": "b"})
+        assert (tmp_path / "opt" / "app" / "deep" / "b.txt").read_text() == "b"
+
+    def test_reads(self, container):
+        container_files.write_files(container, {"a.py": "A", "lib/b.py": "B"})
+
+        assert container_files.read_file(container, "/workspace/lib/b.py") == b"B"
+        assert container_files.read_file(container, "missing.py") is None
+
+        container.calls.clear()
+        found = container_files.read_files(container, ["a.py", "lib/b.py", "nope.py"])
+        assert container.calls == ["tar"]
+        assert found == {"/workspace/a.py": b"A", "/workspace/lib/b.py": b"B", "/workspace/nope.py": None}
+
+    def test_tree_from_single_find(self, container):
+        container_files.write_files(container, {
+            "src/app.py": "",
+            "src/util/helpers.py": "",
+            "README.md": "readme",
+            "node_modules/react/index.js": "",
+        })
+        container.calls.clear()
+
+        entries = container_files.list_entries(container, "/workspace")
+        tree = container_files.build_tree(entries)
+
+        assert container.calls == ["find"]
+        assert [n["name"] for n in tree] == ["node_modules", "src", "README.md"]
+        # node_modules is listed but not descended into
+        assert tree[0]["children"] == []
+        src = tree[1]
+        assert [n["name"] for n in src["children"]] == ["util", "app.py"]
+        assert src["children"][0]["children"][0]["path"] == "/workspace/src/util/helpers.py"
+        assert tree[2]["size"] == 6
+
+        top = container_files.list_entries(container, "/workspace", max_depth=1)
+        assert sorted(e["name"] for e in top) == ["README.md", "node_modules", "src"]
+        assert all(e["permissions"][0] in "d-" for e in top)
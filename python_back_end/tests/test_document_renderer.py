@@ -0,0 +1,128 @@
+"""
+Tests for the document rendering service behind file_processing
+
+PDFs are generated with PyMuPDF; LibreOffice is replaced by a fake `soffice`
+on PATH that drops a prepared PDF into --outdir, which exercises the CLI
+conversion path and the converted-PDF cache.
+"""
+
+import base64
+import os
+import stat
+import sys
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import document_renderer
+from document_renderer import DocumentRenderer
+
+
+def make_pdf(pages=6, label="page"):
+    pdf = fitz.open()
+    for i in range(pages):
+        page = pdf.new_page(width=300, height=400)
+        page.insert_text((40, 60), f"{label} {i + 1}", fontsize=24)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    r = DocumentRenderer(cache_dir=str(tmp_path / "cache"), workers=2, zoom=1.0)
+    yield r
+    r.close()
+
+
+class TestDocumentRenderer:
+
+    def test_parallel_pages_in_order_then_cached(self, renderer):
+        pdf = make_pdf(6)
+        pages = list(renderer.iter_pdf_pages(pdf, max_pages=4))
+
+        assert len(pages) == 4
+        expected = [fitz.open(stream=pdf, filetype="pdf")[i].get_pixmap().tobytes("png") for i in range(4)]
+        assert pages == expected
+
+        again = list(renderer.iter_pdf_pages(pdf, max_pages=4))
+        assert again == pages
+        stats = renderer.get_stats()
+        assert stats["pages_rendered"] == 4 and stats["page_hits"] == 4
+
+        # Asking for more pages than were cached renders again
+        assert len(list(renderer.iter_pdf_pages(pdf, max_pages=10))) == 6
+
+    def test_stream_can_stop_early(self, renderer):
+        first = next(renderer.iter_pdf_pages(make_pdf(8), max_pages=8))
+        assert first.startswith(b"\x89PNG")
+
+    def test_text_extracted_once_per_document(self, renderer):
+        calls = []
+
+        def extract():
+            calls.append(1)
+            return "hello"
+
+        assert renderer.cached_text(b"doc-a", "pdf", extract) == "hello"
+        assert renderer.cached_text(b"doc-a", "pdf", extract) == "hello"
+        assert renderer.cached_text(b"doc-b", "pdf", lambda: "[Error: broken]") == "[Error: broken]"
+        assert len(calls) == 1
+        assert not os.path.exists(os.path.join(renderer.cache_dir, document_renderer.document_hash(b"doc-b"), "text-pdf.txt"))
+
+    def test_cache_is_size_bounded(self, tmp_path):
+        renderer = DocumentRenderer(cache_dir=str(tmp_path / "cache"), workers=1, zoom=1.0,
+                                    max_cache_bytes=20_000)
+        try:
+            for label in ("a", "b", "c", "d"):
+                list(renderer.iter_pdf_pages(make_pdf(3, label), max_pages=3))
+            stats = renderer.get_stats()
+            assert stats["evicted"] > 0
+            assert stats["cache"]["bytes"] <= 20_000 or stats["cache"]["documents"] == 1
+            assert len(os.listdir(renderer.cache_dir)) == stats["cache"]["documents"]
+        finally:
+            renderer.close()
+
+    def test_docx_conversion_cached(self, renderer, tmp_path, monkeypatch):
+        pdf_path = tmp_path / "fixture.pdf"
+        pdf_path.write_bytes(make_pdf(2))
+        log = tmp_path / "soffice.log"
+        fake = tmp_path / "bin" / "soffice"
+        fake.parent.mkdir()
+        fake.write_text(
+            "#!/bin/sh\n"
+            f"echo \"$@\" >> {log}\n"
+            "while [ $# -gt 1 ]; do [ \"$1\" = --outdir ] && out=$2; shift; done\n"
+            f"cp {pdf_path} \"$out/document.pdf\"\n"
+        )
+        fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv("PATH", f"{fake.parent}:{os.environ['PATH']}")
+        monkeypatch.delitem(sys.modules, "uno", raising=False)
+
+        import file_processing
+        monkeypatch.setattr(file_processing, "get_document_renderer", lambda: renderer)
+        docx = base64.b64encode(b"PK\x03\x04 fake docx").decode()
+
+        first = file_processing.convert_file_to_images(docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        second = file_processing.convert_file_to_images(docx, "docx")
+
+        assert len(first) == 2 and first == second
+        assert len(log.read_text().splitlines()) == 1
+        assert f".libreoffice-profiles/{os.getpid()}" in log.read_text()
+        stats = renderer.get_stats()
+        assert stats["libreoffice"]["conversions"] == 1
+        # The profile is neither a cached document nor left behind
+        assert stats["cache"]["documents"] == 1
+        renderer.close()
+        assert not os.path.exists(os.path.join(renderer.cache_dir, ".libreoffice-profiles", str(os.getpid())))
+
+    def test_office_listener_per_process(self, tmp_path):
+        ports = {document_renderer.office_port(pid) for pid in range(4000, 4008)}
+        assert len(ports) == 8 and document_renderer.office_port() == document_renderer.office_port(os.getpid())
+
+        listener = document_renderer.OfficeListener("soffice", str(tmp_path / "profile"))
+        assert listener.port == document_renderer.office_port()
+        assert document_renderer._port_free(document_renderer._free_port())
@@ -0,0 +1,315 @@
+"""
+Tests for the document worker: shared pool, bounded off-loop generation,
+per-job timeouts and cancellation. Postgres is replaced by an in-memory
+pool and queue, and generate_document_from_code by a stub that blocks its
+thread for a fixed time, the way waiting on the sandbox does.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("ARTIFACT_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "harvis_test_artifacts"))
+
+from job_queue import Job, JobQueue
+from workers import document_worker
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def execute(self, query, *args):
+        return await self.pool.execute(query, *args)
+
+
+class FakeAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        return FakeConnection(self.pool)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakePool:
+    """document_jobs rows and artifacts in memory; only the statements the worker issues"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.errors = {}
+        self.artifacts = {}
+        self.heartbeats = 0
+        self.closed = False
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+    async def execute(self, query, *args):
+        await asyncio.sleep(0)
+        if "INSERT INTO artifacts" in query:
+            self.artifacts[args[0]] = args[3]
+        elif "UPDATE document_jobs" in query:
+            job_id, status = args[0], args[1]
+            if self.statuses.get(job_id) != "cancelled":
+                self.statuses[job_id] = status
+            if "failed" == status and len(args) > 2:
+                self.errors[job_id] = args[2]
+
+    async def fetchval(self, query, *args):
+        await asyncio.sleep(0)
+        if query.lstrip().startswith("UPDATE document_jobs SET updated_at"):
+            self.heartbeats += 1
+        return self.statuses.get(args[0])
+
+    async def close(self):
+        self.closed = True
+
+
+class MemoryQueue(JobQueue):
+    """JobQueue whose fetch/complete/fail work on a deque instead of pgboss tables"""
+
+    def __init__(self, jobs):
+        super().__init__("postgresql://unused")
+        self.pending = deque(jobs)
+        self.completed = {}
+        self.failed = {}
+        self.released = []
+        self._running = True
+
+    async def fetch(self, name, batch_size=1):
+        if not self.pending:
+            return None
+        job = self.pending.popleft()
+        job.done = lambda result=None, job=job: self._complete_job(job.id, result)
+        job.fail = lambda error=None, job=job: self._fail_job(job.id, error)
+        job.release = lambda job=job: self._release_job(job.id)
+        return job
+
+    async def _complete_job(self, job_id, result=None):
+        self.completed[job_id] = result
+
+    async def _fail_job(self, job_id, error=None):
+        self.failed[job_id] = error
+
+    async def _release_job(self, job_id):
+        self.released.append(job_id)
+
+
+def make_job(doc_type="docx"):
+    job_id = str(uuid.uuid4())
+    return Job(id=job_id, name="generate-document", state="active", retry_count=1, retry_limit=3,
+               started_at=None, created_at=None,
+               data={"document_job_id": job_id, "artifact_id": job_id, "code": "doc = Document()",
+                     "document_type": doc_type, "title": "Report", "user_id": 1})
+
+
+class StubGenerator:
+    """Blocks the calling thread like a sandbox run, then reports a written file"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.threads = set()
+
+    def __call__(self, llm_response, artifact_type, title, artifact_id, use_docker=True):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.seconds)
+        return {"success": True, "artifact_id": artifact_id, "file_path": f"/artifacts/{artifact_id}.{artifact_type}",
+                "file_size": 1024, "mime_type": "application/octet-stream"}
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """The worker module with a fake pool and a fresh executor, restored afterwards"""
+    pool = FakePool()
+    monkeypatch.setattr(document_worker, "_pool", pool)
+    monkeypatch.setattr(document_worker, "_executor", None)
+    monkeypatch.setattr(document_worker, "_stats", {k: 0 for k in document_worker._stats})
+    yield pool
+    if document_worker._executor is not None:
+        document_worker._executor.shutdown(wait=True)
+
+
+def run_queue(jobs, concurrency, handler=document_worker.process_document_job):
+    """Drain `jobs` with `concurrency` worker loops; returns (queue, seconds)"""
+
+    async def scenario():
+        queue = MemoryQueue(jobs)
+        started = time.perf_counter()
+        for _ in range(concurrency):
+            queue.work("generate-document", handler)
+        while len(queue.completed) + len(queue.failed) < len(jobs):
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - started
+        await queue.stop()
+        return queue, elapsed
+
+    return asyncio.run(scenario())
+
+
+class TestDocumentWorker:
+
+    def test_jobs_share_one_pool_and_render_in_parallel(self, worker, monkeypatch):
+        created = []
+
+        async def create_pool(*args, **kwargs):
+            created.append(kwargs)
+            return worker
+
+        monkeypatch.setattr(document_worker, "_pool", None)
+        monkeypatch.setattr(document_worker.asyncpg, "create_pool", create_pool)
+        monkeypatch.setattr(document_worker, "DOCUMENT_WORKER_CONCURRENCY", 4)
+        generator = StubGenerator(0.2)
+        monkeypatch.setattr(document_worker, "generate_document_from_code", generator)
+
+        jobs = [make_job() for _ in range(8)]
+        queue, elapsed = run_queue(jobs, concurrency=4)
+
+        assert len(created) == 1 and created[0]["max_size"] == 6
+        assert set(queue.completed) == {job.id for job in jobs} and not queue.failed
+        assert all(worker.statuses[job.id] == "completed" for job in jobs)
+        assert set(worker.artifacts) == {job.id for job in jobs}
+        # Eight 200ms renders on four threads: about two rounds, not eight
+        assert elapsed < 0.9
+        assert len(generator.threads) == 4 and all(t.startswith("document-gen") for t in generator.threads)
+        stats = document_worker.get_document_worker_stats()
+        assert stats["completed"] == 8 and stats["peak_in_flight"] == 4 and stats["in_flight"] == 0
+
+    def test_timeout_fails_the_job_without_blocking_the_loop(self, worker, monkeypatch):
+        monkeypatch.setattr(document_worker, "DOCUMENT_JOB_TIMEOUT_S", 0.2)
+        monkeypatch.setattr(document_worker, "generate_document_from_code", StubGenerator(0.6))
+        job = make_job()
+
+        async def scenario():
+            queue = MemoryQueue([job])
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticking = asyncio.create_task(ticker())
+            started = time.perf_counter()
+            queue.work("generate-document", document_worker.process_document_job)
+            while worker.statuses.get(job.id) != "failed":
+                await asyncio.sleep(0.01)
+            reported = time.perf_counter() - started
+            while not queue.failed:
+                await asyncio.sleep(0.01)
+            retried = time.perf_counter() - started
+            ticking.cancel()
+            await queue.stop()
+            return queue, reported, retried, ticks
+
+        queue, reported, retried, ticks = asyncio.run(scenario())
+        assert reported < 0.5
+        assert ticks >= 10  # the loop kept running while the render blocked its thread
+        # The retry is only scheduled once the abandoned render has left its thread
+        assert retried >= 0.55
+        assert "timed out" in queue.failed[job.id]
+        assert worker.statuses[job.id] == "failed" and "timed out" in worker.errors[job.id]
+        assert document_worker.get_document_worker_stats()["timed_out"] == 1
+
+    def test_cancelled_job_stops_waiting(self, worker, monkeypatch):
+        monkeypatch.setattr(document_worker, "DOCUMENT_JOB_HEARTBEAT_S", 0.05)
+        monkeypatch.setattr(document_worker, "generate_document_from_code", StubGenerator(1.0))
+        running, queued = make_job(), make_job()
+        worker.statuses[queued.id] = "cancelled"
+
+        async def scenario():
+            queue = MemoryQueue([running, queued])
+            started = time.perf_counter()
+            queue.work("generate-document", document_worker.process_document_job)
+            await asyncio.sleep(0.15)
+            worker.statuses[running.id] = "cancelled"
+            while running.id not in queue.completed:
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            # The loop takes the next job only once the abandoned render is done
+            while len(queue.completed) < 2:
+                await asyncio.sleep(0.01)
+            next_job = time.perf_counter() - started
+            await queue.stop()
+            return queue, elapsed, next_job
+
+        queue, elapsed, next_job = asyncio.run(scenario())
+        assert elapsed < 0.6 and next_job >= 0.95
+        assert queue.completed == {running.id: {"status": "cancelled"}, queued.id: {"status": "cancelled"}}
+        assert worker.heartbeats >= 2
+        assert not worker.artifacts
+        assert worker.statuses[running.id] == "cancelled"
+
+    def test_shutdown_requeues_in_flight_job_and_releases_resources(self, worker, monkeypatch):
+        import artifacts.sandbox_pool as sandbox_pool
+
+        sandboxes_stopped = []
+        monkeypatch.setattr(sandbox_pool, "shutdown_sandbox_pools", lambda: sandboxes_stopped.append(True))
+        monkeypatch.setattr(document_worker, "generate_document_from_code", StubGenerator(0.3))
+        job = make_job()
+
+        async def scenario():
+            queue = MemoryQueue([job])
+            queue.work("generate-document", document_worker.process_document_job)
+            await asyncio.sleep(0.1)
+            await queue.stop()
+            await document_worker.shutdown_document_worker()
+            return queue
+
+        queue = asyncio.run(scenario())
+        # Requeued without using up one of its attempts
+        assert queue.released == [job.id] and not queue.failed
+        assert worker.statuses[job.id] == "pending"
+        assert worker.closed and document_worker._pool is None and document_worker._executor is None
+        assert sandboxes_stopped == [True]
+
+
+async def legacy_process_document_job(job):
+    """The previous handler's shape: generation called directly on the event loop"""
+    pool = document_worker._pool
+    data = job.data
+    await document_worker.update_document_job(pool, data["document_job_id"], "processing")
+    result = document_worker.generate_document_from_code(
+        llm_response=data["code"], artifact_type=data["document_type"], title=data["title"],
+        artifact_id=data["artifact_id"], use_docker=True,
+    )
+    await document_worker.update_document_job(pool, data["document_job_id"], "completed", {"ok": True})
+    await job.done({"artifact_id": result["artifact_id"]})
+
+
+@pytest.mark.slow
+def test_benchmark_documents_per_minute(worker, monkeypatch):
+    render_s = 0.25
+    monkeypatch.setattr(document_worker, "generate_document_from_code", StubGenerator(render_s))
+    n_jobs = 16
+
+    def docs_per_minute(concurrency, handler):
+        monkeypatch.setattr(document_worker, "DOCUMENT_WORKER_CONCURRENCY", concurrency)
+        if document_worker._executor is not None:
+            document_worker._executor.shutdown(wait=True)
+        monkeypatch.setattr(document_worker, "_executor", None)
+        queue, elapsed = run_queue([make_job() for _ in range(n_jobs)], concurrency, handler)
+        assert len(queue.completed) == n_jobs
+        return n_jobs / elapsed * 60
+
+    legacy = docs_per_minute(4, legacy_process_document_job)
+    rates = {c: docs_per_minute(c, document_worker.process_document_job) for c in (1, 2, 4, 8)}
+
+    print(f"\n{n_jobs} documents, {render_s * 1000:.0f}ms per render: legacy (on-loop, 4 loops) "
+          f"{legacy:.0f} docs/min; " + ", ".join(f"concurrency {c}: {r:.0f} docs/min" for c, r in rates.items()))
+
+    assert legacy < rates[1] * 1.2  # blocking the loop serializes however many loops there are
+    assert rates[4] > rates[1] * 3
+    assert rates[8] > rates[4] * 1.5
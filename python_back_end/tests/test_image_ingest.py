@@ -0,0 +1,121 @@
+"""
+Tests for the vision chat image ingest stage
+"""
+
+import asyncio
+import base64
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_ingest
+from image_ingest import ImageIngestor, preprocess_image, summarize
+
+
+def encode(img, fmt, data_uri=True, **save_args):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **save_args)
+    b64 = base64.b64encode(buf.getvalue()).decode()
+    return f"data:image/{fmt.lower()};base64,{b64}" if data_uri else b64
+
+
+def photo(width=2000, height=1500):
+    """Noisy gradient that compresses like a camera photo"""
+    img = Image.effect_noise((width, height), 40).convert("RGB")
+    return Image.blend(img, Image.linear_gradient("L").resize((width, height)).convert("RGB"), 0.5)
+
+
+def screenshot(width=1170, height=2532):
+    img = Image.new("RGBA", (width, height), (250, 250, 250, 255))
+    draw = ImageDraw.Draw(img)
+    for y in range(0, height, 40):
+        draw.text((20, y), "Settings  >  Wi-Fi  >  Network", fill=(20, 20, 20, 255))
+    return img
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    ing = ImageIngestor(str(tmp_path), workers=2)
+    yield ing
+    ing.close()
+
+
+class TestPreprocess:
+
+    def test_photo_is_downscaled_to_jpeg(self):
+        raw = base64.b64decode(encode(photo(), "PNG", data_uri=False))
+        out = preprocess_image(raw, max_side=1024)
+
+        assert out["resized"] and max(out["width"], out["height"]) == 1024
+        assert out["mime"] == "image/jpeg"
+        assert len(out["data"]) < len(raw) / 10
+        assert Image.open(io.BytesIO(out["thumbnail"])).format == "WEBP"
+
+    def test_small_jpeg_kept_as_is(self):
+        raw = base64.b64decode(encode(photo(640, 480), "JPEG", data_uri=False, quality=70))
+        out = preprocess_image(raw, max_side=1024)
+        assert not out["resized"] and out["data"] == raw
+
+    def test_transparency_flattened(self):
+        raw = base64.b64decode(encode(screenshot(300, 300), "PNG", data_uri=False))
+        out = preprocess_image(raw, max_side=1024)
+        assert Image.open(io.BytesIO(out["data"])).mode == "RGB"
+
+
+class TestImageIngestor:
+
+    def test_ingest_stores_files_and_reports_savings(self, ingestor, tmp_path):
+        images = asyncio.run(ingestor.ingest([encode(photo(), "PNG"), encode(screenshot(), "PNG")],
+                                             session_id="s1", model="llava:13b"))
+
+        assert len(images) == 2
+        assert images[0].width == 672  # llava's limit
+        for img in images:
+            assert (tmp_path / img.url.rsplit("/", 1)[1]).exists()
+            assert (tmp_path / img.thumbnail_url.rsplit("/", 1)[1]).exists()
+        summary = summarize(images, 12.0)
+        assert summary["bytes_saved"] > 0 and summary["resized"] == 2
+        assert ingestor.get_stats()["processed"] == 2
+
+    def test_resent_image_is_not_processed_again(self, ingestor, monkeypatch):
+        payload = encode(photo(800, 600), "PNG")
+        first = asyncio.run(ingestor.ingest([payload], session_id="s1"))[0]
+
+        calls = []
+        monkeypatch.setattr(image_ingest, "preprocess_image", lambda *a, **k: calls.append(a))
+        again = asyncio.run(ingestor.ingest([payload, payload], session_id="s1"))
+
+        assert calls == []
+        assert all(img.deduped for img in again)
+        assert again[0].data_b64 == first.data_b64
+        assert ingestor.get_stats()["deduped"] == 2
+
+    def test_duplicates_in_one_request_processed_once(self, ingestor):
+        payload = encode(photo(800, 600), "PNG")
+        images = asyncio.run(ingestor.ingest([payload] * 4))
+
+        assert len(images) == 4
+        assert ingestor.get_stats()["processed"] == 1
+        assert sum(img.deduped for img in images) == 3
+
+    def test_bad_payloads(self, ingestor):
+        not_an_image = base64.b64encode(b"%PDF-1.4 not an image").decode()
+        images = asyncio.run(ingestor.ingest(["!!!not base64!!!", not_an_image]))
+
+        # Undecodable base64 is dropped; unreadable bytes pass through unchanged
+        assert len(images) == 1
+        assert base64.b64decode(images[0].data_b64).startswith(b"%PDF")
+        assert ingestor.get_stats()["failed"] == 1
+
+    def test_cache_is_bounded(self, tmp_path):
+        ingestor = ImageIngestor(str(tmp_path), workers=1, cache_bytes=1)
+        try:
+            asyncio.run(ingestor.ingest([encode(photo(200, 200), "PNG")], session_id="s"))
+            assert ingestor.get_stats()["cache"]["entries"] == 0
+        finally:
+            ingestor.close()
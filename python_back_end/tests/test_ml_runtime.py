@@ -0,0 +1,139 @@
+"""
+Tests for lazy ML imports, single model initialization and the startup cost
+of the ML-facing modules. Nothing here needs a GPU.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from ml_runtime import LazyModule, get_ml_status, lazy_import, single_init
+
+HEAVY_MODULES = ("torch", "whisper", "transformers", "chatterbox", "qwen_tts", "google.generativeai")
+
+
+def run_threads(target, count=8):
+    barrier = threading.Barrier(count)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(target())
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestLazyModule:
+
+    def test_import_deferred_until_first_attribute(self, tmp_path, monkeypatch):
+        (tmp_path / "slow_ml_stub.py").write_text("import time\ntime.sleep(0.05)\nVALUE = 42\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, "slow_ml_stub", raising=False)
+
+        proxy = lazy_import("slow_ml_stub")
+        assert proxy is lazy_import("slow_ml_stub")
+        assert "slow_ml_stub" not in sys.modules
+        assert get_ml_status()["modules"]["slow_ml_stub"]["loaded"] is False
+
+        assert run_threads(lambda: proxy.VALUE) == [42] * 8
+        status = get_ml_status()["modules"]["slow_ml_stub"]
+        assert status["loaded"] is True and status["import_s"] >= 0.05
+
+    def test_missing_module_reports_error(self):
+        proxy = LazyModule("definitely_not_installed_ml_pkg")
+        with pytest.raises(ImportError):
+            proxy.anything
+        assert "definitely_not_installed_ml_pkg" in proxy._error
+        assert not proxy._loaded
+
+
+class TestSingleInit:
+
+    def test_concurrent_first_requests_build_model_once(self):
+        model = {"value": None}
+        built = []
+
+        @single_init("test_model", lambda: model["value"] is not None)
+        def load():
+            if model["value"] is None:
+                time.sleep(0.05)
+                built.append(1)
+                model["value"] = object()
+            return model["value"]
+
+        results = run_threads(load)
+        assert len(built) == 1
+        assert all(r is results[0] for r in results)
+
+        model["value"] = None  # unloaded to free memory; the next request reloads
+        load()
+        status = get_ml_status()["models"]["test_model"]
+        assert status["loaded"] and status["loads"] == 2 and len(built) == 2
+
+    def test_failed_load_is_recorded_and_retried(self):
+        attempts = []
+
+        @single_init("flaky_model", lambda: len(attempts) > 1)
+        def load():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("CUDA out of memory")
+            return True
+
+        with pytest.raises(RuntimeError):
+            load()
+        assert get_ml_status()["models"]["flaky_model"]["last_error"] == "CUDA out of memory"
+        assert load() is True
+        status = get_ml_status()["models"]["flaky_model"]
+        assert status["failures"] == 1 and status["loads"] == 1 and status["last_error"] is None
+
+
+BENCHMARK = """
+import json, sys, time
+started = time.perf_counter()
+imported = []
+for name in sys.argv[1:]:
+    try:
+        __import__(name)
+        imported.append(name)
+    except ImportError as e:
+        print(f"skipping {name}: {e}", file=sys.stderr)
+elapsed = time.perf_counter() - started
+import ml_runtime
+heavy = [m for m in %r if m in sys.modules]
+print(json.dumps({"imported": imported, "import_s": elapsed, "rss_mb": ml_runtime.current_rss_mb(),
+                  "heavy": heavy, "status": ml_runtime.get_ml_status()}))
+""" % (HEAVY_MODULES,)
+
+
+@pytest.mark.slow
+def test_startup_time_and_rss_without_gpu():
+    """Import the ML-facing modules (and main when its deps are installed) on CPU only"""
+    pythonpath = os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")]))
+    env = {**os.environ, "CUDA_VISIBLE_DEVICES": "", "PYTHONPATH": pythonpath}
+    proc = subprocess.run(
+        [sys.executable, "-c", BENCHMARK, "model_manager", "vison_models.llm_connector",
+         "vibecoding.commands", "main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    print(f"\nimported {result['imported']} in {result['import_s']:.2f}s, "
+          f"RSS {result['rss_mb']:.0f} MiB, heavy modules loaded: {result['heavy']}")
+
+    assert "model_manager" in result["imported"]
+    assert result["heavy"] == []
+    assert not any(m["loaded"] for m in result["status"]["models"].values())
@@ -0,0 +1,293 @@
+"""
+Tests for the shared heartbeat runner used by the Ollama chat endpoints.
+Unit tests go through httpx.MockTransport; the load test runs a local
+Ollama stub in a subprocess.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ollama_runner import OllamaRunner
+
+
+def chat_stream(words, delay=0.0, state=None):
+    """Ollama-style /api/chat NDJSON body, optionally slow"""
+    state = state if state is not None else {}
+
+    async def body():
+        state["open"] = True
+        try:
+            for word in words:
+                await asyncio.sleep(delay)
+                yield (json.dumps({"model": "m", "message": {"role": "assistant", "content": word},
+                                   "done": False}) + "\n").encode()
+            yield (json.dumps({"model": "m", "message": {"role": "assistant", "content": ""},
+                               "done": True, "done_reason": "stop", "eval_count": len(words)}) + "\n").encode()
+        finally:
+            state["open"] = False
+
+    return body()
+
+
+def runner_with(handler, **kwargs):
+    return OllamaRunner(transport=httpx.MockTransport(handler), **kwargs)
+
+
+async def collect(agen):
+    return [event async for event in agen]
+
+
+class TestOllamaRunner:
+
+    def test_stream_reassembled_with_heartbeats(self):
+        sent = []
+
+        async def handler(request):
+            sent.append(json.loads(request.content))
+            return httpx.Response(200, content=chat_stream(["Hello", " ", "world"], delay=0.05))
+
+        async def scenario():
+            runner = runner_with(handler, heartbeat_interval=0.04)
+            try:
+                return await collect(runner.run("http://ollama/api/chat", {"model": "m", "stream": False})), runner
+            finally:
+                await runner.close()
+
+        events, runner = asyncio.run(scenario())
+        heartbeats = [e for e in events if e["type"] == "heartbeat"]
+        assert len(heartbeats) >= 2 and [h["count"] for h in heartbeats] == list(range(1, len(heartbeats) + 1))
+        assert events[-1]["type"] == "result"
+
+        result = events[-1]["data"]
+        assert result.status_code == 200
+        data = result.json()
+        assert data["message"] == {"role": "assistant", "content": "Hello world"}
+        assert data["done"] is True and data["eval_count"] == 3
+        assert json.loads(result.text)["message"]["content"] == "Hello world"
+        assert sent[0]["stream"] is True  # always streamed natively
+        stats = runner.get_stats()
+        assert stats["completed"] == 1 and stats["in_flight"] == 0 and stats["latency_ms"]["count"] == 1
+
+    def test_generate_reply_and_error_status(self):
+        async def handler(request):
+            if request.url.path == "/api/generate":
+                lines = [{"response": "4", "done": False}, {"response": "2", "done": False},
+                         {"response": "", "done": True, "total_duration": 10}]
+                return httpx.Response(200, content="".join(json.dumps(l) + "\n" for l in lines))
+            return httpx.Response(404, text='{"error":"model \\"nope\\" not found"}')
+
+        async def scenario():
+            runner = runner_with(handler)
+            try:
+                ok = await collect(runner.run("http://ollama/api/generate", {"model": "m", "prompt": "?"}))
+                missing = await collect(runner.run("http://ollama/api/chat", {"model": "nope"}))
+                return ok[-1]["data"], missing[-1]["data"], runner.get_stats()
+            finally:
+                await runner.close()
+
+        ok, missing, stats = asyncio.run(scenario())
+        assert ok.json()["response"] == "42" and ok.json()["total_duration"] == 10
+        assert missing.status_code == 404 and "not found" in missing.text
+        assert stats["completed"] == 1 and stats["failed"] == 1
+
+    def test_in_flight_generations_bounded(self):
+        active = {"now": 0, "max": 0}
+
+        async def handler(request):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            try:
+                await asyncio.sleep(0.05)
+                return httpx.Response(200, content=json.dumps(
+                    {"message": {"role": "assistant", "content": "ok"}, "done": True}) + "\n")
+            finally:
+                active["now"] -= 1
+
+        async def scenario():
+            runner = runner_with(handler, max_concurrency=2, heartbeat_interval=0.02)
+            try:
+                results = await asyncio.gather(*(collect(runner.run("http://ollama/api/chat", {"model": "m"}))
+                                                 for _ in range(6)))
+                return results, runner.get_stats()
+            finally:
+                await runner.close()
+
+        results, stats = asyncio.run(scenario())
+        # Queued requests still receive heartbeats while they wait for a slot
+        assert all(events[-1]["data"].json()["message"]["content"] == "ok" for events in results)
+        assert any(e["type"] == "heartbeat" for events in results for e in events)
+        assert active["max"] == 2 and stats["peak_in_flight"] == 2
+        assert stats["completed"] == 6 and stats["queued"] == 0 and stats["in_flight"] == 0
+
+    def test_client_disconnect_cancels_generation(self):
+        state = {}
+
+        async def handler(request):
+            return httpx.Response(200, content=chat_stream(["tok"] * 100, delay=0.05, state=state))
+
+        async def scenario():
+            runner = runner_with(handler, heartbeat_interval=0.05)
+
+            async def sse_endpoint():
+                async for event in runner.run("http://ollama/api/chat", {"model": "m"}):
+                    assert event["type"] == "heartbeat"
+
+            try:
+                task = asyncio.create_task(sse_endpoint())
+                await asyncio.sleep(0.2)
+                assert state["open"] is True
+                task.cancel()  # what Starlette does when the client goes away
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                return runner.get_stats()
+            finally:
+                await runner.close()
+
+        stats = asyncio.run(scenario())
+        assert state["open"] is False
+        assert stats["cancelled"] == 1 and stats["in_flight"] == 0 and stats["completed"] == 0
+
+
+OLLAMA_STUB = r"""
+import asyncio, json, sys
+
+CHUNKS, DELAY = int(sys.argv[1]), float(sys.argv[2])
+
+
+def line(body, content, done):
+    return json.dumps({"model": body["model"], "message": {"role": "assistant", "content": content},
+                       "done": done, "eval_count": CHUNKS}).encode() + b"\n"
+
+
+async def handle(reader, writer):
+    try:
+        while True:
+            head = (await reader.readuntil(b"\r\n\r\n")).decode()
+            length = next(int(h.split(":")[1]) for h in head.split("\r\n")
+                          if h.lower().startswith("content-length:"))
+            body = json.loads(await reader.readexactly(length))
+            if body.get("stream", True):
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                             b"Transfer-Encoding: chunked\r\n\r\n")
+                for i in range(CHUNKS):
+                    await asyncio.sleep(DELAY)
+                    data = line(body, f"w{i} ", False)
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                data = line(body, "", True)
+                writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data), data))
+            else:
+                for i in range(CHUNKS):  # same token pace as the streamed reply
+                    await asyncio.sleep(DELAY)
+                data = line(body, "".join(f"w{i} " for i in range(CHUNKS)), True)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\n\r\n%s" % (len(data), data))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, StopIteration):
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=1024)
+    print(server.sockets[0].getsockname()[1], flush=True)
+    async with server:
+        await server.serve_forever()
+
+asyncio.run(main())
+"""
+
+
+async def legacy_run_with_heartbeats(url, payload, heartbeat_interval, timeout=3600):
+    """The previous main.run_ollama_with_heartbeats: one thread pool per request"""
+    import requests
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.get_event_loop()
+    future = loop.run_in_executor(executor, lambda: requests.post(url, json=payload, timeout=timeout))
+    count = 0
+    while True:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=heartbeat_interval)
+            yield {"type": "result", "data": result}
+            executor.shutdown(wait=False)
+            return
+        except asyncio.TimeoutError:
+            count += 1
+            yield {"type": "heartbeat", "count": count}
+
+
+async def load(make_events, clients):
+    """Run `clients` concurrent chats; return (latencies, peak thread count)"""
+    peak = threading.active_count()
+    done = False
+
+    async def sample_threads():
+        nonlocal peak
+        while not done:
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.005)
+
+    async def chat(i):
+        started = time.perf_counter()
+        payload = {"model": "stub", "messages": [{"role": "user", "content": f"q{i}"}], "stream": False}
+        async for event in make_events(payload):
+            if event["type"] == "result":
+                assert event["data"].json()["message"]["content"].startswith("w0 ")
+        return time.perf_counter() - started
+
+    sampler = asyncio.create_task(sample_threads())
+    try:
+        latencies = await asyncio.gather(*(chat(i) for i in range(clients)))
+    finally:
+        done = True
+        await sampler
+    return sorted(latencies), peak
+
+
+def p99(latencies):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+@pytest.mark.slow
+def test_load_against_ollama_stub():
+    pytest.importorskip("requests")
+    clients, chunks, delay = 64, 40, 0.05  # 2s generations at 20 tokens/s each
+    stub = subprocess.Popen([sys.executable, "-c", OLLAMA_STUB, str(chunks), str(delay)],
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        url = f"http://127.0.0.1:{stub.stdout.readline().strip()}/api/chat"
+
+        async def legacy():
+            return await load(lambda payload: legacy_run_with_heartbeats(url, payload, 0.1), clients)
+
+        async def shared():
+            runner = OllamaRunner(heartbeat_interval=0.1, max_concurrency=clients)
+            try:
+                return await load(lambda payload: runner.run(url, payload), clients)
+            finally:
+                await runner.close()
+
+        legacy_latencies, legacy_threads = asyncio.run(legacy())
+        runner_latencies, runner_threads = asyncio.run(shared())
+    finally:
+        stub.kill()
+        stub.wait()
+
+    print(f"\n{clients} concurrent chats: per-request pools peak {legacy_threads} threads, "
+          f"p99 {p99(legacy_latencies) * 1000:.0f}ms; shared runner peak {runner_threads} threads, "
+          f"p99 {p99(runner_latencies) * 1000:.0f}ms")
+    assert legacy_threads >= clients
+    assert runner_threads <= 2
+    assert p99(runner_latencies) < p99(legacy_latencies) * 1.5
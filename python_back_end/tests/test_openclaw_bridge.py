@@ -0,0 +1,275 @@
+"""
+Tests for OpenClaw job scheduling, event fan-out and batched persistence
+
+VMs and browsers are fake WebSockets; the database is a fake pool that
+records the batched statements.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.core.events import Event, EventType
+from plugins.core.job_schema import Job, JobStatus
+from plugins.openclaw.bridge import EventSubscriber, OpenClawBridge
+from plugins.openclaw.store import OpenClawEventStore
+
+
+class FakeSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed = False
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def receive_json(self):
+        await asyncio.Event().wait()
+
+    async def close(self, code=1000):
+        self.closed = True
+
+    def task_starts(self):
+        return [m["task"]["id"] for m in self.sent if m["type"] == "task_start"]
+
+
+class FakePool:
+    def __init__(self, jobs=()):
+        self.executed = []
+        self.jobs = list(jobs)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args))
+
+    async def fetch(self, query, *args):
+        return [{"job": job.json()} for job in self.jobs]
+
+
+def make_job(job_id, priority=0, vm_id=None):
+    return Job(id=job_id, user_id=1, task_prompt=f"task {job_id}", priority=priority, vm_id=vm_id)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.001)
+
+
+async def connect(bridge, instance_id, slots=1):
+    socket = FakeSocket()
+    await bridge.connect_vm(socket, instance_id, "token", 1, max_concurrency=slots)
+    return socket
+
+
+class TestScheduler:
+
+    def test_priority_order_and_least_loaded_placement(self):
+        async def scenario():
+            bridge = OpenClawBridge()
+            for job_id, priority in [("low", 0), ("high", 9), ("mid", 5), ("mid2", 5)]:
+                await bridge.submit_job(make_job(job_id, priority))
+            await settle()
+            assert bridge.get_stats()["queued"] == 4
+
+            big = await connect(bridge, "vm-big", slots=2)
+            small = await connect(bridge, "vm-small", slots=1)
+            await settle()
+
+            # Three slots: highest priorities first, FIFO within a priority,
+            # and the idle VM gets work before the big one doubles up
+            assert big.task_starts() == ["high", "mid2"]
+            assert small.task_starts() == ["mid"]
+            assert bridge.jobs["low"].status == JobStatus.QUEUED
+            assert bridge.connections["vm-big"].status == "busy"
+
+            await bridge._handle_task_complete(bridge.connections["vm-small"], "mid", {"result": "ok"})
+            await settle()
+            assert small.task_starts() == ["mid", "low"]
+            assert bridge.get_stats()["completed"] == 1
+
+        asyncio.run(scenario())
+
+    def test_pinned_job_waits_for_its_vm(self):
+        async def scenario():
+            bridge = OpenClawBridge()
+            other = await connect(bridge, "vm-a")
+            await bridge.submit_job(make_job("pinned"), instance_id="vm-b")
+            await bridge.submit_job(make_job("free"))
+            await settle()
+            assert other.task_starts() == ["free"]
+
+            pinned_vm = await connect(bridge, "vm-b")
+            await settle()
+            assert pinned_vm.task_starts() == ["pinned"]
+
+        asyncio.run(scenario())
+
+    def test_cancel_queued_job_and_disconnect_fails_running(self):
+        async def scenario():
+            bridge = OpenClawBridge()
+            await bridge.submit_job(make_job("queued"))
+            assert await bridge.cancel_job("queued")
+            vm = await connect(bridge, "vm-a")
+            await bridge.submit_job(make_job("running"))
+            await settle()
+            assert vm.task_starts() == ["running"]
+
+            await bridge.disconnect_vm("vm-a")
+            assert bridge.jobs["running"].status == JobStatus.FAILED
+            assert bridge.instance_tasks == {}
+
+        asyncio.run(scenario())
+
+    def test_late_vm_messages_do_not_reopen_a_finished_job(self):
+        async def scenario():
+            bridge = OpenClawBridge()
+            vm = await connect(bridge, "vm-a")
+            await bridge.submit_job(make_job("job"))
+            await settle()
+            assert vm.task_starts() == ["job"]
+            assert await bridge.cancel_job("job")
+            broadcast = bridge.stats["events_broadcast"]
+
+            connection = bridge.connections["vm-a"]
+            await bridge._handle_task_complete(connection, "job", {"result": "late"})
+            await bridge._handle_task_failed(connection, "job", {"message": "late"})
+            await bridge._handle_task_complete(connection, "job", {"result": "late"})
+
+            job = bridge.jobs["job"]
+            assert job.status == JobStatus.CANCELLED and job.result is None
+            assert (bridge.stats["completed"], bridge.stats["failed"], bridge.stats["cancelled"]) == (0, 0, 1)
+            assert list(bridge._finished_jobs).count("job") == 1
+            assert bridge.stats["events_broadcast"] == broadcast
+
+        asyncio.run(scenario())
+
+
+class TestEventFanOut:
+
+    def test_slow_subscriber_does_not_block_others(self):
+        async def scenario():
+            bridge = OpenClawBridge()
+            fast, slow = FakeSocket(), FakeSocket(blocked=True)
+            await bridge.subscribe_to_job("job", fast)
+            slow_sub = await bridge.subscribe_to_job("job", slow)
+
+            for i in range(1000):
+                await bridge._broadcast_event("job", Event(type=EventType.LOG, job_id="job",
+                                                           payload={"message": str(i)}))
+                await asyncio.sleep(0)  # VM messages arrive with the loop running in between
+            await wait_until(lambda: len(fast.sent) == 1000)
+            assert [m["event"]["payload"]["message"] for m in fast.sent] == [str(i) for i in range(1000)]
+            # One message is stuck in the blocked send; the queue keeps only the newest output
+            assert slow_sub.pending == slow_sub.max_pending
+            assert slow_sub.dropped == 1000 - slow_sub.max_pending - 1
+
+            # Lifecycle events are never shed, so a client that cannot take them is dropped
+            for _ in range(slow_sub.max_pending + 1):
+                await bridge._broadcast_event("job", Event(type=EventType.TASK_STEP_STARTED, job_id="job"))
+                await asyncio.sleep(0)
+            await wait_until(lambda: slow.closed)
+            assert slow_sub.closed
+            assert list(bridge.event_subscribers["job"]) == [fast]
+
+        asyncio.run(scenario())
+
+    def test_stalled_send_drops_subscriber(self):
+        async def scenario():
+            socket = FakeSocket(blocked=True)
+            subscriber = EventSubscriber(socket, send_timeout=0.05)
+            subscriber.offer({"step": 1}, EventType.TASK_STEP_STARTED)
+            await asyncio.sleep(0.1)
+            assert not subscriber.offer({"step": 2}, EventType.TASK_STEP_STARTED)
+            await wait_until(lambda: socket.closed)
+
+        asyncio.run(scenario())
+
+    def test_video_frames_are_coalesced(self):
+        async def scenario():
+            socket = FakeSocket(blocked=True)
+            subscriber = EventSubscriber(socket, max_pending=8)
+            for i in range(50):
+                subscriber.offer({"frame": i}, EventType.VIDEO_FRAME)
+            subscriber.offer({"step": 1}, EventType.TASK_STEP_STARTED)
+            socket.release.set()
+            await wait_until(lambda: len(socket.sent) == 2)
+            assert socket.sent == [{"frame": 49}, {"step": 1}]
+            assert subscriber.coalesced == 49
+            subscriber.close()
+
+        asyncio.run(scenario())
+
+
+class TestEventStore:
+
+    def test_events_written_in_batches_after_job(self):
+        async def scenario():
+            pool = FakePool()
+            bridge = OpenClawBridge()
+            bridge.store = OpenClawEventStore(pool, flush_interval=0.01, max_batch=10_000)
+            job_ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(20)]
+            for job_id in job_ids:
+                await bridge.submit_job(make_job(job_id))
+                for n in range(50):
+                    await bridge._broadcast_event(job_id, Event(type=EventType.LOG, job_id=job_id,
+                                                                payload={"n": n}))
+            await bridge.stop()
+
+            job_writes = [args for query, args in pool.executed if "openclaw_tasks (" in query]
+            event_writes = [args for query, args in pool.executed if "openclaw_events (" in query]
+            assert len(job_writes) == len(event_writes) == 1
+            assert set(job_writes[0][0]) == set(job_ids)
+            assert len(event_writes[0][0]) == 20 * 51  # JOB_QUEUED plus the logs
+            assert pool.executed.index(next(e for e in pool.executed if "openclaw_tasks (" in e[0])) < \
+                pool.executed.index(next(e for e in pool.executed if "openclaw_events (" in e[0]))
+            payload = json.loads(event_writes[0][2][1])
+            assert payload == {"n": 0}
+            assert bridge.store.get_stats()["events_written"] == 20 * 51
+
+        asyncio.run(scenario())
+
+    def test_restart_requeues_waiting_jobs(self):
+        async def scenario():
+            waiting = make_job("waiting", priority=3)
+            waiting.status = JobStatus.QUEUED
+            orphaned = make_job("orphaned")
+            orphaned.status = JobStatus.RUNNING
+            pool = FakePool(jobs=[waiting, orphaned])
+
+            bridge = OpenClawBridge()
+            await bridge.start(db_pool=pool)
+            vm = await connect(bridge, "vm-a")
+            await settle()
+
+            assert vm.task_starts() == ["waiting"]
+            assert bridge.jobs["orphaned"].status == JobStatus.FAILED
+            await bridge.stop()
+
+        asyncio.run(scenario())
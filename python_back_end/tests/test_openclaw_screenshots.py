@@ -0,0 +1,210 @@
+"""
+Tests for the OpenClaw screenshot pipeline
+"""
+
+import asyncio
+import base64
+import io
+import os
+import sys
+import time
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.core.events import EventType
+from plugins.openclaw import bridge as bridge_module
+from plugins.openclaw.bridge import OpenClawBridge
+from plugins.openclaw.screenshots import ScreenshotPipeline, dhash, hamming
+
+
+def page(width=1280, height=800, cursor=0, title="Search results", scroll=0, highlight=None):
+    """A browser-like frame: header, text rows, a hovered row and a blinking cursor"""
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width, 60), fill=(40, 60, 120))
+    if highlight is not None:
+        draw.rectangle((30, 96 + highlight * 28, width - 30, 124 + highlight * 28), fill=(220, 235, 255))
+    draw.text((20, 20), title, fill=(255, 255, 255))
+    for i, y in enumerate(range(100 - scroll, height, 28)):
+        draw.text((40, y), f"Result {i}: example.com/page/{i} - some snippet text", fill=(30, 30, 30))
+    draw.rectangle((300 + cursor * 12, 70, 302 + cursor * 12, 88), fill=(0, 0, 0))
+    return img
+
+
+def png(img):
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    p = ScreenshotPipeline(root=str(tmp_path), workers=2)
+    yield p
+    p.close()
+
+
+class TestScreenshotPipeline:
+
+    def test_near_identical_frames_dropped(self, pipeline):
+        async def scenario():
+            first = await pipeline.ingest("job-1", png(page()))
+            same = await pipeline.ingest("job-1", png(page(cursor=1)))  # cursor blink only
+            changed = await pipeline.ingest("job-1", png(page(title="Checkout", scroll=300)))
+            return first, same, changed
+
+        first, same, changed = asyncio.run(scenario())
+        assert first is not None and first.kind == "key"
+        assert same is None
+        assert changed is not None
+        assert pipeline.get_stats()["deduped"] == 1
+
+    def test_small_change_stored_as_delta_and_rebuilt(self, pipeline, tmp_path):
+        base = page(title="Form")
+        typed = base.copy()
+        ImageDraw.Draw(typed).rectangle((400, 300, 700, 340), fill=(255, 230, 120))
+
+        async def scenario():
+            key = await pipeline.ingest("job-1", png(base))
+            delta = await pipeline.ingest("job-1", png(typed), step_index=2, caption="typed")
+            return key, delta, await pipeline.frame_path("job-1", delta.id)
+
+        key, delta, full_path = asyncio.run(scenario())
+        assert delta.kind == "delta" and delta.keyframe_id == key.id
+        assert delta.bytes < key.bytes / 2
+        assert os.path.getsize(tmp_path / "job-1" / f"{delta.id}.thumb.webp") < delta.bytes + key.bytes
+
+        rebuilt = Image.open(full_path).convert("RGB")
+        assert rebuilt.size == typed.size
+        # Lossy WebP, so compare coarsely
+        diff = ImageChops.difference(rebuilt, typed).convert("L")
+        assert sum(diff.getdata()) / (typed.width * typed.height) < 4
+        assert pipeline.get_stats()["materialized"] == 1
+
+    def test_index_survives_restart(self, tmp_path):
+        first = ScreenshotPipeline(root=str(tmp_path), workers=1)
+        try:
+            frame = asyncio.run(first.ingest("job-1", png(page()), caption="start"))
+        finally:
+            first.close()
+
+        second = ScreenshotPipeline(root=str(tmp_path), workers=1)
+        try:
+            frames = second.list_frames("job-1")
+            assert [f.id for f in frames] == [frame.id]
+            assert frames[0].caption == "start"
+            assert second.get_frame("job-1", "../etc") is None
+        finally:
+            second.close()
+
+    def test_dhash_is_stable_under_recompression(self):
+        img = page()
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=60)
+        assert hamming(dhash(img), dhash(Image.open(buf))) <= 3
+
+    @pytest.mark.slow
+    def test_throughput_across_concurrent_jobs(self, tmp_path):
+        pipeline = ScreenshotPipeline(root=str(tmp_path), workers=4)
+        # Each job scrolls every fifth step and hovers a different row in between
+        frames = {f"job-{j}": [png(page(scroll=(i // 5) * 200, highlight=i % 5, title=f"Job {j}"))
+                               for i in range(20)]
+                  for j in range(4)}
+
+        async def run_job(job_id, shots):
+            for data in shots:
+                await pipeline.ingest(job_id, data)
+
+        async def run_all():
+            await asyncio.gather(*(run_job(job_id, shots) for job_id, shots in frames.items()))
+
+        try:
+            started = time.perf_counter()
+            asyncio.run(asyncio.wait_for(run_all(), 60))
+            fps = 80 / (time.perf_counter() - started)
+            stats = pipeline.get_stats()
+        finally:
+            pipeline.close()
+
+        print(f"\n{fps:.1f} frames/s, stats: {stats}")
+        assert stats["kept"] == 80
+        assert stats["deltas"] >= 60 and stats["bytes_stored"] < stats["bytes_in"] / 3
+        assert fps > 10
+
+
+class TestBridgeScreenshots:
+
+    def test_screenshot_message_broadcasts_urls_not_bytes(self, tmp_path, monkeypatch):
+        pipeline = ScreenshotPipeline(root=str(tmp_path), workers=1)
+        monkeypatch.setattr(bridge_module, "get_screenshot_pipeline", lambda: pipeline)
+
+        class Socket:
+            def __init__(self):
+                self.sent = []
+
+            async def send_json(self, message):
+                self.sent.append(message)
+
+            async def close(self, code=1000):
+                pass
+
+        async def scenario():
+            bridge = OpenClawBridge()
+            socket = Socket()
+            await bridge.subscribe_to_job("job-1", socket)
+            data = base64.b64encode(png(page())).decode()
+            for _ in range(3):
+                await bridge._process_vm_message(None, {"type": "screenshot", "job_id": "job-1",
+                                                        "data": data, "step_index": 0})
+            await asyncio.gather(*bridge._screenshot_tasks)
+            for _ in range(5):
+                await asyncio.sleep(0)
+            return socket.sent
+
+        try:
+            sent = asyncio.run(scenario())
+        finally:
+            pipeline.close()
+
+        events = [m["event"] for m in sent if m["type"] == "event"]
+        assert len(events) == 1  # the two repeats were deduped
+        assert events[0]["type"] == EventType.SCREENSHOT_CAPTURED.value
+        payload = events[0]["payload"]
+        assert payload["thumbnail_path"].endswith("?size=thumb") and "data" not in payload
+
+    def test_screenshot_routes_only_serve_the_owners_jobs(self, tmp_path, monkeypatch):
+        from fastapi import HTTPException
+
+        from plugins.core.job_schema import Job
+        from plugins.openclaw import routes
+
+        pipeline = ScreenshotPipeline(root=str(tmp_path), workers=1)
+        bridge = OpenClawBridge()
+        monkeypatch.setattr(routes, "get_screenshot_pipeline", lambda: pipeline)
+        monkeypatch.setattr(routes, "bridge", bridge)
+
+        async def scenario():
+            await bridge.submit_job(Job(id="job-1", user_id=1, task_prompt="browse"))
+            frame = await pipeline.ingest("job-1", png(page()))
+            listed = await routes.list_screenshots("job-1", user_id=1)
+            served = await routes.get_screenshot("job-1", frame.id, user_id=1)
+            denied = []
+            for call in (routes.list_screenshots("job-1", user_id=2),
+                         routes.get_screenshot("job-1", frame.id, user_id=2),
+                         routes.list_screenshots("missing", user_id=1)):
+                with pytest.raises(HTTPException) as error:
+                    await call
+                denied.append(error.value.status_code)
+            return frame, listed, served, denied
+
+        try:
+            frame, listed, served, denied = asyncio.run(scenario())
+        finally:
+            pipeline.close()
+
+        assert [f["screenshot_id"] for f in listed] == [frame.id]
+        assert served.media_type == "image/webp"
+        assert denied == [404, 404, 404]
@@ -0,0 +1,364 @@
+"""
+Tests for persistent, resumable RAG update jobs. Fetchers, the embedder and
+the vector table are local stand-ins; the job store, chunker, chunk store
+and queue handler are the real ones. A worker is killed mid-job and a fresh
+JobManager on the same store must finish it without embedding any chunk twice.
+Staleness uses the real RAG_JOB_STALE_S: heartbeats are backdated instead.
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import Job as QueueJob
+from rag_corpus import job_manager as job_manager_module
+from rag_corpus.chunker import RawDocument
+from rag_corpus.job_manager import JobManager, JobStatus
+from rag_corpus.job_store import MemoryJobStore
+
+SOURCES = ["kubernetes_docs", "docker_docs"]
+
+
+class Ledger:
+    """Everything the stand-ins saw, across worker restarts"""
+
+    def __init__(self):
+        self.fetches = Counter()
+        self.started = []  # texts handed to the embedder
+        self.completed = []  # texts the embedder returned vectors for
+        self.tables = {}  # collection -> {chunk id: text}
+        self.fail_on_call = None
+        self.calls = 0
+
+
+class StandInEmbedder:
+    def __init__(self, ledger, delay=0.02):
+        self.ledger = ledger
+        self.delay = delay
+
+    async def embed_batch(self, texts, batch_size=32):
+        self.ledger.calls += 1
+        if self.ledger.calls == self.ledger.fail_on_call:
+            raise RuntimeError("Ollama unavailable")
+        self.ledger.started.extend(texts)
+        await asyncio.sleep(self.delay)
+        self.ledger.completed.extend(texts)
+        return [[b / 255 for b in hashlib.sha256(t.encode()).digest()[:8]] for t in texts]
+
+    async def close(self):
+        pass
+
+
+class StandInVectorDB:
+    def __init__(self, ledger, collection):
+        self.table = ledger.tables.setdefault(collection, {})
+
+    async def upsert_vectors(self, records, conn=None):
+        for record in records:
+            self.table[record.id] = record.text
+        return len(records)
+
+
+class FakeQueue:
+    """
+    The job_queue surface JobManager uses. Shared by the workers of a test,
+    like the boss tables; sent jobs count as handed out (active) at once.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.handlers = []
+        self.results = {}
+        self.states = {}
+        self.touched = {}
+        self.released = []
+
+    def work(self, name, handler):
+        self.handlers.append((name, handler))
+
+    async def send(self, name, data, retry_limit=3, **kwargs):
+        job = QueueJob(id=str(uuid.uuid4()), name=name, data=data, state="active",
+                       retry_count=1, retry_limit=retry_limit)
+        self.states[job.id] = "active"
+        self.touched[job.id] = time.monotonic()
+
+        async def done(result=None):
+            self.results[job.id] = ("done", result)
+            self.states[job.id] = "completed"
+
+        async def fail(error=None):
+            self.results[job.id] = ("failed", error)
+            self.states[job.id] = "retry"
+
+        async def release():
+            self.released.append(job.id)
+            self.states[job.id] = "retry"
+
+        async def touch():
+            self.touched[job.id] = time.monotonic()
+
+        job.done, job.fail, job.release, job.touch = done, fail, release, touch
+        self.sent.append(job)
+        return job.id
+
+    async def requeue_stale(self, name, stale_after_s):
+        stale = [job for job in self.sent if self.states[job.id] == "active"
+                 and time.monotonic() - self.touched[job.id] >= stale_after_s]
+        for job in stale:
+            self.states[job.id] = "retry"
+        return [{"id": job.id, "data": job.data} for job in stale]
+
+
+class DyingStore:
+    """A worker's view of the store; once the process dies nothing it does gets through"""
+
+    def __init__(self, store):
+        self.store = store
+        self.dead = False
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        async def call(*args, **kwargs):
+            if self.dead:
+                raise ConnectionError("worker process is gone")
+            return await method(*args, **kwargs)
+
+        return call
+
+
+def backdate(store, queue, job_id, seconds):
+    """As if neither heartbeat had been heard for `seconds`"""
+    row = store._jobs[job_id]
+    row["updated_at"] = (datetime.fromisoformat(row["updated_at"]) - timedelta(seconds=seconds)).isoformat()
+    for job in queue.sent:
+        if job.data["rag_job_id"] == job_id:
+            queue.touched[job.id] -= seconds
+
+
+def make_manager(store, rag_dir, ledger):
+    manager = JobManager(db_pool=None, rag_dir=str(rag_dir), store=store)
+
+    async def fetch_source(job, source):
+        ledger.fetches[source] += 1
+        return [
+            RawDocument(
+                id=f"{source}-{d}", url=f"https://example.com/{source}/{d}", title=f"{source} {d}",
+                source=source,
+                content="\n\n".join(
+                    f"{source} guide {d} section {i}: " + " ".join(f"{source}-term-{d}-{i}-{w}" for w in range(60))
+                    for i in range(12)
+                ),
+            )
+            for d in range(3)
+        ]
+
+    manager._fetch_source = fetch_source
+    manager._create_embedding_adapter = lambda model_name: StandInEmbedder(ledger)
+    manager._create_vectordb_adapter = lambda collection: StandInVectorDB(ledger, collection)
+    return manager
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(job_manager_module, "RAG_JOB_BATCH_SIZE", 8)
+    monkeypatch.setattr(job_manager_module, "RAG_JOB_HEARTBEAT_S", 0.05)
+    monkeypatch.setattr(job_manager_module, "RAG_JOB_SWEEP_S", 0.02)
+
+
+class TestResumableRagJobs:
+
+    def test_killed_worker_is_swept_up_and_resumed_without_reembedding(self, tmp_path):
+        store, ledger, queue = MemoryJobStore(), Ledger(), FakeQueue()
+
+        async def first_worker():
+            dying = DyingStore(store)
+            manager = make_manager(dying, tmp_path, ledger)
+            await manager.start_worker(queue)
+            job_id = await manager.create_job(sources=SOURCES)
+            await manager.run_job_async(job_id)
+            running = asyncio.create_task(manager.process_queue_job(queue.sent[0]))
+
+            # Kill it partway through embedding, while a batch is in flight
+            while not (len(ledger.completed) >= 40 and len(ledger.started) > len(ledger.completed)):
+                await asyncio.sleep(0.001)
+            dying.dead = True
+            running.cancel()
+            await asyncio.gather(running, return_exceptions=True)
+            await manager.stop_worker()
+            return job_id
+
+        job_id = asyncio.run(first_worker())
+        stuck = queue.sent[0]
+        interrupted = asyncio.run(store.get_job(job_id))
+        assert interrupted.status == JobStatus.RUNNING  # nobody got to record the crash
+        assert queue.states[stuck.id] == "active"
+        committed_before = sum(len(t) for t in ledger.tables.values())
+        assert committed_before == len(ledger.completed)  # every finished batch was committed
+
+        async def second_worker():
+            manager = make_manager(store, tmp_path, ledger)
+            await manager.start_worker(queue)
+            # Heartbeats are recent: nothing is taken over on startup
+            await asyncio.sleep(0.1)
+            assert queue.states[stuck.id] == "active" and not await store.stale_job_ids(job_manager_module.RAG_JOB_STALE_S)
+
+            # RAG_JOB_STALE_S passes without a heartbeat; the periodic sweep hands
+            # the stuck queue job out again instead of sending a duplicate
+            backdate(store, queue, job_id, job_manager_module.RAG_JOB_STALE_S + 1)
+            while queue.states[stuck.id] != "retry":
+                await asyncio.sleep(0.01)
+            assert len(queue.sent) == 1
+
+            await manager.process_queue_job(stuck)
+            await manager.stop_worker()
+
+        asyncio.run(second_worker())
+        job = asyncio.run(store.get_job(job_id))
+        assert job.status == JobStatus.COMPLETED and job.attempts == 2
+        assert queue.results[stuck.id][0] == "done"
+
+        stored = {cid: text for table in ledger.tables.values() for cid, text in table.items()}
+        assert job.progress["processed"] == job.progress["total_docs"] == len(stored)
+        assert committed_before < len(stored) / 2
+        # Every chunk was embedded to completion exactly once
+        completed = Counter(ledger.completed)
+        assert set(completed) == set(stored.values())
+        assert max(completed.values()) == 1
+        # Only the batch that was in flight at the kill was handed to the embedder again
+        restarted = [text for text, n in Counter(ledger.started).items() if n > 1]
+        assert 0 < len(restarted) <= job_manager_module.RAG_JOB_BATCH_SIZE
+        # Sources were fetched once; the resumed run reloaded their chunks from the checkpoint
+        assert ledger.fetches == Counter({source: 1 for source in SOURCES})
+
+    def test_stopping_worker_requeues_without_using_an_attempt(self, tmp_path):
+        store, ledger, queue = MemoryJobStore(), Ledger(), FakeQueue()
+
+        async def scenario():
+            manager = make_manager(store, tmp_path, ledger)
+            await manager.start_worker(queue)
+            job_id = await manager.create_job(sources=SOURCES)
+            await manager.run_job_async(job_id)
+            queue_job = queue.sent[0]
+            running = asyncio.create_task(manager.process_queue_job(queue_job))
+            while len(ledger.completed) < 16:
+                await asyncio.sleep(0.001)
+            running.cancel()  # what JobQueue.stop does to its workers
+            await asyncio.gather(running, return_exceptions=True)
+            stopped = await store.get_job(job_id)
+
+            await manager.process_queue_job(queue_job)  # the next worker takes it
+            await manager.stop_worker()
+            return queue_job, stopped, await store.get_job(job_id)
+
+        queue_job, stopped, job = asyncio.run(scenario())
+        assert stopped.status == JobStatus.PENDING
+        assert queue.released == [queue_job.id]
+        assert queue.results[queue_job.id][0] == "done"
+        assert job.status == JobStatus.COMPLETED and job.attempts == 2
+        assert max(Counter(ledger.completed).values()) == 1
+
+    def test_cancel_from_another_process_stops_the_run(self, tmp_path):
+        store, ledger, queue = MemoryJobStore(), Ledger(), FakeQueue()
+
+        async def scenario():
+            worker = make_manager(store, tmp_path, ledger)
+            api = make_manager(store, tmp_path, ledger)  # another backend process
+            await worker.start_worker(queue)
+            job_id = await worker.create_job(sources=SOURCES)
+            await worker.run_job_async(job_id)
+            running = asyncio.create_task(worker.process_queue_job(queue.sent[0]))
+            while len(ledger.completed) < 16:
+                await asyncio.sleep(0.001)
+
+            assert await api.cancel_job(job_id)
+            calls_at_cancel = ledger.calls
+            await asyncio.wait_for(running, timeout=2)
+            await worker.stop_worker()
+            return job_id, ledger.calls - calls_at_cancel
+
+        job_id, calls_after = asyncio.run(scenario())
+        job = asyncio.run(store.get_job(job_id))
+        # The worker's own progress saves did not overwrite the cancel, and its
+        # heartbeat stopped the run within a beat
+        assert job.status == JobStatus.FAILED and job.error == "Cancelled by user"
+        assert calls_after <= 5
+        outcome, result = queue.results[queue.sent[0].id]
+        assert outcome == "done" and result["status"] == "cancelled"
+
+    def test_failed_batch_is_retried_from_the_last_commit(self, tmp_path):
+        store, ledger = MemoryJobStore(), Ledger()
+        ledger.fail_on_call = 4
+
+        async def scenario():
+            manager = make_manager(store, tmp_path, ledger)
+            queue = FakeQueue()
+            await manager.start_worker(queue)
+            job_id = await manager.create_job(sources=SOURCES)
+            await manager.run_job_async(job_id)
+
+            await manager.process_queue_job(queue.sent[0])
+            after_failure = await store.get_job(job_id)
+            committed = sum(len(t) for t in ledger.tables.values())
+
+            retry = queue.sent[0]  # the queue hands the same job out again
+            retry.retry_count += 1
+            await manager.process_queue_job(retry)
+            return queue, after_failure, committed, await store.get_job(job_id)
+
+        queue, after_failure, committed, job = asyncio.run(scenario())
+        assert after_failure.status == JobStatus.PENDING and after_failure.error == "Ollama unavailable"
+        assert committed == 3 * 8
+        assert job.status == JobStatus.COMPLETED and job.error is None
+        assert max(Counter(ledger.completed).values()) == 1
+        assert ledger.fetches == Counter({source: 1 for source in SOURCES})
+
+    def test_cancelled_job_is_not_claimed(self, tmp_path):
+        store, ledger = MemoryJobStore(), Ledger()
+
+        async def scenario():
+            manager = make_manager(store, tmp_path, ledger)
+            queue = FakeQueue()
+            await manager.start_worker(queue)
+            job_id = await manager.create_job(sources=SOURCES)
+            await manager.run_job_async(job_id)
+            assert await manager.cancel_job(job_id)
+            await manager.process_queue_job(queue.sent[0])
+            assert not await manager.cancel_job(job_id)
+            return queue, await store.get_job(job_id)
+
+        queue, job = asyncio.run(scenario())
+        assert queue.results[queue.sent[0].id] == ("done", {"status": "skipped"})
+        assert job.status == JobStatus.FAILED and job.error == "Cancelled by user"
+        assert not ledger.fetches and not ledger.started
+
+    def test_run_finishing_after_a_cancel_does_not_undo_it(self, tmp_path, monkeypatch):
+        # The cancel lands between heartbeats and the run gets to finish
+        monkeypatch.setattr(job_manager_module, "RAG_JOB_HEARTBEAT_S", 30.0)
+        store, ledger, queue = MemoryJobStore(), Ledger(), FakeQueue()
+
+        async def scenario():
+            worker = make_manager(store, tmp_path, ledger)
+            api = make_manager(store, tmp_path, ledger)
+            await worker.start_worker(queue)
+            job_id = await worker.create_job(sources=SOURCES)
+            await worker.run_job_async(job_id)
+            running = asyncio.create_task(worker.process_queue_job(queue.sent[0]))
+            while len(ledger.completed) < 16:
+                await asyncio.sleep(0.001)
+            assert await api.cancel_job(job_id)
+            await running
+            await worker.stop_worker()
+            return await store.get_job(job_id)
+
+        job = asyncio.run(scenario())
+        assert job.status == JobStatus.FAILED and job.error == "Cancelled by user"
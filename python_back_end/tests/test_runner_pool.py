@@ -0,0 +1,315 @@
+"""
+Tests for warm vibecoding runner containers
+
+The fake Docker client maps each "container" onto a temp directory and runs
+exec commands as local subprocesses, so the pool's acquire/reset/reap logic
+and the timeout wrapper run for real without a Docker daemon.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docker.errors import NotFound
+
+from vibecoding.runner_pool import RunnerPool, dependency_key, process_owner
+
+
+class FakeContainer:
+    def __init__(self, root, labels):
+        self.id = os.urandom(16).hex()
+        self.root = root
+        self.labels = labels
+        self.removed = False
+        os.makedirs(os.path.join(root, "workspace"), exist_ok=True)
+
+    def _host(self, path):
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def put_archive(self, path, data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            tar.extractall(self._host(path))
+        return True
+
+    def exec_run(self, cmd, workdir=None, demux=False, **kwargs):
+        if cmd[0] == "sh" and "kill -9 -1" in cmd[-1]:
+            # Reset script: never run kill -1 on the host
+            shutil.rmtree(self._host("/workspace"))
+            os.makedirs(self._host("/workspace"))
+            return SimpleNamespace(exit_code=0, output=(b"", b""))
+        proc = subprocess.run(cmd, cwd=self._host(workdir or "/"), capture_output=True)
+        return SimpleNamespace(exit_code=proc.returncode, output=(proc.stdout, proc.stderr))
+
+    def wait(self, timeout=None):
+        time.sleep(self.install_s)
+        return {"StatusCode": 0}
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeVolume:
+    def __init__(self, volumes, name, labels):
+        self.volumes = volumes
+        self.name = name
+        self.attrs = {"Labels": labels}
+
+    def remove(self, force=False):
+        del self.volumes[self.name]
+
+
+class FakeClient:
+    def __init__(self, root):
+        self.root = root
+        self.started = []
+        self.run_kwargs = []
+        self.installs = []
+        self.volume_map = {}
+        self.labelled = []  # every container created, runners and installers
+        self.hosts = {}  # other backend containers by hostname -> status
+        self.install_s = 0.0
+        outer = self
+
+        class Containers:
+            def run(self, image, command=None, **kwargs):
+                container = FakeContainer(os.path.join(outer.root, str(len(outer.labelled))), kwargs.get("labels", {}))
+                container.install_s = outer.install_s
+                outer.labelled.append(container)
+                if kwargs.get("labels", {}).get("vibecoding.runner") == "installer":
+                    outer.installs.append(command)
+                else:
+                    outer.started.append(container)
+                    outer.run_kwargs.append(kwargs)
+                return container
+
+            def list(self, **kwargs):
+                return [c for c in outer.labelled if not c.removed]
+
+            def get(self, name):
+                if name not in outer.hosts:
+                    raise NotFound(name)
+                return SimpleNamespace(status=outer.hosts[name])
+
+        class Images:
+            def get(self, image):
+                return image
+
+        class Volumes:
+            def create(self, name, labels=None):
+                return outer.volume_map.setdefault(name, FakeVolume(outer.volume_map, name, labels or {}))
+
+            def get(self, name):
+                return outer.volume_map[name]
+
+            def list(self, filters=None):
+                return list(outer.volume_map.values())
+
+        self.containers = Containers()
+        self.images = Images()
+        self.volumes = Volumes()
+
+
+@pytest.fixture
+def client(tmp_path):
+    return FakeClient(str(tmp_path))
+
+
+@pytest.fixture
+def pool(client):
+    p = RunnerPool(client, max_runners=2, max_idle_per_key=1, idle_ttl=60)
+    yield p
+    p.close()
+
+
+def run(pool, code, timeout=10, deps=None, image="python:3.11-slim", owner="1:session"):
+    result = pool.run(owner, code, "python", "main.py", [sys.executable, "main.py"], image,
+                      timeout=timeout, dependencies=deps)
+    # Wait for the background reset to hand the runner back
+    deadline = time.monotonic() + 5
+    while pool.get_stats()["busy"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return result
+
+
+def dead_owner():
+    """Owner label of a backend process that has exited"""
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    host, _, _ = process_owner().split(":")
+    return f"{host}:{proc.pid}:1"
+
+
+class TestRunnerPool:
+
+    def test_second_run_is_warm_with_clean_workspace(self, pool, client):
+        first = run(pool, "open('leftover.txt', 'w').write('x'); print('hello')")
+        second = run(pool, "import os; print(sorted(os.listdir('.')))")
+
+        assert first["status"] == "completed" and first["output"] == "hello"
+        assert first["runner"]["start"] == "cold"
+        assert second["runner"]["start"] == "warm"
+        assert second["output"] == "['main.py']"
+        assert len(client.started) == 1
+        stats = pool.get_stats()
+        assert stats["cold_starts"] == 1 and stats["warm_starts"] == 1
+
+    def test_failure_and_timeout(self, pool):
+        failed = run(pool, "raise SystemExit(3)")
+        slow = run(pool, "import time; time.sleep(10)", timeout=1)
+
+        assert failed["status"] == "failed" and failed["exit_code"] == 3
+        assert slow["status"] == "timeout" and "timed out" in slow["error"]
+        assert pool.get_stats()["timeouts"] == 1
+
+    def test_dependency_sets_get_their_own_runners(self, pool, client):
+        run(pool, "print(1)", deps=["requests", "numpy"])
+        run(pool, "print(1)", deps=["numpy", "requests"])
+
+        assert len(client.installs) == 1
+        assert dependency_key("python:3.11-slim", "python", ["numpy", "requests"]) == \
+            dependency_key("python:3.11-slim", "python", ["requests", "numpy"])
+        assert len(client.started) == 1
+
+        run(pool, "print(1)")
+        assert len(client.started) == 2
+
+    def test_runners_are_never_shared_between_owners(self, client):
+        pool = RunnerPool(client, max_runners=4, max_idle_per_key=1, idle_ttl=60)
+        first = run(pool, "print(1)", owner="1:a")
+        other_user = run(pool, "print(1)", owner="2:a")
+        other_session = run(pool, "print(1)", owner="1:b")
+        again = run(pool, "print(1)", owner="1:a")
+
+        assert [r["runner"]["start"] for r in (first, other_user, other_session)] == ["cold"] * 3
+        assert again["runner"]["start"] == "warm" and again["container_id"] == first["container_id"]
+        assert len({first["container_id"], other_user["container_id"], other_session["container_id"]}) == 3
+        # Runners run unprivileged with only the tmpfs mounts writable
+        kwargs = client.run_kwargs[0]
+        assert kwargs["user"] == "65534:65534" and kwargs["read_only"] is True
+        assert kwargs["cap_drop"] == ["ALL"] and "uid=65534" in kwargs["tmpfs"]["/workspace"]
+        assert pool.get_stats()["owners"] == 3
+        pool.close()
+
+    def test_dependency_volumes_are_removed(self, client):
+        client.volumes.create("vibecoding_deps_stale", labels={"vibecoding.runner": "deps",
+                                                               "vibecoding.runner.owner": dead_owner()})
+        pool = RunnerPool(client, max_runners=2, max_idle_per_key=1, idle_ttl=60)
+        assert client.volume_map == {}
+
+        run(pool, "print(1)", deps=["requests"])
+        run(pool, "print(1)", deps=["numpy"])
+        assert len(client.volume_map) == 2
+        pool.idle_ttl = 0
+        pool.reap_idle()
+        assert client.volume_map == {}
+
+        run(pool, "print(1)", deps=["requests"])
+        pool.close()
+        assert client.volume_map == {} and len(client.installs) == 3
+        assert pool.get_stats()["volumes_removed"] == 3
+
+    def test_idle_runners_are_reaped(self, pool, client):
+        run(pool, "print(1)")
+        pool.idle_ttl = 0
+        assert pool.reap_idle() == 1
+        assert client.started[0].removed
+        assert run(pool, "print(1)")["runner"]["start"] == "cold"
+
+    def test_concurrent_runs_respect_max_runners(self, pool, client):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(run(pool, "import time; time.sleep(0.2)")))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(results) == 4 and all(r["status"] == "completed" for r in results)
+        assert len([c for c in client.started if not c.removed]) <= 2
+
+    def test_sibling_workers_keep_each_others_runners(self, client):
+        # Another uvicorn worker of this backend, with a warm runner and dependencies
+        sibling = RunnerPool(client, max_runners=2, max_idle_per_key=1, idle_ttl=60)
+        run(sibling, "print(1)", deps=["requests"])
+        live = [c for c in client.labelled if not c.removed]
+
+        def leftover(owner):
+            return client.containers.run("python:3.11-slim", labels={"vibecoding.runner": "runner",
+                                                                     "vibecoding.runner.owner": owner})
+
+        dead = leftover(dead_owner())  # a worker that exited
+        client.hosts = {"backend-new": "running", "backend-old": "exited"}
+        other_live = leftover("backend-new:7:1")  # another backend container on the daemon
+        other_dead = leftover("backend-old:7:1")
+        unlabelled = leftover(None)
+
+        pool = RunnerPool(client, max_runners=2, max_idle_per_key=1, idle_ttl=60)
+        assert not any(c.removed for c in live) and not other_live.removed
+        assert dead.removed and other_dead.removed and unlabelled.removed
+        assert len(client.volume_map) == 1
+        assert run(sibling, "print(1)", deps=["requests"])["runner"]["start"] == "warm"
+        pool.close()
+        sibling.close()
+
+    def test_slow_setup_does_not_turn_a_kill_into_a_timeout(self, pool, client):
+        # The install takes longer than the run's timeout; the run itself is killed at once
+        client.install_s = 1.5
+        killed = run(pool, "import os, signal; os.kill(os.getpid(), signal.SIGKILL)",
+                     timeout=1, deps=["requests"])
+
+        assert killed["status"] == "failed" and killed["exit_code"] in (137, -9)
+        assert pool.get_stats()["timeouts"] == 0
+
+
+@pytest.mark.slow
+def test_benchmark_warm_hello_world_latency(tmp_path):
+    """
+    Warm-runner latency of a hello-world Python run. Uses the local Docker
+    daemon when there is one, otherwise the fake client (pool overhead plus
+    a local interpreter start).
+    """
+    try:
+        import docker
+
+        client = docker.from_env()
+        client.ping()
+        backend, command = "docker", ["python", "main.py"]
+    except Exception:
+        client, backend, command = FakeClient(str(tmp_path)), "fake", [sys.executable, "main.py"]
+
+    pool = RunnerPool(client, max_runners=2, max_idle_per_key=1, idle_ttl=600)
+    try:
+        samples = []
+        for i in range(31):
+            started = time.monotonic()
+            result = pool.run("bench:session", "print('hello world')", "python", "main.py", command,
+                              "python:3.11-slim", timeout=10)
+            elapsed = time.monotonic() - started
+            assert result["status"] == "completed" and result["output"] == "hello world"
+            if i:  # the first run starts the runner
+                assert result["runner"]["start"] == "warm"
+                samples.append(elapsed)
+            while pool.get_stats()["busy"]:
+                time.sleep(0.005)
+    finally:
+        pool.close()
+
+    samples.sort()
+    p50 = samples[len(samples) // 2]
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    print(f"\nwarm hello-world ({backend}, {len(samples)} runs): p50 {p50 * 1000:.0f}ms p95 {p95 * 1000:.0f}ms")
+    if os.getenv("BENCHMARK_ASSERT_SPEEDUP"):
+        # Wall-clock numbers depend on the machine and its load; opt in where it is quiet
+        assert p50 < 1.0
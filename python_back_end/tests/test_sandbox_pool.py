@@ -0,0 +1,154 @@
+"""
+Tests for the warm document sandbox pool (local backend)
+"""
+
+import os
+import sys
+import textwrap
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifacts.sandbox_pool import SandboxPool, WorkerBackend
+
+
+def write_script(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text(textwrap.dedent(body))
+    return str(path)
+
+
+@pytest.fixture
+def pool():
+    p = SandboxPool(WorkerBackend(), size=1, max_jobs=3)
+    yield p
+    p.close()
+
+
+class TestSandboxPool:
+
+    def test_second_job_runs_warm(self, pool, tmp_path):
+        out = tmp_path / "out.txt"
+        script = write_script(tmp_path, "gen.py", f"""
+            with open({str(out)!r}, "w") as f:
+                f.write("ok")
+            print("SUCCESS")
+        """)
+
+        first = pool.run(script, str(out), timeout=30)
+        second = pool.run(script, str(out), timeout=30)
+
+        assert first["success"] and "SUCCESS" in first["stdout"]
+        assert first["sandbox"]["start"] == "cold"
+        assert second["sandbox"]["start"] == "warm"
+        stats = pool.get_stats()
+        assert stats["cold_starts"] == 1 and stats["warm_starts"] == 1
+        assert stats["queue_depth"] == 0
+
+    def test_failure_and_state_isolation(self, pool, tmp_path):
+        leak = write_script(tmp_path, "leak.py", """
+            import sys
+            sys.modules["leaked"] = object()
+            raise ValueError("bad document code")
+        """)
+        check = write_script(tmp_path, "check.py", """
+            import sys
+            sys.exit(3 if "leaked" in sys.modules else 0)
+        """)
+
+        failed = pool.run(leak, "", timeout=30)
+        clean = pool.run(check, "", timeout=30)
+
+        assert not failed["success"] and "bad document code" in failed["stderr"]
+        assert clean["success"]
+
+    def test_timeout_kills_job_but_keeps_worker(self, pool, tmp_path):
+        slow = write_script(tmp_path, "slow.py", "import time\ntime.sleep(30)\n")
+        fast = write_script(tmp_path, "fast.py", "print('done')\n")
+
+        timed_out = pool.run(slow, "", timeout=1)
+        after = pool.run(fast, "", timeout=30)
+
+        assert not timed_out["success"] and "timed out" in timed_out["error"]
+        assert after["success"] and after["sandbox"]["start"] == "warm"
+
+    def test_worker_recycled_after_max_jobs(self, pool, tmp_path):
+        script = write_script(tmp_path, "noop.py", "pass\n")
+        for _ in range(4):
+            assert pool.run(script, "", timeout=30)["success"]
+        assert pool.get_stats()["recycled"] == 1
+
+    def test_worker_recycled_when_a_job_passes_the_memory_limit(self, tmp_path):
+        small = write_script(tmp_path, "small.py", "print('ok')\n")
+        big = write_script(tmp_path, "big.py", """
+            block = bytearray(160 * 1024 * 1024)
+            block[::4096] = b"x" * len(block[::4096])  # touch every page
+        """)
+        pool = SandboxPool(WorkerBackend(), size=1, max_jobs=100, max_rss_mb=128)
+        try:
+            assert pool.run(small, "", timeout=30)["success"]
+            assert pool.run(small, "", timeout=30)["sandbox"]["start"] == "warm"
+            assert pool.get_stats()["recycled"] == 0
+
+            assert pool.run(big, "", timeout=30)["success"]
+            assert pool.get_stats()["recycled"] == 1
+            assert pool.run(small, "", timeout=30)["success"]  # on the replacement worker
+        finally:
+            pool.close()
+
+    def test_cleanup_paths_are_removed_after_the_job(self, tmp_path):
+        copy = tmp_path / "job-1-gen.py"
+        copy.write_text("print('ran')\n")
+
+        class CopyingBackend(WorkerBackend):
+            def job_cleanup(self, job_script):
+                return [job_script]
+
+        pool = SandboxPool(CopyingBackend(), size=1)
+        try:
+            result = pool.run(str(copy), "", timeout=30)
+        finally:
+            pool.close()
+        assert result["success"] and "ran" in result["stdout"]
+        assert not copy.exists()
+
+    def test_background_processes_do_not_outlive_the_job(self, pool, tmp_path):
+        pid_file = tmp_path / "sleep.pid"
+        spawn = write_script(tmp_path, "spawn.py", f"""
+            import subprocess
+            proc = subprocess.Popen(["sleep", "30"])
+            with open({str(pid_file)!r}, "w") as f:
+                f.write(str(proc.pid))
+        """)
+        check = write_script(tmp_path, "check.py", f"""
+            import os, sys
+            pid = int(open({str(pid_file)!r}).read())
+            sys.exit(3 if os.path.exists(f"/proc/{{pid}}") else 0)
+        """)
+
+        assert pool.run(spawn, "", timeout=30)["success"]
+        assert not os.path.exists(f"/proc/{pid_file.read_text()}")
+        after = pool.run(check, "", timeout=30)
+        assert after["success"] and after["sandbox"]["start"] == "warm"
+        assert pool.get_stats()["recycled"] == 0
+
+    def test_worker_retired_when_a_process_escapes_its_group(self, pool, tmp_path):
+        pid_file = tmp_path / "daemon.pid"
+        escape = write_script(tmp_path, "escape.py", f"""
+            import subprocess
+            proc = subprocess.Popen(["sleep", "30"], start_new_session=True)
+            with open({str(pid_file)!r}, "w") as f:
+                f.write(str(proc.pid))
+        """)
+        noop = write_script(tmp_path, "noop.py", "pass\n")
+
+        try:
+            assert pool.run(escape, "", timeout=30)["success"]
+            assert pool.get_stats()["recycled"] == 1
+            assert pool.run(noop, "", timeout=30)["success"]  # on a fresh worker
+        finally:
+            try:
+                os.kill(int(pid_file.read_text()), 9)
+            except ProcessLookupError:
+                pass
@@ -0,0 +1,220 @@
+"""
+Tests for screen-share frame sampling and backpressure, driven by synthetic
+frame streams and a fake analyzer with a fixed analysis time
+"""
+
+import asyncio
+import base64
+import io
+import os
+import random
+import sys
+import time
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import screen_frames
+from screen_frames import Frame, FrameSession, frame_difference, frame_thumbnail
+
+
+def screen(scene: int, cursor: bool = False, size=(640, 360)) -> str:
+    """A synthetic screenshot as a PNG data URL: windows laid out by `scene`, optional cursor"""
+    rng = random.Random(scene)
+    image = Image.new("RGB", size, (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0] - 100), rng.randrange(size[1] - 60)
+        draw.rectangle([x, y, x + rng.randint(60, 300), y + rng.randint(40, 200)],
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    if cursor:
+        draw.rectangle([300, 170, 302, 186], fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+class FakeAnalyzer:
+    """Records which frames it analyzed and how old they were when it started"""
+
+    def __init__(self, seconds=0.1):
+        self.seconds = seconds
+        self.frames = []
+        self.ages = []
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    async def __call__(self, frame: Frame):
+        self.frames.append(frame)
+        self.ages.append(time.monotonic() - frame.received_at)
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            await asyncio.sleep(self.seconds)
+        finally:
+            self.concurrent -= 1
+
+
+async def stream(session, frames, interval):
+    for image in frames:
+        session.submit(Frame(image_data=image))
+        await asyncio.sleep(interval)
+
+
+async def drain(session):
+    while session.busy:
+        await asyncio.sleep(0.01)
+
+
+class TestFrameSession:
+
+    def test_fast_stream_keeps_only_the_latest_frame(self):
+        images = [screen(i) for i in range(60)]
+        analyzer = FakeAnalyzer(seconds=0.1)
+
+        async def scenario():
+            session = FrameSession(analyzer, min_interval_s=0.0)
+            await stream(session, images, interval=0.01)
+            await drain(session)
+            return session.get_stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["received"] == 60
+        assert stats["analyzed"] == len(analyzer.frames) < 15
+        assert stats["dropped_stale"] == 60 - stats["analyzed"] and stats["dropped_duplicate"] == 0
+        assert analyzer.max_concurrent == 1
+        # The last frame always gets analyzed, and nothing waits behind a backlog
+        assert analyzer.frames[-1].image_data == images[-1]
+        assert max(analyzer.ages) < 0.25
+
+    def test_near_duplicates_of_the_last_analyzed_frame_are_skipped(self):
+        # The same screen with a blinking cursor, then a different screen
+        images = [screen(1, cursor=i % 2 == 1) for i in range(10)] + [screen(2)]
+        analyzer = FakeAnalyzer(seconds=0.0)
+
+        async def scenario():
+            session = FrameSession(analyzer, min_interval_s=0.0)
+            await stream(session, images, interval=0.02)
+            await drain(session)
+            return session.get_stats()
+
+        stats = asyncio.run(scenario())
+        assert [f.image_data for f in analyzer.frames] == [images[0], images[-1]]
+        assert stats["dropped_duplicate"] == 9 and stats["analyzed"] == 2
+
+        blink = frame_difference(frame_thumbnail(images[0]), frame_thumbnail(images[1]))
+        change = frame_difference(frame_thumbnail(images[0]), frame_thumbnail(images[-1]))
+        assert blink < screen_frames.SCREEN_FRAME_DIFF_THRESHOLD < change
+        assert frame_thumbnail("data:image/png;base64,not-an-image") is None
+
+    def test_minimum_interval_between_analyses(self):
+        images = [screen(i) for i in range(40)]
+        analyzer = FakeAnalyzer(seconds=0.0)
+
+        async def scenario():
+            session = FrameSession(analyzer, min_interval_s=0.2)
+            started = time.monotonic()
+            await stream(session, images, interval=0.025)  # ~1s of frames
+            await drain(session)
+            return session.get_stats(), time.monotonic() - started
+
+        stats, elapsed = asyncio.run(scenario())
+        assert stats["analyzed"] <= elapsed / 0.2 + 1
+        assert stats["analyzed"] >= 4
+        assert analyzer.frames[-1].image_data == images[-1]
+
+    def test_failures_are_counted_and_sessions_close_cleanly(self):
+        calls = []
+
+        async def flaky(frame):
+            calls.append(frame)
+            await asyncio.sleep(0.05)
+            if len(calls) == 1:
+                raise RuntimeError("vision model crashed")
+
+        async def scenario():
+            before = screen_frames.get_screen_share_stats()
+            session = screen_frames.open_session("sid-1", flaky, min_interval_s=0.0)
+            assert screen_frames.open_session("sid-1", flaky) is session
+            session.submit(Frame(image_data=screen(1)))
+            await asyncio.sleep(0.08)  # first analysis failed, nothing waiting
+            session.submit(Frame(image_data=screen(1)))  # not a duplicate: the failed one never counted
+            await asyncio.sleep(0.01)
+            session.submit(Frame(image_data=screen(3)))  # waits behind the one in flight
+            final = await screen_frames.close_session("sid-1")
+            after = screen_frames.get_screen_share_stats()
+            return final, before, after
+
+        final, before, after = asyncio.run(scenario())
+        assert len(calls) == 2
+        assert final["errors"] == 1 and final["received"] == 3 and final["dropped_stale"] == 1
+        assert not final["busy"]
+        assert after["sessions"] == before["sessions"] and after["received"] - before["received"] == 3
+        assert asyncio.run(screen_frames.close_session("sid-1")) is None
+
+    def test_stats_are_reported_after_the_frame_is_counted(self):
+        images = [screen(i) for i in range(3)]
+        reported = []
+
+        async def flaky(frame):
+            if frame.image_data == images[1]:
+                raise RuntimeError("vision model crashed")
+
+        async def on_stats(stats):
+            reported.append((stats["analyzed"], stats["errors"]))
+
+        async def scenario():
+            session = FrameSession(flaky, min_interval_s=0.0, on_stats=on_stats)
+            for image in images:
+                session.submit(Frame(image_data=image))
+                await drain(session)
+
+        asyncio.run(scenario())
+        assert reported == [(1, 0), (1, 1), (2, 1)]
+
+
+async def legacy_screen_data(frame, analyzer, done):
+    """The previous handler: every event analyzed, in arrival order"""
+    await analyzer(frame)
+    done.append(time.monotonic() - frame.received_at)
+
+
+@pytest.mark.slow
+def test_benchmark_latency_under_a_fast_stream():
+    images = [screen(i) for i in range(50)]
+    analysis_s, interval_s = 0.2, 0.02  # 50 fps-ish bursts against a 200ms analysis
+
+    async def legacy():
+        analyzer, done = FakeAnalyzer(analysis_s), []
+        lock = asyncio.Lock()  # one model: requests queue behind each other
+
+        async def handle(frame):
+            async with lock:
+                await legacy_screen_data(frame, analyzer, done)
+
+        tasks = []
+        for image in images:
+            tasks.append(asyncio.create_task(handle(Frame(image_data=image))))
+            await asyncio.sleep(interval_s)
+        await asyncio.gather(*tasks)
+        return done, len(analyzer.frames)
+
+    async def sampled():
+        analyzer = FakeAnalyzer(analysis_s)
+        session = FrameSession(analyzer, min_interval_s=0.0)
+        await stream(session, images, interval_s)
+        await drain(session)
+        return list(session._latencies), session.get_stats()
+
+    legacy_latencies, legacy_analyzed = asyncio.run(legacy())
+    latencies, stats = asyncio.run(sampled())
+    p95 = screen_frames._percentile
+    print(f"\n{len(images)} frames every {interval_s * 1000:.0f}ms, {analysis_s * 1000:.0f}ms analysis: "
+          f"legacy analyzed {legacy_analyzed}, latency p95 {p95(legacy_latencies, 0.95):.2f}s max "
+          f"{max(legacy_latencies):.2f}s; sampled analyzed {stats['analyzed']} dropped {stats['dropped']}, "
+          f"latency p95 {p95(latencies, 0.95):.2f}s max {max(latencies):.2f}s")
+
+    assert max(latencies) < 2 * analysis_s + 0.1
+    assert max(legacy_latencies) > 5 * max(latencies)
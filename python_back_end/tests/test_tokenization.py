@@ -0,0 +1,136 @@
+"""
+Tests for token-budgeted RAG chunking: a synthetic corpus of awkward
+documents is chunked the old way (characters) and the new way (tokens),
+and the token report shows how many chunks the embedder would truncate.
+"""
+
+import base64
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_corpus import tokenization
+from rag_corpus.chunker import MAX_CHUNK_CHARS, CodeAwareChunker, DocumentChunker, RawDocument
+from rag_corpus.embedding_adapter import EmbeddingAdapter
+from rag_corpus.source_config import EMBEDDING_TIER_CONFIG, EmbeddingTier
+from rag_corpus.tokenization import HeuristicTokenizer, Tokenizer, get_token_budget, token_report
+
+HIGH_MODEL = EMBEDDING_TIER_CONFIG[EmbeddingTier.HIGH]["model"]
+STANDARD_MODEL = EMBEDDING_TIER_CONFIG[EmbeddingTier.STANDARD]["model"]
+
+
+@pytest.fixture(autouse=True)
+def fresh_tokenizers(monkeypatch):
+    for tier in EmbeddingTier:
+        monkeypatch.delenv(f"RAG_TOKENIZER_{tier.name}", raising=False)
+    monkeypatch.setattr(tokenization, "_tokenizers", {})
+
+
+def make_corpus():
+    """Documents that defeat character-based sizing, deterministic per run"""
+    rng = random.Random(45)
+    words = ["pod", "node", "deployment", "scheduler", "volume", "ingress", "replica", "namespace",
+             "controller", "container", "image", "registry", "cluster", "service", "kubelet"]
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+    guide = "\n\n".join(f"## Step {i}\n\n" + " ".join(sentence() for _ in range(6)) for i in range(30))
+    wall = " ".join(sentence() for _ in range(220))  # one paragraph, no breaks
+    code = "```python\n" + "\n".join(
+        f"    result_{i} = client.call({i}, retries={i % 5}, timeout={i * 0.5:.1f})  # step {i}"
+        for i in range(150)) + "\n```"
+    blob = base64.b64encode(rng.randbytes(9000)).decode()
+    config = "\n".join(f"0x{rng.getrandbits(64):016x} {rng.randint(0, 10**9)} {rng.random():.9f}"
+                       for _ in range(130))
+    cjk = "".join(rng.choice("容器编排调度节点服务部署镜像集群网络存储") for _ in range(7000))
+
+    docs = {"guide": guide, "wall": wall, "code": "Usage:\n\n" + code + "\n\nDone.",
+            "blob": f"Certificate bundle:\n\n{blob}", "config": config, "cjk": cjk}
+    return [RawDocument(id=name, url=f"https://example.com/{name}", title=name, source="test_docs",
+                        content=content) for name, content in docs.items()]
+
+
+def lost_words(doc, chunks):
+    """Words of the document that made it into no chunk (hard-split runs are rejoined)"""
+    joined = "".join("".join(chunk.text.split()) for chunk in chunks)
+    return {w for w in doc.content.split() if w not in joined}
+
+
+class TestTokenBudgetedChunking:
+
+    @pytest.mark.parametrize("model", [HIGH_MODEL, STANDARD_MODEL])
+    def test_report_before_and_after(self, model):
+        budget = get_token_budget(model)
+        corpus = make_corpus()
+
+        # Before: character-sized chunks, as the job manager used to build them
+        char_chunker = CodeAwareChunker(chunk_size=1000, overlap=200)
+        before_by_doc = {doc.id: char_chunker.chunk_document(doc) for doc in corpus}
+        before = [c for chunks in before_by_doc.values() for c in chunks]
+        # After: sized in the model's tokens
+        token_chunker = CodeAwareChunker.for_model(model)
+        after_by_doc = {doc.id: token_chunker.chunk_document(doc) for doc in corpus}
+        after = [c for chunks in after_by_doc.values() for c in chunks]
+
+        before_report = token_report([c.text for c in before], budget)
+        after_report = token_report([c.text for c in after], budget)
+        print(f"\n{model} before: {json.dumps(before_report)}\n{model} after:  {json.dumps(after_report)}")
+
+        assert before_report["truncated"] > 0
+        assert any(lost_words(doc, before_by_doc[doc.id]) for doc in corpus)  # cut at MAX_CHUNK_CHARS
+        assert after_report["truncated"] == 0
+        assert after_report["tokens"]["max"] <= budget.chunk_tokens
+        assert all(len(c.text) <= MAX_CHUNK_CHARS for c in after)
+        for doc in corpus:
+            assert not lost_words(doc, after_by_doc[doc.id]), doc.id
+
+        # The adapter agrees: nothing gets cut on the way to Ollama
+        adapter = EmbeddingAdapter(model_name=model)
+        assert all(adapter._truncate_text(c.text, max_tokens=budget.max_tokens) == c.text for c in after)
+        assert adapter.truncations == 0
+
+    def test_overlap_measured_in_tokens(self):
+        tokenizer = HeuristicTokenizer()
+        chunker = DocumentChunker(chunk_size=120, overlap=30, tokenizer=tokenizer)
+        doc = RawDocument(id="d", url="u", title="t", source="test_docs",
+                          content="\n\n".join(f"Paragraph {i} talks about pods and nodes at length." for i in range(40)))
+        chunks = chunker.chunk_document(doc)
+
+        assert len(chunks) > 3
+        assert all(tokenizer.count(c.text) <= 120 for c in chunks)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            first_new = next(p for p in chunk.text.split("\n\n") if p not in previous.text)
+            overlap = chunk.text[: chunk.text.index(first_new)].strip()
+            assert overlap and previous.text.endswith(overlap)
+            assert tokenizer.count(overlap) <= 30
+
+    def test_pluggable_tokenizer_per_tier(self):
+        class WhitespaceTokenizer(Tokenizer):
+            name = "whitespace"
+
+            def count(self, text):
+                return len(text.split())
+
+        tokenization.register_tokenizer(EmbeddingTier.STANDARD, WhitespaceTokenizer())
+        assert get_token_budget(STANDARD_MODEL).tokenizer.name == "whitespace"
+        assert get_token_budget(HIGH_MODEL).tokenizer.name == "heuristic"
+
+        chunker = DocumentChunker.for_model(STANDARD_MODEL)
+        budget = get_token_budget(STANDARD_MODEL)
+        assert chunker.chunk_size == budget.chunk_tokens and chunker.overlap == budget.overlap_tokens
+        doc = RawDocument(id="d", url="u", title="t", source="test_docs", content=" ".join(["word"] * 2000))
+        chunks = chunker.chunk_document(doc)
+        assert all(len(c.text.split()) <= budget.chunk_tokens for c in chunks)
+        assert sum(len(c.text.split()) for c in chunks) >= 2000
+
+        # The adapter truncates by the same tokenizer and counts it
+        adapter = EmbeddingAdapter(model_name=STANDARD_MODEL)
+        text = " ".join(["w"] * (budget.max_tokens + 10))
+        assert len(adapter._truncate_text(text, max_tokens=budget.max_tokens).split()) == budget.max_tokens
+        assert adapter.truncations == 1
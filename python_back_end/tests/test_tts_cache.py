@@ -0,0 +1,177 @@
+"""
+Tests for the per-sentence TTS audio cache, driven by a fake TTS engine
+"""
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts_cache as tts_cache_module
+from tts_cache import TTSCache, split_sentences
+
+SR = 24000
+
+
+class FakeTTS:
+    """Deterministic 'audio' derived from the text, with a fixed synthesis cost"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, sentence):
+        with self.lock:
+            self.calls.append(sentence)
+        time.sleep(self.delay)
+        return SR, np.array([float(ord(c)) for c in sentence], dtype=np.float32)
+
+    @staticmethod
+    def expected(text):
+        return np.concatenate([FakeTTS()(s)[1] for s in split_sentences(text)])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TTSCache(str(tmp_path / "tts"), max_bytes=64 * 1024 * 1024)
+
+
+class TestTTSCache:
+
+    def test_partially_repeated_reply_only_synthesizes_new_sentences(self, cache):
+        tts = FakeTTS(delay=0.01)
+        spec = {"engine": "qwen", "voice": "harvis_voice.mp3", "params": {"temperature": 0.3}}
+
+        first = "Hello there! I checked the logs. Everything looks fine."
+        second = "Hello   there!\nI checked the logs. The deploy failed at step 3."
+        sr, wav = cache.synthesize(first, tts, **spec)
+        assert sr == SR and np.array_equal(wav, FakeTTS.expected(first))
+        sr, wav = cache.synthesize(second, tts, **spec)
+        assert np.array_equal(wav, FakeTTS.expected(second))
+
+        assert tts.calls == ["Hello there!", "I checked the logs.", "Everything looks fine.",
+                             "The deploy failed at step 3."]
+        stats = cache.get_stats()
+        assert stats["hits"] == 2 and stats["misses"] == 4
+        assert stats["hit_rate"] == pytest.approx(2 / 6)
+        assert stats["seconds_saved"] >= 0.02
+
+        # Voice and parameters are part of the key
+        cache.synthesize("Hello there!", tts, engine="qwen", voice="other.mp3", params={"temperature": 0.3})
+        cache.synthesize("Hello there!", tts, engine="chatterbox", voice="harvis_voice.mp3",
+                         params={"temperature": 0.3})
+        cache.synthesize("Hello there!", tts, engine="qwen", voice="harvis_voice.mp3", params={"temperature": 0.5})
+        assert len(tts.calls) == 7
+
+        # Whole-text lookups only succeed when every sentence is cached
+        assert np.array_equal(cache.lookup(second, **spec)[1], FakeTTS.expected(second))
+        assert cache.lookup("Hello there! Something new.", **spec) is None
+
+    def test_concurrent_identical_requests_synthesize_once(self, cache):
+        tts = FakeTTS(delay=0.2)
+        text = "Good morning. Here is your summary."
+        results = [None] * 8
+        barrier = threading.Barrier(8)
+
+        def speak(i):
+            barrier.wait()
+            results[i] = cache.synthesize(text, tts, engine="qwen")
+
+        threads = [threading.Thread(target=speak, args=(i,)) for i in range(8)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        assert sorted(tts.calls) == ["Good morning.", "Here is your summary."]
+        assert all(np.array_equal(wav, FakeTTS.expected(text)) for _, wav in results)
+        assert elapsed < 1.0  # two synthesis slots, not sixteen
+        stats = cache.get_stats()
+        assert stats["misses"] == 2 and stats["hits"] + stats["joined"] == 14 and stats["in_flight"] == 0
+
+    def test_failed_synthesis_is_shared_and_not_cached(self, cache):
+        calls = []
+
+        def broken(sentence):
+            calls.append(sentence)
+            time.sleep(0.1)
+            raise RuntimeError("CUDA out of memory")
+
+        errors = []
+
+        def speak():
+            try:
+                cache.synthesize("Hi.", broken, engine="qwen")
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=speak) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == ["CUDA out of memory"] * 3 and len(calls) == 1
+        assert cache.get_stats()["entries"] == 0
+
+        tts = FakeTTS()
+        cache.synthesize("Hi.", tts, engine="qwen")
+        assert tts.calls == ["Hi."]
+
+    def test_lru_eviction_by_size_survives_restart(self, tmp_path):
+        root = str(tmp_path / "tts")
+        tts = FakeTTS()
+        probe = TTSCache(root)
+        probe.synthesize("Sentence number 0.", tts, engine="qwen")
+        entry_bytes = probe.get_stats()["bytes"]
+        probe.clear()
+
+        cache = TTSCache(root, max_bytes=int(entry_bytes * 3.5))
+        for i in range(3):
+            cache.synthesize(f"Sentence number {i}.", tts, engine="qwen")
+            time.sleep(0.01)  # distinct mtimes for the restart order
+        cache.synthesize("Sentence number 0.", tts, engine="qwen")  # now most recent
+        time.sleep(0.01)
+        cache.synthesize("Sentence number 3.", tts, engine="qwen")  # evicts 1
+
+        stats = cache.get_stats()
+        assert stats["entries"] == 3 and stats["evictions"] == 1 and stats["bytes"] <= stats["max_bytes"]
+        assert cache.lookup("Sentence number 1.", engine="qwen") is None
+
+        # Recency is rebuilt from mtimes: 2, then 0, then 3
+        reopened = TTSCache(root, max_bytes=int(entry_bytes * 3.5))
+        assert reopened.get_stats()["entries"] == 3
+        reopened.synthesize("Sentence number 4.", tts, engine="qwen")  # evicts 2, the least recent
+        calls = len(tts.calls)
+        reopened.synthesize("Sentence number 0. Sentence number 3.", tts, engine="qwen")
+        assert len(tts.calls) == calls
+        assert reopened.lookup("Sentence number 2.", engine="qwen") is None
+
+    def test_unified_tts_skips_model_load_when_fully_cached(self, cache, monkeypatch):
+        import model_manager
+
+        monkeypatch.setattr(tts_cache_module, "_tts_cache", cache)
+        monkeypatch.setattr(tts_cache_module, "TTS_CACHE_ENABLED", True)
+
+        def no_model(*args, **kwargs):
+            raise AssertionError("TTS model should not be loaded")
+
+        monkeypatch.setattr(model_manager, "generate_speech_optimized", no_model)
+        monkeypatch.setattr(model_manager, "use_tts_model_optimized", no_model)
+
+        text = "Welcome back. How can I help?"
+        spec = model_manager._chatterbox_cache_spec("voice.mp3", 0.5, 0.6, 2.5)
+        cache.synthesize(text, FakeTTS(), **spec)
+
+        sr, wav = model_manager.generate_speech_unified(
+            text, engine="chatterbox", audio_prompt="voice.mp3", exaggeration=0.5, temperature=0.6, cfg_weight=2.5
+        )
+        assert sr == SR and np.array_equal(wav, FakeTTS.expected(text))
+        assert tts_cache_module.get_tts_cache_stats()["hits"] == 2
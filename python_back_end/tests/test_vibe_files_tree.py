@@ -0,0 +1,149 @@
+"""
+Tests for vibe_files tree building and set-based subtree moves
+
+The tree tests are pure. The move benchmark needs a real Postgres: set
+VIBE_FILES_TEST_DATABASE_URL and it builds a 10k-node tree in a throwaway
+schema, then times the move/rename routes against it.
+
+    VIBE_FILES_TEST_DATABASE_URL=postgresql://... pytest tests/test_vibe_files_tree.py -s -m slow
+"""
+
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibecoding import files
+
+BENCH_DATABASE_URL = os.getenv("VIBE_FILES_TEST_DATABASE_URL")
+USER = {"id": 1}
+
+
+def row(name, type="file", parent=None, path=None):
+    now = datetime.now(timezone.utc)
+    return {
+        "id": uuid.uuid4(), "name": name, "type": type, "content": None, "language": "plaintext",
+        "path": path or name, "parent_id": parent["id"] if parent else None,
+        "session_id": "s", "created_at": now, "updated_at": now,
+    }
+
+
+class TestBuildFileTree:
+
+    def test_nests_in_row_order(self):
+        src = row("src", "folder")
+        lib = row("lib", "folder", src)
+        readme = row("README.md")
+        # Display order as the tree query returns it; children after parents is not required
+        rows = [lib, src, row("app.py", parent=src), row("util.py", parent=lib), readme]
+
+        tree = files.build_file_tree(rows)
+
+        assert [n["name"] for n in tree] == ["src", "README.md"]
+        assert [n["name"] for n in tree[0]["children"]] == ["lib", "app.py"]
+        assert tree[0]["children"][0]["children"][0]["name"] == "util.py"
+        assert tree[0]["children"][0]["parent_id"] == str(src["id"])
+
+    def test_orphans_are_dropped(self):
+        ghost = row("ghost", "folder")
+        tree = files.build_file_tree([row("a.py"), row("lost.py", parent=ghost)])
+        assert [n["name"] for n in tree] == ["a.py"]
+
+
+def build_rows(session_id, folders=100, files_per_folder=99):
+    """root/ -> 100 folders -> 99 files each (10,001 rows)"""
+    root_id = uuid.uuid4()
+    ids, names, types, paths, parents = [root_id], ["root"], ["folder"], ["root"], [None]
+    for f in range(folders):
+        folder_id = uuid.uuid4()
+        ids.append(folder_id); names.append(f"dir{f}"); types.append("folder")
+        paths.append(f"root/dir{f}"); parents.append(root_id)
+        for i in range(files_per_folder):
+            ids.append(uuid.uuid4()); names.append(f"file{i}.py"); types.append("file")
+            paths.append(f"root/dir{f}/file{i}.py"); parents.append(folder_id)
+    return root_id, (ids, names, types, paths, parents)
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+@pytest.mark.skipif(not BENCH_DATABASE_URL, reason="VIBE_FILES_TEST_DATABASE_URL not set")
+async def test_move_10k_node_subtree():
+    import asyncpg
+
+    schema = f"vibe_files_bench_{os.getpid()}"
+    admin = await asyncpg.connect(BENCH_DATABASE_URL)
+    await admin.execute(f'CREATE SCHEMA "{schema}"')
+    pool = await asyncpg.create_pool(BENCH_DATABASE_URL, min_size=1, max_size=2,
+                                     server_settings={"search_path": schema})
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE vibe_files (
+                    id UUID PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    type VARCHAR(20) NOT NULL,
+                    content TEXT,
+                    language VARCHAR(50) DEFAULT 'plaintext',
+                    path TEXT NOT NULL,
+                    parent_id UUID REFERENCES vibe_files(id) ON DELETE CASCADE,
+                    session_id VARCHAR(255) NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+                CREATE INDEX ON vibe_files(session_id, user_id);
+                CREATE INDEX ON vibe_files(parent_id);
+            """)
+            root_id, columns = build_rows("bench")
+            await conn.execute("""
+                INSERT INTO vibe_files (id, name, type, path, parent_id, session_id, user_id)
+                SELECT *, 'bench', 1 FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[], $5::uuid[])
+            """, *columns)
+            target_id = await conn.fetchval("""
+                INSERT INTO vibe_files (id, name, type, path, session_id, user_id)
+                VALUES ($1, 'archive', 'folder', 'archive', 'bench', 1) RETURNING id
+            """, uuid.uuid4())
+
+        await files.init_files_db(pool)
+        files._table_ready = True
+
+        started = time.perf_counter()
+        moved = await files.move_vibe_file(str(root_id), files.VibeFileMoveRequest(targetParentId=str(target_id)), USER)
+        move_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await files.update_vibe_file(str(root_id), files.VibeFileUpdate(name="renamed"), USER)
+        rename_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        tree = await files.get_session_files_tree(sessionId="bench", user=USER)
+        tree_s = time.perf_counter() - started
+
+        with pytest.raises(files.HTTPException) as cycle:
+            await files.move_vibe_file(str(target_id), files.VibeFileMoveRequest(targetParentId=str(root_id)), USER)
+
+        async with pool.acquire() as conn:
+            stale = await conn.fetchval("""
+                SELECT COUNT(*) FROM vibe_files
+                WHERE path NOT LIKE 'archive/renamed%' AND id <> $1
+            """, target_id)
+            sample = await conn.fetchval("SELECT path FROM vibe_files WHERE name = 'file7.py' LIMIT 1")
+
+        print(f"\nmove 10k subtree: {move_s * 1000:.1f} ms, rename: {rename_s * 1000:.1f} ms, "
+              f"tree: {tree_s * 1000:.1f} ms")
+        assert moved.path == "archive/root"
+        assert stale == 0
+        assert sample.startswith("archive/renamed/dir") and sample.endswith("/file7.py")
+        assert cycle.value.status_code == 400
+        assert tree["total"] == 10_002
+        assert [n["name"] for n in tree["tree"]] == ["archive"]
+    finally:
+        files._db_pool = None
+        await pool.close()
+        await admin.execute(f'DROP SCHEMA "{schema}" CASCADE')
+        await admin.close()
@@ -0,0 +1,309 @@
+"""
+Content-addressed cache for synthesized speech.
+
+Assistant replies repeat a lot (greetings, confirmations, replayed
+messages), and TTS is the slowest step of a voice turn. Audio is cached per
+sentence, keyed by a SHA-256 of the normalized sentence, the engine, the
+voice and the generation parameters. A reply that only partly matches
+earlier ones still reuses the sentences it shares with them.
+
+- Entries are .npz files under TTS_CACHE_DIR, evicted least-recently-used
+  once the directory passes TTS_CACHE_MAX_MB (recency survives restarts
+  through file mtimes).
+- Concurrent requests for the same sentence are single-flighted: one
+  caller synthesizes, the others wait for its result.
+- get_tts_cache_stats() reports hit rate and the synthesis time saved.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "harvis_tts_cache"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+
+Audio = Tuple[int, np.ndarray]
+Render = Callable[[str], Audio]
+
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC and collapsed whitespace; case and punctuation change the prosody, so they stay"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def split_sentences(text: str) -> List[str]:
+    """Normalized sentences of `text`, the unit of caching"""
+    return [s for s in _SENTENCE_END.split(normalize_text(text)) if s]
+
+
+def _voice_id(voice: Optional[str]) -> Optional[str]:
+    """A voice file is identified by path, size and mtime, so replacing it invalidates its audio"""
+    if voice and os.path.exists(voice):
+        stat = os.stat(voice)
+        return f"{os.path.abspath(voice)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return voice
+
+
+class TTSCache:
+    """Per-sentence audio cache on disk with LRU eviction and single-flight synthesis"""
+
+    def __init__(self, root: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # key -> (size in bytes, seconds the original synthesis took), oldest first
+        self._index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {
+            "hits": 0, "misses": 0, "joined": 0, "evictions": 0, "errors": 0,
+            "seconds_synthesized": 0.0, "seconds_saved": 0.0,
+        }
+        self._load_index()
+
+    # ── keys and files ──────────────────────────────────────────────────────
+
+    @staticmethod
+    def key(sentence: str, engine: str, voice: Optional[str] = None,
+            params: Optional[Dict[str, Any]] = None) -> str:
+        spec = {"text": normalize_text(sentence), "engine": engine, "voice": _voice_id(voice),
+                "params": params or {}}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.npz")
+
+    def _load_index(self):
+        """Rebuild the LRU from disk, least recently used (oldest mtime) first"""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.endswith(".tmp"):
+                    os.unlink(path)  # interrupted write
+                elif name.endswith(".npz"):
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            seconds = 0.0
+            try:
+                with np.load(self._path(key)) as data:
+                    seconds = float(data["seconds"])
+            except Exception:
+                pass
+            self._index[key] = (size, seconds)
+            self._bytes += size
+        if found:
+            logger.info(f"TTS cache: {len(found)} entries, {self._bytes / 1e6:.1f} MB in {self.root}")
+
+    def _read(self, key: str) -> Optional[Audio]:
+        try:
+            with np.load(self._path(key)) as data:
+                audio = (int(data["sr"]), data["wav"])
+            os.utime(self._path(key))  # recency for the next restart
+            return audio
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _write(self, key: str, audio: Audio, seconds: float):
+        sr, wav = audio
+        buffer = io.BytesIO()
+        np.savez(buffer, sr=np.int64(sr), wav=np.asarray(wav, dtype=np.float32), seconds=np.float64(seconds))
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(buffer.getbuffer())
+        os.replace(tmp, path)
+
+        evicted = []
+        with self._lock:
+            if key in self._index:
+                self._bytes -= self._index[key][0]
+            self._index[key] = (buffer.getbuffer().nbytes, seconds)
+            self._bytes += buffer.getbuffer().nbytes
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old_key, (old_size, _) = self._index.popitem(last=False)
+                self._bytes -= old_size
+                self._stats["evictions"] += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.unlink(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    # ── lookups ─────────────────────────────────────────────────────────────
+
+    def _get(self, key: str) -> Optional[Audio]:
+        """Cached audio, counted as a hit; None if absent (not counted)"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            self._index.move_to_end(key)
+        audio = self._read(key)
+        with self._lock:
+            if audio is None:
+                # Removed behind our back
+                if self._index.pop(key, None) is not None:
+                    self._bytes -= entry[0]
+                return None
+            self._stats["hits"] += 1
+            self._stats["seconds_saved"] += entry[1]
+        return audio
+
+    def get_or_render(self, sentence: str, render: Render, engine: str, voice: Optional[str] = None,
+                      params: Optional[Dict[str, Any]] = None) -> Audio:
+        """Audio for one sentence: cached, joined from an in-flight synthesis, or rendered"""
+        key = self.key(sentence, engine, voice, params)
+        audio = self._get(key)
+        if audio is not None:
+            return audio
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self._stats["misses"] += 1
+            else:
+                self._stats["joined"] += 1
+
+        if not leader:
+            audio, seconds = future.result()
+            with self._lock:
+                self._stats["seconds_saved"] += seconds
+            return audio
+
+        try:
+            started = time.perf_counter()
+            audio = render(sentence)
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._stats["seconds_synthesized"] += seconds
+            try:
+                self._write(key, audio, seconds)
+            except OSError as e:
+                logger.warning(f"TTS cache write failed: {e}")
+            future.set_result((audio, seconds))
+            return audio
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def lookup(self, text: str, engine: str, voice: Optional[str] = None,
+               params: Optional[Dict[str, Any]] = None) -> Optional[Audio]:
+        """The whole text's audio if every sentence is cached, else None (nothing counted)"""
+        sentences = split_sentences(text)
+        keys = [self.key(s, engine, voice, params) for s in sentences]
+        with self._lock:
+            if not keys or any(k not in self._index for k in keys):
+                return None
+        parts = []
+        for key in keys:
+            audio = self._get(key)
+            if audio is None:
+                return None
+            parts.append(audio)
+        return _concatenate(parts)
+
+    def synthesize(self, text: str, render: Render, engine: str, voice: Optional[str] = None,
+                   params: Optional[Dict[str, Any]] = None) -> Audio:
+        """
+        Audio for `text`, rendering only the sentences not cached yet.
+        `render(sentence)` returns (sample_rate, wav) for one sentence.
+        """
+        sentences = split_sentences(text)
+        if not sentences:
+            return render(text)
+        return _concatenate([self.get_or_render(s, render, engine, voice, params) for s in sentences])
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._index)
+            self._index.clear()
+            self._bytes = 0
+        for key in keys:
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"] + stats["joined"]
+            stats.update({
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "in_flight": len(self._inflight),
+                "lookups": lookups,
+                "hit_rate": (stats["hits"] + stats["joined"]) / lookups if lookups else 0.0,
+                "seconds_synthesized": round(stats["seconds_synthesized"], 3),
+                "seconds_saved": round(stats["seconds_saved"], 3),
+            })
+        return stats
+
+
+def _concatenate(parts: List[Audio]) -> Audio:
+    sample_rate = parts[0][0]
+    if any(sr != sample_rate for sr, _ in parts):
+        logger.warning(f"TTS cache: mixed sample rates {sorted({sr for sr, _ in parts})}, using {sample_rate}")
+    if len(parts) == 1:
+        return parts[0]
+    return sample_rate, np.concatenate([wav for _, wav in parts])
+
+
+# Global cache instance
+_tts_cache: Optional[TTSCache] = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> Optional[TTSCache]:
+    """Shared TTS cache, or None when TTS_CACHE_ENABLED is false"""
+    global _tts_cache
+    if not TTS_CACHE_ENABLED:
+        return None
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                try:
+                    _tts_cache = TTSCache()
+                except OSError as e:
+                    logger.warning(f"TTS cache disabled, cannot use {TTS_CACHE_DIR}: {e}")
+                    return None
+    return _tts_cache
+
+
+def get_tts_cache_stats() -> Dict[str, Any]:
+    """Hit rate and synthesis time saved (empty when the cache has not been used yet)"""
+    if _tts_cache is None:
+        return {"enabled": TTS_CACHE_ENABLED, "hit_rate": 0.0, "lookups": 0}
+    return {"enabled": True, **_tts_cache.get_stats()}
@@ -7,7 +7,6 @@ extracted from main.py to keep the vibe coding logic organized.
 import os
 import uuid
 import tempfile
-import soundfile as sf
 import shlex
 import subprocess
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File
@@ -15,9 +14,13 @@ from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import logging
 
+from ml_runtime import lazy_import
+
 from .core import get_vibe_agent, execute_vibe_coding_with_model_management
 from model_manager import transcribe_with_whisper_optimized, generate_speech_optimized, reload_models_if_needed
 
+sf = lazy_import("soundfile")
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["vibe-commands"])
@@ -0,0 +1,229 @@
+"""Archive-based file transfer for vibecoding dev containers
+
+File contents move through the Docker archive API (put_archive / get_archive)
+or a single `tar` exec instead of shell-quoted `echo | tee` and `cat`, so
+file size is not limited by ARG_MAX and a batch of files is one round trip.
+Directory listings come from one `find -printf` call.
+
+Everything here is blocking docker-py; callers run it with asyncio.to_thread.
+"""
+
+import io
+import posixpath
+import tarfile
+import time
+import logging
+from typing import Dict, List, Optional, Any, Tuple, Union
+
+from docker.errors import NotFound
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE = "/workspace"
+
+# Directories not descended into when listing a tree
+TREE_PRUNE_DIRS = ("node_modules", ".git", "__pycache__", ".venv", "venv", ".next")
+MAX_TREE_ENTRIES = 5000
+MAX_READ_BYTES = 10 * 1024 * 1024
+
+# type \t size \t mtime \t symbolic mode \t path relative to the start point
+FIND_FORMAT = r"%y\t%s\t%T@\t%M\t%P\0"
+
+
+def normalize_path(path: str, base: str = WORKSPACE) -> str:
+    """Absolute, normalized container path; relative paths are under base"""
+    if not path.startswith("/"):
+        path = posixpath.join(base, path)
+    return posixpath.normpath(path)
+
+
+def _common_root(paths: List[str]) -> str:
+    root = posixpath.commonpath([posixpath.dirname(p) for p in paths])
+    return root or "/"
+
+
+def build_archive(files: Dict[str, Union[str, bytes]], mode: int = 0o644) -> Tuple[str, bytes]:
+    """
+    Pack files into one tar for put_archive.
+
+    Returns (extract_root, tar_bytes); member names are relative to the root,
+    and parent directories below it are included so they get created.
+    """
+    paths = {normalize_path(p): content for p, content in files.items()}
+    root = _common_root(list(paths))
+    now = time.time()
+
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        dirs = set()
+        for path in paths:
+            parent = posixpath.dirname(posixpath.relpath(path, root))
+            while parent and parent != "." and parent not in dirs:
+                dirs.add(parent)
+                parent = posixpath.dirname(parent)
+        for d in sorted(dirs):
+            info = tarfile.TarInfo(d)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            info.mtime = now
+            tar.addfile(info)
+
+        for path, content in paths.items():
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            info = tarfile.TarInfo(posixpath.relpath(path, root))
+            info.size = len(data)
+            info.mode = mode
+            info.mtime = now
+            tar.addfile(info, io.BytesIO(data))
+
+    return root, buf.getvalue()
+
+
+def write_files(container, files: Dict[str, Union[str, bytes]]) -> None:
+    """Write any number of files with a single put_archive call"""
+    if not files:
+        return
+    root, data = build_archive(files)
+    try:
+        ok = container.put_archive(root, data)
+    except NotFound:
+        # put_archive needs the extraction directory to exist
+        container.exec_run(["mkdir", "-p", root])
+        ok = container.put_archive(root, data)
+    if not ok:
+        raise IOError(f"put_archive to {root} failed")
+
+
+def _read_members(tar: tarfile.TarFile, root: str) -> Dict[str, bytes]:
+    contents = {}
+    total = 0
+    for member in tar:
+        if not member.isfile():
+            continue
+        total += member.size
+        if total > MAX_READ_BYTES:
+            raise IOError(f"Read exceeds {MAX_READ_BYTES} bytes")
+        handle = tar.extractfile(member)
+        contents[posixpath.normpath(posixpath.join(root, member.name))] = handle.read()
+    return contents
+
+
+def read_file(container, path: str) -> Optional[bytes]:
+    """Read one file via get_archive; None if it does not exist"""
+    path = normalize_path(path)
+    try:
+        stream, stat = container.get_archive(path)
+    except NotFound:
+        return None
+    if stat.get("size", 0) > MAX_READ_BYTES:
+        raise IOError(f"{path} is larger than {MAX_READ_BYTES} bytes")
+
+    data = b"".join(stream)
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r") as tar:
+        members = _read_members(tar, posixpath.dirname(path))
+    return members.get(path)
+
+
+def read_files(container, paths: List[str]) -> Dict[str, Optional[bytes]]:
+    """
+    Read many files with one `tar -c` exec.
+
+    Missing paths map to None rather than failing the batch.
+    """
+    wanted = [normalize_path(p) for p in paths]
+    if not wanted:
+        return {}
+
+    # Path list goes to exec as argv (no shell), relative to / for tar -C
+    result = container.exec_run(
+        ["tar", "-cf", "-", "-C", "/", "--ignore-failed-read"]
+        + [p.lstrip("/") for p in wanted],
+        demux=True,
+    )
+    stdout, stderr = result.output if isinstance(result.output, tuple) else (result.output, b"")
+    if stderr:
+        logger.debug(f"tar read warnings: {stderr.decode('utf-8', errors='replace')[:500]}")
+
+    found: Dict[str, bytes] = {}
+    if stdout:
+        with tarfile.open(fileobj=io.BytesIO(stdout), mode="r") as tar:
+            found = _read_members(tar, "/")
+    return {path: found.get(path) for path in wanted}
+
+
+def _find_command(path: str, max_depth: Optional[int]) -> List[str]:
+    cmd = ["find", path, "-mindepth", "1"]
+    if max_depth is not None:
+        cmd += ["-maxdepth", str(max_depth)]
+    prune: List[str] = []
+    for name in TREE_PRUNE_DIRS:
+        prune += (["-o"] if prune else []) + ["-name", name]
+    # Pruned directories are still listed, just not descended into
+    cmd += ["(", "-type", "d", "(", *prune, ")", "-prune", "-printf", FIND_FORMAT, ")"]
+    cmd += ["-o", "-printf", FIND_FORMAT]
+    return cmd
+
+
+def parse_find_output(output: bytes, base: str) -> List[Dict[str, Any]]:
+    """Parse FIND_FORMAT records into entry dicts"""
+    entries = []
+    for record in output.split(b"\0"):
+        if not record:
+            continue
+        try:
+            kind, size, mtime, perms, rel = record.decode("utf-8", errors="replace").split("\t", 4)
+        except ValueError:
+            continue
+        entries.append({
+            "name": posixpath.basename(rel),
+            "type": "directory" if kind == "d" else "file",
+            "size": int(size) if size.isdigit() else 0,
+            "modified": float(mtime) if mtime else None,
+            "permissions": perms,
+            "path": posixpath.join(base, rel),
+            "relative_path": rel,
+        })
+        if len(entries) >= MAX_TREE_ENTRIES:
+            break
+    return entries
+
+
+def list_entries(container, path: str = WORKSPACE, max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+    """List a directory (or the whole tree below it) with one exec"""
+    path = normalize_path(path)
+    result = container.exec_run(_find_command(path, max_depth), demux=True)
+    stdout, stderr = result.output if isinstance(result.output, tuple) else (result.output, b"")
+    if result.exit_code != 0 and not stdout:
+        logger.debug(f"find {path} failed: {(stderr or b'').decode('utf-8', errors='replace')[:200]}")
+        return []
+    return parse_find_output(stdout or b"", path.rstrip("/") or "/")
+
+
+def build_tree(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Nest flat find entries; directories first, then files, alphabetically"""
+    nodes: Dict[str, Dict[str, Any]] = {}
+    roots: List[Dict[str, Any]] = []
+
+    for entry in sorted(entries, key=lambda e: e["relative_path"].count("/")):
+        node = {
+            "name": entry["name"],
+            "type": entry["type"],
+            "path": entry["path"],
+            "size": entry["size"],
+            "children": [],
+        }
+        nodes[entry["relative_path"]] = node
+        parent = posixpath.dirname(entry["relative_path"])
+        if parent and parent in nodes:
+            nodes[parent]["children"].append(node)
+        elif not parent:
+            roots.append(node)
+
+    def sort(items):
+        items.sort(key=lambda x: (x["type"] == "file", x["name"].lower()))
+        for item in items:
+            if item["children"]:
+                sort(item["children"])
+        return items
+
+    return sort(roots)
@@ -10,12 +10,14 @@ import uuid
 import logging
 import asyncio
 import json
+import time
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Request, Depends
 from pydantic import BaseModel
 import asyncpg
 from .db_session import get_session_db
+from . import container_files
 
 # Import auth utilities
 from auth_utils import get_current_user
@@ -28,6 +30,23 @@ router = APIRouter(tags=["vibe-dev-containers"])
 DEV_CONTAINER_IMAGE = "python:3.10-slim"
 CONTAINER_TIMEOUT = timedelta(hours=2)  # Auto-cleanup after 2 hours of inactivity
 VOLUME_PREFIX = "vibecoding_"
+# File trees are cached per session; writes through this manager invalidate,
+# the TTL covers changes made from the terminal
+TREE_CACHE_TTL = float(os.getenv("VIBECODING_TREE_CACHE_TTL", "10"))
+
+LANGUAGE_MAP = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+    '.html': 'html',
+    '.css': 'css',
+    '.json': 'json',
+    '.md': 'markdown',
+    '.txt': 'text',
+    '.sh': 'bash',
+    '.yml': 'yaml',
+    '.yaml': 'yaml'
+}
 
 class ContainerManager:
     """Manages Docker containers for vibecoding sessions."""
@@ -41,6 +60,8 @@ class ContainerManager:
             self.docker_client = None
         
         self.active_containers: Dict[str, Dict[str, Any]] = {}
+        # session_id -> {path: (cached_at, tree)}
+        self._tree_cache: Dict[str, Dict[str, Any]] = {}
         
     async def create_dev_container(self, session_id: str, user_id: str = None) -> Dict[str, Any]:
         """Create a new development container for a vibecoding session."""
@@ -53,12 +74,14 @@ class ContainerManager:
             
             # Check if container already exists
             try:
-                existing_container = self.docker_client.containers.get(container_name)
+                existing_container = await asyncio.to_thread(
+                    self.docker_client.containers.get, container_name
+                )
                 logger.info(f"🔄 Found existing container: {container_name}")
                 
                 # If container exists but is stopped, start it
                 if existing_container.status == "exited":
-                    existing_container.start()
+                    await asyncio.to_thread(existing_container.start)
                     logger.info(f"▶️ Started existing container: {container_name}")
                 elif existing_container.status == "running":
                     logger.info(f"✅ Container already running: {container_name}")
@@ -90,11 +113,13 @@ class ContainerManager:
             
             # Create volume for persistent storage
             try:
-                volume = self.docker_client.volumes.create(name=volume_name)
+                volume = await asyncio.to_thread(
+                    self.docker_client.volumes.create, name=volume_name
+                )
                 logger.info(f"📦 Created volume: {volume_name}")
             except docker.errors.APIError as e:
                 if "already exists" in str(e):
-                    volume = self.docker_client.volumes.get(volume_name)
+                    volume = await asyncio.to_thread(self.docker_client.volumes.get, volume_name)
                     logger.info(f"📦 Using existing volume: {volume_name}")
                 else:
                     raise
@@ -123,7 +148,9 @@ class ContainerManager:
             }
             
             # Create and start container
-            container = self.docker_client.containers.run(**container_config)
+            container = await asyncio.to_thread(
+                lambda: self.docker_client.containers.run(**container_config)
+            )
             
             # Install common development tools
             setup_commands = [
@@ -135,7 +162,7 @@ class ContainerManager:
             
             for cmd in setup_commands:
                 try:
-                    result = container.exec_run(cmd)
+                    result = await asyncio.to_thread(container.exec_run, cmd)
                     if result.exit_code != 0:
                         logger.warning(f"Setup command failed: {cmd} - {result.output.decode()}")
                 except Exception as e:
@@ -185,7 +212,9 @@ class ContainerManager:
         if session_id in self.active_containers:
             try:
                 container_info = self.active_containers[session_id]
-                container = self.docker_client.containers.get(container_info["container_id"])
+                container = await asyncio.to_thread(
+                    self.docker_client.containers.get, container_info["container_id"]
+                )
                 
                 # Update last activity
                 container_info["last_activity"] = datetime.now()
@@ -200,7 +229,7 @@ class ContainerManager:
         # If not in active_containers or failed, try to find by container name
         try:
             container_name = f"vibecoding_{session_id}"
-            container = self.docker_client.containers.get(container_name)
+            container = await asyncio.to_thread(self.docker_client.containers.get, container_name)
             
             # Container exists but not tracked, add it to active_containers
             volume_name = f"{VOLUME_PREFIX}{session_id}"
@@ -235,7 +264,9 @@ class ContainerManager:
             import time
             start_time = time.time()
             
-            result = container.exec_run(command, workdir="/workspace")
+            result = await asyncio.to_thread(container.exec_run, command, workdir="/workspace")
+            # Commands can create, move or delete files
+            self.invalidate_tree(session_id)
             
             execution_time_ms = int((time.time() - start_time) * 1000)
             output = result.output.decode("utf-8", errors="replace")
@@ -273,35 +304,43 @@ class ContainerManager:
             raise HTTPException(status_code=404, detail="Container not found")
         
         try:
-            result = container.exec_run(f"ls -la {path}")
-            if result.exit_code != 0:
-                return []
-            
-            files = []
-            lines = result.output.decode("utf-8").strip().split("\n")
-            
-            for line in lines[1:]:  # Skip total line
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 9:
-                        permissions = parts[0]
-                        size = parts[4] if parts[4].isdigit() else "0"
-                        name = " ".join(parts[8:])
-                        
-                        if name not in [".", ".."]:
-                            files.append({
-                                "name": name,
-                                "type": "directory" if permissions.startswith("d") else "file",
-                                "size": int(size),
-                                "permissions": permissions,
-                                "path": f"{path.rstrip('/')}/{name}"
-                            })
-            
-            return files
+            entries = await asyncio.to_thread(
+                container_files.list_entries, container, path, 1
+            )
+            return [
+                {
+                    "name": e["name"],
+                    "type": e["type"],
+                    "size": e["size"],
+                    "permissions": e["permissions"],
+                    "path": e["path"],
+                }
+                for e in entries
+            ]
         except Exception as e:
             logger.error(f"File listing failed: {e}")
             return []
     
+    async def get_file_tree(self, session_id: str, path: str = "/workspace") -> List[Dict[str, Any]]:
+        """Full nested file tree below path, from one find call (cached per session)."""
+        path = container_files.normalize_path(path)
+        cached = self._tree_cache.get(session_id, {}).get(path)
+        if cached and time.monotonic() - cached[0] < TREE_CACHE_TTL:
+            return cached[1]
+        
+        container = await self.get_container(session_id)
+        if not container:
+            raise HTTPException(status_code=404, detail="Container not found")
+        
+        entries = await asyncio.to_thread(container_files.list_entries, container, path)
+        tree = container_files.build_tree(entries)
+        self._tree_cache.setdefault(session_id, {})[path] = (time.monotonic(), tree)
+        return tree
+    
+    def invalidate_tree(self, session_id: str):
+        """Drop cached file trees for a session."""
+        self._tree_cache.pop(session_id, None)
+    
     async def read_file(self, session_id: str, file_path: str) -> str:
         """Read file content from container."""
         container = await self.get_container(session_id)
@@ -309,72 +348,76 @@ class ContainerManager:
             raise HTTPException(status_code=404, detail="Container not found")
         
         try:
-            result = container.exec_run(f"cat {file_path}")
-            if result.exit_code != 0:
-                raise HTTPException(status_code=404, detail="File not found")
-            
-            return result.output.decode("utf-8", errors="replace")
+            data = await asyncio.to_thread(container_files.read_file, container, file_path)
         except Exception as e:
             logger.error(f"File read failed: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to read file: {str(e)}")
+        
+        if data is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return data.decode("utf-8", errors="replace")
+    
+    async def read_files(self, session_id: str, file_paths: List[str]) -> Dict[str, Optional[str]]:
+        """Read several files in one round trip; missing files map to None."""
+        container = await self.get_container(session_id)
+        if not container:
+            raise HTTPException(status_code=404, detail="Container not found")
+        
+        try:
+            found = await asyncio.to_thread(container_files.read_files, container, file_paths)
+        except Exception as e:
+            logger.error(f"Batch file read failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to read files: {str(e)}")
+        
+        return {
+            path: data.decode("utf-8", errors="replace") if data is not None else None
+            for path, data in found.items()
+        }
     
     async def write_file(self, session_id: str, file_path: str, content: str) -> bool:
         """Write content to file in container."""
+        results = await self.write_files(session_id, {file_path: content})
+        return results.get(container_files.normalize_path(file_path), False)
+    
+    async def write_files(self, session_id: str, files: Dict[str, str]) -> Dict[str, bool]:
+        """Write several files with a single archive upload."""
         container = await self.get_container(session_id)
         if not container:
             raise HTTPException(status_code=404, detail="Container not found")
         
+        normalized = {container_files.normalize_path(p): c for p, c in files.items()}
         try:
-            import os
-            # Create directory if it doesn't exist
-            dir_path = os.path.dirname(file_path)
-            if dir_path:
-                container.exec_run(f"mkdir -p {dir_path}")
-            
-            # Write content using tee command to handle special characters
-            import shlex
-            escaped_content = shlex.quote(content)
-            result = container.exec_run(f"echo {escaped_content} | tee {file_path}")
-            
-            success = result.exit_code == 0
-            
-            if success:
-                # Update file metadata in database
-                try:
-                    file_name = os.path.basename(file_path)
-                    file_ext = os.path.splitext(file_name)[1].lower()
-                    
-                    # Detect file type and language
-                    language_map = {
-                        '.py': 'python',
-                        '.js': 'javascript',
-                        '.ts': 'typescript',
-                        '.html': 'html',
-                        '.css': 'css',
-                        '.json': 'json',
-                        '.md': 'markdown',
-                        '.txt': 'text',
-                        '.sh': 'bash',
-                        '.yml': 'yaml',
-                        '.yaml': 'yaml'
-                    }
-                    
-                    language = language_map.get(file_ext, 'text')
-                    file_type = 'text' if file_ext in language_map else 'binary'
-                    content_preview = content[:500] if len(content) > 500 else content
-                    
-                    session_db = get_session_db()
-                    await session_db.update_session_file(
-                        session_id, file_path, file_name, file_type,
-                        len(content), content_preview, language
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to update file metadata: {e}")
-            
-            return success
+            await asyncio.to_thread(container_files.write_files, container, normalized)
         except Exception as e:
             logger.error(f"File write failed: {e}")
-            return False
+            return {path: False for path in normalized}
+        finally:
+            self.invalidate_tree(session_id)
+        
+        # Update file metadata in database
+        await asyncio.gather(*[
+            self._record_file_metadata(session_id, path, content)
+            for path, content in normalized.items()
+        ])
+        return {path: True for path in normalized}
+    
+    async def _record_file_metadata(self, session_id: str, file_path: str, content: str):
+        try:
+            file_name = os.path.basename(file_path)
+            file_ext = os.path.splitext(file_name)[1].lower()
+            
+            # Detect file type and language
+            language = LANGUAGE_MAP.get(file_ext, 'text')
+            file_type = 'text' if file_ext in LANGUAGE_MAP else 'binary'
+            content_preview = content[:500] if len(content) > 500 else content
+            
+            session_db = get_session_db()
+            await session_db.update_session_file(
+                session_id, file_path, file_name, file_type,
+                len(content), content_preview, language
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update file metadata: {e}")
     
     async def stop_container(self, session_id: str) -> bool:
         """Stop and remove container."""
@@ -383,13 +426,16 @@ class ContainerManager:
         
         try:
             container_info = self.active_containers[session_id]
-            container = self.docker_client.containers.get(container_info["container_id"])
+            container = await asyncio.to_thread(
+                self.docker_client.containers.get, container_info["container_id"]
+            )
             
-            container.stop(timeout=10)
-            container.remove()
+            await asyncio.to_thread(container.stop, timeout=10)
+            await asyncio.to_thread(container.remove)
             
             # Keep volume for data persistence, but remove from active containers
             del self.active_containers[session_id]
+            self.invalidate_tree(session_id)
             
             logger.info(f"✅ Stopped container for session: {session_id}")
             return True
@@ -471,85 +517,35 @@ async def write_file(req: FileOperationRequest):
     success = await container_manager.write_file(req.session_id, req.file_path, req.content)
     return {"success": success, "file_path": req.file_path}
 
+class BatchReadRequest(BaseModel):
+    session_id: str
+    file_paths: List[str]
+
+class BatchWriteRequest(BaseModel):
+    session_id: str
+    files: Dict[str, str]
+
+@router.post("/api/vibecoding/container/files/read-batch")
+async def read_files(req: BatchReadRequest):
+    """Read several files from the container in one round trip."""
+    files = await container_manager.read_files(req.session_id, req.file_paths)
+    return {"files": files}
+
+@router.post("/api/vibecoding/container/files/write-batch")
+async def write_files(req: BatchWriteRequest):
+    """Write several files to the container in one round trip."""
+    results = await container_manager.write_files(req.session_id, req.files)
+    return {"success": all(results.values()), "results": results}
+
 @router.post("/api/vibecoding/container/files/tree")
 async def get_file_tree(req: ListFilesRequest):
     """Get complete file tree structure for better performance."""
-    container = await container_manager.get_container(req.session_id)
-    if not container:
-        raise HTTPException(status_code=404, detail="Container not found")
-    
     try:
-        # Get full directory tree in one command for better performance
-        result = container.exec_run(
-            f"find {req.path} -type f -o -type d 2>/dev/null | head -1000"
-        )
-        
-        if result.exit_code != 0:
-            return {"files": [], "path": req.path}
-        
-        paths = result.output.decode("utf-8").strip().split("\n")
-        paths = [p for p in paths if p and p != req.path]
-        
-        # Build tree structure
-        tree_dict = {}
-        for path in paths:
-            if path:
-                relative_path = path.replace(req.path, "").strip("/")
-                if relative_path:
-                    parts = relative_path.split("/")
-                    current = tree_dict
-                    
-                    for i, part in enumerate(parts):
-                        if part not in current:
-                            # Check if it's the final part (file/directory)
-                            is_final = i == len(parts) - 1
-                            if is_final:
-                                # Check if it's a directory
-                                stat_result = container.exec_run(f"test -d '{path}' && echo dir || echo file")
-                                is_dir = "dir" in stat_result.output.decode().strip()
-                                
-                                current[part] = {
-                                    "type": "directory" if is_dir else "file",
-                                    "path": path,
-                                    "name": part,
-                                    "children": {} if is_dir else None
-                                }
-                            else:
-                                # Intermediate directory
-                                current[part] = current.get(part, {
-                                    "type": "directory",
-                                    "path": "/".join(path.split("/")[:-len(parts)+i+1]),
-                                    "name": part,
-                                    "children": {}
-                                })
-                                current = current[part]["children"]
-                        else:
-                            if "children" in current[part]:
-                                current = current[part]["children"]
-        
-        def tree_to_list(tree_dict):
-            result = []
-            for name, node in tree_dict.items():
-                node_data = {
-                    "name": name,
-                    "type": node["type"],
-                    "path": node["path"],
-                }
-                if node["type"] == "directory" and node.get("children"):
-                    node_data["children"] = tree_to_list(node["children"])
-                else:
-                    node_data["children"] = []
-                result.append(node_data)
-            
-            # Sort: directories first, then files, both alphabetically
-            result.sort(key=lambda x: (x["type"] == "file", x["name"].lower()))
-            return result
-        
-        file_list = tree_to_list(tree_dict)
+        file_list = await container_manager.get_file_tree(req.session_id, req.path)
         logger.info(f"Built file tree with {len(file_list)} root items for {req.session_id}")
-        
         return {"files": file_list, "path": req.path}
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"File tree listing failed: {e}")
         return {"files": [], "path": req.path}
@@ -568,7 +564,7 @@ async def get_container_status(session_id: str):
         return {"status": "not_found", "session_id": session_id}
     
     try:
-        container.reload()
+        await asyncio.to_thread(container.reload)
         return {
             "status": container.status,
             "session_id": session_id,
@@ -593,7 +589,8 @@ async def terminal_websocket(websocket: WebSocket, session_id: str):
     
     try:
         # Start interactive shell
-        exec_id = container.client.api.exec_create(
+        exec_id = await asyncio.to_thread(
+            container.client.api.exec_create,
             container.id,
             "/bin/bash",
             stdin=True,
@@ -601,7 +598,8 @@ async def terminal_websocket(websocket: WebSocket, session_id: str):
             workdir="/workspace"
         )
         
-        socket = container.client.api.exec_start(
+        socket = await asyncio.to_thread(
+            container.client.api.exec_start,
             exec_id["Id"],
             detach=False,
             tty=True,
@@ -621,7 +619,7 @@ async def terminal_websocket(websocket: WebSocket, session_id: str):
             try:
                 while True:
                     try:
-                        data = raw.recv(4096)    # use public recv with larger buffer
+                        data = await asyncio.to_thread(raw.recv, 4096)
                         if not data:
                             break
                         await websocket.send_text(data.decode("utf-8", errors="replace"))
@@ -636,7 +634,9 @@ async def terminal_websocket(websocket: WebSocket, session_id: str):
             try:
                 while True:
                     message = await websocket.receive_text()
-                    raw.send(message.encode("utf-8"))
+                    await asyncio.to_thread(raw.send, message.encode("utf-8"))
+                    # Typed commands may change files
+                    container_manager.invalidate_tree(session_id)
             except WebSocketDisconnect:
                 logger.info("Terminal WebSocket disconnected")
             except Exception as e:
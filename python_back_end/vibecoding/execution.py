@@ -16,6 +16,12 @@ from docker.errors import DockerException, ContainerError
 
 # Import auth dependencies
 from auth_utils import get_current_user
+from .runner_pool import (
+    RUNNER_POOL_ENABLED,
+    RunnerUnavailable,
+    get_runner_pool,
+    get_runner_stats,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -141,9 +147,14 @@ async def execute_code_in_container(
     docker_image: str,
     working_dir: str = "/workspace",
     timeout: int = 30,
-    dependencies: Optional[List[str]] = None
+    dependencies: Optional[List[str]] = None,
+    owner: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Execute code in a Docker container"""
+    """Execute code in a Docker container
+
+    With an owner (user and session), the run goes to a warm runner that
+    serves only that owner; without one it gets a one-off container.
+    """
     
     if not DOCKER_AVAILABLE:
         return {
@@ -154,6 +165,25 @@ async def execute_code_in_container(
             "execution_time": 0.0
         }
     
+    # Warm runner containers: exec into an idle runner instead of creating one
+    if RUNNER_POOL_ENABLED and owner:
+        try:
+            pool = await asyncio.to_thread(get_runner_pool, docker_client)
+            return await asyncio.to_thread(
+                pool.run,
+                owner,
+                code,
+                language,
+                filename,
+                get_execution_command(language, filename),
+                docker_image,
+                working_dir,
+                timeout,
+                dependencies,
+            )
+        except RunnerUnavailable as e:
+            logger.warning(f"Warm runner unavailable, using a one-off container: {e}")
+    
     container = None
     start_time = datetime.now()
     
@@ -549,7 +579,8 @@ async def execute_code(
                 docker_image=docker_image,
                 working_dir=request.working_directory or "/workspace",
                 timeout=request.timeout or 30,
-                dependencies=request.dependencies
+                dependencies=request.dependencies,
+                owner=f"{user.get('id')}:{request.session_id}"
             )
         else:
             logger.info(f"Using fallback execution for {request.language} (Docker not available)")
@@ -718,6 +749,13 @@ async def get_docker_status(
             "error": str(e)
         }
 
+@router.get("/runners/stats")
+async def get_runner_pool_stats(
+    user: Dict = Depends(get_current_user)
+):
+    """Warm runner pool: idle/busy runners, cold vs warm latency, reaping"""
+    return get_runner_stats()
+
 @router.get("/languages")
 async def get_supported_languages(
     user: Dict = Depends(get_current_user)
@@ -0,0 +1,557 @@
+"""Warm runner containers for vibecoding code execution
+
+Instead of creating (and pulling, and installing into) a container for every
+run, keeps idle runner containers per (owner, image, dependency set) and
+sends each run to one of them with `docker exec`:
+
+- a runner only ever serves one owner (user and vibecoding session), so
+  nothing one user's code leaves behind can reach another user's run
+- runners have no network, a memory/CPU/pids limit, run as an unprivileged
+  user with no capabilities on a read-only root filesystem, and only
+  /workspace and /tmp (tmpfs) are writable
+- code goes in with one put_archive, runs under `timeout`, and the runner is
+  reset afterwards (all processes killed, /workspace and /tmp emptied)
+- dependencies are installed once into a named volume keyed by the image
+  and the sorted dependency list, then mounted read-only at /deps
+- runners idle longer than VIBECODING_RUNNER_IDLE_TTL are removed, as are
+  dependency volumes no runner has used for as long, and everything is
+  removed on shutdown
+- runners and volumes are labelled with the backend process that owns them
+  (host, pid and process start time). On start a pool removes only those
+  whose owner is gone, never those of sibling workers (UVICORN_WORKERS).
+  Dependency volumes belong to one pool, so no other process can remove
+  one in use
+"""
+
+import hashlib
+import logging
+import os
+import shlex
+import socket
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from docker.errors import DockerException, ImageNotFound, NotFound
+
+from .container_files import write_files
+
+logger = logging.getLogger(__name__)
+
+RUNNER_POOL_ENABLED = os.getenv("VIBECODING_RUNNER_POOL", "true").lower() == "true"
+MAX_RUNNERS = int(os.getenv("VIBECODING_MAX_RUNNERS", "8"))
+MAX_IDLE_PER_KEY = int(os.getenv("VIBECODING_MAX_IDLE_PER_KEY", "2"))
+RUNNER_IDLE_TTL = float(os.getenv("VIBECODING_RUNNER_IDLE_TTL", "600"))  # seconds
+RUNNER_MEM_LIMIT = os.getenv("VIBECODING_RUNNER_MEM_LIMIT", "512m")
+DEPS_INSTALL_TIMEOUT = int(os.getenv("VIBECODING_DEPS_INSTALL_TIMEOUT", "300"))
+# uid:gid runner code runs as (nobody on Debian and Alpine images)
+RUNNER_USER = os.getenv("VIBECODING_RUNNER_USER", "65534:65534")
+
+RUNNER_LABEL = "vibecoding.runner"
+DEPS_MOUNT = "/deps"
+DEPS_VOLUME_PREFIX = "vibecoding_deps_"
+
+# PID 1 of a runner: idles until removed
+IDLE_COMMAND = ["sh", "-c", "trap 'exit 0' TERM; while :; do sleep 3600; done"]
+
+# kill(-1) reaches every process of the runner user but PID 1 and the
+# caller, so anything the last run left in the background is gone before
+# the next one
+RESET_SCRIPT = (
+    "kill -9 -1 2>/dev/null; "
+    "rm -rf {workdir}/* {workdir}/.[!.]* {workdir}/..?* /tmp/* /tmp/.[!.]* 2>/dev/null; "
+    "mkdir -p {workdir}; true"
+)
+
+# How each language installs a dependency set into /deps, and the
+# environment runners need to find it
+DEPENDENCY_INSTALLERS = {
+    "python": (
+        "pip install --no-cache-dir --disable-pip-version-check --target /deps {packages}",
+        {"PYTHONPATH": DEPS_MOUNT},
+    ),
+    "javascript": (
+        "npm install --no-audit --no-fund --prefix /deps {packages}",
+        {"NODE_PATH": f"{DEPS_MOUNT}/node_modules"},
+    ),
+    "typescript": (
+        "npm install --no-audit --no-fund --prefix /deps {packages}",
+        {"NODE_PATH": f"{DEPS_MOUNT}/node_modules"},
+    ),
+}
+
+
+class RunnerUnavailable(Exception):
+    """No warm runner could be provided; callers fall back to a one-off container"""
+
+
+def dependency_key(image: str, language: str, dependencies: Optional[List[str]]) -> Optional[str]:
+    """Volume key for a dependency set, or None when there is nothing to install"""
+    if not dependencies or language not in DEPENDENCY_INSTALLERS:
+        return None
+    packages = sorted({d.strip() for d in dependencies if d and d.strip()})
+    if not packages:
+        return None
+    digest = hashlib.sha256("\n".join([image, language, *packages]).encode()).hexdigest()
+    return digest[:16]
+
+
+# (owner, image, dependency key)
+RunnerKey = Tuple[str, str, Optional[str]]
+
+
+def deps_volume(instance: str, deps_key: str) -> str:
+    return f"{DEPS_VOLUME_PREFIX}{instance}_{deps_key}"
+
+
+def _process_start(pid: int) -> Optional[str]:
+    """Start time of a process (clock ticks since boot), to tell its owner from a reused pid"""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rpartition(")")[2].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def process_owner() -> str:
+    """Owner label for this process: host:pid:start"""
+    pid = os.getpid()
+    return f"{socket.gethostname()}:{pid}:{_process_start(pid) or ''}"
+
+
+class Runner:
+    """One warm container"""
+
+    def __init__(self, container, key: RunnerKey):
+        self.container = container
+        self.key = key
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.runs = 0
+
+    @property
+    def id(self) -> str:
+        return self.container.id[:12]
+
+
+class RunnerPool:
+    """Warm runner containers keyed by (owner, image, dependency key)"""
+
+    def __init__(
+        self,
+        client,
+        max_runners: int = MAX_RUNNERS,
+        max_idle_per_key: int = MAX_IDLE_PER_KEY,
+        idle_ttl: float = RUNNER_IDLE_TTL,
+        mem_limit: str = RUNNER_MEM_LIMIT,
+    ):
+        self.client = client
+        self.max_runners = max_runners
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_ttl = idle_ttl
+        self.mem_limit = mem_limit
+        self.instance = uuid.uuid4().hex[:8]
+        self.owner = process_owner()
+
+        self._cond = threading.Condition()
+        self._idle: Dict[RunnerKey, List[Runner]] = {}
+        self._busy: Dict[str, Runner] = {}
+        self._known_images: set = set()
+        self._ready_deps: set = set()
+        self._deps_last_used: Dict[str, float] = {}
+        self._deps_locks: Dict[str, threading.Lock] = {}
+        self._closed = False
+
+        self._latencies: Dict[str, Deque[float]] = {"cold": deque(maxlen=200), "warm": deque(maxlen=200)}
+        self._counters = {
+            "cold_starts": 0, "warm_starts": 0, "reaped": 0, "discarded": 0, "timeouts": 0, "volumes_removed": 0,
+        }
+
+        self._remove_orphans()
+        self._reaper = threading.Thread(target=self._reap_loop, name="vibe-runner-reaper", daemon=True)
+        self._reaper.start()
+
+    # Container lifecycle
+
+    def _labels(self, role: str) -> Dict[str, str]:
+        return {RUNNER_LABEL: role, f"{RUNNER_LABEL}.instance": self.instance, f"{RUNNER_LABEL}.owner": self.owner}
+
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        """
+        Whether the backend process in an owner label still runs. On another
+        host (in compose, another backend container, whose hostname is its
+        container id) it counts as alive while that container runs.
+        """
+        if not owner:
+            return False
+        host, _, rest = owner.partition(":")
+        pid, _, start = rest.partition(":")
+        if host != self.owner.partition(":")[0]:
+            try:
+                return self.client.containers.get(host).status == "running"
+            except NotFound:
+                return False
+            except DockerException:
+                return True
+        try:
+            os.kill(int(pid), 0)
+        except (ProcessLookupError, ValueError):
+            return False
+        except PermissionError:
+            pass
+        return not start or _process_start(int(pid)) in (None, start)
+
+    def _remove_orphans(self):
+        """Remove runners and dependency volumes whose backend process is gone"""
+        owners: Dict[str, bool] = {}
+
+        def orphaned(labels) -> bool:
+            owner = (labels or {}).get(f"{RUNNER_LABEL}.owner")
+            if owner not in owners:
+                owners[owner] = self._owner_alive(owner)
+            return not owners[owner]
+
+        try:
+            for container in self.client.containers.list(all=True, filters={"label": RUNNER_LABEL}):
+                if orphaned(container.labels):
+                    container.remove(force=True)
+            for volume in self.client.volumes.list(filters={"label": RUNNER_LABEL}):
+                if orphaned(volume.attrs.get("Labels")):
+                    volume.remove(force=True)
+        except DockerException as e:
+            logger.warning(f"Could not clean up old runner containers: {e}")
+
+    def _remove_volume(self, deps_key: str):
+        try:
+            self.client.volumes.get(deps_volume(self.instance, deps_key)).remove(force=True)
+            self._counters["volumes_removed"] += 1
+        except DockerException as e:
+            logger.warning(f"Could not remove dependency volume {deps_key}: {e}")
+
+    def _ensure_image(self, image: str):
+        if image in self._known_images:
+            return
+        try:
+            self.client.images.get(image)
+        except ImageNotFound:
+            logger.info(f"Pulling Docker image: {image}")
+            self.client.images.pull(image)
+        self._known_images.add(image)
+
+    def _ensure_dependencies(self, image: str, language: str, deps_key: str, dependencies: List[str]):
+        """Install a dependency set into its volume once (single-flight per key)"""
+        with self._cond:
+            # Marked in use before the check so the reaper leaves the volume alone
+            self._deps_last_used[deps_key] = time.monotonic()
+            if deps_key in self._ready_deps:
+                return
+            lock = self._deps_locks.setdefault(deps_key, threading.Lock())
+        with lock:
+            if deps_key in self._ready_deps:
+                return
+            command, _ = DEPENDENCY_INSTALLERS[language]
+            packages = " ".join(shlex.quote(d) for d in sorted({d.strip() for d in dependencies if d and d.strip()}))
+            script = f"test -f {DEPS_MOUNT}/.ready || ({command.format(packages=packages)} && touch {DEPS_MOUNT}/.ready)"
+            started = time.monotonic()
+            # Labelled so orphaned volumes can be found again
+            self.client.volumes.create(name=deps_volume(self.instance, deps_key), labels=self._labels("deps"))
+            installer = self.client.containers.run(
+                image,
+                command=["sh", "-c", script],
+                volumes={deps_volume(self.instance, deps_key): {"bind": DEPS_MOUNT, "mode": "rw"}},
+                network_mode="bridge",  # the only step with network access
+                mem_limit=self.mem_limit,
+                detach=True,
+                labels=self._labels("installer"),
+            )
+            try:
+                result = installer.wait(timeout=DEPS_INSTALL_TIMEOUT)
+                if result.get("StatusCode") != 0:
+                    logs = installer.logs(tail=20).decode("utf-8", errors="replace")
+                    raise RunnerUnavailable(f"Dependency install failed: {logs}")
+            finally:
+                try:
+                    installer.remove(force=True)
+                except DockerException:
+                    pass
+            self._ready_deps.add(deps_key)
+            logger.info(f"📦 Dependency volume {deps_key} ready in {time.monotonic() - started:.1f}s")
+
+    def _start_runner(self, key: RunnerKey, language: str, workdir: str) -> Runner:
+        _, image, deps_key = key
+        environment = {"PYTHONUNBUFFERED": "1", "HOME": "/tmp"}
+        volumes = {}
+        if deps_key:
+            volumes[deps_volume(self.instance, deps_key)] = {"bind": DEPS_MOUNT, "mode": "ro"}
+            environment.update(DEPENDENCY_INSTALLERS[language][1])
+
+        uid, _, gid = RUNNER_USER.partition(":")
+        owned = f"uid={uid},gid={gid or uid}"
+        container = self.client.containers.run(
+            image,
+            command=IDLE_COMMAND,
+            detach=True,
+            working_dir=workdir,
+            user=RUNNER_USER,
+            read_only=True,
+            cap_drop=["ALL"],
+            security_opt=["no-new-privileges"],
+            network_mode="none",
+            mem_limit=self.mem_limit,
+            nano_cpus=1_000_000_000,
+            pids_limit=256,
+            # The only writable paths, owned by the runner user so the reset can empty them
+            tmpfs={workdir: f"rw,exec,size=256m,mode=0755,{owned}", "/tmp": f"rw,exec,size=128m,mode=1777,{owned}"},
+            volumes=volumes,
+            environment=environment,
+            labels={**self._labels("runner"), f"{RUNNER_LABEL}.image": image},
+        )
+        return Runner(container, key)
+
+    def _discard(self, runner: Runner):
+        try:
+            runner.container.remove(force=True)
+        except DockerException:
+            pass
+
+    def _acquire(self, key, language: str, workdir: str) -> Tuple[Runner, bool]:
+        """Idle runner for key (warm) or a new one (cold), within max_runners"""
+        evict = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RunnerUnavailable("Runner pool is closed")
+                idle = self._idle.get(key)
+                if idle:
+                    runner = idle.pop()
+                    self._busy[runner.id] = runner
+                    return runner, True
+                total = len(self._busy) + sum(len(v) for v in self._idle.values())
+                if total < self.max_runners:
+                    break
+                # Make room by evicting the least recently used idle runner
+                candidates = [r for runners in self._idle.values() for r in runners]
+                if candidates:
+                    evict = min(candidates, key=lambda r: r.last_used)
+                    self._idle[evict.key].remove(evict)
+                    break
+                self._cond.wait(timeout=5)
+
+        if evict:
+            self._discard(evict)
+        runner = self._start_runner(key, language, workdir)
+        with self._cond:
+            self._busy[runner.id] = runner
+        return runner, False
+
+    def _release(self, runner: Runner, workdir: str, healthy: bool):
+        if healthy:
+            try:
+                reset = runner.container.exec_run(["sh", "-c", RESET_SCRIPT.format(workdir=workdir)])
+                healthy = reset.exit_code == 0
+            except DockerException:
+                healthy = False
+
+        with self._cond:
+            self._busy.pop(runner.id, None)
+            idle = self._idle.setdefault(runner.key, [])
+            keep = healthy and not self._closed and len(idle) < self.max_idle_per_key
+            if keep:
+                runner.last_used = time.monotonic()
+                idle.append(runner)
+            self._cond.notify()
+        if not keep:
+            self._counters["discarded"] += 1
+            self._discard(runner)
+
+    def _reap_loop(self):
+        while not self._closed:
+            time.sleep(min(30.0, max(self.idle_ttl / 4, 1.0)))
+            self.reap_idle()
+
+    def reap_idle(self) -> int:
+        """Remove runners idle longer than idle_ttl, then dependency volumes none of the rest use"""
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = []
+        with self._cond:
+            for key, runners in self._idle.items():
+                keep = [r for r in runners if r.last_used >= cutoff]
+                expired.extend(r for r in runners if r.last_used < cutoff)
+                self._idle[key] = keep
+        for runner in expired:
+            self._discard(runner)
+        self._counters["reaped"] += len(expired)
+
+        with self._cond:
+            in_use = {r.key[2] for r in self._busy.values()}
+            in_use.update(key[2] for key, runners in self._idle.items() if runners)
+            unused = [
+                k for k in self._ready_deps
+                if k not in in_use and self._deps_last_used.get(k, 0.0) < cutoff
+            ]
+            for deps_key in unused:
+                self._ready_deps.discard(deps_key)
+                self._deps_last_used.pop(deps_key, None)
+        for deps_key in unused:
+            self._remove_volume(deps_key)
+        return len(expired)
+
+    # Execution
+
+    def run(
+        self,
+        owner: str,
+        code: str,
+        language: str,
+        filename: str,
+        command: List[str],
+        image: str,
+        workdir: str = "/workspace",
+        timeout: int = 30,
+        dependencies: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Run code in a warm runner that only `owner` uses; result dict matches execute_code_in_container"""
+        started = time.monotonic()
+        language = language.lower()
+        try:
+            self._ensure_image(image)
+            deps_key = dependency_key(image, language, dependencies)
+            if deps_key:
+                self._ensure_dependencies(image, language, deps_key, dependencies)
+            runner, warm = self._acquire((owner, image, deps_key), language, workdir)
+        except RunnerUnavailable:
+            raise
+        except Exception as e:
+            # Docker API errors and client-side timeouts alike
+            raise RunnerUnavailable(str(e)) from e
+
+        healthy = True
+        timed_out = False
+        try:
+            write_files(runner.container, {os.path.join(workdir, filename): code})
+            # Not `started`: pulls and installs above do not count towards the run's timeout
+            exec_started = time.monotonic()
+            result = runner.container.exec_run(
+                ["timeout", "-s", "KILL", str(timeout), *command],
+                workdir=workdir,
+                demux=True,
+            )
+            stdout, stderr = result.output or (None, None)
+            exit_code = result.exit_code
+            # timeout -s KILL signals its own process group, so the exec
+            # reports 137 (or -9) once the deadline has passed
+            timed_out = exit_code in (124, 137, -9) and time.monotonic() - exec_started >= timeout
+            runner.runs += 1
+        except DockerException as e:
+            healthy = False
+            raise RunnerUnavailable(str(e)) from e
+        finally:
+            # Reset off the response path; the runner is not idle until it is done
+            threading.Thread(
+                target=self._release, args=(runner, workdir, healthy), daemon=True
+            ).start()
+
+        elapsed = time.monotonic() - started
+        kind = "warm" if warm else "cold"
+        self._counters[f"{kind}_starts"] += 1
+        self._latencies[kind].append(elapsed)
+        if timed_out:
+            self._counters["timeouts"] += 1
+
+        output = (stdout or b"").decode("utf-8", errors="ignore")
+        error = (stderr or b"").decode("utf-8", errors="ignore")
+        if timed_out:
+            error = (error + f"\nExecution timed out after {timeout} seconds").strip()
+
+        return {
+            "status": "timeout" if timed_out else ("completed" if exit_code == 0 else "failed"),
+            "output": output.strip(),
+            "error": error.strip() if error.strip() else None,
+            "exit_code": -1 if timed_out else exit_code,
+            "execution_time": elapsed,
+            "container_id": runner.container.id,
+            "runner": {"start": kind, "runs": runner.runs},
+        }
+
+    def prewarm(self, owner: str, image: str, language: str, workdir: str = "/workspace"):
+        """Start one idle runner for an owner and image without dependencies"""
+        try:
+            self._ensure_image(image)
+            runner, _ = self._acquire((owner, image, None), language, workdir)
+            self._release(runner, workdir, healthy=True)
+        except (DockerException, RunnerUnavailable) as e:
+            logger.warning(f"Could not prewarm runner for {image}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        def summarize(values):
+            values = list(values)
+            if not values:
+                return None
+            return {
+                "count": len(values),
+                "p50_ms": round(statistics.median(values) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1),
+            }
+
+        with self._cond:
+            idle: Dict[str, int] = {}
+            for (_, image, deps), runners in self._idle.items():
+                if runners:
+                    label = f"{image}|{deps or '-'}"
+                    idle[label] = idle.get(label, 0) + len(runners)
+            owners = len({key[0] for key, runners in self._idle.items() if runners}
+                         | {r.key[0] for r in self._busy.values()})
+            busy = len(self._busy)
+        return {
+            "enabled": RUNNER_POOL_ENABLED,
+            "max_runners": self.max_runners,
+            "idle": idle,
+            "busy": busy,
+            "owners": owners,
+            "dependency_volumes": len(self._ready_deps),
+            "latency": {kind: summarize(v) for kind, v in self._latencies.items()},
+            **self._counters,
+        }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            runners = [r for rs in self._idle.values() for r in rs] + list(self._busy.values())
+            self._idle.clear()
+            deps_keys = list(self._ready_deps)
+            self._ready_deps.clear()
+            self._cond.notify_all()
+        for runner in runners:
+            self._discard(runner)
+        for deps_key in deps_keys:
+            self._remove_volume(deps_key)
+
+
+_pool: Optional[RunnerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_runner_pool(client) -> RunnerPool:
+    """Process-wide runner pool (created on first use)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RunnerPool(client)
+        return _pool
+
+
+def get_runner_stats() -> Dict[str, Any]:
+    if _pool is None:
+        return {"enabled": RUNNER_POOL_ENABLED, "started": False}
+    return {"started": True, **_pool.get_stats()}
+
+
+def shutdown_runner_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
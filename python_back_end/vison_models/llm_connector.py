@@ -1,9 +1,12 @@
 import requests
 import os
-import torch
 import logging
-import google.generativeai as genai
-from .qwen import Qwen2VL
+
+from ml_runtime import lazy_import, single_init
+
+# torch, transformers (via Qwen2VL) and the Gemini SDK load on first use
+torch = lazy_import("torch")
+genai = lazy_import("google.generativeai")
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -20,10 +23,13 @@ def log_gpu_memory(stage: str):
         free = total - allocated
         logger.info(f"🔍 GPU Memory {stage}: {allocated:.2f}GB allocated, {reserved:.2f}GB reserved, {free:.2f}GB free")
 
+@single_init("qwen2vl", lambda: qwen_model is not None)
 def load_qwen_model():
     """Load Qwen2VL model if not already loaded"""
     global qwen_model
     if qwen_model is None:
+        from .qwen import Qwen2VL
+
         log_gpu_memory("before Qwen2VL load")
         
         # Additional cleanup before loading
@@ -85,9 +91,16 @@ def query_qwen(image_path: str, prompt: str) -> str:
 
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+_gemini_configured = False
+
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+def _get_genai():
+    """Gemini SDK, configured on first use"""
+    global _gemini_configured
+    if not _gemini_configured:
+        genai.configure(api_key=GEMINI_API_KEY)
+        _gemini_configured = True
+    return genai
 
 def unload_ollama_model(model_name: str, url: str = None) -> bool:
     """Unload specific Ollama model to free VRAM"""
@@ -144,7 +157,7 @@ def query_llm(prompt: str, model_name: str = "mistral", system_prompt: str = "",
         if not GEMINI_API_KEY:
             return "[LLM error] Gemini API key not configured."
         try:
-            model = genai.GenerativeModel(model_name)
+            model = _get_genai().GenerativeModel(model_name)
             response = model.generate_content(prompt)
             return response.text.strip()
         except Exception as e:
@@ -1,15 +1,26 @@
 """
 Document Generation Worker
 Processes document generation jobs from the queue
+
+One asyncpg pool is shared by every job in the process, and generation runs
+in a bounded thread pool so DOCUMENT_WORKER_CONCURRENCY documents render at
+once while the event loop keeps polling and heartbeating. Each job has a
+timeout, and setting its document_jobs row to 'cancelled' stops waiting on it.
+A render that is given up on still holds its thread, so its queue loop waits
+for it before taking (or retrying) anything else.
 """
 
 import os
 import sys
 import json
 import uuid
+import time
+import signal
 import asyncio
+import functools
 import logging
-from typing import Dict, Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -21,9 +32,69 @@ import asyncpg
 
 logger = logging.getLogger(__name__)
 
+# Documents rendered at once per worker process (queue loops and executor threads)
+DOCUMENT_WORKER_CONCURRENCY = int(os.getenv("DOCUMENT_WORKER_CONCURRENCY", "2"))
+# Wall-clock limit per job, on top of the sandbox's own CODE_MAX_EXECUTION_TIME
+DOCUMENT_JOB_TIMEOUT_S = float(os.getenv("DOCUMENT_JOB_TIMEOUT_S", "300"))
+# How often a running job touches document_jobs.updated_at and checks for cancellation
+DOCUMENT_JOB_HEARTBEAT_S = float(os.getenv("DOCUMENT_JOB_HEARTBEAT_S", "10"))
+
 # Initialize artifact storage
 artifact_storage = get_artifact_storage()
 
+# Shared per worker process
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_stats = {"completed": 0, "failed": 0, "timed_out": 0, "cancelled": 0, "in_flight": 0, "peak_in_flight": 0}
+
+
+class DocumentJobCancelled(Exception):
+    """The document_jobs row was set to 'cancelled' while the job was running"""
+
+
+async def get_worker_pool() -> asyncpg.Pool:
+    """The worker's asyncpg pool, created on first use"""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    os.getenv("DATABASE_URL"), min_size=1, max_size=DOCUMENT_WORKER_CONCURRENCY + 2
+                )
+    return _pool
+
+
+def get_document_executor() -> ThreadPoolExecutor:
+    """Threads that run generate_document_from_code, one per concurrent job"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DOCUMENT_WORKER_CONCURRENCY, thread_name_prefix="document-gen"
+        )
+    return _executor
+
+
+def get_document_worker_stats() -> Dict[str, Any]:
+    return dict(_stats)
+
+
+async def shutdown_document_worker():
+    """Close the shared pool, stop the executor and the warm document sandboxes"""
+    global _pool, _executor
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    try:
+        from artifacts.sandbox_pool import shutdown_sandbox_pools
+
+        await asyncio.to_thread(shutdown_sandbox_pools)
+    except Exception as e:
+        logger.warning(f"⚠️ Sandbox pool shutdown error: {e}")
+
 
 async def update_document_job(
     pool: asyncpg.Pool,
@@ -67,17 +138,75 @@ async def update_document_job(
         logger.error(f"Failed to update document job {job_id}: {e}")
 
 
+async def _heartbeat(pool: asyncpg.Pool, document_job_id: str):
+    """Touch the job row periodically; return once it has been cancelled"""
+    while True:
+        await asyncio.sleep(DOCUMENT_JOB_HEARTBEAT_S)
+        try:
+            status = await pool.fetchval(
+                "UPDATE document_jobs SET updated_at = NOW() WHERE id = $1 RETURNING status",
+                document_job_id,
+            )
+        except Exception as e:
+            logger.warning(f"Heartbeat failed for document job {document_job_id}: {e}")
+            continue
+        if status == "cancelled":
+            return
+
+
+async def _run_generation(pool: asyncpg.Pool, document_job_id: str, render: Future) -> Dict[str, Any]:
+    """
+    Wait for `render` (submitted to the bounded executor). Raises
+    asyncio.TimeoutError past DOCUMENT_JOB_TIMEOUT_S and DocumentJobCancelled
+    when the row is cancelled. A render that is already running cannot be
+    interrupted; see _wait_for_render.
+    """
+    future = asyncio.wrap_future(render)
+    heartbeat = asyncio.create_task(_heartbeat(pool, document_job_id))
+    try:
+        done, _ = await asyncio.wait(
+            {future, heartbeat}, timeout=DOCUMENT_JOB_TIMEOUT_S, return_when=asyncio.FIRST_COMPLETED
+        )
+        if future in done:
+            return future.result()
+        future.cancel()  # stops the render only if it has not started yet
+        if heartbeat in done:
+            raise DocumentJobCancelled()
+        raise asyncio.TimeoutError()
+    finally:
+        heartbeat.cancel()
+
+
+async def _wait_for_render(render: Optional[Future], document_job_id: str):
+    """
+    Wait until an abandoned render has left its thread (the sandbox enforces
+    its own execution limit). Until then the queue loop takes no other job,
+    so nothing queues behind the busy thread and a retry never overlaps it.
+    """
+    if render is None or render.done():
+        return
+    logger.warning(f"⏳ Waiting for the abandoned render of document job {document_job_id} to finish")
+    finished = asyncio.wrap_future(render)
+    await asyncio.wait({finished})
+    if not finished.cancelled() and finished.exception():
+        logger.warning(f"Abandoned render of document job {document_job_id} failed: {finished.exception()}")
+
+
 async def process_document_job(job: Job):
     """
     Process a document generation job
     This is called by the worker when a job is fetched from the queue
     """
     job_data = job.data
-    pool = await asyncpg.create_pool(os.getenv("DATABASE_URL"))
+    pool = await get_worker_pool()
+    document_job_id = job_data.get("document_job_id")
+    started = time.perf_counter()
+    _stats["in_flight"] += 1
+    _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    render: Optional[Future] = None
 
     try:
         # Extract job details
-        document_job_id = job_data.get("document_job_id")
         code = job_data.get("code")
         doc_type = job_data.get("document_type")
         title = job_data.get("title")
@@ -87,17 +216,25 @@ async def process_document_job(job: Job):
 
         logger.info(f"📄 Processing document job: {document_job_id} ({doc_type}) for artifact {artifact_id}")
 
+        # Cancelled while it was still queued
+        if await pool.fetchval("SELECT status FROM document_jobs WHERE id = $1", document_job_id) == "cancelled":
+            raise DocumentJobCancelled()
+
         # Update job status to processing
         await update_document_job(pool, document_job_id, "processing")
 
-        # Generate the document
-        result = generate_document_from_code(
-            llm_response=code,
-            artifact_type=doc_type,
-            title=title,
-            artifact_id=artifact_id,
-            use_docker=True,
+        # Generate the document off the event loop
+        render = get_document_executor().submit(
+            functools.partial(
+                generate_document_from_code,
+                llm_response=code,
+                artifact_type=doc_type,
+                title=title,
+                artifact_id=artifact_id,
+                use_docker=True,
+            )
         )
+        result = await _run_generation(pool, document_job_id, render)
 
         if result.get("success"):
             # Save artifact to database
@@ -175,13 +312,40 @@ async def process_document_job(job: Job):
 
             await update_document_job(pool, document_job_id, "failed", error=full_error)
             await job.fail(full_error)
-
+            _stats["failed"] += 1
+            return
+
+        _stats["completed"] += 1
+
+    except asyncio.TimeoutError:
+        error = f"Document generation timed out after {DOCUMENT_JOB_TIMEOUT_S:.0f}s"
+        logger.error(f"⏱️ {error}: {document_job_id}")
+        await update_document_job(pool, document_job_id, "failed", error=error)
+        _stats["timed_out"] += 1
+        try:
+            await _wait_for_render(render, document_job_id)
+        finally:
+            # Only now may the retry be scheduled
+            await job.fail(error)
+    except DocumentJobCancelled:
+        logger.info(f"🛑 Document job cancelled: {document_job_id}")
+        await job.done({"status": "cancelled"})
+        _stats["cancelled"] += 1
+        await _wait_for_render(render, document_job_id)
+    except asyncio.CancelledError:
+        # Worker shutting down: back in the queue, without using up an attempt
+        logger.warning(f"🛑 Document job interrupted by shutdown: {document_job_id}")
+        await update_document_job(pool, document_job_id, "pending")
+        await job.release()
+        raise
     except Exception as e:
         logger.exception(f"💥 Document job error: {e}")
         await update_document_job(pool, document_job_id, "failed", error=str(e))
         await job.fail(str(e))
+        _stats["failed"] += 1
     finally:
-        await pool.close()
+        _stats["in_flight"] -= 1
+        logger.info(f"⏱️ Document job {document_job_id} took {time.perf_counter() - started:.1f}s")
 
 
 async def run_worker():
@@ -195,21 +359,34 @@ async def run_worker():
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
 
-    logger.info("🚀 Starting Document Generation Worker...")
+    logger.info(
+        f"🚀 Starting Document Generation Worker (concurrency {DOCUMENT_WORKER_CONCURRENCY}, "
+        f"timeout {DOCUMENT_JOB_TIMEOUT_S:.0f}s)..."
+    )
 
     # Initialize job queue
     queue = await init_job_queue()
 
-    # Register worker for 'generate-document' queue
-    queue.work("generate-document", process_document_job)
+    # One queue loop per concurrent document; each hands rendering to the executor
+    for _ in range(DOCUMENT_WORKER_CONCURRENCY):
+        queue.work("generate-document", process_document_job)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
 
     # Keep running
     try:
-        while True:
-            await asyncio.sleep(1)
-    except KeyboardInterrupt:
+        await stop.wait()
+    finally:
         logger.info("🛑 Shutting down worker...")
         await shutdown_job_queue()
+        await shutdown_document_worker()
+        logger.info(f"📊 Document worker stats: {get_document_worker_stats()}")
 
 
 if __name__ == "__main__":